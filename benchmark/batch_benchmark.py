@@ -0,0 +1,106 @@
+"""Micro-benchmarks for the core operations of :class:`~tianshou.data.Batch`.
+
+The benchmarks cover construction (via the validating constructor and via the trusted
+``Batch.from_validated``), copying, slicing, ``len``, ``split`` (regular and contiguous), ``cat``, ``stack`` and ``to_torch``
+for batches resembling the ones created in the collection loop and when sampling from a replay
+buffer, including batches with nested (dict) observations as used with goal-based environments.
+
+Example usage:
+    python batch_benchmark.py --batch_size 256 --obs_dim 17
+"""
+
+import timeit
+from collections.abc import Callable
+from copy import copy
+
+import numpy as np
+from sensai.util import logging
+
+from tianshou.data import Batch
+
+log = logging.getLogger("batch_benchmark")
+
+
+def _time_per_call(fn: Callable[[], object], min_total_time: float) -> float:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    number = max(number, int(number * min_total_time / 0.2))
+    return min(timer.repeat(repeat=5, number=number)) / number
+
+
+def _create_transition_values(batch_size: int, obs_dim: int, act_dim: int) -> dict[str, np.ndarray]:
+    return {
+        "obs": np.random.rand(batch_size, obs_dim).astype(np.float32),
+        "act": np.random.rand(batch_size, act_dim).astype(np.float32),
+        "rew": np.random.rand(batch_size),
+        "terminated": np.zeros(batch_size, dtype=bool),
+        "truncated": np.zeros(batch_size, dtype=bool),
+        "done": np.zeros(batch_size, dtype=bool),
+        "obs_next": np.random.rand(batch_size, obs_dim).astype(np.float32),
+    }
+
+
+def main(
+    batch_size: int = 256,
+    obs_dim: int = 17,
+    act_dim: int = 6,
+    num_batches: int = 16,
+    min_total_time: float = 0.2,
+) -> dict[str, float]:
+    """
+    :param batch_size: the number of transitions in each batch
+    :param obs_dim: the dimension of the (flat) observations
+    :param act_dim: the dimension of the actions
+    :param num_batches: the number of batches to concatenate/stack
+    :param min_total_time: the minimum time (in seconds) to spend on each timing repetition
+    :return: a mapping from benchmark name to the time per call in microseconds
+    """
+    values = _create_transition_values(batch_size, obs_dim, act_dim)
+    batch = Batch(**values, policy=Batch(), info=Batch())
+    batches = [
+        Batch(**_create_transition_values(batch_size, obs_dim, act_dim), info=Batch())
+        for _ in range(num_batches)
+    ]
+    nested_batch = Batch(
+        obs=Batch(
+            observation=values["obs"],
+            achieved_goal=values["act"],
+            desired_goal=Batch(position=values["act"], orientation=values["act"]),
+        ),
+        act=values["act"],
+        rew=values["rew"],
+        obs_next=Batch(observation=values["obs_next"], achieved_goal=values["act"]),
+        info=Batch(),
+    )
+    permuted_batch = Batch()
+    indices = np.random.randint(batch_size, size=batch_size // 4)
+
+    benchmarks: dict[str, Callable[[], object]] = {
+        "construct": lambda: Batch(**values, policy=Batch(), info=Batch()),
+        "construct_from_validated": lambda: Batch.from_validated(
+            **values, policy=Batch(), info=Batch()
+        ),
+        "construct_nested_dict": lambda: Batch({"obs": {"a": values["obs"], "b": values["obs"]}}),
+        "copy": lambda: copy(batch),
+        "index_int": lambda: batch[0],
+        "index_slice": lambda: batch[: batch_size // 2],
+        "index_array": lambda: batch[indices],
+        "index_array_nested": lambda: nested_batch[indices],
+        "len_nested": lambda: len(nested_batch),
+        "split_nested": lambda: list(nested_batch.split(batch_size // 8)),
+        "split_nested_contiguous": lambda: list(
+            nested_batch.split(batch_size // 8, contiguous=True, out=permuted_batch),
+        ),
+        "cat": lambda: Batch.cat(batches),
+        "stack": lambda: Batch.stack(batches),
+        "to_torch": lambda: batch.to_torch(),
+    }
+    results = {}
+    for name, fn in benchmarks.items():
+        results[name] = _time_per_call(fn, min_total_time) * 1e6
+        log.info(f"{name:>26s}: {results[name]:10.2f} us")
+    return results
+
+
+if __name__ == "__main__":
+    logging.run_cli(main)
@@ -0,0 +1,115 @@
+"""Benchmark measuring the start-up latency of a training process.
+
+Each run is performed in a fresh Python process, which imports tianshou, sets up DQN on CartPole,
+performs the first collect and the first gradient step (whose n-step return computation triggers the
+compilation of the numba kernels). The first run uses an empty numba cache directory, such that the
+kernels are compiled from scratch (cold start); subsequent runs reuse the kernels cached on disk by
+the first run (warm start).
+
+Example usage:
+    python startup_time.py --num_runs 3
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from sensai.util import logging
+
+log = logging.getLogger("startup_time")
+
+_CHILD_SCRIPT = """
+import json
+import sys
+import time
+
+start_time = time.perf_counter()
+timings = {}
+num_envs = int(sys.argv[1])
+
+import gymnasium as gym
+
+from tianshou.algorithm import DQN
+from tianshou.algorithm.modelfree.dqn import DiscreteQLearningPolicy
+from tianshou.algorithm.optim import AdamOptimizerFactory
+from tianshou.data import Collector, CollectStats, VectorReplayBuffer
+from tianshou.env import DummyVectorEnv
+from tianshou.utils.net.common import Net
+from tianshou.utils.torch_utils import policy_within_training_step
+
+timings["import"] = time.perf_counter() - start_time
+
+phase_start_time = time.perf_counter()
+env = gym.make("CartPole-v1")
+net = Net(
+    state_shape=env.observation_space.shape or 4,
+    action_shape=int(env.action_space.n),
+    hidden_sizes=[64, 64],
+)
+policy = DiscreteQLearningPolicy(
+    model=net,
+    action_space=env.action_space,
+    observation_space=env.observation_space,
+)
+algorithm = DQN(
+    policy=policy,
+    optim=AdamOptimizerFactory(lr=1e-3),
+    target_update_freq=100,
+    n_step_return_horizon=3,
+)
+collector = Collector[CollectStats](
+    algorithm,
+    DummyVectorEnv([lambda: gym.make("CartPole-v1") for _ in range(num_envs)]),
+    VectorReplayBuffer(10000, buffer_num=num_envs),
+)
+collector.reset()
+timings["setup"] = time.perf_counter() - phase_start_time
+
+phase_start_time = time.perf_counter()
+collector.collect(n_step=256, random=True)
+timings["first_collect"] = time.perf_counter() - phase_start_time
+
+phase_start_time = time.perf_counter()
+with policy_within_training_step(policy):
+    algorithm.update(sample_size=64, buffer=collector.buffer)
+timings["first_update"] = time.perf_counter() - phase_start_time
+
+timings["total"] = time.perf_counter() - start_time
+print(json.dumps(timings))
+"""
+
+
+def _run_child(num_envs: int, numba_cache_dir: str) -> dict[str, float]:
+    env = dict(os.environ, NUMBA_CACHE_DIR=numba_cache_dir)
+    output = subprocess.run(
+        [sys.executable, "-c", _CHILD_SCRIPT, str(num_envs)],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(num_runs: int = 3, num_envs: int = 4) -> dict[str, dict[str, float]]:
+    """
+    :param num_runs: the number of runs; the first run starts with an empty numba cache, all
+        subsequent runs reuse it
+    :param num_envs: the number of environments to collect from
+    :return: a mapping from run name to a mapping from phase name to the time in seconds
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as numba_cache_dir:
+        for i in range(num_runs):
+            run_name = "cold" if i == 0 else f"warm{i}"
+            timings = _run_child(num_envs, numba_cache_dir)
+            results[run_name] = timings
+            timings_str = ", ".join(f"{k}={v:.3f}s" for k, v in timings.items())
+            log.info(f"{run_name:>6s}: {timings_str}")
+    return results
+
+
+if __name__ == "__main__":
+    logging.run_cli(main)
@@ -0,0 +1,109 @@
+"""Micro-benchmark measuring the trainer's bookkeeping overhead per gradient step.
+
+For off-policy training with high update-to-data ratios, the trainer performs its bookkeeping
+(moving averages of the losses, update logging) after every single gradient step. This script
+measures the time spent on this bookkeeping and relates it to the time of the gradient steps
+themselves, using DQN with a small network on CartPole.
+
+Example usage:
+    python trainer_overhead.py --num_gradient_steps 2000 --hidden_sizes "[64, 64]"
+"""
+
+import time
+
+import gymnasium as gym
+import numpy as np
+import torch
+from sensai.util import logging
+
+from tianshou.algorithm import DQN
+from tianshou.algorithm.modelfree.dqn import DiscreteQLearningPolicy
+from tianshou.algorithm.optim import AdamOptimizerFactory
+from tianshou.data import Collector, CollectStats, VectorReplayBuffer
+from tianshou.env import DummyVectorEnv
+from tianshou.trainer import OffPolicyTrainer, OffPolicyTrainerParams
+from tianshou.utils import LazyLogger
+from tianshou.utils.net.common import Net
+from tianshou.utils.torch_utils import policy_within_training_step
+
+log = logging.getLogger("trainer_overhead")
+
+
+def main(
+    num_gradient_steps: int = 2000,
+    batch_size: int = 64,
+    hidden_sizes: tuple[int, ...] = (64, 64),
+    update_interval: int = 1000,
+    seed: int = 0,
+) -> None:
+    """
+    :param num_gradient_steps: the number of gradient steps to measure
+    :param batch_size: the mini-batch size of each gradient step
+    :param hidden_sizes: the hidden layer sizes of the Q-network
+    :param update_interval: the logger's update interval (in update steps)
+    :param seed: the random seed
+    """
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    env = gym.make("CartPole-v1")
+    assert isinstance(env.action_space, gym.spaces.Discrete)
+    net = Net(
+        state_shape=env.observation_space.shape or 4,
+        action_shape=int(env.action_space.n),
+        hidden_sizes=list(hidden_sizes),
+    )
+    policy = DiscreteQLearningPolicy(
+        model=net,
+        action_space=env.action_space,
+        observation_space=env.observation_space,
+    )
+    algorithm = DQN(policy=policy, optim=AdamOptimizerFactory(lr=1e-3), target_update_freq=100)
+    training_collector = Collector[CollectStats](
+        algorithm,
+        DummyVectorEnv([lambda: gym.make("CartPole-v1")]),
+        VectorReplayBuffer(10000, buffer_num=1),
+    )
+    training_collector.reset()
+    training_collector.collect(n_step=5000, random=True)
+
+    logger = LazyLogger()
+    logger.update_interval = update_interval
+    trainer = OffPolicyTrainer(
+        algorithm,
+        OffPolicyTrainerParams(
+            training_collector=training_collector,
+            batch_size=batch_size,
+            logger=logger,
+            show_progress=False,
+            verbose=False,
+        ),
+    )
+    buffer = training_collector.buffer
+
+    with policy_within_training_step(policy):
+        update_stats = [
+            algorithm.update(sample_size=batch_size, buffer=buffer)
+            for _ in range(num_gradient_steps)
+        ]
+        # time the gradient steps alone
+        start_time = time.perf_counter()
+        for _ in range(num_gradient_steps):
+            algorithm.update(sample_size=batch_size, buffer=buffer)
+        gradient_step_time = (time.perf_counter() - start_time) / num_gradient_steps
+
+        # time the trainer's per-step bookkeeping alone
+        start_time = time.perf_counter()
+        for update_stat in update_stats:
+            trainer._current_update_step += 1
+            trainer._update_moving_avg_stats_and_log_update_data(update_stat)
+        bookkeeping_time = (time.perf_counter() - start_time) / num_gradient_steps
+
+    log.info(
+        f"Gradient step: {gradient_step_time * 1e6:.1f} us, "
+        f"trainer bookkeeping: {bookkeeping_time * 1e6:.1f} us per gradient step "
+        f"({100 * bookkeeping_time / (gradient_step_time + bookkeeping_time):.1f}% of step time)"
+    )
+
+
+if __name__ == "__main__":
+    logging.run_cli(main)
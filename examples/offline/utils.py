@@ -30,6 +30,7 @@ def load_buffer(buffer_path: str) -> ReplayBuffer:
             obs_next=dataset["next_observations"],
             terminated=dataset["terminals"],
             truncated=np.zeros(len(dataset["terminals"])),
+            mmap=True,
         )
 
 
@@ -450,6 +450,56 @@ def test_batch_copy() -> None:
     assert orig_b_b_addr != curr_b_b_addr
 
 
+def test_batch_shallow_copy() -> None:
+    batch = Batch(a=np.array([1, 2]), b=Batch(c=np.array([3, 4])), d=None)
+    batch_copy = copy.copy(batch)
+    assert batch_copy == batch
+    assert batch_copy.a is batch.a
+    assert batch_copy.b is not batch.b
+    assert batch_copy.b.c is batch.b.c
+    batch_copy.pop("a")
+    batch_copy.b.pop("c")
+    assert "a" in batch
+    assert "c" in batch.b
+
+
+def test_batch_from_validated() -> None:
+    values = {
+        "obs": np.zeros((3, 2)),
+        "act": torch.ones(3),
+        "info": np.array([None, "a", 1], dtype=object),
+        "policy": Batch(x=np.arange(3)),
+        "dist": Categorical(probs=torch.ones(3, 2)),
+        "state": None,
+    }
+    batch = Batch.from_validated(values)
+    for key, value in values.items():
+        assert batch[key] is value
+    values.pop("dist")
+    assert Batch.from_validated(**values) == Batch(values)
+    assert len(Batch.from_validated().get_keys()) == 0
+
+
+def test_batch_stack_info_dicts() -> None:
+    """The fast path for dicts with number values must give the same result as the general stacking logic."""
+    infos_cases: list[list[dict[str, Any]]] = [
+        [{"env_id": 0, "x": 0.5, "flag": True}, {"env_id": 1, "x": 1.5, "flag": False}],
+        [{"n": np.int32(1)}, {"n": np.int32(2)}],
+        # not covered by the fast path: different keys, types, non-number values
+        [{"env_id": 0}, {"env_id": 1, "x": 1.5}],
+        [{"x": 1}, {"x": 1.5}],
+        [{"x": "a"}, {"x": "b"}],
+        [{"x": {"y": 1}}, {"x": {"y": 2}}],
+    ]
+    for infos in infos_cases:
+        batch = Batch(info=np.array(infos, dtype=object))
+        expected = Batch.stack([Batch(info) for info in infos])
+        assert batch.info == expected
+        for key, value in expected.items():
+            if isinstance(value, np.ndarray):
+                assert batch.info[key].dtype == value.dtype
+
+
 def test_batch_empty() -> None:
     b5_dict = np.array([{"a": False, "b": {"c": 2.0, "d": 1.0}}, {"a": True, "b": {"c": 3.0}}])
     b5 = Batch(b5_dict)
@@ -956,3 +1006,102 @@ class TestSlicing:
         with pytest.raises(TypeError):
             # scalar batches have no len
             len(batch_with_dist[0])
+
+    @staticmethod
+    def test_getitem_nested_batch_keeps_structure() -> None:
+        batch = Batch(
+            a=np.arange(4),
+            obs=Batch(
+                observation=np.zeros((4, 3)), goal=Batch(achieved=np.ones((4, 2)), empty=Batch())
+            ),
+            info=Batch(),
+            b=None,
+        )
+        batch_sliced = batch[np.array([2, 0])]
+        assert list(batch_sliced.get_keys()) == ["a", "obs", "info", "b"]
+        assert list(batch_sliced.obs.get_keys()) == ["observation", "goal"]
+        assert list(batch_sliced.obs.goal.get_keys()) == ["achieved", "empty"]
+        assert np.array_equal(batch_sliced.a, np.array([2, 0]))
+        assert batch_sliced.obs.observation.shape == (2, 3)
+        assert batch_sliced.obs.goal.achieved.shape == (2, 2)
+        assert batch_sliced.b is None
+        # nested batches (including empty ones) are new objects
+        assert batch_sliced.obs is not batch.obs
+        assert batch_sliced.info is not batch.info
+        assert batch_sliced.obs.goal.empty is not batch.obs.goal.empty
+        assert len(batch_sliced) == 2
+
+    @staticmethod
+    def test_split_nested_batch() -> None:
+        batch = Batch(a=np.arange(10), obs=Batch(x=np.arange(10), y=Batch(z=np.arange(10))))
+        splits = list(batch.split(4, shuffle=False, merge_last=True))
+        assert [len(split) for split in splits] == [4, 6]
+        for split in splits:
+            assert np.array_equal(split.a, split.obs.x)
+            assert np.array_equal(split.a, split.obs.y.z)
+        assert np.array_equal(splits[1].obs.y.z, np.arange(4, 10))
+
+
+def test_batch_isinstance() -> None:
+    class BatchSubclass(Batch):
+        pass
+
+    assert isinstance(Batch(), Batch)
+    assert isinstance(BatchSubclass(), Batch)
+    assert not isinstance(Batch(), BatchSubclass)
+    assert not isinstance(np.zeros(3), Batch)
+    assert not isinstance({}, Batch)
+    assert issubclass(BatchSubclass, Batch)
+    assert not issubclass(dict, Batch)
+
+
+class TestSplit:
+    @staticmethod
+    def test_split_contiguous_yields_views_of_permuted_storage() -> None:
+        batch = Batch(
+            a=np.arange(10),
+            obs=Batch(x=np.arange(20).reshape(10, 2), empty=Batch()),
+            t=torch.arange(10.0),
+            b=None,
+            dist=Categorical(probs=torch.ones(10, 3)),
+        )
+        out = Batch()
+        storage: dict[str, Any] = {}
+        for _ in range(3):
+            minibatches = list(batch.split(3, merge_last=True, contiguous=True, out=out))
+            assert [len(minibatch) for minibatch in minibatches] == [3, 3, 4]
+            assert sorted(np.concatenate([minibatch.a for minibatch in minibatches])) == list(
+                range(10)
+            )
+            for minibatch in minibatches:
+                assert np.array_equal(minibatch.obs.x[:, 0], 2 * minibatch.a)
+                assert np.array_equal(minibatch.t.numpy(), minibatch.a)
+                assert minibatch.b is None
+                assert minibatch.dist.probs.shape == (len(minibatch), 3)
+                # the minibatches are views of the permuted storage
+                assert np.shares_memory(minibatch.a, out.a)
+            # the storage is reused across calls
+            if storage:
+                assert out.a is storage["a"]
+                assert out.obs.x is storage["obs.x"]
+                assert out.t is storage["t"]
+            storage = {"a": out.a, "obs.x": out.obs.x, "t": out.t}
+
+    @staticmethod
+    def test_split_contiguous_reallocates_mismatching_storage() -> None:
+        out = Batch(a=np.zeros(5), c=np.zeros(3))
+        batch = Batch(a=np.arange(10))
+        minibatches = list(batch.split(5, contiguous=True, out=out))
+        assert list(out.get_keys()) == ["a"]
+        assert out.a.shape == (10,)
+        assert sorted(np.concatenate([minibatch.a for minibatch in minibatches])) == list(range(10))
+
+    @staticmethod
+    def test_split_contiguous_without_shuffle_yields_views_of_batch() -> None:
+        batch = Batch(a=np.arange(10), obs=Batch(x=np.arange(10)))
+        minibatches = list(batch.split(4, shuffle=False, merge_last=True, contiguous=True))
+        assert [minibatch.a.tolist() for minibatch in minibatches] == [
+            [0, 1, 2, 3],
+            [4, 5, 6, 7, 8, 9],
+        ]
+        assert all(np.shares_memory(minibatch.obs.x, batch.obs.x) for minibatch in minibatches)
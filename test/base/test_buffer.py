@@ -1,8 +1,11 @@
+import copy
+import multiprocessing
 import os
 import pickle
 import tempfile
 from typing import cast
 
+import gymnasium as gym
 import h5py
 import numpy as np
 import numpy.typing as npt
@@ -10,6 +13,7 @@ import pytest
 import torch
 
 from test.base.env import MoveToRightEnv, MyGoalEnv
+from tianshou.algorithm.algorithm_base import Algorithm
 from tianshou.data import (
     Batch,
     CachedReplayBuffer,
@@ -19,9 +23,10 @@ from tianshou.data import (
     PrioritizedVectorReplayBuffer,
     ReplayBuffer,
     SegmentTree,
+    SharedMemoryVectorReplayBuffer,
     VectorReplayBuffer,
 )
-from tianshou.data.types import RolloutBatchProtocol
+from tianshou.data.types import RecurrentStateBatch, RolloutBatchProtocol
 from tianshou.data.utils.converter import to_hdf5
 
 
@@ -221,6 +226,35 @@ def test_ignore_obs_next(size: int = 10) -> None:
     assert data.obs_next
 
 
+@pytest.mark.parametrize("ignore_obs_next", [False, True])
+@pytest.mark.parametrize("stack_num", [1, 3])
+def test_get_keys(ignore_obs_next: bool, stack_num: int, size: int = 10) -> None:
+    buf = ReplayBuffer(size, stack_num=stack_num, ignore_obs_next=ignore_obs_next)
+    for i in range(size + 3):
+        buf.add(
+            cast(
+                RolloutBatchProtocol,
+                Batch(
+                    obs={"mask": i, "pos": np.array([i, -i])},
+                    act=i,
+                    rew=i,
+                    terminated=i % 4 == 0,
+                    truncated=False,
+                    obs_next={"mask": i + 1, "pos": np.array([i + 1, -i - 1])},
+                    info={"if": i},
+                ),
+            ),
+        )
+    for index in (np.array([0, 3, 5, 9, 9]), slice(2, 7), slice(None)):
+        data = buf[index]
+        keys = ("obs_next", "rew", "done", "info")
+        data_keys = buf.get_keys(index, keys)
+        assert data_keys == Batch({key: data[key] for key in keys})
+        assert len(buf.get_keys(index, ()).get_keys()) == 0
+    with pytest.raises(KeyError):
+        buf.get_keys(np.array([0]), ("nonexistent",))
+
+
 def test_stack(size: int = 5, bufsize: int = 9, stack_num: int = 4, cached_num: int = 3) -> None:
     env = MoveToRightEnv(size)
     buf = ReplayBuffer(bufsize, stack_num=stack_num)
@@ -399,24 +433,56 @@ def test_herreplaybuffer(size: int = 10, bufsize: int = 100, sample_sz: int = 4)
         assert len(buf) == min(bufsize, i + 1)
         assert len(buf2) == min(bufsize, 3 * (i + 1))
 
+    stored_goal, stored_rew = buf.obs.desired_goal.copy(), buf.rew.copy()
+    # the seed yields a relabeled goal which differs from the stored one
+    np.random.seed(0)
     batch_sample, indices = buf.sample(sample_sz)
-
-    # Check that goals are the same for the episode (only 1 ep in buffer)
+    her = batch_sample.her
+
+    # Check that goals are the same for the episode (only 1 ep in buffer) and that the
+    # rewards of the episode's subsequent transitions are computed for the relabeled goal
+    assert np.all(her.is_relabeled)
+    g = cast(Batch, batch_sample.obs).desired_goal.reshape(sample_sz, -1)[:, 0]
+    g_next = cast(Batch, batch_sample.obs_next).desired_goal.reshape(sample_sz, -1)[:, 0]
+    assert np.all(g == g[0])
+    assert np.all(g_next == g)
+    assert g[0] != env_size
+    assert np.all(batch_sample.rew == her.rew[:, 0])
     tmp_indices = indices.copy()
-    for _ in range(2 * env_size):
-        obs_in_buf = cast(Batch, buf[tmp_indices].obs)
+    for t in range(2 * env_size):
         obs_next_buf = cast(Batch, buf[tmp_indices].obs_next)
-        rew_in_buf = buf[tmp_indices].rew
-        g = obs_in_buf.desired_goal.reshape(sample_sz, -1)[:, 0]
         ag_next = obs_next_buf.achieved_goal.reshape(sample_sz, -1)[:, 0]
-        g_next = obs_next_buf.desired_goal.reshape(sample_sz, -1)[:, 0]
-        assert np.all(g == g[0])
-        assert np.all(g_next == g_next[0])
-        assert np.all(rew_in_buf == (ag_next == g).astype(np.float32))
+        assert np.all(her.rew[:, t] == (ag_next == g).astype(np.float32))
         tmp_indices = buf.next(tmp_indices)
 
-    # Check that goals are correctly restored
-    buf._restore_cache()
+    # Check that the n-step returns are computed for the relabeled goal, as if the relabeled
+    # episode were stored, also after a subsequent sample (e.g. a prefetch)
+    buf.sample(sample_sz)
+
+    def target_q_fn(buffer: ReplayBuffer, indices: np.ndarray) -> torch.Tensor:
+        obs_next = buffer.get_keys(indices, ("obs_next",)).obs_next
+        return torch.tensor(obs_next.desired_goal.reshape(len(indices), -1)[:, :1]).double()
+
+    relabeled_buf = copy.deepcopy(buf)
+    relabeled_buf.obs.desired_goal[:] = g[0]
+    relabeled_buf.obs_next.desired_goal[:] = g[0]
+    relabeled_buf.rew[:] = compute_reward_fn(
+        relabeled_buf.obs_next.achieved_goal,
+        relabeled_buf.obs_next.desired_goal,
+    )
+    relabeled_batch = relabeled_buf[indices]
+    for n_step in [1, 3]:
+        returns = Algorithm.compute_nstep_return(
+            copy.deepcopy(batch_sample), buf, indices, target_q_fn, gamma=0.5, n_step=n_step
+        ).returns
+        expected_returns = Algorithm.compute_nstep_return(
+            relabeled_batch, relabeled_buf, indices, target_q_fn, gamma=0.5, n_step=n_step
+        ).returns
+        assert torch.allclose(returns, expected_returns)
+
+    # Check that the stored data is untouched
+    assert np.all(buf.obs.desired_goal == stored_goal)
+    assert np.all(buf.rew == stored_rew)
     tmp_indices = indices.copy()
     for _ in range(2 * env_size):
         obs_in_buf = cast(Batch, buf[tmp_indices].obs)
@@ -429,23 +495,23 @@ def test_herreplaybuffer(size: int = 10, bufsize: int = 100, sample_sz: int = 4)
         tmp_indices = buf.next(tmp_indices)
 
     # Test vector buffer
+    stored_goal = buf2.obs.desired_goal.copy()
     batch_sample, indices = buf2.sample(sample_sz)
+    her = batch_sample.her
 
-    # Check that goals are the same for the episode (only 1 ep in buffer)
+    # Check that goals are the same for the episode (only 1 ep in each sub-buffer)
+    g = cast(Batch, batch_sample.obs).desired_goal.reshape(sample_sz, -1)[:, 0]
+    g_next = cast(Batch, batch_sample.obs_next).desired_goal.reshape(sample_sz, -1)[:, 0]
+    assert np.all(g == g_next)
     tmp_indices = indices.copy()
-    for _ in range(2 * env_size):
-        obs_in_buf = cast(Batch, buf2[tmp_indices].obs)
+    for t in range(2 * env_size):
         obs_next_buf = cast(Batch, buf2[tmp_indices].obs_next)
-        rew_buf = buf2[tmp_indices].rew
-        g = obs_in_buf.desired_goal.reshape(sample_sz, -1)[:, 0]
         ag_next = obs_next_buf.achieved_goal.reshape(sample_sz, -1)[:, 0]
-        g_next = obs_next_buf.desired_goal.reshape(sample_sz, -1)[:, 0]
-        assert np.all(g == g_next)
-        assert np.all(rew_buf == (ag_next == g).astype(np.float32))
+        assert np.all(her.rew[:, t] == (ag_next == g).astype(np.float32))
         tmp_indices = buf2.next(tmp_indices)
 
-    # Check that goals are correctly restored
-    buf2._restore_cache()
+    # Check that the stored data is untouched
+    assert np.all(buf2.obs.desired_goal == stored_goal)
     tmp_indices = indices.copy()
     for _ in range(2 * env_size):
         obs_in_buf = cast(Batch, buf2[tmp_indices].obs)
@@ -484,10 +550,12 @@ def test_herreplaybuffer(size: int = 10, bufsize: int = 100, sample_sz: int = 4)
             buf.add(batch)
             obs = obs_next
     batch_sample, indices = buf.sample(0)
-    assert np.all(buf.obs.desired_goal[:5] == buf.obs.desired_goal[0])
-    assert np.all(buf.obs.desired_goal[5:10] == buf.obs.desired_goal[5])
-    assert np.all(buf.obs.desired_goal[5:] == buf.obs.desired_goal[14])  # (same ep)
-    assert np.all(buf.obs.desired_goal[0] != buf.obs.desired_goal[5])  # (diff ep)
+    desired_goal = np.empty_like(buf.obs.desired_goal)
+    desired_goal[indices] = batch_sample.obs.desired_goal
+    assert np.all(desired_goal[:5] == desired_goal[0])
+    assert np.all(desired_goal[5:10] == desired_goal[5])
+    assert np.all(desired_goal[5:] == desired_goal[14])  # (same ep)
+    assert np.all(desired_goal[0] != desired_goal[5])  # (diff ep)
 
     # Another test case for cycled indices
     env_size = 99
@@ -517,10 +585,10 @@ def test_herreplaybuffer(size: int = 10, bufsize: int = 100, sample_sz: int = 4)
                 continue
             buf.add(batch)
             obs = obs_next
-    buf._restore_cache()
     sample_indices = np.array([10])  # Suppose the sampled indices is [10]
-    buf.rewrite_transitions(sample_indices)
-    assert int(buf.obs.desired_goal[10][0]) in [11, 12, 13, 14, 15, 16, 17, 18, 19, 20]
+    her = buf.rewrite_transitions(sample_indices)
+    assert int(her.desired_goal[0][0]) in range(11, 21)
+    assert int(buf.obs.desired_goal[10][0]) == env_size
 
 
 def test_update() -> None:
@@ -725,6 +793,13 @@ def test_hdf5() -> None:
         assert np.all(buffers[k][:]["info"].number.n == _buffers[k][:]["info"].number.n)
         assert np.all(buffers[k][:]["info"]["extra"] == _buffers[k][:]["info"]["extra"])
 
+    # load memory-mapped replay buffer; modifications are not written back to the file
+    mmap_buf = ReplayBuffer.load_hdf5(paths["array"], mmap=True)
+    assert isinstance(mmap_buf.act, np.memmap)
+    assert np.array_equal(mmap_buf.act, buffers["array"].act)
+    mmap_buf.act[:] = -1
+    assert np.array_equal(ReplayBuffer.load_hdf5(paths["array"]).act, buffers["array"].act)
+
     # raise exception when value cannot be pickled
     data = {"not_supported": lambda x: x * x}
     grp = h5py.Group
@@ -1435,6 +1510,20 @@ def test_from_data() -> None:
     next_obs = batch.obs_next
     assert isinstance(next_obs, np.ndarray)
     assert np.array_equal(next_obs, 4 * np.ones((3, 3), dtype="uint8"))
+    # the last transition is the most recent one, so the first one is not an episode end
+    assert buf.next(0) == 1
+    assert buf.next(9) == 9
+    # contiguous datasets can be memory-mapped; the done flags can be derived
+    with h5py.File(path, "r") as f:
+        keys = ["obs", "act", "rew", "terminated", "truncated"]
+        mmap_buf = ReplayBuffer.from_data(*[f[k] for k in keys], None, f["obs_next"], mmap=True)
+    assert isinstance(mmap_buf.obs, np.memmap)
+    assert mmap_buf[:] == buf[:]
+    # the mapping is copy-on-write
+    mmap_buf.rew[0] = 100.0
+    with h5py.File(path, "r") as f:
+        assert f["rew"][0] == 0.0
+    del mmap_buf
     os.remove(path)
 
 
@@ -1588,3 +1677,273 @@ def test_get_vector_replay_buffer_indices(
         buffer.get_buffer_indices(3, 6)
     with pytest.raises(ValueError):
         buffer.get_buffer_indices(6, 3)
+
+
+def _add_to_shared_buffer(buffer: SharedMemoryVectorReplayBuffer, num_steps: int) -> None:
+    for i in range(num_steps):
+        buffer.add(
+            Batch(
+                obs=np.full((2, 3), i),
+                act=np.zeros(2),
+                rew=np.full(2, i),
+                terminated=np.zeros(2, dtype=bool),
+                truncated=np.array([False, i % 4 == 3]),
+                obs_next=np.full((2, 3), i + 1),
+            ),
+        )
+
+
+def test_shared_memory_vector_replay_buffer() -> None:
+    observation_space = gym.spaces.Box(-1, 1, (3,), dtype=np.float32)
+    buffer = SharedMemoryVectorReplayBuffer(20, 4, observation_space, gym.spaces.Discrete(2))
+    reference_buffer = VectorReplayBuffer(20, 4)
+    try:
+        for i in range(7):
+            batch = Batch(
+                obs=np.full((4, 3), i, dtype=np.float32),
+                act=np.arange(4) % 2,
+                rew=np.arange(4) + i,
+                terminated=np.array([i % 3 == 2, False, False, i % 2 == 1]),
+                truncated=np.array([False, i % 4 == 3, False, False]),
+                obs_next=np.full((4, 3), i + 1, dtype=np.float32),
+                info={"key": np.arange(4)},
+            )
+            for result, expected in zip(
+                buffer.add(batch),
+                reference_buffer.add(batch),
+                strict=True,
+            ):
+                assert np.array_equal(result, expected)
+        assert len(buffer) == len(reference_buffer)
+        indices = np.arange(20)
+        assert np.array_equal(buffer.prev(indices), reference_buffer.prev(indices))
+        assert np.array_equal(buffer.next(indices), reference_buffer.next(indices))
+        assert np.array_equal(buffer.unfinished_index(), reference_buffer.unfinished_index())
+        # info is not stored
+        assert buffer[:].info == Batch()
+        reference_data = reference_buffer[:]
+        reference_data.info = Batch()
+        assert buffer[:] == reference_data
+        batch, indices = buffer.sample(8)
+        assert np.array_equal(batch.rew, reference_buffer.rew[indices])
+
+        # another process writes to its own sub-buffers, while this process samples
+        attached_buffer = SharedMemoryVectorReplayBuffer.attach(buffer.name, buffer_ids=[2, 3])
+        with pytest.raises(ValueError):
+            attached_buffer.add(batch[:2], buffer_ids=[0, 1])
+        process = multiprocessing.get_context("fork").Process(
+            target=_add_to_shared_buffer,
+            args=(attached_buffer, 500),
+        )
+        process.start()
+        while process.is_alive():
+            batch, _ = buffer.sample(8)
+            assert np.all(batch.obs_next == batch.obs + 1)
+        process.join()
+        assert process.exitcode == 0
+        assert np.array_equal(buffer.rew[buffer.last_index[2:]], [499, 499])
+        # the sub-buffers of this process are untouched
+        assert np.array_equal(buffer.last_index[:2], reference_buffer.last_index[:2])
+        assert buffer.buffers[3]._ep_len == 500 % 4
+
+        # pickling attaches to the same shared memory
+        unpickled_buffer = pickle.loads(pickle.dumps(buffer))
+        assert unpickled_buffer.name == buffer.name
+        unpickled_buffer.reset()
+        assert len(buffer) == 0
+        unpickled_buffer.close()
+    finally:
+        buffer.close()
+        buffer.unlink()
+
+
+def test_shared_memory_vector_replay_buffer_writes_data_before_state() -> None:
+    # the state of a sub-buffer (insertion index, size, episode index tables) must only advance
+    # after the data was written, such that other processes never read unwritten transitions
+    observation_space = gym.spaces.Box(-1, 1, (3,), dtype=np.float32)
+    buffer = SharedMemoryVectorReplayBuffer(6, 2, observation_space, gym.spaces.Discrete(2))
+    try:
+        sub_buffer = buffer.buffers[0]
+        update_state_pre_add = sub_buffer._update_state_pre_add
+        rew_at_state_update = []
+
+        def checked_update_state_pre_add(rew: float, done: bool) -> tuple[int, float, int, int]:
+            rew_at_state_update.append(buffer.rew[sub_buffer._insertion_idx])
+            return update_state_pre_add(rew, done)
+
+        sub_buffer._update_state_pre_add = checked_update_state_pre_add
+        _add_to_shared_buffer(buffer, 5)
+        assert rew_at_state_update == list(range(5))
+    finally:
+        buffer.close()
+        buffer.unlink()
+
+
+def test_sample_sequences() -> None:
+    buffer = VectorReplayBuffer(40, 2)
+    for t in range(12):
+        buffer.add(
+            cast(
+                RolloutBatchProtocol,
+                Batch(
+                    obs=np.full((2, 3), t),
+                    act=np.array([t, t]),
+                    rew=np.ones(2),
+                    terminated=np.array([t % 5 == 4, t % 7 == 6]),
+                    truncated=np.zeros(2, dtype=bool),
+                    obs_next=np.full((2, 3), t + 1),
+                    info={},
+                    # the hidden state after the step, as stored by the collector
+                    policy=Batch(
+                        hidden_state=Batch(
+                            hidden=torch.full((2, 1, 4), float(t)),
+                            cell=torch.full((2, 1, 4), -float(t)),
+                        ),
+                    ),
+                ),
+            ),
+        )
+    # the episodes of the first sub-buffer end at t=4 and t=9, the last one is unfinished;
+    # the first episode of the second sub-buffer (offset 20) ends at t=6
+    start_indices = np.array([0, 3, 5, 20, 26, 11])
+    sequences = buffer.get_sequences(start_indices, 4)
+    assert np.array_equal(
+        sequences.act,
+        [[0, 1, 2, 3], [3, 4, 4, 4], [5, 6, 7, 8], [0, 1, 2, 3], [6, 6, 6, 6], [11, 11, 11, 11]],
+    )
+    assert np.array_equal(
+        sequences.mask.sum(axis=1),
+        [4, 2, 4, 4, 1, 1],
+    )
+    assert sequences.obs.shape == (6, 4, 3)
+    assert np.array_equal(sequences.obs_next[..., 0], sequences.obs[..., 0] + 1)  # type: ignore
+    assert sequences.policy.hidden_state.hidden.shape == (6, 4, 1, 4)
+    # the initial states are the stored states of the preceding transitions and zero at episode starts
+    initial_state = cast(RecurrentStateBatch, sequences.initial_state)
+    assert np.array_equal(initial_state.hidden[:, 0, 0], [0, 2, 0, 0, 5, 10])
+    assert np.array_equal(initial_state.cell[:, 0, 0], [0, -2, 0, 0, -5, -10])
+
+    sequences, start_indices = buffer.sample_sequences(8, 3)
+    assert sequences.act.shape == (8, 3)
+    assert np.array_equal(sequences.act[:, 0], buffer.act[start_indices])
+
+    # without stored hidden states, there is no initial state
+    buffer = VectorReplayBuffer(40, 2)
+    buffer.add(
+        cast(
+            RolloutBatchProtocol,
+            Batch(
+                obs=np.zeros((2, 3)),
+                act=np.zeros(2),
+                rew=np.ones(2),
+                terminated=np.ones(2, dtype=bool),
+                truncated=np.zeros(2, dtype=bool),
+                obs_next=np.zeros((2, 3)),
+            ),
+        ),
+    )
+    sequences, _ = buffer.sample_sequences(4, 3)
+    assert sequences.initial_state is None
+    assert not sequences.mask[:, 1:].any()
+
+
+def _assert_prev_next_match_done_flags(buffer: ReplayBuffer, max_steps: int = 9) -> None:
+    """Compares the (multi-step) prev/next of the buffer with repeated single steps computed
+    from the done flags and last indices of the (sub-)buffers.
+    """
+    sub_buffers = buffer.buffers if isinstance(buffer, VectorReplayBuffer) else [buffer]
+    last_indices = buffer.last_index
+    for sub_buffer, offset, end, last_index in zip(
+        sub_buffers,
+        buffer.subbuffer_edges[:-1],
+        buffer.subbuffer_edges[1:],
+        last_indices,
+        strict=True,
+    ):
+        size, last = len(sub_buffer), last_index - offset
+        if size == 0:
+            continue
+        done = buffer.done[offset:end]
+        index = np.arange(size)
+        prev_step = (index - 1) % size
+        prev_step = (prev_step + (done[prev_step] | (prev_step == last))) % size
+        next_step = (index + 1 - (done[index] | (index == last))) % size
+        expected_prev, expected_next = [index], [index]
+        for _ in range(max_steps - 1):
+            expected_prev.append(prev_step[expected_prev[-1]])
+            expected_next.append(next_step[expected_next[-1]])
+        num_steps = np.arange(max_steps)[:, None]
+        assert np.array_equal(
+            buffer.prev(index + offset, num_steps), np.stack(expected_prev) + offset
+        )
+        assert np.array_equal(
+            buffer.next(index + offset, num_steps), np.stack(expected_next) + offset
+        )
+        assert np.array_equal(buffer.prev(index + offset), expected_prev[1] + offset)
+        assert np.array_equal(buffer.next(index + offset), expected_next[1] + offset)
+
+
+def test_prev_next_multi_step() -> None:
+    rng = np.random.default_rng(0)
+    buffer_num, size = 3, 7
+    buffer = ReplayBuffer(size)
+    vector_buffer = VectorReplayBuffer(buffer_num * size, buffer_num)
+    for t in range(40):
+        # the last episodes are longer than the buffer
+        terminated = rng.random(buffer_num) < (0.3 if t < 25 else 0.0)
+        batch = Batch(
+            obs=np.full(buffer_num, t),
+            act=np.zeros(buffer_num),
+            rew=np.ones(buffer_num),
+            terminated=terminated,
+            truncated=np.zeros(buffer_num, dtype=bool),
+            obs_next=np.full(buffer_num, t + 1),
+        )
+        buffer.add(cast(RolloutBatchProtocol, batch[:1]), buffer_ids=[0])
+        vector_buffer.add(cast(RolloutBatchProtocol, batch))
+        if t == 20:
+            # the episode index tables stay linked to the sub-buffers after unpickling
+            vector_buffer = pickle.loads(pickle.dumps(vector_buffer))
+        _assert_prev_next_match_done_flags(buffer)
+        _assert_prev_next_match_done_flags(vector_buffer)
+
+    # the tables are rebuilt from the done flags when the data is set or moved to another buffer
+    buffer.done[3] = True
+    buffer.set_batch(buffer._meta)
+    _assert_prev_next_match_done_flags(buffer)
+    updated_buffer = ReplayBuffer(size + 2)
+    updated_buffer.update(buffer)
+    _assert_prev_next_match_done_flags(updated_buffer)
+
+
+def test_unfinished_mask() -> None:
+    rng = np.random.default_rng(1)
+    buffer_num = 3
+    buffers = [
+        VectorReplayBuffer(buffer_num * 5, buffer_num),
+        CachedReplayBuffer(ReplayBuffer(10), buffer_num, 6),
+    ]
+    for t in range(30):
+        terminated = rng.random(buffer_num) < 0.3
+        # keep the episodes within the cached buffers' maximum episode length
+        truncated = np.full(buffer_num, t % 6 == 5)
+        batch = Batch(
+            obs=np.full(buffer_num, t),
+            act=np.zeros(buffer_num),
+            rew=np.ones(buffer_num),
+            terminated=terminated,
+            truncated=truncated,
+            obs_next=np.full(buffer_num, t + 1),
+        )
+        for buffer in buffers:
+            buffer.add(cast(RolloutBatchProtocol, batch))
+            # the last transitions of the non-empty sub-buffers whose episodes are unfinished
+            last_indices = buffer.last_index[[len(buf) > 0 for buf in buffer.buffers]]
+            expected_mask = np.zeros(buffer.maxsize, dtype=bool)
+            expected_mask[last_indices[~buffer.done[last_indices]]] = True
+            assert np.array_equal(buffer.unfinished_mask(), expected_mask)
+            assert np.array_equal(buffer.unfinished_index(), np.flatnonzero(expected_mask))
+    for buffer in buffers:
+        buffer.reset()
+        assert not buffer.unfinished_mask().any()
+        assert len(buffer.unfinished_index()) == 0
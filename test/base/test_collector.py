@@ -1,14 +1,18 @@
+import os
 from collections.abc import Callable, Sequence
 from typing import Any
 
 import gymnasium as gym
 import numpy as np
 import pytest
+import torch
 import tqdm
 
 from test.base.env import MoveToRightEnv, NXEnv
 from tianshou.algorithm.algorithm_base import Policy, episode_mc_return_to_go
+from tianshou.algorithm.modelfree.dqn import DiscreteQLearningPolicy
 from tianshou.data import (
+    ActorLearnerCollector,
     AsyncCollector,
     Batch,
     CachedReplayBuffer,
@@ -16,8 +20,11 @@ from tianshou.data import (
     CollectStats,
     PrioritizedReplayBuffer,
     ReplayBuffer,
+    ReplayBufferManager,
+    SharedMemoryVectorReplayBuffer,
     VectorReplayBuffer,
 )
+from tianshou.data.actor_learner import SharedModuleWeights
 from tianshou.data.batch import BatchProtocol
 from tianshou.data.collector import (
     CollectActionBatchProtocol,
@@ -26,6 +33,8 @@ from tianshou.data.collector import (
 )
 from tianshou.data.types import ObsBatchProtocol, RolloutBatchProtocol
 from tianshou.env import DummyVectorEnv, SubprocVectorEnv
+from tianshou.utils.net.common import Net
+from tianshou.utils.profiling import ProfilerContext
 
 try:
     import envpool
@@ -964,6 +973,22 @@ def test_collector_with_vector_env() -> None:
     assert np.array_equal(np.array([1, 1, 1, 8, 1, 9, 1, 10]), c4r.lens)
 
 
+def test_collector_profiling() -> None:
+    env_fns = [lambda x=i: MoveToRightEnv(size=x, sleep=0) for i in [2, 3]]
+    collector = Collector[CollectStats](
+        MaxActionPolicy(),
+        DummyVectorEnv(env_fns),
+        VectorReplayBuffer(total_size=100, buffer_num=2),
+    )
+    collector.reset()
+    with ProfilerContext() as profiler:
+        collector.collect(n_step=10)
+        summary = profiler.get_summary()
+    for phase in ["policy_forward", "env_step", "batch_construction", "buffer_add", "env_reset"]:
+        assert f"collect/{phase}" in summary
+    assert summary["collect/env_step"].count == 5
+
+
 def test_async_collector_with_vector_env() -> None:
     env_fns = [lambda x=i: MoveToRightEnv(size=x, sleep=0) for i in [1, 8, 9, 10]]
 
@@ -981,6 +1006,150 @@ def test_async_collector_with_vector_env() -> None:
     assert np.array_equal(np.array([1, 10, 1, 1, 1, 1]), c2r.lens)
 
 
+def test_collector_with_policy_export() -> None:
+    policy = DiscreteQLearningPolicy(
+        model=Net(state_shape=4, action_shape=2, hidden_sizes=[16]),
+        action_space=gym.spaces.Discrete(2),
+        eps_inference=0.2,
+    )
+    with pytest.raises(ValueError):
+        Collector(MaxActionPolicy(), gym.make("CartPole-v1"), policy_export="eager")
+    # structured observations (e.g. carrying action masks) are not supported
+    dict_env = MoveToRightEnv(size=3, dict_state=True)
+    with pytest.raises(ValueError):
+        Collector(
+            DiscreteQLearningPolicy(
+                model=Net(state_shape=4, action_shape=2, hidden_sizes=[16]),
+                action_space=dict_env.action_space,
+                observation_space=dict_env.observation_space,
+            ),
+            dict_env,
+            policy_export="eager",
+        )
+    dict_collector = Collector[CollectStats](policy, dict_env, policy_export="eager")
+    dict_collector.reset()
+    with pytest.raises(TypeError):
+        dict_collector.collect(n_step=1)
+
+    buffers = []
+    for policy_export in (None, "eager"):
+        env = DummyVectorEnv([lambda: gym.make("CartPole-v1") for _ in range(3)])
+        env.seed(0)
+        np.random.seed(0)
+        collector = Collector[CollectStats](
+            policy,
+            env,
+            VectorReplayBuffer(total_size=300, buffer_num=3),
+            exploration_noise=True,
+            policy_export=policy_export,
+        )
+        collector.reset()
+        collector.collect(n_step=60)
+        collector.collect(n_episode=4)
+        buffers.append(collector.buffer)
+    assert len(buffers[0]) == len(buffers[1])
+    batch, batch_with_export = buffers[0][:], buffers[1][:]
+    for key in ("obs", "act", "rew", "done"):
+        assert np.array_equal(batch[key], batch_with_export[key])
+
+
+@pytest.mark.parametrize("shared_memory_buffer", [False, True])
+def test_actor_learner_collector(shared_memory_buffer: bool) -> None:
+    env = MoveToRightEnv(size=3, sleep=0)
+    buffer: ReplayBufferManager
+    if shared_memory_buffer:
+        buffer = SharedMemoryVectorReplayBuffer(
+            total_size=400,
+            buffer_num=4,
+            observation_space=env.observation_space,
+            action_space=env.action_space,
+        )
+    else:
+        buffer = VectorReplayBuffer(total_size=400, buffer_num=4)
+    collector = ActorLearnerCollector(
+        MaxActionPolicy(),
+        lambda: MoveToRightEnv(size=3, sleep=0),
+        num_actors=2,
+        num_envs_per_actor=2,
+        buffer=buffer,
+        num_env_steps_per_chunk=8,
+        context="fork",
+    )
+    try:
+        collector.reset()
+        stats = collector.collect(n_step=20)
+        # whole chunks are consumed
+        assert stats.n_collected_steps == 24
+        stats = collector.collect(n_step=40)
+        assert collector.collect_step == 24 + stats.n_collected_steps
+        if shared_memory_buffer:
+            # actors add chunks directly, possibly before the learner has consumed them
+            assert len(collector.buffer) >= collector.collect_step
+        else:
+            assert len(collector.buffer) == collector.collect_step
+        # the transitions of each env are stored in order in a dedicated sub-buffer
+        # (actors writing to a shared buffer may have started an episode before the reset)
+        for buffer in collector.buffer.buffers:
+            obs = buffer[buffer.sample_indices(0)].obs[:, 0]
+            assert len(obs) > 0
+            assert np.all(np.diff(np.asarray(obs)) % 3 == 1)
+        assert np.all(stats.lens == 3)
+        assert np.all(stats.returns == 1)
+        # the buffer can be reset while the actors are running
+        collector.reset_buffer()
+        stats = collector.collect(n_step=8)
+        assert len(collector.buffer) >= stats.n_collected_steps
+        for buffer in collector.buffer.buffers:
+            obs = buffer[buffer.sample_indices(0)].obs[:, 0]
+            assert np.all(np.diff(np.asarray(obs)) % 3 == 1)
+        with pytest.raises(ValueError):
+            collector.collect(n_episode=1)
+    finally:
+        collector.close()
+        if isinstance(buffer, SharedMemoryVectorReplayBuffer):
+            buffer.close()
+            buffer.unlink()
+
+
+class _CrashingEnv(MoveToRightEnv):
+    def step(self, action: Any) -> Any:
+        os._exit(1)
+
+
+def test_actor_learner_collector_crashing_actor() -> None:
+    collector = ActorLearnerCollector(
+        MaxActionPolicy(),
+        lambda: _CrashingEnv(size=3, sleep=0),
+        num_actors=2,
+        buffer=VectorReplayBuffer(total_size=100, buffer_num=2),
+        num_env_steps_per_chunk=4,
+        context="fork",
+    )
+    try:
+        collector.reset()
+        with pytest.raises(RuntimeError, match="terminated unexpectedly"):
+            collector.collect(n_step=4)
+    finally:
+        collector.close()
+    # the stopped actors cannot be restarted
+    with pytest.raises(RuntimeError):
+        collector.reset()
+
+
+def test_shared_module_weights() -> None:
+    source, target = Net(state_shape=4, action_shape=2), Net(state_shape=4, action_shape=2)
+    weights = SharedModuleWeights(source)
+    for param in source.parameters():
+        param.data.add_(1.0)
+    # the weights at creation time are the initial weights
+    version = weights.load_into(target)
+    assert version == 0
+    weights.publish(source)
+    assert weights.load_into(target, version) == 1
+    for param, target_param in zip(source.parameters(), target.parameters(), strict=True):
+        assert torch.equal(param, target_param)
+
+
 class StepHookAddFieldToBatch(StepHook):
     def __call__(
         self,
@@ -1,3 +1,4 @@
+import os
 import sys
 import time
 from collections.abc import Callable
@@ -18,9 +19,11 @@ from tianshou.env import (
     ShmemVectorEnv,
     SubprocVectorEnv,
     VectorEnvNormObs,
+    VectorEnvWorkerNormObs,
 )
 from tianshou.env.gym_wrappers import TruncatedAsTerminated
 from tianshou.env.venvs import BaseVectorEnv
+from tianshou.env.worker.subproc import CompletionQueue
 from tianshou.utils import RunningMeanStd
 
 try:
@@ -158,6 +161,35 @@ def test_async_check_id(
         assert total_pass >= 2
 
 
+def test_completion_queue() -> None:
+    queue = CompletionQueue(3, None)
+    assert len(queue.get(0)) == 0
+    # times out if fewer ids than requested are available
+    assert len(queue.get(1, timeout=1e-3)) == 0
+    for worker_id in [2, 0]:
+        queue.put(worker_id)
+    # all available ids are retrieved, in the order in which they were posted
+    assert queue.get(1).tolist() == [2, 0]
+    for worker_id in [1, 2, 0]:
+        queue.put(worker_id)
+    assert queue.get(3).tolist() == [1, 2, 0]
+
+
+class _CrashingEnv(MoveToRightEnv):
+    def step(self, action: Any) -> Any:
+        os._exit(1)
+
+
+@pytest.mark.parametrize("venv_type", [SubprocVectorEnv, ShmemVectorEnv])
+def test_async_env_crashing_worker(venv_type: Callable[..., BaseVectorEnv]) -> None:
+    env = venv_type([lambda: _CrashingEnv(size=3) for _ in range(2)], wait_num=1)
+    env.reset()
+    # the crashed workers never report completion; waiting must not hang
+    with pytest.raises(EOFError):
+        env.step(np.ones(2))
+    env.close()
+
+
 def test_vecenv(size: int = 10, num: int = 8, sleep: float = 0.001) -> None:
     env_fns = [
         lambda i=i: MoveToRightEnv(size=i, sleep=sleep, recurse_state=True)
@@ -342,6 +374,42 @@ def test_venv_norm_obs() -> None:
     run_align_norm_obs(raw, train_env, test_env, action_list)
 
 
+@pytest.mark.parametrize("venv_type", [DummyVectorEnv, SubprocVectorEnv])
+def test_venv_worker_norm_obs(venv_type: type[BaseVectorEnv]) -> None:
+    env_fns = [lambda i=x: MoveToRightEnv(size=i) for x in [5, 10, 15, 20]]
+    raw_env = DummyVectorEnv(env_fns)
+    train_env = VectorEnvWorkerNormObs(env_fns, venv_type, sync_interval=5)
+    raw_obs = [raw_env.reset()[0]]
+    train_env.reset()
+    for _ in range(4):
+        raw_obs.append(raw_env.step(np.ones(4, dtype=int))[0])
+        train_env.step(np.ones(4, dtype=int))
+    # the statistics of all observations have been reduced (at the last step)
+    all_obs = np.concatenate(raw_obs)
+    obs_rms = train_env.get_obs_rms()
+    assert obs_rms.count == len(all_obs)
+    assert np.allclose(obs_rms.mean, all_obs.mean(axis=0))
+    assert np.allclose(obs_rms.var, all_obs.var(axis=0))
+
+    # the workers normalize with the broadcast statistics
+    test_env = VectorEnvWorkerNormObs(env_fns, venv_type, update_obs_rms=False)
+    test_env.set_obs_rms(obs_rms)
+    raw_obs, _ = raw_env.reset()
+    obs, _ = test_env.reset()
+    assert obs.dtype == np.float32
+    assert np.allclose(obs, (raw_obs - obs_rms.mean) / np.sqrt(obs_rms.var + obs_rms.eps))
+    assert test_env.get_obs_rms().count == obs_rms.count
+
+    # without reduced or given statistics, the workers normalize with zero mean and unit variance
+    unset_env = VectorEnvWorkerNormObs(env_fns, venv_type, update_obs_rms=False)
+    unset_env.reset()
+    raw_obs = raw_env.step(np.ones(4, dtype=int))[0]
+    obs = unset_env.step(np.ones(4, dtype=int))[0]
+    assert np.allclose(obs, raw_obs, atol=1e-3)
+    for venv in (raw_env, train_env, test_env, unset_env):
+        venv.close()
+
+
 def test_gym_wrappers() -> None:
     class DummyEnv(gym.Env):
         def __init__(self) -> None:
@@ -1,10 +1,15 @@
+import threading
+from collections.abc import Callable
+from pathlib import Path
 from typing import Literal
 
 import numpy as np
 import pytest
 from torch.utils.tensorboard import SummaryWriter
 
-from tianshou.utils import TensorboardLogger
+from tianshou.utils import BackgroundLogger, LazyLogger, TensorboardLogger
+from tianshou.utils.logger.background import QueueFullPolicy
+from tianshou.utils.logger.logger_base import VALID_LOG_VALS_TYPE
 
 
 class TestTensorBoardLogger:
@@ -79,3 +84,111 @@ class TestTensorBoardLogger:
         logger = TensorboardLogger(SummaryWriter("log/logger"))
         result = logger.prepare_dict_for_logging(input_dict)
         assert result == expected_output
+
+
+class RecordingLogger(LazyLogger):
+    """Records all written data; writing blocks while the `unblocked` event is not set."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.training_interval = self.update_interval = 1
+        self.written: list[tuple[str, int, dict[str, VALID_LOG_VALS_TYPE]]] = []
+        self.num_flushes = 0
+        self.unblocked = threading.Event()
+        self.unblocked.set()
+        self.writer_thread_names: set[str] = set()
+
+    def write(self, step_type: str, step: int, data: dict[str, VALID_LOG_VALS_TYPE]) -> None:
+        self.unblocked.wait()
+        self.writer_thread_names.add(threading.current_thread().name)
+        self.written.append((step_type, step, data))
+
+    def flush(self) -> None:
+        self.num_flushes += 1
+
+    def save_data(
+        self,
+        epoch: int,
+        env_step: int,
+        update_step: int,
+        save_checkpoint_fn: Callable[[int, int, int], str] | None = None,
+    ) -> None:
+        if save_checkpoint_fn is not None:
+            save_checkpoint_fn(epoch, env_step, update_step)
+
+
+class TestBackgroundLogger:
+    @staticmethod
+    def test_writes_in_background_in_order() -> None:
+        recording_logger = RecordingLogger()
+        logger = BackgroundLogger(recording_logger, max_batch_size=10)
+        for step in range(100):
+            logger.log_update_data({"loss": float(step)}, step)
+        logger.finalize()
+        assert [data["loss"] for _, _, data in recording_logger.written] == list(range(100))
+        assert threading.current_thread().name not in recording_logger.writer_thread_names
+        assert 10 <= recording_logger.num_flushes <= 100
+        with pytest.raises(RuntimeError):
+            logger.log_update_data({"loss": 0.0}, 100)
+
+    @staticmethod
+    def test_flush_before_checkpoint() -> None:
+        recording_logger = RecordingLogger()
+        logger = BackgroundLogger(recording_logger)
+        recording_logger.unblocked.clear()
+        for step in range(10):
+            logger.log_training_data({"rew": 1.0}, step)
+        num_written_at_checkpoint = []
+
+        def save_checkpoint_fn(epoch: int, env_step: int, update_step: int) -> str:
+            num_written_at_checkpoint.append(len(recording_logger.written))
+            return ""
+
+        threading.Timer(0.1, recording_logger.unblocked.set).start()
+        logger.save_data(1, 10, 10, save_checkpoint_fn)
+        assert num_written_at_checkpoint == [10]
+        logger.finalize()
+
+    @staticmethod
+    def test_drop_policy() -> None:
+        recording_logger = RecordingLogger()
+        logger = BackgroundLogger(
+            recording_logger,
+            max_queue_size=5,
+            queue_full_policy=QueueFullPolicy.DROP,
+            max_batch_size=1,
+        )
+        recording_logger.unblocked.clear()
+        for step in range(20):
+            logger.log_update_data({"loss": 1.0}, step)
+        recording_logger.unblocked.set()
+        logger.finalize()
+        assert logger.num_dropped > 0
+        assert len(recording_logger.written) + logger.num_dropped == 20
+
+    @staticmethod
+    def test_writer_exception_is_reraised() -> None:
+        class FailingLogger(RecordingLogger):
+            def write(
+                self, step_type: str, step: int, data: dict[str, VALID_LOG_VALS_TYPE]
+            ) -> None:
+                raise OSError("disk full")
+
+        logger = BackgroundLogger(FailingLogger())
+        logger.log_update_data({"loss": 1.0}, 0)
+        with pytest.raises(RuntimeError) as exc_info:
+            logger.flush()
+        assert isinstance(exc_info.value.__cause__, OSError)
+        logger.finalize()
+
+    @staticmethod
+    def test_restore_logged_data_of_wrapped_logger(tmp_path: Path) -> None:
+        log_path = str(tmp_path)
+        logger = BackgroundLogger(TensorboardLogger(SummaryWriter(log_path), write_flush=False))
+        logger.log_update_data({"loss": 1.0}, 1000)
+        logger.finalize()
+        data = BackgroundLogger.restore_logged_data(log_path, TensorboardLogger)
+        update_data = data["update"]
+        assert isinstance(update_data, dict)
+        assert isinstance(update_data["loss"], np.ndarray)
+        assert update_data["loss"].tolist() == [1.0]
@@ -1,20 +1,34 @@
+import copy
+from typing import Any
+
 import gymnasium as gym
 import numpy as np
 import pytest
 import torch
 from torch.distributions import Categorical, Distribution, Independent, Normal
 
-from tianshou.algorithm import PPO
+from tianshou.algorithm import C51, CQL, DQN, NPG, PPO, QRDQN, SAC, TD3, DiscreteSAC
 from tianshou.algorithm.algorithm_base import (
     RandomActionPolicy,
     episode_mc_return_to_go,
 )
-from tianshou.algorithm.modelfree.reinforce import ProbabilisticActorPolicy
+from tianshou.algorithm.modelfree.c51 import C51Policy
+from tianshou.algorithm.modelfree.ddpg import ContinuousDeterministicPolicy
+from tianshou.algorithm.modelfree.discrete_sac import DiscreteSACPolicy
+from tianshou.algorithm.modelfree.dqn import DiscreteQLearningPolicy
+from tianshou.algorithm.modelfree.qrdqn import QRDQNPolicy
+from tianshou.algorithm.modelfree.reinforce import DiscreteActorPolicy, ProbabilisticActorPolicy
+from tianshou.algorithm.modelfree.sac import SACPolicy
 from tianshou.algorithm.optim import AdamOptimizerFactory
-from tianshou.data import Batch
+from tianshou.data import Batch, ReplayBuffer
 from tianshou.utils.net.common import Net
-from tianshou.utils.net.continuous import ContinuousActorProbabilistic, ContinuousCritic
-from tianshou.utils.net.discrete import DiscreteActor
+from tianshou.utils.net.continuous import (
+    ContinuousActorDeterministic,
+    ContinuousActorProbabilistic,
+    ContinuousCritic,
+)
+from tianshou.utils.net.discrete import DiscreteActor, DiscreteCritic
+from tianshou.utils.torch_utils import policy_within_training_step
 
 obs_shape = (5,)
 
@@ -144,3 +158,305 @@ class TestPolicyBasics:
         action_batch = policy(Batch(obs=np.zeros((10, 2))))
         assert action_batch.act.shape == (10, 3)
         assert len(set(map(_to_hashable, action_batch.act))) > 1
+
+
+@pytest.mark.parametrize("action_type", ["continuous", "discrete"])
+def test_ppo_shared_preprocess_net(action_type: str) -> None:
+    preprocess_net = Net(state_shape=obs_shape, hidden_sizes=[64, 64])
+    action_space: gym.spaces.Box | gym.spaces.Discrete
+    actor: DiscreteActor | ContinuousActorProbabilistic
+    if action_type == "continuous":
+        action_space = gym.spaces.Box(low=-1, high=1, shape=(3,))
+        actor = ContinuousActorProbabilistic(
+            preprocess_net=preprocess_net,
+            action_shape=action_space.shape,
+        )
+
+        def dist_fn(loc_scale: tuple[torch.Tensor, torch.Tensor]) -> Distribution:
+            loc, scale = loc_scale
+            return Independent(Normal(loc, scale), 1)
+
+    else:
+        action_space = gym.spaces.Discrete(3)
+        actor = DiscreteActor(preprocess_net=preprocess_net, action_shape=action_space.n)
+        dist_fn = Categorical
+    critic = ContinuousCritic(preprocess_net=preprocess_net, apply_preprocess_net_to_obs_only=True)
+    policy = ProbabilisticActorPolicy(
+        actor=actor,
+        dist_fn=dist_fn,
+        action_space=action_space,
+        action_scaling=False,
+    )
+    algorithm = PPO(policy=policy, critic=critic, optim=AdamOptimizerFactory(lr=1e-3))
+    assert algorithm._shared_preprocess_net is preprocess_net
+
+    batch_size = 8
+    act = np.stack([action_space.sample() for _ in range(batch_size)])
+    batch = Batch(obs=np.random.randn(batch_size, *obs_shape).astype(np.float32), act=act, info={})
+    with torch.no_grad():
+        dist, value = algorithm._evaluate_actor_critic(batch)
+        expected_dist = policy(batch).dist
+        expected_value = critic(batch.obs).flatten()
+    assert torch.allclose(value, expected_value)
+    act_tensor = torch.as_tensor(act, dtype=torch.float32)
+    assert torch.allclose(dist.log_prob(act_tensor), expected_dist.log_prob(act_tensor))
+
+
+def test_npg_flat_params_and_conjugate_gradients() -> None:
+    torch.manual_seed(0)
+    np.random.seed(0)
+    action_space = gym.spaces.Discrete(3)
+    actor = DiscreteActor(
+        preprocess_net=Net(state_shape=obs_shape, hidden_sizes=[16]),
+        action_shape=action_space.n,
+        softmax_output=False,
+    )
+    policy = DiscreteActorPolicy(actor=actor, action_space=action_space)
+    critic = ContinuousCritic(preprocess_net=Net(state_shape=obs_shape, hidden_sizes=[16]))
+    algorithm = NPG(policy=policy, critic=critic, optim=AdamOptimizerFactory(lr=1e-3))
+
+    # the flat parameter vector is a view on the actor's parameters
+    expected_flat_params = torch.cat([p.detach().reshape(-1) for p in actor.parameters()])
+    flat_params = algorithm._get_actor_flat_params()
+    assert torch.equal(flat_params, expected_flat_params)
+    assert algorithm._get_actor_flat_params() is flat_params
+    flat_params.add_(1.0)
+    assert torch.equal(
+        torch.cat([p.detach().reshape(-1) for p in actor.parameters()]),
+        expected_flat_params + 1.0,
+    )
+
+    # the accumulated matrix vector product equals the explicitly computed one
+    batch = Batch(obs=np.random.randn(8, *obs_shape).astype(np.float32), info={})
+    dist = policy(batch).dist
+    with torch.no_grad():
+        old_dist = policy(batch).dist
+    kl = torch.distributions.kl_divergence(old_dist, dist).mean()
+    flat_kl_grad = algorithm._get_flat_grad(kl, actor, create_graph=True)
+    g = torch.randn_like(flat_params)
+    x, Hx = algorithm._conjugate_gradients_with_mvp(g, flat_kl_grad, nsteps=5)
+    assert torch.allclose(Hx, algorithm._MVP(x, flat_kl_grad), rtol=1e-4, atol=1e-4)
+
+
+@pytest.mark.parametrize("algorithm_type", ["dqn", "double_dqn_no_target", "qrdqn", "c51"])
+def test_q_learning_fused_online_forward(algorithm_type: str) -> None:
+    torch.manual_seed(0)
+    action_space = gym.spaces.Discrete(3)
+    optim = AdamOptimizerFactory(lr=1e-2)
+    algorithm: DQN | QRDQN | C51
+    if algorithm_type in ("dqn", "double_dqn_no_target"):
+        net = Net(state_shape=obs_shape, action_shape=action_space.n, hidden_sizes=[16])
+        algorithm = DQN(
+            policy=DiscreteQLearningPolicy(model=net, action_space=action_space),
+            optim=optim,
+            n_step_return_horizon=2,
+            target_update_freq=0 if algorithm_type == "double_dqn_no_target" else 2,
+        )
+    elif algorithm_type == "qrdqn":
+        net = Net(state_shape=obs_shape, action_shape=action_space.n * 4, hidden_sizes=[16])
+        algorithm = QRDQN(
+            policy=QRDQNPolicy(model=_ReshapeLogits(net, 4), action_space=action_space),
+            optim=optim,
+            num_quantiles=4,
+            n_step_return_horizon=2,
+            target_update_freq=2,
+        )
+    else:
+        net = Net(state_shape=obs_shape, action_shape=action_space.n * 5, hidden_sizes=[16])
+        algorithm = C51(
+            policy=C51Policy(
+                model=_ReshapeLogits(net, 5, softmax=True),
+                action_space=action_space,
+                num_atoms=5,
+            ),
+            optim=optim,
+            target_update_freq=2,
+        )
+    fused_algorithm = copy.deepcopy(algorithm)
+    fused_algorithm.fuse_online_forward = True
+
+    buffer = ReplayBuffer(32)
+    for i in range(32):
+        buffer.add(
+            Batch(
+                obs=np.random.randn(*obs_shape).astype(np.float32),
+                act=np.random.randint(action_space.n),
+                rew=np.random.randn(),
+                terminated=i % 7 == 6,
+                truncated=False,
+                obs_next=np.random.randn(*obs_shape).astype(np.float32),
+                info={},
+            ),
+        )
+    # the fused mode yields the same updates as the separate forward passes
+    for _ in range(4):
+        losses = []
+        buffer_state = copy.deepcopy(buffer._random_state)
+        for alg in (algorithm, fused_algorithm):
+            buffer._random_state = copy.deepcopy(buffer_state)
+            with policy_within_training_step(alg.policy):
+                losses.append(alg.update(buffer=buffer, sample_size=8).loss)  # type: ignore[attr-defined]
+        assert np.isclose(losses[0], losses[1], atol=1e-5)
+    for param, fused_param in zip(
+        algorithm.policy.parameters(), fused_algorithm.policy.parameters(), strict=True
+    ):
+        assert torch.allclose(param, fused_param, atol=1e-5)
+
+
+@pytest.mark.parametrize("algorithm_type", ["td3", "sac", "discrete_sac", "cql"])
+def test_fuse_twin_critics(algorithm_type: str) -> None:
+    torch.manual_seed(0)
+    optim = AdamOptimizerFactory(lr=1e-2)
+    algorithm: TD3 | SAC | DiscreteSAC | CQL
+    if algorithm_type == "discrete_sac":
+        action_space: gym.spaces.Space = gym.spaces.Discrete(3)
+        algorithm = DiscreteSAC(
+            policy=DiscreteSACPolicy(
+                actor=DiscreteActor(
+                    preprocess_net=Net(state_shape=obs_shape, hidden_sizes=[16]),
+                    action_shape=3,
+                    softmax_output=False,
+                ),
+                action_space=action_space,
+            ),
+            policy_optim=optim,
+            critic=DiscreteCritic(
+                preprocess_net=Net(state_shape=obs_shape, hidden_sizes=[16]),
+                last_size=3,
+            ),
+            critic_optim=optim,
+        )
+    else:
+        action_space = gym.spaces.Box(-1, 1, (2,))
+        critic = ContinuousCritic(
+            preprocess_net=Net(
+                state_shape=obs_shape, action_shape=2, hidden_sizes=[16], concat=True
+            ),
+        )
+        if algorithm_type == "td3":
+            algorithm = TD3(
+                policy=ContinuousDeterministicPolicy(
+                    actor=ContinuousActorDeterministic(
+                        preprocess_net=Net(state_shape=obs_shape, hidden_sizes=[16]),
+                        action_shape=2,
+                    ),
+                    action_space=action_space,
+                ),
+                policy_optim=optim,
+                critic=critic,
+                critic_optim=optim,
+                update_actor_freq=1,
+            )
+        else:
+            policy = SACPolicy(
+                actor=ContinuousActorProbabilistic(
+                    preprocess_net=Net(state_shape=obs_shape, hidden_sizes=[16]),
+                    action_shape=2,
+                    unbounded=True,
+                ),
+                action_space=action_space,
+            )
+            if algorithm_type == "sac":
+                algorithm = SAC(
+                    policy=policy,
+                    policy_optim=optim,
+                    critic=critic,
+                    critic_optim=optim,
+                )
+            else:
+                algorithm = CQL(
+                    policy=policy,
+                    policy_optim=optim,
+                    critic=critic,
+                    critic_optim=optim,
+                    num_repeat_actions=3,
+                    calibrated=False,
+                )
+    # the fused algorithm starts with the same parameters
+    fused_algorithm = copy.deepcopy(algorithm)
+    fused_algorithm.fuse_twin_critics = True
+
+    buffer = ReplayBuffer(32)
+    for i in range(32):
+        buffer.add(
+            Batch(
+                obs=np.random.randn(*obs_shape).astype(np.float32),
+                act=action_space.sample(),
+                rew=np.random.randn(),
+                terminated=i % 7 == 6,
+                truncated=False,
+                obs_next=np.random.randn(*obs_shape).astype(np.float32),
+                info={},
+            ),
+        )
+    # the fused mode yields the same updates as the separate evaluation of the critics
+    for step in range(3):
+        stats = []
+        buffer_state = copy.deepcopy(buffer._random_state)
+        for alg in (algorithm, fused_algorithm):
+            buffer._random_state = copy.deepcopy(buffer_state)
+            torch.manual_seed(step)
+            with policy_within_training_step(alg.policy):
+                stats.append(alg.update(buffer=buffer, sample_size=8))
+        for key in ("critic1_loss", "critic2_loss", "actor_loss"):
+            assert np.isclose(getattr(stats[0], key), getattr(stats[1], key), atol=1e-5)
+    for param, fused_param in zip(
+        algorithm.parameters(), fused_algorithm.parameters(), strict=True
+    ):
+        assert torch.allclose(param, fused_param, atol=1e-5)
+
+
+def test_cql_calibration_returns() -> None:
+    action_space = gym.spaces.Box(-1, 1, (2,))
+    algorithm = CQL(
+        policy=SACPolicy(
+            actor=ContinuousActorProbabilistic(
+                preprocess_net=Net(state_shape=obs_shape, hidden_sizes=[16]),
+                action_shape=2,
+                unbounded=True,
+            ),
+            action_space=action_space,
+        ),
+        policy_optim=AdamOptimizerFactory(lr=1e-3),
+        critic=ContinuousCritic(
+            preprocess_net=Net(
+                state_shape=obs_shape, action_shape=2, hidden_sizes=[16], concat=True
+            ),
+        ),
+        critic_optim=AdamOptimizerFactory(lr=1e-3),
+    )
+
+    def create_buffer(rew: float) -> ReplayBuffer:
+        buffer = ReplayBuffer(8)
+        for i in range(8):
+            buffer.add(
+                Batch(
+                    obs=np.zeros(obs_shape, dtype=np.float32),
+                    act=np.zeros(2, dtype=np.float32),
+                    rew=rew,
+                    terminated=i % 4 == 3,
+                    truncated=False,
+                    obs_next=np.zeros(obs_shape, dtype=np.float32),
+                    info={},
+                ),
+            )
+        return buffer
+
+    returns = algorithm.process_buffer(create_buffer(1.0)).calibration_returns
+    assert np.allclose(returns[:4], episode_mc_return_to_go(np.ones(4), algorithm.gamma))
+    assert np.allclose(returns[4:], returns[:4])
+    returns = algorithm.process_buffer(create_buffer(2.0)).calibration_returns
+    assert np.allclose(returns[:4], episode_mc_return_to_go(np.full(4, 2.0), algorithm.gamma))
+
+
+class _ReshapeLogits(torch.nn.Module):
+    def __init__(self, net: Net, num_outputs: int, softmax: bool = False) -> None:
+        super().__init__()
+        self.net = net
+        self.num_outputs = num_outputs
+        self.softmax = softmax
+
+    def forward(self, obs: np.ndarray, state: Any = None, info: Any = None) -> tuple:
+        logits, state = self.net(obs, state)
+        logits = logits.view(len(logits), -1, self.num_outputs)
+        return (logits.softmax(dim=-1) if self.softmax else logits), state
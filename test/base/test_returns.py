@@ -1,10 +1,14 @@
 from typing import cast
 
+import numba
 import numpy as np
+import pytest
 import torch
 
+from tianshou import config
 from tianshou.algorithm import Algorithm
-from tianshou.data import Batch, ReplayBuffer, to_numpy
+from tianshou.algorithm.algorithm_base import mc_return_to_go
+from tianshou.data import Batch, ReplayBuffer, VectorReplayBuffer, to_numpy
 from tianshou.data.types import RolloutBatchProtocol
 
 
@@ -194,6 +198,89 @@ def compute_nstep_return_base(
     return returns
 
 
+def test_mc_return_to_go() -> None:
+    buf = ReplayBuffer(50)
+    for i in range(73):
+        terminated = np.random.rand() < 0.1
+        buf.add(
+            cast(
+                RolloutBatchProtocol,
+                Batch(
+                    obs=i,
+                    act=i,
+                    rew=np.random.rand(),
+                    terminated=terminated,
+                    truncated=not terminated and np.random.rand() < 0.05,
+                ),
+            ),
+        )
+    indices = buf.sample_indices(0)
+    end_flag = buf.done[indices]
+    end_flag[np.isin(indices, buf.unfinished_index())] = True
+    returns = mc_return_to_go(buf.rew[indices], end_flag, gamma=0.9)
+    expected_returns, _ = Algorithm.compute_episodic_return(
+        buf[indices], buf, indices, gamma=0.9, gae_lambda=1.0
+    )
+    assert np.allclose(returns, expected_returns)
+
+
+def compute_gae_base(
+    v_s: np.ndarray,
+    v_s_: np.ndarray,
+    rew: np.ndarray,
+    end_flag: np.ndarray,
+    gamma: float,
+    gae_lambda: float,
+) -> np.ndarray:
+    advantages = np.zeros_like(rew)
+    gae = 0.0
+    for i in reversed(range(len(rew))):
+        if end_flag[i]:
+            gae = 0.0
+        gae = rew[i] + gamma * v_s_[i] - v_s[i] + gamma * gae_lambda * gae
+        advantages[i] = gae
+    return advantages
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_gae_on_vector_buffer(parallel: bool, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "ENABLE_PARALLEL_GAE", parallel)
+    # the test session forks processes later on
+    monkeypatch.setattr(numba.config, "THREADING_LAYER", "workqueue")
+    num_envs, num_steps = 8, 50
+    buf = VectorReplayBuffer(num_envs * num_steps, num_envs)
+    rng = np.random.default_rng(0)
+    for _ in range(num_steps - 3):
+        terminated = rng.random(num_envs) < 0.1
+        buf.add(
+            cast(
+                RolloutBatchProtocol,
+                Batch(
+                    obs=np.zeros((num_envs, 1)),
+                    act=np.zeros(num_envs),
+                    rew=rng.random(num_envs),
+                    terminated=terminated,
+                    truncated=~terminated & (rng.random(num_envs) < 0.05),
+                    obs_next=np.zeros((num_envs, 1)),
+                ),
+            ),
+        )
+    indices = buf.sample_indices(0)
+    batch = buf[indices]
+    v_s, v_s_ = rng.random(len(indices)), rng.random(len(indices))
+    returns, advantages = Algorithm.compute_episodic_return(
+        batch, buf, indices, v_s_, v_s, gamma=0.99, gae_lambda=0.95
+    )
+    # the episodes in progress end at the last transition of each subbuffer
+    end_flag = batch.done.copy()
+    end_flag[np.isin(indices, buf.unfinished_index())] = True
+    expected_advantages = compute_gae_base(
+        v_s, v_s_ * ~batch.terminated, batch.rew, end_flag, 0.99, 0.95
+    )
+    assert np.allclose(advantages, expected_advantages)
+    assert np.allclose(returns, expected_advantages + v_s)
+
+
 def test_nstep_returns(size: int = 10000) -> None:
     buf = ReplayBuffer(10)
     for i in range(12):
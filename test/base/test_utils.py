@@ -1,3 +1,6 @@
+import json
+import os
+import tempfile
 from typing import cast
 
 import numpy as np
@@ -11,6 +14,7 @@ from tianshou.exploration import GaussianNoise, OUNoise
 from tianshou.utils import MovAvg, RunningMeanStd
 from tianshou.utils.net.common import MLP, Net
 from tianshou.utils.net.continuous import RecurrentActorProb, RecurrentCritic
+from tianshou.utils.profiling import Profiler, ProfilerContext
 from tianshou.utils.torch_utils import create_uniform_action_dist, torch_train_mode
 
 
@@ -35,6 +39,18 @@ def test_moving_average() -> None:
     assert np.allclose(stat.get(), 3)
     assert np.allclose(stat.mean(), 3)
     assert np.allclose(stat.std() ** 2, 2)
+    stat.add([np.nan, np.inf, float("nan")])
+    assert np.allclose(stat.get(), 3)
+    # only the most recent values are retained once the window is full
+    for i in range(6, 16):
+        stat.add(i)
+    assert np.array_equal(stat.cache, np.arange(6, 16))
+    assert np.allclose(stat.get(), 10.5)
+    assert np.allclose(stat.std(), np.std(np.arange(6, 16)))
+    unbounded_stat = MovAvg(0)
+    unbounded_stat.add(np.arange(1000))
+    assert len(unbounded_stat.cache) == 1000
+    assert np.allclose(unbounded_stat.get(), 499.5)
 
 
 def test_rms() -> None:
@@ -47,6 +63,60 @@ def test_rms() -> None:
     assert np.allclose(rms.var, np.array([[0, 0], [2, 14 / 3.0]]), atol=1e-3)
 
 
+def test_rms_merge_and_dtype() -> None:
+    data = np.random.default_rng(0).normal(size=(100, 3))
+    full_rms = RunningMeanStd()
+    full_rms.update(data)
+    # statistics of disjoint parts of the data can be merged
+    rms, other_rms = RunningMeanStd(), RunningMeanStd()
+    rms.update(data[:30])
+    other_rms.update(data[30:70])
+    other_rms.update(data[70:])
+    rms.merge(other_rms)
+    rms.merge(RunningMeanStd())
+    assert rms.count == full_rms.count == 100
+    assert np.allclose(rms.mean, full_rms.mean)
+    assert np.allclose(rms.var, full_rms.var)
+    # normalization in float32
+    rms_float32 = RunningMeanStd(dtype=np.float32)
+    rms_float32.merge(full_rms)
+    normalized = rms_float32.norm(data.astype(np.float32))
+    assert normalized.dtype == np.float32
+    assert np.allclose(normalized, full_rms.norm(data), atol=1e-5)
+
+
+def test_profiler() -> None:
+    # disabled: timers are no-ops and nothing is recorded
+    with Profiler.timer("a"):
+        pass
+    assert not Profiler.is_enabled
+    assert "a" not in Profiler.get_summary()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        trace_path = os.path.join(tmpdir, "trace.json")
+        with ProfilerContext(trace_path=trace_path) as profiler:
+            for _ in range(10):
+                with Profiler.timer("outer/a"), Profiler.timer("outer/b"):
+                    pass
+            summary = profiler.get_summary()
+            assert set(summary) == {"outer/a", "outer/b"}
+            assert summary["outer/a"].count == 10
+            assert summary["outer/a"].p50_ms >= summary["outer/b"].p50_ms
+            stats = summary["outer/b"]
+            assert stats.p50_ms <= stats.p90_ms <= stats.p99_ms <= stats.max_ms
+            # the window is reset, but the events are retained for the trace
+            assert set(Profiler.get_summary()) == {"outer/a", "outer/b"}
+            assert Profiler.get_summary() == {}
+        assert not Profiler.is_enabled
+        with open(trace_path) as f:
+            trace = json.load(f)
+    events = trace["traceEvents"]
+    assert len(events) == 20
+    assert {e["ph"] for e in events} == {"X"}
+    assert {e["cat"] for e in events} == {"outer"}
+    assert all(e["dur"] >= 0 for e in events)
+
+
 def test_net() -> None:
     # here test the networks that does not appear in the other script
     bsz = 64
@@ -1,10 +1,22 @@
+import os
+import queue
+from typing import Any, cast
+
 import pytest
+import torch
 
 from test.highlevel.env_factory import ContinuousTestEnvFactory, DiscreteTestEnvFactory
+from tianshou.evaluation.launcher import (
+    THREAD_LIMIT_ENV_VARS,
+    ProcessPoolConfig,
+    ProcessPoolExpLauncher,
+    _run_pinned_experiment,
+)
 from tianshou.highlevel.config import (
     OffPolicyTrainingConfig,
     OnPolicyTrainingConfig,
 )
+from tianshou.highlevel.env import EnvFactoryRegistered, VectorEnvType
 from tianshou.highlevel.experiment import (
     A2CExperimentBuilder,
     DDPGExperimentBuilder,
@@ -115,3 +127,67 @@ def test_experiment_builder_discrete_default_params(
     experiment = builder.build()
     experiment.run(run_name="test")
     print(experiment)
+
+
+def test_experiment_collection_process_pool_launcher() -> None:
+    training_config = create_training_config(
+        PPOExperimentBuilder,
+        num_epochs=1,
+        epoch_num_steps=100,
+        num_training_envs=2,
+        num_test_envs=2,
+    )
+    builder = PPOExperimentBuilder(
+        experiment_config=ExperimentConfig(persistence_enabled=False, watch=False),
+        env_factory=DiscreteTestEnvFactory(),
+        training_config=training_config,
+    )
+    launcher = ProcessPoolExpLauncher(ProcessPoolConfig(n_jobs=2, cpus=[0]))
+    results = builder.build_seeded_collection(2).run(launcher)
+    assert len(results) == 2
+    assert len(launcher.reports) == 2
+    for report in launcher.reports:
+        assert not report.failed
+        assert report.num_threads == 1
+        assert report.env_steps is not None and report.env_steps > 0
+
+
+def test_process_pool_launcher_cpu_partitions() -> None:
+    builder = PPOExperimentBuilder(
+        experiment_config=ExperimentConfig(persistence_enabled=False, watch=False),
+        env_factory=EnvFactoryRegistered(task="CartPole-v1", venv_type=VectorEnvType.SUBPROC),
+        training_config=create_training_config(
+            PPOExperimentBuilder,
+            num_training_envs=2,
+            num_test_envs=2,
+        ),
+    )
+    experiments = builder.build_seeded_collection(4).experiments
+    # each experiment requires one CPU per env worker, also if the number of jobs is given
+    for n_jobs in (-1, 4):
+        launcher = ProcessPoolExpLauncher(ProcessPoolConfig(n_jobs=n_jobs, cpus=[0, 1, 2, 3]))
+        assert launcher._partition_cpus(experiments) == [[0, 1], [2, 3]]
+    launcher = ProcessPoolExpLauncher(ProcessPoolConfig(n_jobs=1, cpus=[0, 1, 2, 3]))
+    assert launcher._partition_cpus(experiments) == [[0, 1, 2, 3]]
+
+
+def test_process_pool_launcher_env_worker_threads(monkeypatch: pytest.MonkeyPatch) -> None:
+    for key in THREAD_LIMIT_ENV_VARS:
+        monkeypatch.setenv(key, "4")
+    env_worker_environ: dict[str, str] = {}
+
+    def experiment_runner(exp: Any) -> None:
+        env_worker_environ.update({key: os.environ[key] for key in THREAD_LIMIT_ENV_VARS})
+
+    result_queue: queue.Queue = queue.Queue()
+    _run_pinned_experiment(
+        experiment_runner,
+        cast(Any, None),
+        0,
+        [],
+        torch.get_num_threads(),
+        result_queue,
+    )
+    # the environment worker processes created by the experiment run single-threaded
+    assert env_worker_environ == dict.fromkeys(THREAD_LIMIT_ENV_VARS, "1")
+    assert result_queue.get()[1] is None
@@ -1,7 +1,7 @@
 import logging
 import time
 from abc import ABC, abstractmethod
-from collections.abc import Callable, Mapping
+from collections.abc import Callable, Mapping, Sequence
 from dataclasses import dataclass, field
 from typing import TYPE_CHECKING, Any, Generic, Literal, TypeVar, cast
 
@@ -9,7 +9,7 @@ import gymnasium as gym
 import numpy as np
 import torch
 from gymnasium.spaces import Box, Discrete, MultiBinary, MultiDiscrete
-from numba import njit
+from numba import njit, prange
 from numpy.typing import ArrayLike
 from overrides import override
 from sensai.util.hash import pickle_hash
@@ -20,10 +20,12 @@ from torch.nn.modules.module import (
 )
 from torch.optim.lr_scheduler import LRScheduler
 
+from tianshou import config
 from tianshou.algorithm.optim import OptimizerFactory
 from tianshou.data import ReplayBuffer, SequenceSummaryStats, to_numpy, to_torch_as
 from tianshou.data.batch import Batch, BatchProtocol, TArr
 from tianshou.data.buffer.buffer_base import TBuffer
+from tianshou.data.buffer.her import relabel_nstep_rewards, relabeled_target_buffer
 from tianshou.data.types import (
     ActBatchProtocol,
     ActStateBatchProtocol,
@@ -38,6 +40,7 @@ from tianshou.utils.lagged_network import (
 )
 from tianshou.utils.net.common import RandomActor
 from tianshou.utils.print import DataclassPPrintMixin
+from tianshou.utils.profiling import Profiler
 from tianshou.utils.torch_utils import policy_within_training_step, torch_train_mode
 
 if TYPE_CHECKING:
@@ -236,7 +239,6 @@ class Policy(nn.Module, ABC):
         training steps. This is done automatically by the Trainer classes. If a policy is used outside of a Trainer,
         the user should ensure that this flag is set correctly.
         """
-        self._compile()
 
     @property
     def action_type(self) -> Literal["discrete", "continuous"]:
@@ -339,16 +341,6 @@ class Policy(nn.Module, ABC):
             act = int(act)  # type: ignore
         return act
 
-    @staticmethod
-    def _compile() -> None:
-        f64 = np.array([0, 1], dtype=np.float64)
-        f32 = np.array([0, 1], dtype=np.float32)
-        b = np.array([False, True], dtype=np.bool_)
-        i64 = np.array([[0, 1]], dtype=np.int64)
-        _gae(f64, f64, f64, b, 0.1, 0.1)
-        _gae(f32, f32, f64, b, 0.1, 0.1)
-        _nstep_return(f64, b, f32.reshape(-1, 1), i64, 0.1, 1)
-
     _TArrOrActBatch = TypeVar("_TArrOrActBatch", bound="np.ndarray | ActBatchProtocol")
 
     def add_exploration_noise(
@@ -371,6 +363,107 @@ class Policy(nn.Module, ABC):
         """
         return act
 
+    def create_inference_module(self) -> nn.Module | None:
+        """Creates a module implementing the acting path of the policy for use in an
+        :class:`InferencePolicy`.
+
+        The module maps a tensor of observations (with a leading batch dimension) to the tensor of
+        actions that :meth:`forward` computes for them (i.e. prior to the addition of exploration
+        noise and action mapping), assuming a feed-forward policy.
+        The module must reference the policy's networks rather than copies of them, such that it
+        always uses the current weights. It may specialize on the current value of
+        `is_within_training_step`.
+
+        NOTE: The base implementation returns None, indicating that the policy does not support
+        the export of its acting path.
+
+        :return: the module or None if the policy does not support inference export.
+        """
+        return None
+
+
+class InferencePolicy:
+    """The acting path of a policy, exported for fast, gradient-free action computation in the
+    collection hot path.
+
+    Computing actions via :meth:`Policy.forward` involves the construction of batches and
+    distribution objects and, unless disabled, autograd tracking, which, for small networks,
+    can dominate the cost of a collection step. An inference policy instead maps an array of
+    observations directly to actions via the policy's inference module
+    (see :meth:`Policy.create_inference_module`), which is run in inference mode and can
+    optionally be compiled with `torch.compile` (specializing on the batch layout).
+    Exploration noise and action mapping are applied by the policy's own (numpy-based)
+    methods, such that the resulting actions are distributed identically to the ones computed
+    via :meth:`Policy.forward`.
+
+    Since the inference modules reference the policy's networks, in-place updates of the
+    weights (as performed by optimizers or `load_state_dict`) are reflected immediately,
+    without any copying. Only feed-forward policies with array observations are supported;
+    structured observations (such as dict observations carrying action masks) are rejected, as
+    the inference modules only receive the raw observation array.
+    """
+
+    def __init__(self, policy: Policy, mode: Literal["eager", "compile"] = "eager"):
+        """
+        :param policy: the policy whose acting path is to be exported.
+        :param mode: the execution mode of the inference module. With "eager", the module is
+            called directly; with "compile", it is compiled via `torch.compile` for static
+            shapes, i.e. it is specialized for every batch layout that is encountered (which
+            incurs a significant one-time cost).
+        """
+        if policy.create_inference_module() is None:
+            raise ValueError(f"{type(policy).__name__} does not support inference export.")
+        if isinstance(policy.observation_space, gym.spaces.Dict | gym.spaces.Tuple):
+            raise ValueError("Inference export is only supported for array observations.")
+        if mode not in ("eager", "compile"):
+            raise ValueError(f"Got invalid {mode=}. Valid values are: ('eager', 'compile').")
+        self.policy = policy
+        self.mode = mode
+        self._act_functions: dict[bool, Callable[[torch.Tensor], torch.Tensor]] = {}
+
+    def _get_act_function(self) -> Callable[[torch.Tensor], torch.Tensor]:
+        # modules may specialize on the value of the flag, so one is created per value
+        is_within_training_step = self.policy.is_within_training_step
+        act_function = self._act_functions.get(is_within_training_step)
+        if act_function is None:
+            module = self.policy.create_inference_module()
+            assert module is not None
+            if self.mode == "compile":
+                act_function = cast(
+                    Callable[[torch.Tensor], torch.Tensor],
+                    torch.compile(module, dynamic=False),
+                )
+            else:
+                act_function = module
+            self._act_functions[is_within_training_step] = act_function
+        return act_function
+
+    def __call__(
+        self,
+        obs: np.ndarray,
+        exploration_noise: bool = False,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Computes the actions for the given batch of observations.
+
+        :param obs: the batch of observations.
+        :param exploration_noise: whether to add the policy's exploration noise to the actions.
+        :return: a pair `(act, act_normalized)`, where `act` is the action computed by the policy
+            (including exploration noise, if any) and `act_normalized` is the action mapped to the
+            environment's action space (see :meth:`Policy.map_action`).
+        """
+        if not isinstance(obs, np.ndarray) or obs.dtype == object:
+            raise TypeError(
+                "Inference export is only supported for array observations, "
+                f"got {type(obs).__name__}.",
+            )
+        act_function = self._get_act_function()
+        with torch.inference_mode():
+            act_tensor = act_function(torch.as_tensor(obs))
+        act = act_tensor.cpu().numpy()
+        if exploration_noise:
+            act = self.policy.add_exploration_noise(act, cast(ObsBatchProtocol, Batch(obs=obs)))
+        return act, self.policy.map_action(act)
+
 
 class LaggedNetworkAlgorithmMixin(ABC):
     """
@@ -499,6 +592,31 @@ class Algorithm(torch.nn.Module, Generic[TPolicy, TTrainerParams], ABC):
                 nn.utils.clip_grad_norm_(self._module.parameters(), max_norm=self._max_grad_norm)
             self._optim.step()
 
+        @staticmethod
+        def step_jointly(
+            optimizers: Sequence["Algorithm.Optimizer"],
+            loss: torch.Tensor,
+        ) -> None:
+            """Performs a step of several optimizers based on a single backward pass of a joint loss.
+
+            If the modules of the optimizers are independent and the joint loss is the sum of the modules'
+            individual losses (e.g. for twin critics that are evaluated jointly), this is equivalent to
+            separate calls of :meth:`step`, but avoids repeated backward passes through the joint graph.
+
+            :param optimizers: the optimizers, whose modules must not share parameters
+            :param loss: the joint loss to backpropagate
+            """
+            for optimizer in optimizers:
+                optimizer._optim.zero_grad()
+            loss.backward()
+            for optimizer in optimizers:
+                if optimizer._max_grad_norm is not None:
+                    nn.utils.clip_grad_norm_(
+                        optimizer._module.parameters(),
+                        max_norm=optimizer._max_grad_norm,
+                    )
+                optimizer._optim.step()
+
         def state_dict(self) -> dict:
             """Returns the `state_dict` of the wrapped optimizer."""
             return self._optim.state_dict()
@@ -619,12 +737,15 @@ class Algorithm(torch.nn.Module, Generic[TPolicy, TTrainerParams], ABC):
         if buffer is None:
             return TrainingStats()
         start_time = time.time()
-        batch, indices = buffer.sample(sample_size)
+        with Profiler.timer("update/sample"):
+            batch, indices = buffer.sample(sample_size)
         TraceLogger.log(logger, lambda: f"Updating with batch: indices={pickle_hash(indices)}")
-        batch = self._preprocess_batch(batch, buffer, indices)
-        with torch_train_mode(self):
+        with Profiler.timer("update/preprocess"):
+            batch = self._preprocess_batch(batch, buffer, indices)
+        with Profiler.timer("update/learn"), torch_train_mode(self):
             training_stat = update_with_batch_fn(batch)
-        self._postprocess_batch(batch, buffer, indices)
+        with Profiler.timer("update/postprocess"):
+            self._postprocess_batch(batch, buffer, indices)
         for lr_scheduler in self.lr_schedulers:
             lr_scheduler.step()
         training_stat.train_time = time.time() - start_time
@@ -673,7 +794,7 @@ class Algorithm(torch.nn.Module, Generic[TPolicy, TTrainerParams], ABC):
         :param batch: a data batch which contains several episodes of data in
             sequential order. Mind that the end of each finished episode of batch
             should be marked by done flag, unfinished (or collecting) episodes will be
-            recognized by buffer.unfinished_index().
+            recognized by buffer.unfinished_mask().
         :param buffer: the corresponding replay buffer.
         :param indices: tells the batch's location in buffer, batch is equal
             to buffer[indices].
@@ -712,8 +833,16 @@ class Algorithm(torch.nn.Module, Generic[TPolicy, TTrainerParams], ABC):
         v_s = np.roll(v_s_, 1) if v_s is None else to_numpy(v_s.flatten())
 
         end_flag = np.logical_or(batch.terminated, batch.truncated)
-        end_flag[np.isin(indices, buffer.unfinished_index())] = True
-        advantage = _gae(v_s, v_s_, rew, end_flag, gamma, gae_lambda)
+        # the last transitions of unfinished episodes end their episodes' sequences, too
+        end_flag |= buffer.unfinished_mask()[indices]
+        # the recursion restarts after every end flag, so the segments are independent; for
+        # vector buffers, they never span sub-buffers (the last transition of every sub-buffer
+        # ends an episode or is the last transition of an unfinished one)
+        segment_ends = np.flatnonzero(end_flag)
+        if len(end_flag) > 0 and not end_flag[-1]:
+            segment_ends = np.append(segment_ends, len(end_flag) - 1)
+        gae_fn = _gae_parallel if config.ENABLE_PARALLEL_GAE else _gae
+        advantage = gae_fn(v_s, v_s_, rew, segment_ends, gamma, gae_lambda)
         returns = advantage + v_s
         # normalization varies from each policy, so we don't do it here
         return returns, advantage
@@ -737,7 +866,8 @@ class Algorithm(torch.nn.Module, Generic[TPolicy, TTrainerParams], ABC):
         where :math:`\gamma` is the discount factor, :math:`\gamma \in [0, 1]`,
         :math:`d_t` is the done flag of step :math:`t`.
 
-        :param batch: a data batch, which is equal to buffer[indices].
+        :param batch: a data batch, which is equal to buffer[indices] (or its HER relabeling,
+            see :meth:`~tianshou.data.HERReplayBuffer.sample`).
         :param buffer: the data buffer.
         :param indices: tell batch's location in buffer
         :param target_q_fn: a function which computes the target Q value
@@ -759,7 +889,6 @@ class Algorithm(torch.nn.Module, Generic[TPolicy, TTrainerParams], ABC):
 
         # naming convention
         #  I = number of indices
-        #  B = size of the replay buffer
         #  N = n_step
         #  A = the output dimension of target_q_fn for a single index. Presumably
         #      this is the number of actions in the discrete case, or something like that.
@@ -772,11 +901,7 @@ class Algorithm(torch.nn.Module, Generic[TPolicy, TTrainerParams], ABC):
         I = len(indices)
         N = n_step
 
-        _indices_to_stack = [indices]
-        for _ in range(N - 1):
-            next_indices = buffer.next(_indices_to_stack[-1])
-            _indices_to_stack.append(next_indices)
-        stacked_indices_NI = np.stack(_indices_to_stack)
+        stacked_indices_NI = buffer.next(indices, np.arange(N)[:, None])
         """The stacked indices represent a 2d array of shape `IxN` of the type
         [
          [i_1, i_2,...],
@@ -790,19 +915,32 @@ class Algorithm(torch.nn.Module, Generic[TPolicy, TTrainerParams], ABC):
         """Indicates indexes of transitions in buffer that occur N steps after the user provided 'indices';
         they are truncated at the end of each episode"""
 
+        rew_NI = buffer.rew[stacked_indices_NI]
+        target_buffer, target_indices_I = buffer, indices_after_n_steps_I
+        if "her" in batch.get_keys():
+            # the batch was sampled with a HER relabeling, which applies to the n-step
+            # trajectories of the sampled transitions (see HERReplayBuffer.sample)
+            rew_NI = relabel_nstep_rewards(batch.her, rew_NI)
+            target_buffer, target_indices_I = relabeled_target_buffer(
+                batch.her,
+                buffer,
+                indices_after_n_steps_I,
+            )
+
         with torch.no_grad():
-            target_q_torch_IA = target_q_fn(buffer, indices_after_n_steps_I)
+            target_q_torch_IA = target_q_fn(target_buffer, target_indices_I)
         target_q_IA = to_numpy(target_q_torch_IA.reshape(I, -1))
         """Represents the Q-values (one for each action) of the transition after N steps."""
 
         target_q_IA *= Algorithm.value_mask(buffer, indices_after_n_steps_I).reshape(-1, 1)
-        end_flag_B = buffer.done.copy()
-        end_flag_B[buffer.unfinished_index()] = True
+        end_flag_NI = np.logical_or(
+            buffer.done[stacked_indices_NI],
+            buffer.unfinished_mask()[stacked_indices_NI],
+        )
         n_step_return_IA = _nstep_return(
-            buffer.rew,
-            end_flag_B,
+            rew_NI,
+            end_flag_NI,
             target_q_IA,
-            stacked_indices_NI,
             gamma,
             n_step,
         )
@@ -1082,12 +1220,33 @@ class RandomActionPolicy(Policy):
         return cast(ActStateBatchProtocol, Batch(act=act, state=next_state))
 
 
-@njit
+@njit(cache=True)
+def _gae_segment(
+    advantages: np.ndarray,
+    v_s: np.ndarray,
+    v_s_: np.ndarray,
+    rew: np.ndarray,
+    start: int,
+    end: int,
+    gamma: float,
+    gae_lambda: float,
+) -> None:
+    """Computes the advantages of the transitions `start, ..., end` (inclusive) of a single segment,
+    see :func:`_gae`.
+    """
+    discount = gamma * gae_lambda
+    gae = 0.0
+    for i in range(end, start - 1, -1):
+        gae = rew[i] + v_s_[i] * gamma - v_s[i] + discount * gae
+        advantages[i] = gae
+
+
+@njit(cache=True)
 def _gae(
     v_s: np.ndarray,
     v_s_: np.ndarray,
     rew: np.ndarray,
-    end_flag: np.ndarray,
+    segment_ends: np.ndarray,
     gamma: float,
     gae_lambda: float,
 ) -> np.ndarray:
@@ -1115,7 +1274,9 @@ def _gae(
     :param v_s_: next values in an episode, i.e. v_s shifted by 1, equivalent to
         $V_{t+1}$
     :param rew: rewards in an episode, i.e. $r_t$
-    :param end_flag: boolean array indicating whether the episode is done
+    :param segment_ends: the (ascending) indices of the last transitions of the segments the
+        transitions are partitioned into, i.e. of the transitions which end an episode (or, for
+        unfinished episodes, the collected part of it); the last index must be `len(rew) - 1`.
     :param gamma: the discount factor in [0, 1] for future rewards.
     :param gae_lambda: the lambda parameter in [0, 1] for generalized advantage estimation (GAE).
         Controls the bias-variance tradeoff in advantage estimates, acting as a
@@ -1128,19 +1289,35 @@ def _gae(
         Intermediate values create a weighted average of n-step returns, with exponentially
         decaying weights for longer-horizon returns. Typically set between 0.9 and 0.99 for
         most policy gradient methods.
-    :return:
+    :return: the advantages
     """
-    returns = np.zeros(rew.shape)
-    delta = rew + v_s_ * gamma - v_s
-    discount = (1.0 - end_flag) * (gamma * gae_lambda)
-    gae = 0.0
-    for i in range(len(rew) - 1, -1, -1):
-        gae = delta[i] + discount[i] * gae
-        returns[i] = gae
-    return returns
+    advantages = np.zeros(rew.shape)
+    for k in range(len(segment_ends)):
+        start = 0 if k == 0 else segment_ends[k - 1] + 1
+        _gae_segment(advantages, v_s, v_s_, rew, start, segment_ends[k], gamma, gae_lambda)
+    return advantages
 
 
-@njit
+@njit(cache=True, parallel=True)
+def _gae_parallel(
+    v_s: np.ndarray,
+    v_s_: np.ndarray,
+    rew: np.ndarray,
+    segment_ends: np.ndarray,
+    gamma: float,
+    gae_lambda: float,
+) -> np.ndarray:
+    """Like :func:`_gae`, but processes the segments in parallel (see
+    :data:`tianshou.config.ENABLE_PARALLEL_GAE`).
+    """
+    advantages = np.zeros(rew.shape)
+    for k in prange(len(segment_ends)):
+        start = 0 if k == 0 else segment_ends[k - 1] + 1
+        _gae_segment(advantages, v_s, v_s_, rew, start, segment_ends[k], gamma, gae_lambda)
+    return advantages
+
+
+@njit(cache=True)
 def episode_mc_return_to_go(rewards: np.ndarray, gamma: float = 0.99) -> np.ndarray:
     """Calculates discounted monte-carlo returns to go from rewards of a single episode.
 
@@ -1157,12 +1334,30 @@ def episode_mc_return_to_go(rewards: np.ndarray, gamma: float = 0.99) -> np.ndar
     return ret2go
 
 
-@njit
+@njit(cache=True)
+def mc_return_to_go(rew: np.ndarray, end_flag: np.ndarray, gamma: float = 0.99) -> np.ndarray:
+    """Calculates discounted monte-carlo returns to go for a sequence of consecutive episodes in a single pass.
+
+    :param rew: the rewards of consecutive episodes in chronological order (1-dim array).
+    :param end_flag: boolean array indicating the last transition of each episode.
+    :param gamma: discount factor
+    :return: a numpy array of shape (len(rew), ).
+    """
+    ret2go = np.zeros(len(rew))
+    ret = 0.0
+    for i in range(len(rew) - 1, -1, -1):
+        if end_flag[i]:
+            ret = 0.0
+        ret = rew[i] + gamma * ret
+        ret2go[i] = ret
+    return ret2go
+
+
+@njit(cache=True)
 def _nstep_return(
-    rew_B: np.ndarray,
-    end_flag_B: np.ndarray,
+    rew_NI: np.ndarray,
+    end_flag_NI: np.ndarray,
     target_q_IA: np.ndarray,
-    stacked_indices_NI: np.ndarray,
     gamma: float,
     n_step: int,
 ) -> np.ndarray:
@@ -1179,24 +1374,17 @@ def _nstep_return(
 
     Notation:
     I = number of indices
-    B = size of the replay buffer
     N = n_step
     A = the output dimension of target_q_fn for a single index. Presumably,
         this is the number of actions in the discrete case, or something like that.
         See comments in the method `compute_nstep_return` for more details.
     1 = 1 extra dimension
 
-    :param rew_B: rewards of the entire replay buffer
-    :param end_flag_B: end flags (where done=True) of the entire replay buffer
+    :param rew_NI: rewards of the transitions at the stacked indices (see `compute_nstep_return`),
+        of the same shape
+    :param end_flag_NI: end flags (done or last transition of an unfinished episode) of the
+        transitions at the stacked indices, of the same shape
     :param target_q_IA: Q-values of the transitions after n steps. Passed as a 2d array of shape (I, A)
-    :param stacked_indices_NI: indices of the transitions in the buffer of the structure
-        [
-         [i_1, i_2,...],
-         [i_(next(1)), i_(next(2)), ...],
-         [i_(next(next(1)), ...
-         ...
-        ]
-        where `next` is the subsequent transition in the buffer.
     """
     N = n_step
     I, A = target_q_IA.shape
@@ -1211,10 +1399,9 @@ def _nstep_return(
     """
     gammas_IN = np.full(I, N)
     for n in range(N - 1, -1, -1):
-        now = stacked_indices_NI[n]
-        gammas_IN[end_flag_B[now] > 0] = n + 1
-        n_step_mc_returns_IA[end_flag_B[now] > 0] = 0.0
-        n_step_mc_returns_IA = rew_B[now].reshape(I, 1) + gamma * n_step_mc_returns_IA
+        gammas_IN[end_flag_NI[n]] = n + 1
+        n_step_mc_returns_IA[end_flag_NI[n]] = 0.0
+        n_step_mc_returns_IA = rew_NI[n].reshape(I, 1) + gamma * n_step_mc_returns_IA
 
     n_step_return_with_Q_IA = (
         target_q_IA * gamma_buffer_N[gammas_IN].reshape(I, 1) + n_step_mc_returns_IA
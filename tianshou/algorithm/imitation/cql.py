@@ -1,3 +1,4 @@
+import logging
 from copy import deepcopy
 from dataclasses import dataclass
 from typing import cast
@@ -6,19 +7,29 @@ import numpy as np
 import torch
 import torch.nn.functional as F
 from overrides import override
+from torch.distributions import Independent
 
 from tianshou.algorithm.algorithm_base import (
     LaggedNetworkPolyakUpdateAlgorithmMixin,
     OfflineAlgorithm,
+    mc_return_to_go,
+)
+from tianshou.algorithm.modelfree.sac import (
+    Alpha,
+    SACPolicy,
+    SACTrainingStats,
+    correct_log_prob_gaussian_tanh,
 )
-from tianshou.algorithm.modelfree.sac import Alpha, SACPolicy, SACTrainingStats
 from tianshou.algorithm.optim import OptimizerFactory
 from tianshou.data import Batch, ReplayBuffer, to_torch
 from tianshou.data.buffer.buffer_base import TBuffer
 from tianshou.data.types import RolloutBatchProtocol
 from tianshou.utils.conversion import to_optional_float
+from tianshou.utils.net.common import is_stackable, stacked_forward
 from tianshou.utils.torch_utils import torch_device
 
+log = logging.getLogger(__name__)
+
 
 @dataclass(kw_only=True)
 class CQLTrainingStats(SACTrainingStats):
@@ -56,6 +67,7 @@ class CQL(OfflineAlgorithm[SACPolicy], LaggedNetworkPolyakUpdateAlgorithmMixin):
         alpha_max: float = 1e6,
         max_grad_norm: float = 1.0,
         calibrated: bool = True,
+        fuse_twin_critics: bool = False,
     ) -> None:
         """
         :param actor: the actor network following the rules (s -> a)
@@ -156,6 +168,9 @@ class CQL(OfflineAlgorithm[SACPolicy], LaggedNetworkPolyakUpdateAlgorithmMixin):
             Particularly useful for offline pre-training followed by online fine-tuning scenarios.
             Experimental results suggest this approach often achieves better performance than vanilla CQL.
             Based on techniques from the CalQL paper (arXiv:2303.05479).
+        :param fuse_twin_critics: whether to evaluate the two critics jointly in a single vectorized
+            call, which reduces the number of critic calls per update from six to three; see
+            :class:`~tianshou.algorithm.modelfree.td3.ActorDualCriticsOffPolicyAlgorithm`.
         """
         super().__init__(
             policy=policy,
@@ -175,6 +190,11 @@ class CQL(OfflineAlgorithm[SACPolicy], LaggedNetworkPolyakUpdateAlgorithmMixin):
         )
         self.critic_old = self._add_lagged_network(self.critic)
         self.critic2_old = self._add_lagged_network(self.critic2)
+        if fuse_twin_critics and not is_stackable([self.critic, self.critic2]):
+            raise ValueError(
+                "fuse_twin_critics requires structurally identical critics without buffers",
+            )
+        self.fuse_twin_critics = fuse_twin_critics
 
         self.gamma = gamma
         self.alpha = Alpha.from_float_or_instance(alpha)
@@ -200,75 +220,79 @@ class CQL(OfflineAlgorithm[SACPolicy], LaggedNetworkPolyakUpdateAlgorithmMixin):
 
         self.calibrated = calibrated
 
-    def _policy_pred(self, obs: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
-        batch = Batch(obs=obs, info=[None] * len(obs))
-        obs_result = self.policy(batch)
-        return obs_result.act, obs_result.log_prob
+    def _twin_critic_values(
+        self,
+        obs: torch.Tensor,
+        act: torch.Tensor,
+        lagged: bool = False,
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """Applies the two critics (or the two lagged critics) to the given observations and actions.
+
+        :param obs: the observations
+        :param act: the actions
+        :param lagged: whether to apply the lagged critics instead of the current ones
+        :return: the pair of outputs of the first and the second critic
+        """
+        critics = (self.critic_old, self.critic2_old) if lagged else (self.critic, self.critic2)
+        if self.fuse_twin_critics:
+            values = stacked_forward(critics, obs, act)
+            return values[0], values[1]
+        return critics[0](obs, act), critics[1](obs, act)
 
     def _calc_policy_loss(self, obs: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
-        act_pred, log_pi = self._policy_pred(obs)
-        q1 = self.critic(obs, act_pred)
-        q2 = self.critic2(obs, act_pred)
+        obs_result = self.policy(
+            Batch.from_validated(obs=obs, info=np.full(len(obs), None, dtype=object))
+        )
+        act_pred, log_pi = obs_result.act, obs_result.log_prob
+        q1, q2 = self._twin_critic_values(obs, act_pred)
         min_Q = torch.min(q1, q2)
         # self.alpha: float | torch.Tensor
         actor_loss = (self.alpha.value * log_pi - min_Q).mean()
         # actor_loss.shape: (), log_pi.shape: (batch_size, 1)
         return actor_loss, log_pi
 
-    def _calc_pi_values(
-        self,
-        obs_pi: torch.Tensor,
-        obs_to_pred: torch.Tensor,
-    ) -> tuple[torch.Tensor, torch.Tensor]:
-        act_pred, log_pi = self._policy_pred(obs_pi)
-
-        q1 = self.critic(obs_to_pred, act_pred)
-        q2 = self.critic2(obs_to_pred, act_pred)
-
-        return q1 - log_pi.detach(), q2 - log_pi.detach()
-
-    def _calc_random_values(
-        self,
-        obs: torch.Tensor,
-        act: torch.Tensor,
-    ) -> tuple[torch.Tensor, torch.Tensor]:
-        random_value1 = self.critic(obs, act)
-        random_log_prob1 = np.log(0.5 ** act.shape[-1])
-
-        random_value2 = self.critic2(obs, act)
-        random_log_prob2 = np.log(0.5 ** act.shape[-1])
+    def _sample_repeated_actions(self, dist: Independent) -> tuple[torch.Tensor, torch.Tensor]:
+        """Samples `num_repeat_actions` (squashed) actions per entry of the policy's action distribution.
 
-        return random_value1 - random_log_prob1, random_value2 - random_log_prob2
+        :param dist: the (unsquashed) Gaussian action distribution computed by the policy for B observations
+        :return: a pair (`act`, `log_prob`) of shapes (B * num_repeat_actions, action_dim) and
+            (B * num_repeat_actions, 1), where the samples for the b-th observation are found at
+            positions b * num_repeat_actions, ..., (b + 1) * num_repeat_actions - 1
+        """
+        act_RB = dist.rsample(torch.Size((self.num_repeat_actions,)))
+        log_prob_RB = dist.log_prob(act_RB).unsqueeze(-1)
+        squashed_act_RB = torch.tanh(act_RB)
+        log_prob_RB = correct_log_prob_gaussian_tanh(log_prob_RB, squashed_act_RB)
+        return (
+            squashed_act_RB.transpose(0, 1).flatten(0, 1),
+            log_prob_RB.transpose(0, 1).flatten(0, 1),
+        )
 
     @override
     def process_buffer(self, buffer: TBuffer) -> TBuffer:
-        """If `self.calibrated = True`, adds `calibration_returns` to buffer._meta.
+        """If `self.calibrated = True`, adds `calibration_returns` (the discounted MC returns-to-go) to the buffer.
 
-        :param buffer:
-        :return:
+        The returns are computed in a single pass over the buffer's rewards and episode ends (without
+        materializing the transitions) and are stored in place.
         """
         if self.calibrated:
-            # otherwise _meta hack cannot work
             assert isinstance(buffer, ReplayBuffer)
-            batch, indices = buffer.sample(0)
-            returns, _ = self.compute_episodic_return(
-                batch=batch,
-                buffer=buffer,
-                indices=indices,
-                gamma=self.gamma,
-                gae_lambda=1.0,
-            )
-            # TODO: don't access _meta directly
-            buffer._meta = cast(
-                RolloutBatchProtocol,
-                Batch(**buffer._meta.__dict__, calibration_returns=returns),
+            indices = buffer.sample_indices(0)
+            rew = buffer.rew[indices]
+            end_flag = np.logical_or(buffer.done[indices], buffer.unfinished_mask()[indices])
+            returns = mc_return_to_go(rew, end_flag, self.gamma)
+            buffer.set_array_at_key(
+                returns, "calibration_returns", index=indices, default_value=0.0
             )
         return buffer
 
     def _update_with_batch(self, batch: RolloutBatchProtocol) -> CQLTrainingStats:
         device = torch_device(self.policy)
         batch: Batch = to_torch(batch, dtype=torch.float, device=device)
-        obs, act, rew, obs_next = batch.obs, batch.act, batch.rew, batch.obs_next
+        obs, act, rew, obs_next = cast(
+            tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor],
+            (batch.obs, batch.act, batch.rew, batch.obs_next),
+        )
         batch_size = obs.shape[0]
 
         # compute actor loss and update actor
@@ -278,12 +302,23 @@ class CQL(OfflineAlgorithm[SACPolicy], LaggedNetworkPolyakUpdateAlgorithmMixin):
         entropy = -log_pi.detach()
         alpha_loss = self.alpha.update(entropy)
 
-        # compute target_Q
+        # evaluate the updated actor once for both obs and obs_next: the sampled actions for obs_next
+        # are used for the target, and further actions are sampled from the same distributions for
+        # the CQL term (instead of evaluating the actor on repeated observations)
         with torch.no_grad():
-            act_next, new_log_pi = self._policy_pred(obs_next)
+            obs_result = self.policy(
+                Batch.from_validated(
+                    obs=torch.cat([obs, obs_next]),
+                    info=np.full(2 * batch_size, None, dtype=object),
+                ),
+            )
+            act_next, new_log_pi = obs_result.act[batch_size:], obs_result.log_prob[batch_size:]
+            pi_act, pi_log_prob = self._sample_repeated_actions(obs_result.dist)
+            # pi_act & pi_log_prob: (2 * batch_size * num_repeat, ...)
 
-            target_Q1 = self.critic_old(obs_next, act_next)
-            target_Q2 = self.critic2_old(obs_next, act_next)
+        # compute target_Q
+        with torch.no_grad():
+            target_Q1, target_Q2 = self._twin_critic_values(obs_next, act_next, lagged=True)
 
             target_Q = torch.min(target_Q1, target_Q2) - self.alpha.value * new_log_pi
 
@@ -291,14 +326,6 @@ class CQL(OfflineAlgorithm[SACPolicy], LaggedNetworkPolyakUpdateAlgorithmMixin):
             target_Q = target_Q.float()
             # shape: (batch_size)
 
-        # compute critic loss
-        current_Q1 = self.critic(obs, act).flatten()
-        current_Q2 = self.critic2(obs, act).flatten()
-        # shape: (batch_size)
-
-        critic1_loss = F.mse_loss(current_Q1, target_Q)
-        critic2_loss = F.mse_loss(current_Q2, target_Q)
-
         # CQL
         random_actions = (
             torch.FloatTensor(batch_size * self.num_repeat_actions, act.shape[-1])
@@ -306,27 +333,48 @@ class CQL(OfflineAlgorithm[SACPolicy], LaggedNetworkPolyakUpdateAlgorithmMixin):
             .to(device)
         )
 
-        obs_len = len(obs.shape)
-        repeat_size = [1, self.num_repeat_actions] + [1] * (obs_len - 1)
-        view_size = [batch_size * self.num_repeat_actions, *list(obs.shape[1:])]
-        tmp_obs = obs.unsqueeze(1).repeat(*repeat_size).view(*view_size)
-        tmp_obs_next = obs_next.unsqueeze(1).repeat(*repeat_size).view(*view_size)
-        # tmp_obs & tmp_obs_next: (batch_size * num_repeat, state_dim)
-
-        current_pi_value1, current_pi_value2 = self._calc_pi_values(tmp_obs, tmp_obs)
-        next_pi_value1, next_pi_value2 = self._calc_pi_values(tmp_obs_next, tmp_obs)
+        # evaluate the critics on the dataset actions as well as on the random, current-policy and
+        # next-policy actions (all for obs) in a single call
+        act_dim = act.shape[-1]
+        all_act = torch.cat(
+            [
+                act.view(batch_size, 1, act_dim),
+                random_actions.view(batch_size, self.num_repeat_actions, act_dim),
+                pi_act.view(2, batch_size, self.num_repeat_actions, act_dim)
+                .transpose(0, 1)
+                .flatten(1, 2),
+            ],
+            dim=1,
+        )
+        num_act_per_obs = all_act.shape[1]
+        all_q1, all_q2 = self._twin_critic_values(
+            obs.repeat_interleave(num_act_per_obs, dim=0),
+            all_act.flatten(0, 1),
+        )
+        random_log_prob = np.log(0.5 ** act.shape[-1])
+        current_pi_log_prob, next_pi_log_prob = pi_log_prob.view(2, -1, 1).unbind(0)
+
+        def split_values(
+            all_q: torch.Tensor,
+        ) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+            all_q = all_q.view(batch_size, num_act_per_obs)
+            random_q, current_pi_q, next_pi_q = (
+                all_q[:, 1:].view(batch_size, 3, self.num_repeat_actions).unbind(1)
+            )
+            # shape of the CQL values: (batch_size * num_repeat, 1)
+            return (
+                all_q[:, 0],
+                random_q.reshape(-1, 1) - random_log_prob,
+                current_pi_q.reshape(-1, 1) - current_pi_log_prob,
+                next_pi_q.reshape(-1, 1) - next_pi_log_prob,
+            )
 
-        random_value1, random_value2 = self._calc_random_values(tmp_obs, random_actions)
+        current_Q1, random_value1, current_pi_value1, next_pi_value1 = split_values(all_q1)
+        current_Q2, random_value2, current_pi_value2, next_pi_value2 = split_values(all_q2)
+        # current_Q1 & current_Q2: (batch_size)
 
-        for value in [
-            current_pi_value1,
-            current_pi_value2,
-            next_pi_value1,
-            next_pi_value2,
-            random_value1,
-            random_value2,
-        ]:
-            value.reshape(batch_size, self.num_repeat_actions, 1)
+        critic1_loss = F.mse_loss(current_Q1, target_Q)
+        critic2_loss = F.mse_loss(current_Q2, target_Q)
 
         if self.calibrated:
             returns = (
@@ -384,8 +432,14 @@ class CQL(OfflineAlgorithm[SACPolicy], LaggedNetworkPolyakUpdateAlgorithmMixin):
         critic2_loss = critic2_loss + cql2_scaled_loss
 
         # update critics
-        self.critic_optim.step(critic1_loss, retain_graph=True)
-        self.critic2_optim.step(critic2_loss)
+        if self.fuse_twin_critics:
+            self.Optimizer.step_jointly(
+                (self.critic_optim, self.critic2_optim),
+                critic1_loss + critic2_loss,
+            )
+        else:
+            self.critic_optim.step(critic1_loss, retain_graph=True)
+            self.critic2_optim.step(critic2_loss)
 
         self._update_lagged_network_weights()
 
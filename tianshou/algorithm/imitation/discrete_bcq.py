@@ -226,11 +226,13 @@ class DiscreteBCQ(
         )
 
     def _target_q(self, buffer: ReplayBuffer, indices: np.ndarray) -> torch.Tensor:
-        batch = buffer[indices]  # batch.obs_next: s_{t+n}
-        next_obs_batch = Batch(obs=batch.obs_next, info=[None] * len(batch))
+        obs_next = buffer.get_keys(indices, ("obs_next",)).obs_next  # s_{t+n}
+        next_obs_batch = Batch.from_validated(
+            obs=obs_next, info=np.full(len(indices), None, dtype=object)
+        )
         # target_Q = Q_old(s_, argmax(Q_new(s_, *)))
         act = self.policy(next_obs_batch).act
-        target_q, _ = self.model_old(batch.obs_next)
+        target_q, _ = self.model_old(obs_next)
         return target_q[np.arange(len(act)), act]
 
     def _update_with_batch(  # type: ignore[override]
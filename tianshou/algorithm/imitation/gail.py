@@ -222,7 +222,7 @@ class GAIL(PPO):
         acc_pis = []
         acc_exps = []
         bsz = len(batch) // self.disc_update_num
-        for b in batch.split(bsz, merge_last=True):
+        for b in batch.split(bsz, merge_last=True, contiguous=True):
             logits_pi = self.disc(b)
             exp_b = self.expert_buffer.sample(bsz)[0]
             logits_exp = self.disc(exp_b)
@@ -12,10 +12,10 @@ from tianshou.algorithm.algorithm_base import (
 )
 from tianshou.algorithm.modelfree.reinforce import ProbabilisticActorPolicy
 from tianshou.algorithm.optim import OptimizerFactory
-from tianshou.data import ReplayBuffer, SequenceSummaryStats, to_torch_as
+from tianshou.data import Batch, ReplayBuffer, SequenceSummaryStats, to_torch_as
 from tianshou.data.types import BatchWithAdvantagesProtocol, RolloutBatchProtocol
 from tianshou.utils import RunningMeanStd
-from tianshou.utils.net.common import ActorCritic
+from tianshou.utils.net.common import Actor, ActorCritic, ModuleWithVectorOutput
 from tianshou.utils.net.continuous import ContinuousCritic
 from tianshou.utils.net.discrete import DiscreteCritic
 
@@ -111,19 +111,73 @@ class ActorCriticOnPolicyAlgorithm(OnPolicyAlgorithm[ProbabilisticActorPolicy],
         self.return_scaling = return_scaling
         self.ret_rms = RunningMeanStd()
         self._eps = 1e-8
+        self._shared_preprocess_net = self._get_shared_preprocess_net()
+
+    def _get_shared_preprocess_net(self) -> ModuleWithVectorOutput | None:
+        """:return: the pre-processing network shared by actor and critic, provided that the outputs
+        of both networks can be computed from its result (see :meth:`Actor.forward_from_latent`);
+        None otherwise
+        """
+        actor = self.policy.actor
+        critic = self.critic
+        if not isinstance(actor, Actor) or not isinstance(
+            critic, ContinuousCritic | DiscreteCritic
+        ):
+            return None
+        if isinstance(critic, ContinuousCritic) and not critic.apply_preprocess_net_to_obs_only:
+            return None
+        preprocess_net = actor.get_preprocess_net()
+        if critic.preprocess is not preprocess_net or not actor.supports_forward_from_latent():
+            return None
+        return preprocess_net
+
+    def _evaluate_actor_critic(
+        self,
+        minibatch: RolloutBatchProtocol,
+    ) -> tuple[torch.distributions.Distribution, torch.Tensor]:
+        """Computes the policy's action distribution and the critic's value estimate for the observations
+        in the given batch.
+
+        If actor and critic share their pre-processing network, it is applied only once and its result
+        is fed to both the actor and the critic.
+
+        :return: a tuple (dist, value), where value is flattened
+        """
+        if self._shared_preprocess_net is None:
+            return self.policy(minibatch).dist, self.critic(minibatch.obs).flatten()
+        actor = cast(Actor, self.policy.actor)
+        critic = cast(ContinuousCritic | DiscreteCritic, self.critic)
+        latent, hidden = self._shared_preprocess_net(minibatch.obs)
+        dist_input, _ = actor.forward_from_latent(latent, hidden)
+        dist = self.policy.dist_fn(dist_input)
+        return dist, critic.forward_from_latent(latent).flatten()
 
     def _add_returns_and_advantages(
         self,
         batch: RolloutBatchProtocol,
         buffer: ReplayBuffer,
         indices: np.ndarray,
+        add_log_probs: bool = False,
     ) -> BatchWithAdvantagesProtocol:
-        """Adds the returns and advantages to the given batch."""
-        v_s, v_s_ = [], []
+        """Adds the returns and advantages to the given batch.
+
+        :param add_log_probs: whether to also add the log probabilities of the actions under the current
+            policy (as `logp_old`), which are computed in the same pass over the batch as the values.
+        """
+        v_s, v_s_, logp = [], [], []
         with torch.no_grad():
-            for minibatch in batch.split(self.max_batchsize, shuffle=False, merge_last=True):
-                v_s.append(self.critic(minibatch.obs))
+            for minibatch in batch.split(
+                self.max_batchsize, shuffle=False, merge_last=True, contiguous=True
+            ):
+                if add_log_probs:
+                    dist, value = self._evaluate_actor_critic(minibatch)
+                    logp.append(dist.log_prob(to_torch_as(minibatch.act, value)))
+                    v_s.append(value)
+                else:
+                    v_s.append(self.critic(minibatch.obs))
                 v_s_.append(self.critic(minibatch.obs_next))
+        if add_log_probs:
+            batch.logp_old = torch.cat(logp, dim=0).flatten()
         batch.v_s = torch.cat(v_s, dim=0).flatten()  # old value
         v_s = batch.v_s.cpu().numpy()
         v_s_ = torch.cat(v_s_, dim=0).flatten().cpu().numpy()
@@ -255,17 +309,20 @@ class A2C(ActorCriticOnPolicyAlgorithm):
         losses, actor_losses, vf_losses, ent_losses = [], [], [], []
         split_batch_size = batch_size or -1
         gradient_steps = 0
+        # the batch is permuted into the same contiguous storage in each epoch
+        permuted_batch = Batch()
         for _ in range(repeat):
-            for minibatch in batch.split(split_batch_size, merge_last=True):
+            for minibatch in batch.split(
+                split_batch_size, merge_last=True, contiguous=True, out=permuted_batch
+            ):
                 gradient_steps += 1
 
+                dist, value = self._evaluate_actor_critic(minibatch)
                 # calculate loss for actor
-                dist = self.policy(minibatch).dist
-                log_prob = dist.log_prob(minibatch.act)
+                log_prob = dist.log_prob(to_torch_as(minibatch.act, value))
                 log_prob = log_prob.reshape(len(minibatch.adv), -1).transpose(0, 1)
                 actor_loss = -(log_prob * minibatch.adv).mean()
                 # calculate loss for critic
-                value = self.critic(minibatch.obs).flatten()
                 vf_loss = F.mse_loss(minibatch.returns, value)
                 # calculate regularization and overall loss
                 ent_loss = dist.entropy().mean()
@@ -22,6 +22,7 @@ from tianshou.data.types import (
     RolloutBatchProtocol,
 )
 from tianshou.utils.net.common import BranchingNet
+from tianshou.utils.torch_utils import torch_device
 
 mark_used(ActBatchProtocol)
 
@@ -114,6 +115,7 @@ class BDQN(QLearningOffPolicyAlgorithm[BDQNPolicy]):
         gamma: float = 0.99,
         target_update_freq: int = 0,
         is_double: bool = True,
+        fuse_online_forward: bool = False,
     ) -> None:
         """
         :param policy: policy
@@ -141,6 +143,8 @@ class BDQN(QLearningOffPolicyAlgorithm[BDQNPolicy]):
             This decoupling helps reduce the overestimation bias that standard Q-learning is prone to.
             If False, the algorithm selects actions by directly taking the maximum Q-value from the target network.
             Note: This parameter is most effective when used with a target network (target_update_freq > 0).
+        :param fuse_online_forward: whether to fuse the forward passes of the online network in the
+            update; see :class:`~tianshou.algorithm.modelfree.dqn.QLearningOffPolicyAlgorithm`.
         """
         super().__init__(
             policy=policy,
@@ -149,22 +153,28 @@ class BDQN(QLearningOffPolicyAlgorithm[BDQNPolicy]):
             # BDQN implements its own returns computation (below), which supports only 1-step returns
             n_step_return_horizon=1,
             target_update_freq=target_update_freq,
+            fuse_online_forward=fuse_online_forward,
         )
         self.is_double = is_double
 
-    def _target_q(self, buffer: ReplayBuffer, indices: np.ndarray) -> torch.Tensor:
-        obs_next_batch = Batch(
-            obs=buffer[indices].obs_next,
-            info=[None] * len(indices),
-        )  # obs_next: s_{t+n}
-        result = self.policy(obs_next_batch)
+    @property
+    def _uses_online_q_for_target(self) -> bool:
+        return self.is_double or not self.use_target_network
+
+    def _compute_target_q(
+        self,
+        obs_next_batch: ObsBatchProtocol,
+        result: ModelOutputBatchProtocol | None,
+    ) -> torch.Tensor:
         if self.use_target_network:
             # target_Q = Q_old(s_, argmax(Q_new(s_, *)))
             target_q = self.policy(obs_next_batch, model=self.model_old).logits
         else:
+            assert result is not None
             target_q = result.logits
         if self.is_double:
-            act = np.expand_dims(self.policy(obs_next_batch).act, -1)
+            assert result is not None
+            act = np.expand_dims(result.act, -1)
             act = to_torch(act, dtype=torch.long, device=target_q.device)
         else:
             act = target_q.max(-1).indices.unsqueeze(-1)
@@ -178,12 +188,22 @@ class BDQN(QLearningOffPolicyAlgorithm[BDQNPolicy]):
         gamma: float = 0.99,
     ) -> BatchWithReturnsProtocol:
         rew = batch.rew
+        end_flag = np.logical_or(buffer.done[indice], buffer.unfinished_mask()[indice])
+        if self.fuse_online_forward:
+            # the return is completed within the update step, see _compute_online_q_and_returns
+            batch.obs_nstep = batch.obs_next
+            batch.nstep_rew = rew
+            batch.nstep_discount = gamma * (1 - end_flag)
+            if hasattr(batch, "weight"):  # prio buffer update
+                batch.weight = to_torch(
+                    batch.weight,
+                    dtype=torch.float32,
+                    device=torch_device(self.policy),
+                )
+            return cast(BatchWithReturnsProtocol, batch)
         with torch.no_grad():
             target_q_torch = self._target_q(buffer, indice)  # (bsz, ?)
         target_q = to_numpy(target_q_torch)
-        end_flag = buffer.done.copy()
-        end_flag[buffer.unfinished_index()] = True
-        end_flag = end_flag[indice]
         mean_target_q = np.mean(target_q, -1) if len(target_q.shape) > 1 else target_q
         _target_q = rew + gamma * mean_target_q * (1 - end_flag)
         target_q = np.repeat(_target_q[..., None], self.policy.model.num_branches, axis=-1)
@@ -207,10 +227,16 @@ class BDQN(QLearningOffPolicyAlgorithm[BDQNPolicy]):
         self,
         batch: BatchWithReturnsProtocol,
     ) -> SimpleLossTrainingStats:
-        self._periodically_update_lagged_network_weights()
+        if self.fuse_online_forward:
+            q = self._compute_online_q_and_returns(batch).logits
+            self._periodically_update_lagged_network_weights()
+            # average over the branches and broadcast to all branches and actions
+            batch.returns = batch.returns.mean(-1)[:, None, None].expand_as(q)
+        else:
+            self._periodically_update_lagged_network_weights()
+            q = self.policy(batch).logits
         weight = batch.pop("weight", 1.0)
         act = to_torch(batch.act, dtype=torch.long, device=batch.returns.device)
-        q = self.policy(batch).logits
         act_mask = torch.zeros_like(q)
         act_mask = act_mask.scatter_(-1, act.unsqueeze(-1), 1)
         act_q = q * act_mask
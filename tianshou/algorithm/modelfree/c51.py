@@ -1,3 +1,5 @@
+from typing import cast
+
 import gymnasium as gym
 import numpy as np
 import torch
@@ -9,7 +11,12 @@ from tianshou.algorithm.modelfree.dqn import (
 from tianshou.algorithm.modelfree.reinforce import LossSequenceTrainingStats
 from tianshou.algorithm.optim import OptimizerFactory
 from tianshou.data import Batch, ReplayBuffer
-from tianshou.data.types import RolloutBatchProtocol
+from tianshou.data.types import (
+    BatchWithReturnsProtocol,
+    ModelOutputBatchProtocol,
+    ObsBatchProtocol,
+    RolloutBatchProtocol,
+)
 from tianshou.utils.net.common import Net
 
 
@@ -78,6 +85,7 @@ class C51(QLearningOffPolicyAlgorithm[C51Policy]):
         gamma: float = 0.99,
         n_step_return_horizon: int = 1,
         target_update_freq: int = 0,
+        fuse_online_forward: bool = False,
     ) -> None:
         """
         :param policy: a policy following the rules (s -> action_values_BA)
@@ -107,6 +115,8 @@ class C51(QLearningOffPolicyAlgorithm[C51Policy]):
             due to rapidly changing targets.
             Typically set between 100-10000 for DQN variants, with exact values depending on environment
             complexity.
+        :param fuse_online_forward: whether to fuse the forward passes of the online network in the
+            update; see :class:`~tianshou.algorithm.modelfree.dqn.QLearningOffPolicyAlgorithm`.
         """
         super().__init__(
             policy=policy,
@@ -114,22 +124,56 @@ class C51(QLearningOffPolicyAlgorithm[C51Policy]):
             gamma=gamma,
             n_step_return_horizon=n_step_return_horizon,
             target_update_freq=target_update_freq,
+            fuse_online_forward=fuse_online_forward,
         )
         self.delta_z = (policy.v_max - policy.v_min) / (policy.num_atoms - 1)
 
     def _target_q(self, buffer: ReplayBuffer, indices: np.ndarray) -> torch.Tensor:
         return self.policy.support.repeat(len(indices), 1)  # shape: [bsz, num_atoms]
 
-    def _target_dist(self, batch: RolloutBatchProtocol) -> torch.Tensor:
-        obs_next_batch = Batch(obs=batch.obs_next, info=[None] * len(batch))
+    def _preprocess_batch(
+        self,
+        batch: RolloutBatchProtocol,
+        buffer: ReplayBuffer,
+        indices: np.ndarray,
+    ) -> BatchWithReturnsProtocol:
+        # the returns (the support of the target distribution) do not depend on the
+        # networks, so they are computed upfront in the fused mode, too
+        return self.compute_nstep_return(
+            batch=batch,
+            buffer=buffer,
+            indices=indices,
+            target_q_fn=self._target_q,
+            gamma=self.gamma,
+            n_step=self.n_step,
+        )
+
+    def _compute_target_q(
+        self,
+        obs_next_batch: ObsBatchProtocol,
+        result: ModelOutputBatchProtocol | None,
+    ) -> torch.Tensor:
+        """Compute the next state's distribution of the greedy action."""
+        assert result is not None
+        act = result.act
         if self.use_target_network:
-            act = self.policy(obs_next_batch).act
             next_dist = self.policy(obs_next_batch, model=self.model_old).logits
         else:
-            next_batch = self.policy(obs_next_batch)
-            act = next_batch.act
-            next_dist = next_batch.logits
-        next_dist = next_dist[np.arange(len(act)), act, :]
+            next_dist = result.logits
+        return next_dist[np.arange(len(act)), act, :]
+
+    def _target_dist(
+        self,
+        batch: RolloutBatchProtocol,
+        next_result: ModelOutputBatchProtocol | None = None,
+    ) -> torch.Tensor:
+        obs_next_batch = cast(
+            ObsBatchProtocol,
+            Batch.from_validated(obs=batch.obs_next, info=np.full(len(batch), None, dtype=object)),
+        )
+        if next_result is None:
+            next_result = self.policy(obs_next_batch)
+        next_dist = self._compute_target_q(obs_next_batch, next_result)
         target_support = batch.returns.clamp(self.policy.v_min, self.policy.v_max)
         # An amazing trick for calculating the projection gracefully.
         # ref: https://github.com/ShangtongZhang/DeepRL
@@ -145,10 +189,16 @@ class C51(QLearningOffPolicyAlgorithm[C51Policy]):
         batch: RolloutBatchProtocol,
     ) -> LossSequenceTrainingStats:
         self._periodically_update_lagged_network_weights()
-        with torch.no_grad():
-            target_dist = self._target_dist(batch)
+        if self.fuse_online_forward:
+            result, next_result = self._fused_online_forward(batch, batch.obs_next)
+            curr_dist = result.logits
+            with torch.no_grad():
+                target_dist = self._target_dist(batch, next_result)
+        else:
+            with torch.no_grad():
+                target_dist = self._target_dist(batch)
+            curr_dist = self.policy(batch).logits
         weight = batch.pop("weight", 1.0)
-        curr_dist = self.policy(batch).logits
         act = batch.act
         curr_dist = curr_dist[np.arange(len(act)), act, :]
         cross_entropy = -(target_dist * torch.log(curr_dist + 1e-8)).sum(1)
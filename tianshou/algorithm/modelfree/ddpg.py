@@ -111,6 +111,18 @@ class ContinuousPolicyWithExplorationNoise(Policy, ABC):
         return act
 
 
+class _DeterministicActorInferenceModule(torch.nn.Module):
+    """Maps observations to the actions of a deterministic actor."""
+
+    def __init__(self, actor: torch.nn.Module) -> None:
+        super().__init__()
+        self.actor = actor
+
+    def forward(self, obs: torch.Tensor) -> torch.Tensor:
+        actions, _ = self.actor(obs)
+        return actions
+
+
 class ContinuousDeterministicPolicy(ContinuousPolicyWithExplorationNoise):
     """A policy for continuous action spaces that uses an actor which directly maps states to actions."""
 
@@ -189,6 +201,11 @@ class ContinuousDeterministicPolicy(ContinuousPolicyWithExplorationNoise):
         actions, hidden = model(batch.obs, state=state, info=batch.info)
         return cast(ActStateBatchProtocol, Batch(act=actions, state=hidden))
 
+    def create_inference_module(self) -> torch.nn.Module | None:
+        if type(self).forward is not ContinuousDeterministicPolicy.forward:
+            return None
+        return _DeterministicActorInferenceModule(self.actor)
+
 
 TActBatchProtocol = TypeVar("TActBatchProtocol", bound=ActBatchProtocol)
 
@@ -331,9 +348,9 @@ class ActorCriticOffPolicyAlgorithm(
         :param buffer: the replay buffer
         :param indices: the indices within the buffer to compute the target Q-value for
         """
-        obs_next_batch = Batch(
-            obs=buffer[indices].obs_next,
-            info=[None] * len(indices),
+        obs_next_batch = Batch.from_validated(
+            obs=buffer.get_keys(indices, ("obs_next",)).obs_next,
+            info=np.full(len(indices), None, dtype=object),
         )  # obs_next: s_{t+n}
         act_batch = self._target_q_compute_action(obs_next_batch)
         return self._target_q_compute_value(obs_next_batch, act_batch)
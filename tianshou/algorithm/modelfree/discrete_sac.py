@@ -96,6 +96,7 @@ class DiscreteSAC(ActorDualCriticsOffPolicyAlgorithm[DiscreteSACPolicy, DistBatc
         gamma: float = 0.99,
         alpha: float | Alpha = 0.2,
         n_step_return_horizon: int = 1,
+        fuse_twin_critics: bool = False,
     ) -> None:
         """
         :param policy: the policy
@@ -130,6 +131,8 @@ class DiscreteSAC(ActorDualCriticsOffPolicyAlgorithm[DiscreteSACPolicy, DistBatc
             the averaging effect). A value of 1 corresponds to standard TD learning with immediate
             bootstrapping, while very large values approach Monte Carlo-like estimation that uses
             complete episode returns.
+        :param fuse_twin_critics: whether to evaluate the two critics jointly in a single vectorized
+            call; see :class:`~tianshou.algorithm.modelfree.td3.ActorDualCriticsOffPolicyAlgorithm`.
         """
         super().__init__(
             policy=policy,
@@ -141,6 +144,7 @@ class DiscreteSAC(ActorDualCriticsOffPolicyAlgorithm[DiscreteSACPolicy, DistBatc
             tau=tau,
             gamma=gamma,
             n_step_return_horizon=n_step_return_horizon,
+            fuse_twin_critics=fuse_twin_critics,
         )
         self.alpha = Alpha.from_float_or_instance(alpha)
 
@@ -148,10 +152,7 @@ class DiscreteSAC(ActorDualCriticsOffPolicyAlgorithm[DiscreteSACPolicy, DistBatc
         self, obs_batch: Batch, act_batch: DistBatchProtocol
     ) -> torch.Tensor:
         dist = cast(Categorical, act_batch.dist)
-        target_q = dist.probs * torch.min(
-            self.critic_old(obs_batch.obs),
-            self.critic2_old(obs_batch.obs),
-        )
+        target_q = dist.probs * torch.min(*self._twin_critic_values(obs_batch.obs, lagged=True))
         return target_q.sum(dim=-1) + self.alpha.value * dist.entropy()
 
     def _update_with_batch(self, batch: RolloutBatchProtocol) -> TDiscreteSACTrainingStats:  # type: ignore
@@ -159,17 +160,29 @@ class DiscreteSAC(ActorDualCriticsOffPolicyAlgorithm[DiscreteSACPolicy, DistBatc
         target_q = batch.returns.flatten()
         act = to_torch(batch.act[:, np.newaxis], device=target_q.device, dtype=torch.long)
 
-        # critic 1
-        current_q1 = self.critic(batch.obs).gather(1, act).flatten()
-        td1 = current_q1 - target_q
-        critic1_loss = (td1.pow(2) * weight).mean()
-        self.critic_optim.step(critic1_loss)
-
-        # critic 2
-        current_q2 = self.critic2(batch.obs).gather(1, act).flatten()
-        td2 = current_q2 - target_q
-        critic2_loss = (td2.pow(2) * weight).mean()
-        self.critic2_optim.step(critic2_loss)
+        if self.fuse_twin_critics:
+            # critic 1&2
+            current_q1_all, current_q2_all = self._twin_critic_values(batch.obs)
+            td1 = current_q1_all.gather(1, act).flatten() - target_q
+            td2 = current_q2_all.gather(1, act).flatten() - target_q
+            critic1_loss = (td1.pow(2) * weight).mean()
+            critic2_loss = (td2.pow(2) * weight).mean()
+            self.Optimizer.step_jointly(
+                (self.critic_optim, self.critic2_optim),
+                critic1_loss + critic2_loss,
+            )
+        else:
+            # critic 1
+            current_q1 = self.critic(batch.obs).gather(1, act).flatten()
+            td1 = current_q1 - target_q
+            critic1_loss = (td1.pow(2) * weight).mean()
+            self.critic_optim.step(critic1_loss)
+
+            # critic 2
+            current_q2 = self.critic2(batch.obs).gather(1, act).flatten()
+            td2 = current_q2 - target_q
+            critic2_loss = (td2.pow(2) * weight).mean()
+            self.critic2_optim.step(critic2_loss)
 
         batch.weight = (td1 + td2) / 2.0  # prio-buffer
 
@@ -177,9 +190,7 @@ class DiscreteSAC(ActorDualCriticsOffPolicyAlgorithm[DiscreteSACPolicy, DistBatc
         dist = self.policy(batch).dist
         entropy = dist.entropy()
         with torch.no_grad():
-            current_q1a = self.critic(batch.obs)
-            current_q2a = self.critic2(batch.obs)
-            q = torch.min(current_q1a, current_q2a)
+            q = torch.min(*self._twin_critic_values(batch.obs))
         actor_loss = -(self.alpha.value * entropy + (dist.probs * q).sum(dim=-1)).mean()
         self.policy_optim.step(actor_loss)
 
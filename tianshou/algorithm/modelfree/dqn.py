@@ -26,9 +26,11 @@ from tianshou.data.types import (
     ModelOutputBatchProtocol,
     ObsBatchProtocol,
     RolloutBatchProtocol,
+    TObs,
 )
 from tianshou.utils.lagged_network import EvalModeModuleWrapper
 from tianshou.utils.net.common import Net
+from tianshou.utils.torch_utils import torch_device
 
 mark_used(ActBatchProtocol)
 
@@ -36,6 +38,19 @@ TModel = TypeVar("TModel", bound=torch.nn.Module | Net)
 log = logging.getLogger(__name__)
 
 
+class _QLearningInferenceModule(torch.nn.Module):
+    """Maps observations to the greedy actions of a :class:`DiscreteQLearningPolicy`."""
+
+    def __init__(self, policy: "DiscreteQLearningPolicy") -> None:
+        super().__init__()
+        self.model = policy.model
+        self.compute_q_value = policy.compute_q_value
+
+    def forward(self, obs: torch.Tensor) -> torch.Tensor:
+        action_values_BA, _ = self.model(obs)
+        return self.compute_q_value(action_values_BA, None).argmax(dim=1)
+
+
 class DiscreteQLearningPolicy(Policy, Generic[TModel]):
     def __init__(
         self,
@@ -150,6 +165,12 @@ class DiscreteQLearningPolicy(Policy, Generic[TModel]):
             logits = logits + to_torch_as(1 - mask, logits) * min_value
         return logits
 
+    def create_inference_module(self) -> torch.nn.Module | None:
+        # subclasses computing actions differently need to provide their own module
+        if type(self).forward is not DiscreteQLearningPolicy.forward:
+            return None
+        return _QLearningInferenceModule(self)
+
     def add_exploration_noise(
         self,
         act: TArrOrActBatch,
@@ -195,6 +216,7 @@ class QLearningOffPolicyAlgorithm(
         gamma: float = 0.99,
         n_step_return_horizon: int = 1,
         target_update_freq: int = 0,
+        fuse_online_forward: bool = False,
     ) -> None:
         """
         :param policy: the policy
@@ -224,6 +246,15 @@ class QLearningOffPolicyAlgorithm(
             due to rapidly changing targets.
             Typically set between 100-10000 for DQN variants, with exact values depending on environment
             complexity.
+        :param fuse_online_forward: whether to evaluate the online network on the observations of the
+            batch and on the observations the targets bootstrap from (s_{t+n}) in a single, concatenated
+            forward pass within the update step, reusing the result both for the loss and for the
+            action selection of the targets.
+            This saves one forward pass of the online network per update, which is beneficial for
+            networks with a large per-call overhead (e.g. convolutional networks on Atari).
+            Note that the action selection of the targets is then performed with the network in
+            training mode, which only makes a difference for networks with mode-dependent layers
+            (such as dropout).
         """
         super().__init__(
             policy=policy,
@@ -237,6 +268,7 @@ class QLearningOffPolicyAlgorithm(
         )
         self.n_step = n_step_return_horizon
         self.target_update_freq = target_update_freq
+        self.fuse_online_forward = fuse_online_forward
         # TODO: 1 would be a more reasonable initialization given how it is incremented
         self._iter = 0
         self.model_old: EvalModeModuleWrapper | None = (
@@ -250,9 +282,31 @@ class QLearningOffPolicyAlgorithm(
     def use_target_network(self) -> bool:
         return self.target_update_freq > 0
 
-    @abstractmethod
+    @property
+    def _uses_online_q_for_target(self) -> bool:
+        """Whether the target computation requires the online network's output for s_{t+n}."""
+        return True
+
     def _target_q(self, buffer: ReplayBuffer, indices: np.ndarray) -> torch.Tensor:
-        pass
+        obs_next_batch = Batch.from_validated(
+            obs=buffer.get_keys(indices, ("obs_next",)).obs_next,
+            info=np.full(len(indices), None, dtype=object),
+        )  # obs_next: s_{t+n}
+        result = self.policy(obs_next_batch) if self._uses_online_q_for_target else None
+        return self._compute_target_q(obs_next_batch, result)
+
+    @abstractmethod
+    def _compute_target_q(
+        self,
+        obs_next_batch: ObsBatchProtocol,
+        result: ModelOutputBatchProtocol | None,
+    ) -> torch.Tensor:
+        """Compute the target Q-values to bootstrap from.
+
+        :param obs_next_batch: the batch containing the observations s_{t+n}.
+        :param result: the online network's output for `obs_next_batch`; None if
+            `_uses_online_q_for_target` is False.
+        """
 
     def _preprocess_batch(
         self,
@@ -264,7 +318,12 @@ class QLearningOffPolicyAlgorithm(
 
         More details can be found at
         :meth:`~tianshou.policy.BasePolicy.compute_nstep_return`.
+        In the fused mode (see `fuse_online_forward`), only the parts of the return which
+        do not depend on the networks are computed here, see
+        :meth:`_compute_online_q_and_returns`.
         """
+        if self.fuse_online_forward:
+            return self._prepare_fused_nstep_return(batch, buffer, indices)
         return self.compute_nstep_return(
             batch=batch,
             buffer=buffer,
@@ -274,6 +333,97 @@ class QLearningOffPolicyAlgorithm(
             n_step=self.n_step,
         )
 
+    def _prepare_fused_nstep_return(
+        self,
+        batch: RolloutBatchProtocol,
+        buffer: ReplayBuffer,
+        indices: np.ndarray,
+    ) -> BatchWithReturnsProtocol:
+        """Prepare the n-step return for its completion within the update step.
+
+        The return is linear in the bootstrapped target Q-value, i.e.
+        `returns = nstep_rew + nstep_discount * target_q(s_{t+n})`. Computing the n-step
+        return for the target values 0 and 1 yields the two coefficients, which are
+        stored in the batch together with the observations s_{t+n}.
+        """
+
+        def unit_target_q_fn(buffer: ReplayBuffer, indices: np.ndarray) -> torch.Tensor:
+            batch.obs_nstep = buffer.get_keys(indices, ("obs_next",)).obs_next
+            unit_target_q = torch.tensor([0.0, 1.0], device=torch_device(self.policy))
+            return unit_target_q.repeat(len(indices), 1)
+
+        batch = self.compute_nstep_return(
+            batch=batch,
+            buffer=buffer,
+            indices=indices,
+            target_q_fn=unit_target_q_fn,
+            gamma=self.gamma,
+            n_step=self.n_step,
+        )
+        returns = batch.pop("returns")
+        batch.nstep_rew = returns[:, 0]
+        batch.nstep_discount = returns[:, 1] - returns[:, 0]
+        return batch
+
+    def _fused_online_forward(
+        self,
+        batch: RolloutBatchProtocol,
+        obs_next: TObs,
+    ) -> tuple[ModelOutputBatchProtocol, ModelOutputBatchProtocol]:
+        """Evaluate the online network on `batch.obs` and `obs_next` in a single forward pass.
+
+        :return: the online network's outputs for `batch.obs` and for `obs_next`.
+        """
+        batch_size = len(batch)
+        obs = Batch.cat(
+            [Batch.from_validated(obs=batch.obs), Batch.from_validated(obs=obs_next)]
+        ).obs
+        result = self.policy(
+            cast(
+                ObsBatchProtocol,
+                Batch.from_validated(obs=obs, info=np.full(len(obs), None, dtype=object)),
+            ),
+        )
+        return (
+            cast(ModelOutputBatchProtocol, result[:batch_size]),
+            cast(ModelOutputBatchProtocol, result[batch_size:]),
+        )
+
+    def _compute_online_q_and_returns(
+        self,
+        batch: RolloutBatchProtocol,
+    ) -> ModelOutputBatchProtocol:
+        """Evaluate the online network and complete the n-step return in the fused mode.
+
+        The online network is evaluated on the observations s_t and s_{t+n} in a single
+        forward pass (if the targets require the online network's output for s_{t+n}),
+        and the output for s_{t+n} is used to compute the targets and thus `batch.returns`.
+
+        Must be called before the lagged network is updated, such that the targets are
+        computed with the same networks as in the non-fused mode.
+
+        :return: the online network's output for `batch.obs`.
+        """
+        obs_next_batch = cast(
+            ObsBatchProtocol,
+            Batch.from_validated(
+                obs=batch.pop("obs_nstep"),
+                info=np.full(len(batch), None, dtype=object),
+            ),
+        )
+        next_result: ModelOutputBatchProtocol | None = None
+        if self._uses_online_q_for_target:
+            result, next_result = self._fused_online_forward(batch, obs_next_batch.obs)
+        else:
+            result = self.policy(batch)
+        with torch.no_grad():
+            target_q = self._compute_target_q(obs_next_batch, next_result)
+        target_q = target_q.reshape(len(batch), -1)
+        nstep_rew = to_torch_as(batch.pop("nstep_rew"), target_q).reshape(-1, 1)
+        nstep_discount = to_torch_as(batch.pop("nstep_discount"), target_q).reshape(-1, 1)
+        batch.returns = nstep_rew + nstep_discount * target_q
+        return result
+
     def _periodically_update_lagged_network_weights(self) -> None:
         """
         Periodically updates the parameters of the lagged target network (if any), i.e.
@@ -307,6 +457,7 @@ class DQN(
         target_update_freq: int = 0,
         is_double: bool = True,
         huber_loss_delta: float | None = None,
+        fuse_online_forward: bool = False,
     ) -> None:
         """
         :param policy: the policy
@@ -351,6 +502,8 @@ class DQN(
             Unlike the MSE loss where the gradients grow linearly with the error magnitude, the Huber
             loss causes the gradients to plateau at a constant value for large errors, providing more stable training.
             NOTE: The magnitude of delta should depend on the scale of the returns obtained in the environment.
+        :param fuse_online_forward: whether to fuse the forward passes of the online network in the
+            update; see :class:`QLearningOffPolicyAlgorithm`.
         """
         super().__init__(
             policy=policy,
@@ -358,22 +511,28 @@ class DQN(
             gamma=gamma,
             n_step_return_horizon=n_step_return_horizon,
             target_update_freq=target_update_freq,
+            fuse_online_forward=fuse_online_forward,
         )
         self.is_double = is_double
         self.huber_loss_delta = huber_loss_delta
 
-    def _target_q(self, buffer: ReplayBuffer, indices: np.ndarray) -> torch.Tensor:
-        obs_next_batch = Batch(
-            obs=buffer[indices].obs_next,
-            info=[None] * len(indices),
-        )  # obs_next: s_{t+n}
-        result = self.policy(obs_next_batch)
+    @property
+    def _uses_online_q_for_target(self) -> bool:
+        return self.is_double or not self.use_target_network
+
+    def _compute_target_q(
+        self,
+        obs_next_batch: ObsBatchProtocol,
+        result: ModelOutputBatchProtocol | None,
+    ) -> torch.Tensor:
         if self.use_target_network:
             # target_Q = Q_old(s_, argmax(Q_new(s_, *)))
             target_q = self.policy(obs_next_batch, model=self.model_old).logits
         else:
+            assert result is not None
             target_q = result.logits
         if self.is_double:
+            assert result is not None
             return target_q[np.arange(len(result.act)), result.act]
         # Nature DQN, over estimate
         return target_q.max(dim=1)[0]
@@ -382,9 +541,13 @@ class DQN(
         self,
         batch: RolloutBatchProtocol,
     ) -> SimpleLossTrainingStats:
-        self._periodically_update_lagged_network_weights()
+        if self.fuse_online_forward:
+            q = self._compute_online_q_and_returns(batch).logits
+            self._periodically_update_lagged_network_weights()
+        else:
+            self._periodically_update_lagged_network_weights()
+            q = self.policy(batch).logits
         weight = batch.pop("weight", 1.0)
-        q = self.policy(batch).logits
         q = q[np.arange(len(q)), batch.act]
         returns = to_torch_as(batch.returns.flatten(), q)
         td_error = returns - q
@@ -12,8 +12,13 @@ from tianshou.algorithm.modelfree.dqn import DiscreteQLearningPolicy
 from tianshou.algorithm.modelfree.qrdqn import QRDQNPolicy
 from tianshou.algorithm.modelfree.reinforce import SimpleLossTrainingStats
 from tianshou.algorithm.optim import OptimizerFactory
-from tianshou.data import Batch, ReplayBuffer, to_numpy
-from tianshou.data.types import FQFBatchProtocol, ObsBatchProtocol, RolloutBatchProtocol
+from tianshou.data import Batch, to_numpy
+from tianshou.data.types import (
+    FQFBatchProtocol,
+    ModelOutputBatchProtocol,
+    ObsBatchProtocol,
+    RolloutBatchProtocol,
+)
 from tianshou.utils.net.discrete import FractionProposalNetwork, FullQuantileFunction
 
 
@@ -120,6 +125,7 @@ class FQF(QRDQN[FQFPolicy]):
         ent_coef: float = 0.0,
         n_step_return_horizon: int = 1,
         target_update_freq: int = 0,
+        fuse_online_forward: bool = False,
     ) -> None:
         """
         :param policy: the policy
@@ -157,6 +163,8 @@ class FQF(QRDQN[FQFPolicy]):
             due to rapidly changing targets.
             Typically set between 100-10000 for DQN variants, with exact values depending on environment
             complexity.
+        :param fuse_online_forward: whether to fuse the forward passes of the online network in the
+            update; see :class:`~tianshou.algorithm.modelfree.dqn.QLearningOffPolicyAlgorithm`.
         """
         super().__init__(
             policy=policy,
@@ -165,6 +173,7 @@ class FQF(QRDQN[FQFPolicy]):
             num_quantiles=num_fractions,
             n_step_return_horizon=n_step_return_horizon,
             target_update_freq=target_update_freq,
+            fuse_online_forward=fuse_online_forward,
         )
         self.ent_coef = ent_coef
         self.fraction_optim = self._create_optimizer(self.policy.fraction_model, fraction_optim)
@@ -175,30 +184,34 @@ class FQF(QRDQN[FQFPolicy]):
         # to use a separate optimizer for the fraction model
         return self._create_optimizer(self.policy.model, optim)
 
-    def _target_q(self, buffer: ReplayBuffer, indices: np.ndarray) -> torch.Tensor:
-        obs_next_batch = Batch(
-            obs=buffer[indices].obs_next,
-            info=[None] * len(indices),
-        )  # obs_next: s_{t+n}
+    def _compute_target_q(
+        self,
+        obs_next_batch: ObsBatchProtocol,
+        result: ModelOutputBatchProtocol | None,
+    ) -> torch.Tensor:
+        assert result is not None
+        act = result.act
         if self.use_target_network:
-            result = self.policy(obs_next_batch)
-            act, fractions = result.act, result.fractions
             next_dist = self.policy(
-                obs_next_batch, model=self.model_old, fractions=fractions
+                obs_next_batch,
+                model=self.model_old,
+                fractions=cast(FQFBatchProtocol, result).fractions,
             ).logits
         else:
-            next_batch = self.policy(obs_next_batch)
-            act = next_batch.act
-            next_dist = next_batch.logits
+            next_dist = result.logits
         return next_dist[np.arange(len(act)), act, :]
 
     def _update_with_batch(
         self,
         batch: RolloutBatchProtocol,
     ) -> FQFTrainingStats:
-        self._periodically_update_lagged_network_weights()
+        if not self.fuse_online_forward:
+            self._periodically_update_lagged_network_weights()
+            out = self.policy(batch)
+        else:
+            out = self._compute_online_q_and_returns(batch)
+            self._periodically_update_lagged_network_weights()
         weight = batch.pop("weight", 1.0)
-        out = self.policy(batch)
         curr_dist_orig = out.logits
         taus, tau_hats = out.fractions.taus, out.fractions.tau_hats
         act = batch.act
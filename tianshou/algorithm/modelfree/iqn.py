@@ -112,6 +112,7 @@ class IQN(QRDQN[IQNPolicy]):
         num_quantiles: int = 200,
         n_step_return_horizon: int = 1,
         target_update_freq: int = 0,
+        fuse_online_forward: bool = False,
     ) -> None:
         """
         :param policy: the policy
@@ -143,6 +144,8 @@ class IQN(QRDQN[IQNPolicy]):
             due to rapidly changing targets.
             Typically set between 100-10000 for DQN variants, with exact values depending on environment
             complexity.
+        :param fuse_online_forward: whether to fuse the forward passes of the online network in the
+            update; see :class:`~tianshou.algorithm.modelfree.dqn.QLearningOffPolicyAlgorithm`.
         """
         super().__init__(
             policy=policy,
@@ -151,15 +154,20 @@ class IQN(QRDQN[IQNPolicy]):
             num_quantiles=num_quantiles,
             n_step_return_horizon=n_step_return_horizon,
             target_update_freq=target_update_freq,
+            fuse_online_forward=fuse_online_forward,
         )
 
     def _update_with_batch(
         self,
         batch: RolloutBatchProtocol,
     ) -> SimpleLossTrainingStats:
-        self._periodically_update_lagged_network_weights()
+        if self.fuse_online_forward:
+            action_batch = self._compute_online_q_and_returns(batch)
+            self._periodically_update_lagged_network_weights()
+        else:
+            self._periodically_update_lagged_network_weights()
+            action_batch = self.policy(batch)
         weight = batch.pop("weight", 1.0)
-        action_batch = self.policy(batch)
         curr_dist, taus = action_batch.logits, action_batch.taus
         act = batch.act
         curr_dist = curr_dist[np.arange(len(act)), act, :].unsqueeze(2)
@@ -1,3 +1,4 @@
+from collections.abc import Sequence
 from dataclasses import dataclass
 from typing import Any
 
@@ -11,7 +12,7 @@ from tianshou.algorithm.algorithm_base import TrainingStats
 from tianshou.algorithm.modelfree.a2c import ActorCriticOnPolicyAlgorithm
 from tianshou.algorithm.modelfree.reinforce import ProbabilisticActorPolicy
 from tianshou.algorithm.optim import OptimizerFactory
-from tianshou.data import ReplayBuffer, SequenceSummaryStats, to_torch_as
+from tianshou.data import Batch, ReplayBuffer, SequenceSummaryStats, to_torch_as
 from tianshou.data.types import BatchWithAdvantagesProtocol, RolloutBatchProtocol
 from tianshou.utils.net.continuous import ContinuousCritic
 from tianshou.utils.net.discrete import DiscreteCritic
@@ -119,6 +120,10 @@ class NPG(ActorCriticOnPolicyAlgorithm):
         self.trust_region_size = trust_region_size
         # adjusts Hessian-vector product calculation for numerical stability
         self._damping = 0.1
+        self._actor_flat_params: torch.Tensor | None = None
+        """single contiguous buffer holding the actor's parameters (see `_get_actor_flat_params`)"""
+        self._flat_grad_buffer: torch.Tensor | None = None
+        """preallocated buffer for (detached) flat gradients of the actor's parameters"""
 
     def _preprocess_batch(
         self,
@@ -130,7 +135,9 @@ class NPG(ActorCriticOnPolicyAlgorithm):
         batch.act = to_torch_as(batch.act, batch.v_s)
         old_log_prob = []
         with torch.no_grad():
-            for minibatch in batch.split(self.max_batchsize, shuffle=False, merge_last=True):
+            for minibatch in batch.split(
+                self.max_batchsize, shuffle=False, merge_last=True, contiguous=True
+            ):
                 old_log_prob.append(self.policy(minibatch).dist.log_prob(minibatch.act))
         batch.logp_old = torch.cat(old_log_prob, dim=0)
         if self.advantage_normalization:
@@ -145,8 +152,12 @@ class NPG(ActorCriticOnPolicyAlgorithm):
     ) -> NPGTrainingStats:
         actor_losses, vf_losses, kls = [], [], []
         split_batch_size = batch_size or -1
+        # the batch is permuted into the same contiguous storage in each epoch
+        permuted_batch = Batch()
         for _ in range(repeat):
-            for minibatch in batch.split(split_batch_size, merge_last=True):
+            for minibatch in batch.split(
+                split_batch_size, merge_last=True, contiguous=True, out=permuted_batch
+            ):
                 # optimize actor
                 # direction: calculate villia gradient
                 dist = self.policy(minibatch).dist
@@ -168,11 +179,8 @@ class NPG(ActorCriticOnPolicyAlgorithm):
 
                 # step
                 with torch.no_grad():
-                    flat_params = torch.cat(
-                        [param.data.view(-1) for param in self.policy.actor.parameters()],
-                    )
-                    new_flat_params = flat_params + self.trust_region_size * search_direction
-                    self._set_from_flat_params(self.policy.actor, new_flat_params)
+                    flat_params = self._get_actor_flat_params()
+                    flat_params.add_(search_direction, alpha=self.trust_region_size)
                     new_dist = self.policy(minibatch).dist
                     kl = kl_divergence(old_dist, new_dist).mean()
 
@@ -193,11 +201,17 @@ class NPG(ActorCriticOnPolicyAlgorithm):
         )
 
     def _MVP(self, v: torch.Tensor, flat_kl_grad: torch.Tensor) -> torch.Tensor:
-        """Matrix vector product."""
+        """Matrix vector product.
+
+        The (first order) gradient of the KL divergence, `flat_kl_grad`, must have been computed with
+        `create_graph=True`; its graph is retained, such that it can be reused for subsequent products.
+        Note that the returned tensor is a preallocated buffer, which is overwritten by the next call.
+        """
         # caculate second order gradient of kl with respect to theta
         kl_v = (flat_kl_grad * v).sum()
-        flat_kl_grad_grad = self._get_flat_grad(kl_v, self.policy.actor, retain_graph=True).detach()
-        return flat_kl_grad_grad + v * self._damping
+        grads = torch.autograd.grad(kl_v, list(self.policy.actor.parameters()), retain_graph=True)
+        flat_kl_grad_grad = self._cat_to_flat_grad_buffer(grads)
+        return flat_kl_grad_grad.add_(v, alpha=self._damping)
 
     def _conjugate_gradients(
         self,
@@ -206,7 +220,22 @@ class NPG(ActorCriticOnPolicyAlgorithm):
         nsteps: int = 10,
         residual_tol: float = 1e-10,
     ) -> torch.Tensor:
+        return self._conjugate_gradients_with_mvp(minibatch, flat_kl_grad, nsteps, residual_tol)[0]
+
+    def _conjugate_gradients_with_mvp(
+        self,
+        minibatch: torch.Tensor,
+        flat_kl_grad: torch.Tensor,
+        nsteps: int = 10,
+        residual_tol: float = 1e-10,
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """Solves Hx = g via conjugate gradients.
+
+        :return: a tuple (x, Hx), where the matrix vector product Hx is accumulated from the products
+            computed during the iterations (and therefore requires no additional Hessian-vector product)
+        """
         x = torch.zeros_like(minibatch)
+        Hx = torch.zeros_like(minibatch)
         r, p = minibatch.clone(), minibatch.clone()
         # Note: should be 'r, p = minibatch - MVP(x)', but for x=0, MVP(x)=0.
         # Change if doing warm start.
@@ -215,22 +244,66 @@ class NPG(ActorCriticOnPolicyAlgorithm):
             z = self._MVP(p, flat_kl_grad)
             alpha = rdotr / p.dot(z)
             x += alpha * p
+            Hx += alpha * z
             r -= alpha * z
             new_rdotr = r.dot(r)
             if new_rdotr < residual_tol:
                 break
             p = r + new_rdotr / rdotr * p
             rdotr = new_rdotr
-        return x
+        return x, Hx
 
     def _get_flat_grad(self, y: torch.Tensor, model: nn.Module, **kwargs: Any) -> torch.Tensor:
         grads = torch.autograd.grad(y, model.parameters(), **kwargs)  # type: ignore
         return torch.cat([grad.reshape(-1) for grad in grads])
 
-    def _set_from_flat_params(self, model: nn.Module, flat_params: torch.Tensor) -> nn.Module:
-        prev_ind = 0
-        for param in model.parameters():
-            flat_size = int(np.prod(list(param.size())))
-            param.data.copy_(flat_params[prev_ind : prev_ind + flat_size].view(param.size()))
-            prev_ind += flat_size
-        return model
+    def _cat_to_flat_grad_buffer(self, grads: Sequence[torch.Tensor]) -> torch.Tensor:
+        """Concatenates the given (actor parameter) gradients into the preallocated flat gradient buffer."""
+        num_elements = sum(grad.numel() for grad in grads)
+        buffer = self._flat_grad_buffer
+        if (
+            buffer is None
+            or buffer.numel() != num_elements
+            or buffer.device != grads[0].device
+            or buffer.dtype != grads[0].dtype
+        ):
+            buffer = torch.empty(num_elements, device=grads[0].device, dtype=grads[0].dtype)
+            self._flat_grad_buffer = buffer
+        return torch.cat([grad.detach().reshape(-1) for grad in grads], out=buffer)
+
+    def _get_actor_flat_params(self) -> torch.Tensor:
+        """Returns a flat (1D) view of all of the actor's parameters.
+
+        The parameters are stored in a single contiguous buffer, such that reading or updating all
+        parameters at once requires no per-parameter copies.
+        Upon first use (and whenever the parameters were re-allocated in the meantime, e.g. because the
+        actor was moved to another device), the parameters are moved into such a buffer.
+        """
+        params = list(self.policy.actor.parameters())
+        flat_params = self._actor_flat_params
+        if flat_params is None or not self._is_flat_view(flat_params, params):
+            if len({param.dtype for param in params}) > 1:
+                raise ValueError("The actor's parameters must all have the same dtype.")
+            with torch.no_grad():
+                flat_params = torch.cat([param.reshape(-1) for param in params])
+                offset = 0
+                for param in params:
+                    param.data = flat_params[offset : offset + param.numel()].view_as(param)
+                    offset += param.numel()
+            self._actor_flat_params = flat_params
+        return flat_params
+
+    @staticmethod
+    def _is_flat_view(flat_params: torch.Tensor, params: Sequence[torch.Tensor]) -> bool:
+        """:return: whether the given parameters are consecutive views on the given flat buffer"""
+        offset = 0
+        for param in params:
+            if (
+                param.dtype != flat_params.dtype
+                or param.device != flat_params.device
+                or not param.is_contiguous()
+                or param.data_ptr() != flat_params.data_ptr() + offset * flat_params.element_size()
+            ):
+                return False
+            offset += param.numel()
+        return offset == flat_params.numel()
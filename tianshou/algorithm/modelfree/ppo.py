@@ -7,7 +7,7 @@ from tianshou.algorithm import A2C
 from tianshou.algorithm.modelfree.a2c import A2CTrainingStats
 from tianshou.algorithm.modelfree.reinforce import ProbabilisticActorPolicy
 from tianshou.algorithm.optim import OptimizerFactory
-from tianshou.data import ReplayBuffer, SequenceSummaryStats, to_torch_as
+from tianshou.data import Batch, ReplayBuffer, SequenceSummaryStats, to_torch_as
 from tianshou.data.types import LogpOldProtocol, RolloutBatchProtocol
 from tianshou.utils.net.continuous import ContinuousCritic
 from tianshou.utils.net.discrete import DiscreteCritic
@@ -152,13 +152,8 @@ class PPO(A2C):
         if self.recompute_adv:
             # buffer input `buffer` and `indices` to be used in `_update_with_batch()`.
             self._buffer, self._indices = buffer, indices
-        batch = self._add_returns_and_advantages(batch, buffer, indices)
+        batch = self._add_returns_and_advantages(batch, buffer, indices, add_log_probs=True)
         batch.act = to_torch_as(batch.act, batch.v_s)
-        logp_old = []
-        with torch.no_grad():
-            for minibatch in batch.split(self.max_batchsize, shuffle=False, merge_last=True):
-                logp_old.append(self.policy(minibatch).dist.log_prob(minibatch.act))
-            batch.logp_old = torch.cat(logp_old, dim=0).flatten()
         return cast(LogpOldProtocol, batch)
 
     def _update_with_batch(  # type: ignore[override]
@@ -170,21 +165,26 @@ class PPO(A2C):
         losses, clip_losses, vf_losses, ent_losses = [], [], [], []
         gradient_steps = 0
         split_batch_size = batch_size or -1
+        # the batch is permuted into the same contiguous storage in each epoch
+        permuted_batch = Batch()
         for step in range(repeat):
             if self.recompute_adv and step > 0:
                 batch = cast(
                     LogpOldProtocol,
                     self._add_returns_and_advantages(batch, self._buffer, self._indices),
                 )
-            for minibatch in batch.split(split_batch_size, merge_last=True):
+            for minibatch in batch.split(
+                split_batch_size, merge_last=True, contiguous=True, out=permuted_batch
+            ):
                 gradient_steps += 1
+                dist, value = self._evaluate_actor_critic(minibatch)
                 # calculate loss for actor
                 advantages = minibatch.adv
-                dist = self.policy(minibatch).dist
                 if self.advantage_normalization:
                     mean, std = advantages.mean(), advantages.std()
                     advantages = (advantages - mean) / (std + self._eps)  # per-batch norm
-                ratios = (dist.log_prob(minibatch.act) - minibatch.logp_old).exp().float()
+                log_prob = dist.log_prob(to_torch_as(minibatch.act, value))
+                ratios = (log_prob - minibatch.logp_old).exp().float()
                 ratios = ratios.reshape(ratios.size(0), -1).transpose(0, 1)
                 surr1 = ratios * advantages
                 surr2 = ratios.clamp(1.0 - self.eps_clip, 1.0 + self.eps_clip) * advantages
@@ -195,7 +195,6 @@ class PPO(A2C):
                 else:
                     clip_loss = -torch.min(surr1, surr2).mean()
                 # calculate loss for critic
-                value = self.critic(minibatch.obs).flatten()
                 if self.value_clip:
                     v_clip = minibatch.v_s + (value - minibatch.v_s).clamp(
                         -self.eps_clip,
@@ -11,8 +11,11 @@ from tianshou.algorithm.modelfree.dqn import (
 )
 from tianshou.algorithm.modelfree.reinforce import SimpleLossTrainingStats
 from tianshou.algorithm.optim import OptimizerFactory
-from tianshou.data import Batch, ReplayBuffer
-from tianshou.data.types import RolloutBatchProtocol
+from tianshou.data.types import (
+    ModelOutputBatchProtocol,
+    ObsBatchProtocol,
+    RolloutBatchProtocol,
+)
 
 
 class QRDQNPolicy(DiscreteQLearningPolicy):
@@ -38,6 +41,7 @@ class QRDQN(
         num_quantiles: int = 200,
         n_step_return_horizon: int = 1,
         target_update_freq: int = 0,
+        fuse_online_forward: bool = False,
     ) -> None:
         """
         :param policy: the policy
@@ -74,6 +78,8 @@ class QRDQN(
             due to rapidly changing targets.
             Typically set between 100-10000 for DQN variants, with exact values depending on environment
             complexity.
+        :param fuse_online_forward: whether to fuse the forward passes of the online network in the
+            update; see :class:`~tianshou.algorithm.modelfree.dqn.QLearningOffPolicyAlgorithm`.
         """
         assert num_quantiles > 1, f"num_quantiles should be greater than 1 but got: {num_quantiles}"
         super().__init__(
@@ -82,6 +88,7 @@ class QRDQN(
             gamma=gamma,
             n_step_return_horizon=n_step_return_horizon,
             target_update_freq=target_update_freq,
+            fuse_online_forward=fuse_online_forward,
         )
         self.num_quantiles = num_quantiles
         tau = torch.linspace(0, 1, self.num_quantiles + 1)
@@ -91,27 +98,30 @@ class QRDQN(
         )
         warnings.filterwarnings("ignore", message="Using a target size")
 
-    def _target_q(self, buffer: ReplayBuffer, indices: np.ndarray) -> torch.Tensor:
-        obs_next_batch = Batch(
-            obs=buffer[indices].obs_next,
-            info=[None] * len(indices),
-        )  # obs_next: s_{t+n}
+    def _compute_target_q(
+        self,
+        obs_next_batch: ObsBatchProtocol,
+        result: ModelOutputBatchProtocol | None,
+    ) -> torch.Tensor:
+        assert result is not None
+        act = result.act
         if self.use_target_network:
-            act = self.policy(obs_next_batch).act
             next_dist = self.policy(obs_next_batch, model=self.model_old).logits
         else:
-            next_batch = self.policy(obs_next_batch)
-            act = next_batch.act
-            next_dist = next_batch.logits
+            next_dist = result.logits
         return next_dist[np.arange(len(act)), act, :]
 
     def _update_with_batch(
         self,
         batch: RolloutBatchProtocol,
     ) -> SimpleLossTrainingStats:
-        self._periodically_update_lagged_network_weights()
+        if self.fuse_online_forward:
+            curr_dist = self._compute_online_q_and_returns(batch).logits
+            self._periodically_update_lagged_network_weights()
+        else:
+            self._periodically_update_lagged_network_weights()
+            curr_dist = self.policy(batch).logits
         weight = batch.pop("weight", 1.0)
-        curr_dist = self.policy(batch).logits
         act = batch.act
         curr_dist = curr_dist[np.arange(len(act)), act, :].unsqueeze(2)
         target_dist = batch.returns.unsqueeze(1)
@@ -26,6 +26,7 @@ class RainbowDQN(C51):
         gamma: float = 0.99,
         n_step_return_horizon: int = 1,
         target_update_freq: int = 0,
+        fuse_online_forward: bool = False,
     ) -> None:
         """
         :param policy: a policy following the rules (s -> action_values_BA)
@@ -55,6 +56,8 @@ class RainbowDQN(C51):
             due to rapidly changing targets.
             Typically set between 100-10000 for DQN variants, with exact values depending on environment
             complexity.
+        :param fuse_online_forward: whether to fuse the forward passes of the online network in the
+            update; see :class:`~tianshou.algorithm.modelfree.dqn.QLearningOffPolicyAlgorithm`.
         """
         super().__init__(
             policy=policy,
@@ -62,6 +65,7 @@ class RainbowDQN(C51):
             gamma=gamma,
             n_step_return_horizon=n_step_return_horizon,
             target_update_freq=target_update_freq,
+            fuse_online_forward=fuse_online_forward,
         )
 
         self.model_old: nn.Module | None  # type: ignore[assignment]
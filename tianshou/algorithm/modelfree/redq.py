@@ -11,7 +11,7 @@ from tianshou.algorithm.modelfree.ddpg import (
     ContinuousPolicyWithExplorationNoise,
     DDPGTrainingStats,
 )
-from tianshou.algorithm.modelfree.sac import Alpha
+from tianshou.algorithm.modelfree.sac import Alpha, SquashedGaussianActorInferenceModule
 from tianshou.algorithm.optim import OptimizerFactory
 from tianshou.data import Batch
 from tianshou.data.types import (
@@ -130,6 +130,14 @@ class REDQPolicy(ContinuousPolicyWithExplorationNoise):
         )
         return cast(DistLogProbBatchProtocol, result)
 
+    def create_inference_module(self) -> torch.nn.Module | None:
+        if type(self).forward is not REDQPolicy.forward:
+            return None
+        return SquashedGaussianActorInferenceModule(
+            self.actor,
+            deterministic=self.deterministic_eval and not self.is_within_training_step,
+        )
+
 
 class REDQ(ActorCriticOffPolicyAlgorithm[REDQPolicy, DistLogProbBatchProtocol]):
     """Implementation of REDQ. arXiv:2101.05982."""
@@ -287,7 +287,7 @@ class DiscountedReturnComputation:
         :param batch: a data batch which contains several episodes of data in
             sequential order. Mind that the end of each finished episode of batch
             should be marked by done flag, unfinished (or collecting) episodes will be
-            recognized by buffer.unfinished_index().
+            recognized by buffer.unfinished_mask().
         :param buffer: the corresponding replay buffer.
         :param indices: tell batch's location in buffer, batch is equal
             to buffer[indices].
@@ -368,8 +368,12 @@ class Reinforce(OnPolicyAlgorithm[ProbabilisticActorPolicy]):
     ) -> LossSequenceTrainingStats:
         losses = []
         split_batch_size = batch_size or -1
+        # the batch is permuted into the same contiguous storage in each epoch
+        permuted_batch = Batch()
         for _ in range(repeat):
-            for minibatch in batch.split(split_batch_size, merge_last=True):
+            for minibatch in batch.split(
+                split_batch_size, merge_last=True, contiguous=True, out=permuted_batch
+            ):
                 result = self.policy(minibatch)
                 dist = result.dist
                 act = to_torch_as(minibatch.act, result.act)
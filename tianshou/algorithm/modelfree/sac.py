@@ -39,6 +39,25 @@ def correct_log_prob_gaussian_tanh(
     return log_prob - log_prob_correction
 
 
+class SquashedGaussianActorInferenceModule(torch.nn.Module):
+    """Maps observations to the tanh-squashed actions of a Gaussian actor, which are either
+    sampled or, if `deterministic` is True, given by the mode of the distribution.
+    """
+
+    def __init__(self, actor: torch.nn.Module, deterministic: bool) -> None:
+        super().__init__()
+        self.actor = actor
+        self.deterministic = deterministic
+
+    def forward(self, obs: torch.Tensor) -> torch.Tensor:
+        (loc_B, scale_B), _ = self.actor(obs)
+        if self.deterministic:
+            act_B = loc_B
+        else:
+            act_B = loc_B + scale_B * torch.randn_like(loc_B)
+        return torch.tanh(act_B)
+
+
 @dataclass(kw_only=True)
 class SACTrainingStats(TrainingStats):
     actor_loss: float
@@ -130,6 +149,14 @@ class SACPolicy(ContinuousPolicyWithExplorationNoise):
         )
         return cast(DistLogProbBatchProtocol, result)
 
+    def create_inference_module(self) -> torch.nn.Module | None:
+        if type(self).forward is not SACPolicy.forward:
+            return None
+        return SquashedGaussianActorInferenceModule(
+            self.actor,
+            deterministic=self.deterministic_eval and not self.is_within_training_step,
+        )
+
 
 class Alpha(ABC):
     """Defines the interface for the entropy regularization coefficient alpha."""
@@ -229,6 +256,7 @@ class SAC(
         alpha: float | Alpha = 0.2,
         n_step_return_horizon: int = 1,
         deterministic_eval: bool = True,
+        fuse_twin_critics: bool = False,
     ) -> None:
         """
         :param policy: the policy
@@ -272,6 +300,8 @@ class SAC(
             the averaging effect). A value of 1 corresponds to standard TD learning with immediate
             bootstrapping, while very large values approach Monte Carlo-like estimation that uses
             complete episode returns.
+        :param fuse_twin_critics: whether to evaluate the two critics jointly in a single vectorized
+            call; see :class:`~tianshou.algorithm.modelfree.td3.ActorDualCriticsOffPolicyAlgorithm`.
         """
         super().__init__(
             policy=policy,
@@ -283,6 +313,7 @@ class SAC(
             tau=tau,
             gamma=gamma,
             n_step_return_horizon=n_step_return_horizon,
+            fuse_twin_critics=fuse_twin_critics,
         )
         self.deterministic_eval = deterministic_eval
         self.alpha = Alpha.from_float_or_instance(alpha)
@@ -303,21 +334,16 @@ class SAC(
 
     def _update_with_batch(self, batch: RolloutBatchProtocol) -> TSACTrainingStats:  # type: ignore
         # critic 1&2
-        td1, critic1_loss = self._minimize_critic_squared_loss(
-            batch, self.critic, self.critic_optim
-        )
-        td2, critic2_loss = self._minimize_critic_squared_loss(
-            batch, self.critic2, self.critic2_optim
-        )
+        td1, td2, critic1_loss, critic2_loss = self._minimize_twin_critics_squared_loss(batch)
         batch.weight = (td1 + td2) / 2.0  # prio-buffer
 
         # actor
         obs_result = self.policy(batch)
         act = obs_result.act
-        current_q1a = self.critic(batch.obs, act).flatten()
-        current_q2a = self.critic2(batch.obs, act).flatten()
+        current_q1a, current_q2a = self._twin_critic_values(batch.obs, act)
         actor_loss = (
-            self.alpha.value * obs_result.log_prob.flatten() - torch.min(current_q1a, current_q2a)
+            self.alpha.value * obs_result.log_prob.flatten()
+            - torch.min(current_q1a.flatten(), current_q2a.flatten())
         ).mean()
         self.policy_optim.step(actor_loss)
 
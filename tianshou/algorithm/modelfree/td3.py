@@ -20,6 +20,7 @@ from tianshou.data.types import (
     ActStateBatchProtocol,
     RolloutBatchProtocol,
 )
+from tianshou.utils.net.common import is_stackable, stacked_forward
 
 
 @dataclass(kw_only=True)
@@ -49,6 +50,7 @@ class ActorDualCriticsOffPolicyAlgorithm(
         tau: float = 0.005,
         gamma: float = 0.99,
         n_step_return_horizon: int = 1,
+        fuse_twin_critics: bool = False,
     ) -> None:
         """
         :param policy: the policy
@@ -77,6 +79,16 @@ class ActorDualCriticsOffPolicyAlgorithm(
             potentially improving performance in tasks where delayed rewards are important but
             increasing training variance by incorporating more environmental stochasticity.
             Typically set between 0.9 and 0.99 for most reinforcement learning tasks
+        :param fuse_twin_critics: whether to evaluate the two critics (and the two lagged critics)
+            jointly in a single vectorized call (via :func:`~tianshou.utils.net.common.stacked_forward`)
+            wherever they are applied to the same inputs, updating both critics based on a single
+            backward pass.
+            This halves the number of critic calls per update, which reduces the per-update overhead
+            for small networks and on GPUs (where kernel launches dominate); for large networks on CPUs,
+            the separate evaluation can be faster.
+            The results are equivalent to the separate evaluation.
+            Requires the critics to be structurally identical (e.g. `critic2` being None) and
+            compatible with `torch.vmap` (e.g. not using batch normalization or recurrent layers).
         """
         super().__init__(
             policy=policy,
@@ -90,16 +102,65 @@ class ActorDualCriticsOffPolicyAlgorithm(
         self.critic2 = critic2 or deepcopy(critic)
         self.critic2_old = self._add_lagged_network(self.critic2)
         self.critic2_optim = self._create_optimizer(self.critic2, critic2_optim or critic_optim)
+        if fuse_twin_critics and not is_stackable([self.critic, self.critic2]):
+            raise ValueError(
+                "fuse_twin_critics requires structurally identical critics without buffers",
+            )
+        self.fuse_twin_critics = fuse_twin_critics
+
+    def _twin_critic_values(
+        self,
+        *args: Any,
+        lagged: bool = False,
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """Applies the two critics (or the two lagged critics) to the same inputs.
+
+        :param args: the arguments to pass to the critics, e.g. observations and actions
+        :param lagged: whether to apply the lagged critics instead of the current ones
+        :return: the pair of outputs of the first and the second critic
+        """
+        critics = (self.critic_old, self.critic2_old) if lagged else (self.critic, self.critic2)
+        if self.fuse_twin_critics:
+            values = stacked_forward(critics, *args)
+            return values[0], values[1]
+        return critics[0](*args), critics[1](*args)
+
+    def _minimize_twin_critics_squared_loss(
+        self,
+        batch: RolloutBatchProtocol,
+    ) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+        """Takes optimizer steps to minimize the squared losses of both critics given a batch of data.
+
+        :param batch: the batch containing the observations, actions, returns, and (optionally) weights.
+        :return: a tuple (`td1`, `td2`, `loss1`, `loss2`) containing the tensors of errors (current - target)
+            and the MSE losses of the two critics.
+        """
+        if not self.fuse_twin_critics:
+            td1, critic1_loss = self._minimize_critic_squared_loss(
+                batch, self.critic, self.critic_optim
+            )
+            td2, critic2_loss = self._minimize_critic_squared_loss(
+                batch, self.critic2, self.critic2_optim
+            )
+            return td1, td2, critic1_loss, critic2_loss
+        weight = getattr(batch, "weight", 1.0)
+        current_q1, current_q2 = self._twin_critic_values(batch.obs, batch.act)
+        target_q = batch.returns.flatten()
+        td1 = current_q1.flatten() - target_q
+        td2 = current_q2.flatten() - target_q
+        critic1_loss = (td1.pow(2) * weight).mean()
+        critic2_loss = (td2.pow(2) * weight).mean()
+        self.Optimizer.step_jointly(
+            (self.critic_optim, self.critic2_optim),
+            critic1_loss + critic2_loss,
+        )
+        return td1, td2, critic1_loss, critic2_loss
 
     def _target_q_compute_value(
         self, obs_batch: Batch, act_batch: TActBatchProtocol
     ) -> torch.Tensor:
         # compute the Q-value as the minimum of the two lagged critics
-        act = act_batch.act
-        return torch.min(
-            self.critic_old(obs_batch.obs, act),
-            self.critic2_old(obs_batch.obs, act),
-        )
+        return torch.min(*self._twin_critic_values(obs_batch.obs, act_batch.act, lagged=True))
 
 
 class TD3(
@@ -122,6 +183,7 @@ class TD3(
         update_actor_freq: int = 2,
         noise_clip: float = 0.5,
         n_step_return_horizon: int = 1,
+        fuse_twin_critics: bool = False,
     ) -> None:
         """
         :param policy: the policy
@@ -168,6 +230,8 @@ class TD3(
             It prevents extreme noise values from causing unrealistic target values during training.
             Setting it 0.0 (or a negative value) disables clipping entirely.
             It is typically set to about twice the `policy_noise` value (e.g. 0.5 when `policy_noise` is 0.2).
+        :param fuse_twin_critics: whether to evaluate the two critics jointly in a single vectorized
+            call; see :class:`ActorDualCriticsOffPolicyAlgorithm`.
         """
         super().__init__(
             policy=policy,
@@ -179,6 +243,7 @@ class TD3(
             tau=tau,
             gamma=gamma,
             n_step_return_horizon=n_step_return_horizon,
+            fuse_twin_critics=fuse_twin_critics,
         )
         self.actor_old = self._add_lagged_network(self.policy.actor)
         self.policy_noise = policy_noise
@@ -203,12 +268,7 @@ class TD3(
 
     def _update_with_batch(self, batch: RolloutBatchProtocol) -> TD3TrainingStats:
         # critic 1&2
-        td1, critic1_loss = self._minimize_critic_squared_loss(
-            batch, self.critic, self.critic_optim
-        )
-        td2, critic2_loss = self._minimize_critic_squared_loss(
-            batch, self.critic2, self.critic2_optim
-        )
+        td1, td2, critic1_loss, critic2_loss = self._minimize_twin_critics_squared_loss(batch)
         batch.weight = (td1 + td2) / 2.0  # prio-buffer
 
         # actor
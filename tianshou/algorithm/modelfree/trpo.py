@@ -9,7 +9,7 @@ from tianshou.algorithm import NPG
 from tianshou.algorithm.modelfree.npg import NPGTrainingStats
 from tianshou.algorithm.modelfree.reinforce import ProbabilisticActorPolicy
 from tianshou.algorithm.optim import OptimizerFactory
-from tianshou.data import SequenceSummaryStats
+from tianshou.data import Batch, SequenceSummaryStats, to_torch_as
 from tianshou.data.types import BatchWithAdvantagesProtocol
 from tianshou.utils.net.continuous import ContinuousCritic
 from tianshou.utils.net.discrete import DiscreteCritic
@@ -128,8 +128,12 @@ class TRPO(NPG):
     ) -> TRPOTrainingStats:
         actor_losses, vf_losses, step_sizes, kls = [], [], [], []
         split_batch_size = batch_size or -1
+        # the batch is permuted into the same contiguous storage in each epoch
+        permuted_batch = Batch()
         for _ in range(repeat):
-            for minibatch in batch.split(split_batch_size, merge_last=True):
+            for minibatch in batch.split(
+                split_batch_size, merge_last=True, contiguous=True, out=permuted_batch
+            ):
                 # optimize actor
                 # direction: calculate villia gradient
                 dist = self.policy(minibatch).dist
@@ -147,48 +151,47 @@ class TRPO(NPG):
                 kl = kl_divergence(old_dist, dist).mean()
                 # calculate first order gradient of kl with respect to theta
                 flat_kl_grad = self._get_flat_grad(kl, self.policy.actor, create_graph=True)
-                search_direction = -self._conjugate_gradients(flat_grads, flat_kl_grad, nsteps=10)
+                x, Hx = self._conjugate_gradients_with_mvp(flat_grads, flat_kl_grad, nsteps=10)
+                search_direction = -x
 
                 # stepsize: calculate max stepsize constrained by kl bound
+                # (note: the product of H and the search direction is -Hx)
                 step_size = torch.sqrt(
-                    2
-                    * self.max_kl
-                    / (search_direction * self._MVP(search_direction, flat_kl_grad)).sum(
-                        0,
-                        keepdim=True,
-                    ),
+                    2 * self.max_kl / (search_direction * -Hx).sum(0, keepdim=True),
                 )
 
-                # stepsize: linesearch stepsize
+                # stepsize: linesearch stepsize, evaluating all candidate step sizes at once
                 with torch.no_grad():
-                    flat_params = torch.cat(
-                        [param.data.view(-1) for param in self.policy.actor.parameters()],
+                    flat_params = self._get_actor_flat_params()
+                    candidate_step_sizes = step_size * self.backtrack_coeff ** torch.arange(
+                        self.max_backtracks,
+                        device=step_size.device,
                     )
-                    for i in range(self.max_backtracks):
-                        new_flat_params = flat_params + step_size * search_direction
-                        self._set_from_flat_params(self.policy.actor, new_flat_params)
-                        # calculate kl and if in bound, loss actually down
-                        new_dist = self.policy(minibatch).dist
-                        new_dratio = (
-                            (new_dist.log_prob(minibatch.act) - minibatch.logp_old).exp().float()
+                    candidate_flat_params = (
+                        flat_params + candidate_step_sizes[:, None] * search_direction
+                    )
+                    new_actor_losses, kls_candidates = self._evaluate_candidate_params(
+                        candidate_flat_params,
+                        minibatch,
+                        old_dist,
+                    )
+                    # calculate kl and if in bound, loss actually down
+                    accepted = (kls_candidates < self.max_kl) & (new_actor_losses < actor_loss)
+                    if accepted.any():
+                        i = int(accepted.nonzero()[0])
+                        if i > 0:
+                            warnings.warn(f"Backtracking to step {i}.")
+                        flat_params.copy_(candidate_flat_params[i])
+                        step_size = candidate_step_sizes[i]
+                        kl = kls_candidates[i]
+                    else:
+                        # the parameters remain unchanged
+                        step_size = torch.tensor([0.0])
+                        kl = kls_candidates[-1]
+                        warnings.warn(
+                            "Line search failed! It seems hyperparamters"
+                            " are poor and need to be changed.",
                         )
-                        new_dratio = new_dratio.reshape(new_dratio.size(0), -1).transpose(0, 1)
-                        new_actor_loss = -(new_dratio * minibatch.adv).mean()
-                        kl = kl_divergence(old_dist, new_dist).mean()
-
-                        if kl < self.max_kl and new_actor_loss < actor_loss:
-                            if i > 0:
-                                warnings.warn(f"Backtracking to step {i}.")
-                            break
-                        if i < self.max_backtracks - 1:
-                            step_size = step_size * self.backtrack_coeff
-                        else:
-                            self._set_from_flat_params(self.policy.actor, new_flat_params)
-                            step_size = torch.tensor([0.0])
-                            warnings.warn(
-                                "Line search failed! It seems hyperparamters"
-                                " are poor and need to be changed.",
-                            )
 
                 # optimize critic
                 for _ in range(self.optim_critic_iters):
@@ -212,3 +215,34 @@ class TRPO(NPG):
             kl=kl_summary_stat,
             step_size=step_size_stat,
         )
+
+    def _evaluate_candidate_params(
+        self,
+        candidate_flat_params: torch.Tensor,
+        minibatch: BatchWithAdvantagesProtocol,
+        old_dist: torch.distributions.Distribution,
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """Computes the actor loss and the KL divergence to the old policy for several candidate parameter
+        vectors in a single vectorized pass.
+
+        :param candidate_flat_params: tensor of shape (num_candidates, num_actor_params)
+        :return: a tuple (actor_losses, kls), each of shape (num_candidates,)
+        """
+        actor = self.policy.actor
+        named_params = list(actor.named_parameters())
+        act = to_torch_as(minibatch.act, minibatch.logp_old)
+
+        def evaluate(flat_params: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+            params = {}
+            offset = 0
+            for name, param in named_params:
+                params[name] = flat_params[offset : offset + param.numel()].view_as(param)
+                offset += param.numel()
+            dist_input, _ = torch.func.functional_call(actor, params, (minibatch.obs,))
+            new_dist = self.policy.dist_fn(dist_input)
+            new_dratio = (new_dist.log_prob(act) - minibatch.logp_old).exp().float()
+            new_dratio = new_dratio.reshape(new_dratio.size(0), -1).transpose(0, 1)
+            new_actor_loss = -(new_dratio * minibatch.adv).mean()
+            return new_actor_loss, kl_divergence(old_dist, new_dist).mean()
+
+        return torch.vmap(evaluate)(candidate_flat_params)
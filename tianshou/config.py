@@ -1,2 +1,13 @@
 ENABLE_VALIDATION = False
 """Validation can help catching bugs and issues but it slows down training and collection. Enable it only if needed."""
+
+ENABLE_PARALLEL_GAE = False
+"""Whether to compute generalized advantage estimates (see
+:meth:`~tianshou.algorithm.algorithm_base.Algorithm.compute_episodic_return`) for the episodes in a batch
+in parallel, using numba's threading layer. This speeds up on-policy algorithms with many environments.
+
+NOTE: Not all of numba's threading layers are fork-safe. If processes are forked after the computation
+(e.g. the workers of a :class:`~tianshou.env.SubprocVectorEnv` with the "fork" context), the "workqueue"
+layer must be used (by setting the environment variable ``NUMBA_THREADING_LAYER=workqueue``), as the
+"tbb" and (GNU) "omp" layers hang or abort in this case.
+"""
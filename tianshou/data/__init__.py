@@ -18,6 +18,7 @@ from tianshou.data.buffer.vecbuf import (
     VectorReplayBuffer,
 )
 from tianshou.data.buffer.cached import CachedReplayBuffer
+from tianshou.data.buffer.shared import SharedMemoryVectorReplayBuffer
 from tianshou.data.stats import (
     EpochStats,
     InfoStats,
@@ -31,8 +32,10 @@ from tianshou.data.collector import (
     CollectStatsBase,
     BaseCollector,
 )
+from tianshou.data.actor_learner import ActorLearnerCollector
 
 __all__ = [
+    "ActorLearnerCollector",
     "AsyncCollector",
     "BaseCollector",
     "Batch",
@@ -52,6 +55,7 @@ __all__ = [
     "ReplayBufferManager",
     "SegmentTree",
     "SequenceSummaryStats",
+    "SharedMemoryVectorReplayBuffer",
     "TimingStats",
     "VectorReplayBuffer",
     "to_numpy",
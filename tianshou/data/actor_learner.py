@@ -0,0 +1,443 @@
+"""Decoupled actor/learner execution, where data collection happens in separate actor processes.
+
+In the regular (synchronous) setup, the trainer strictly alternates between data collection and
+gradient updates within a single process. With the :class:`ActorLearnerCollector`, one or more
+actor processes instead collect data continuously with their own copy of the policy, while the
+learner (the trainer's process) performs gradient updates. The learner periodically publishes
+its weights to the actors through shared memory (see :class:`SharedModuleWeights`).
+"""
+
+import logging
+import multiprocessing
+import queue
+import time
+from collections.abc import Callable
+from multiprocessing.context import BaseContext
+from typing import Any, Literal, NamedTuple
+
+import gymnasium as gym
+import numpy as np
+import torch
+from torch import nn
+
+from tianshou.algorithm import Algorithm
+from tianshou.algorithm.algorithm_base import Policy
+from tianshou.config import ENABLE_VALIDATION
+from tianshou.data import ReplayBufferManager, SharedMemoryVectorReplayBuffer, VectorReplayBuffer
+from tianshou.data.collector import DEFAULT_BUFFER_MAXSIZE, BaseCollector, Collector, CollectStats
+from tianshou.data.types import RolloutBatchProtocol
+from tianshou.env import DummyVectorEnv
+from tianshou.env.utils import CloudpickleWrapper
+
+log = logging.getLogger(__name__)
+
+_ACTOR_LIVENESS_CHECK_INTERVAL = 1.0
+"""the interval (in seconds) in which the liveness of the actors is checked while waiting for chunks"""
+
+
+class SharedModuleWeights:
+    """The weights (state dict) of a module in shared memory, which allows a single writer process
+    to publish weights to any number of reader processes.
+
+    Every publication increments a version counter, such that readers can cheaply determine
+    whether new weights are available. Reads and writes are synchronized via the counter's lock,
+    such that readers never observe partially published weights.
+    """
+
+    def __init__(
+        self,
+        module: nn.Module,
+        context: BaseContext | Literal["fork", "spawn"] | None = None,
+    ) -> None:
+        """
+        :param module: the module whose state dict determines the layout of the shared weights;
+            its current weights are used as the initial weights.
+        :param context: the multiprocessing context with which the reader processes are created.
+        """
+        if not isinstance(context, BaseContext):
+            context = multiprocessing.get_context(context)
+        self._tensors = {
+            name: tensor.detach().cpu().clone().share_memory_()
+            for name, tensor in module.state_dict().items()
+        }
+        self._version = context.Value("q", 0)
+
+    @property
+    def version(self) -> int:
+        """The number of times weights have been published."""
+        return self._version.value
+
+    def publish(self, module: nn.Module) -> None:
+        """Copies the module's weights to shared memory.
+
+        :param module: the module, which must have the same state dict layout as the module
+            the shared weights were created with.
+        """
+        with self._version.get_lock():
+            for name, tensor in module.state_dict().items():
+                self._tensors[name].copy_(tensor)
+            self._version.value += 1
+
+    def load_into(self, module: nn.Module, loaded_version: int | None = None) -> int:
+        """Copies the shared weights into the module (in-place), unless they have not changed.
+
+        :param module: the module to load the weights into.
+        :param loaded_version: the version that was previously loaded into the module (as returned by
+            this method); if it is the current version, the weights are not loaded again.
+        :return: the version of the weights that the module now holds.
+        """
+        if loaded_version is not None and loaded_version == self.version:
+            return loaded_version
+        with self._version.get_lock():
+            module.load_state_dict(self._tensors)
+            return self._version.value
+
+
+class _AddedChunk(NamedTuple):
+    """The message an actor sends in place of a chunk after adding it to a shared memory buffer."""
+
+    num_steps: int
+    episode_returns: list[float]
+    episode_lens: list[int]
+    buffer_generation: int
+    """the number of times the buffer had been reset when the chunk was added"""
+
+
+def _add_chunk(
+    buffer: ReplayBufferManager,
+    chunk: RolloutBatchProtocol,
+    buffer_ids: np.ndarray,
+) -> tuple[list, list]:
+    """Adds the transitions of a chunk to the buffer, time step by time step, such that the transitions
+    of each env are added to a dedicated sub-buffer in the order in which they were collected.
+
+    :param buffer: the buffer to add the transitions to.
+    :param chunk: the chunk, which contains the transitions of each env contiguously.
+    :param buffer_ids: the ids of the sub-buffers to which the transitions of the envs are added.
+    :return: the returns and lengths of the episodes that were completed in the chunk.
+    """
+    num_envs = len(buffer_ids)
+    num_steps_per_env = len(chunk) // num_envs
+    episode_returns, episode_lens = [], []
+    for t in range(num_steps_per_env):
+        step_batch = chunk[np.arange(num_envs) * num_steps_per_env + t]
+        _, ep_return, ep_len, _ = buffer.add(step_batch, buffer_ids=buffer_ids)
+        done = step_batch.done
+        episode_returns.extend(ep_return[done])
+        episode_lens.extend(ep_len[done])
+    return episode_returns, episode_lens
+
+
+def _actor_worker(
+    actor_id: int,
+    env_fn_wrapper: CloudpickleWrapper,
+    policy_wrapper: CloudpickleWrapper,
+    num_envs: int,
+    num_env_steps_per_chunk: int,
+    exploration_noise: bool,
+    weights: SharedModuleWeights,
+    chunk_queue: "multiprocessing.Queue[tuple[int, RolloutBatchProtocol | _AddedChunk]]",
+    stop_event: Any,
+    seed: int | None,
+    shared_buffer_name: str | None,
+    shared_buffer_generation: Any,
+) -> None:
+    # actors share the machine with the learner and with each other
+    torch.set_num_threads(1)
+    policy: Policy = policy_wrapper.data
+    policy.is_within_training_step = True
+    env = DummyVectorEnv([env_fn_wrapper.data] * num_envs)
+    if seed is not None:
+        env.seed(seed + actor_id * num_envs)
+        np.random.seed(seed + actor_id)
+        torch.manual_seed(seed + actor_id)
+    # every sub-buffer holds exactly the transitions of one env collected for a chunk
+    buffer = VectorReplayBuffer(num_env_steps_per_chunk, num_envs)
+    collector = Collector[CollectStats](
+        policy,
+        env,
+        buffer,
+        exploration_noise=exploration_noise,
+        raise_on_nan_in_buffer=False,
+    )
+    collector.reset()
+    shared_buffer = None
+    shared_buffer_ids = actor_id * num_envs + np.arange(num_envs)
+    if shared_buffer_name is not None:
+        shared_buffer = SharedMemoryVectorReplayBuffer.attach(
+            shared_buffer_name,
+            buffer_ids=shared_buffer_ids,
+        )
+    loaded_version = None
+    try:
+        while not stop_event.is_set():
+            loaded_version = weights.load_into(policy, loaded_version)
+            collector.reset_buffer(keep_statistics=True)
+            collector.collect(n_step=num_env_steps_per_chunk)
+            chunk = buffer[buffer.sample_indices(0)]
+            message: RolloutBatchProtocol | _AddedChunk = chunk
+            if shared_buffer is not None:
+                # the buffer is not reset by the learner while the lock is held
+                with shared_buffer_generation.get_lock():
+                    message = _AddedChunk(
+                        len(chunk),
+                        *_add_chunk(shared_buffer, chunk, shared_buffer_ids),
+                        buffer_generation=shared_buffer_generation.value,
+                    )
+            # blocks while the queue is full, which exerts backpressure on the actor
+            while not stop_event.is_set():
+                try:
+                    chunk_queue.put((actor_id, message), timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+    except KeyboardInterrupt:
+        pass
+    finally:
+        env.close()
+        if shared_buffer is not None:
+            shared_buffer.close()
+
+
+class ActorLearnerCollector(BaseCollector[CollectStats]):
+    """Collects transitions for training in separate actor processes, such that data collection
+    and gradient updates (as performed in the process of the collector, the learner) overlap.
+
+    Each actor process runs a regular :class:`Collector` with its own copy of the policy and its own
+    environments, collecting chunks of transitions continuously. The chunks are passed to the learner,
+    which adds them to its buffer when :meth:`collect` is called. The learner's policy weights are
+    published to the actors through shared memory every `weight_sync_interval` calls of
+    :meth:`collect`, and actors pick up new weights before collecting their next chunk.
+    If the buffer is a :class:`~tianshou.data.SharedMemoryVectorReplayBuffer`, the actors instead
+    add their chunks to the buffer directly, each writing to the sub-buffers of its environments,
+    and only pass the chunks' episode statistics to the learner. In this case, actors are paused
+    while the buffer is reset (see :meth:`reset_buffer`).
+
+    The collector can be used as the training collector of an off-policy trainer: Since the trainer
+    performs gradient steps in proportion to the number of steps returned by :meth:`collect`, the
+    update-to-data ratio (see
+    :attr:`~tianshou.trainer.OffPolicyTrainerParams.update_step_num_gradient_steps_per_sample`)
+    retains its semantics. Actors cannot run arbitrarily far ahead of the learner, as they block once
+    `max_queued_chunks` chunks are waiting to be consumed (backpressure). The data used in an update
+    step may thus stem from a policy that lags behind the learner by a bounded number of updates.
+
+    The policy must be a feed-forward policy that lives on the CPU and that can be pickled.
+    """
+
+    def __init__(
+        self,
+        policy: Policy | Algorithm,
+        env_fn: Callable[[], gym.Env],
+        num_actors: int = 1,
+        num_envs_per_actor: int = 1,
+        buffer: ReplayBufferManager | None = None,
+        exploration_noise: bool = False,
+        num_env_steps_per_chunk: int = 64,
+        weight_sync_interval: int = 1,
+        max_queued_chunks: int | None = None,
+        seed: int | None = None,
+        context: BaseContext | Literal["fork", "spawn"] | None = None,
+        raise_on_nan_in_buffer: bool = ENABLE_VALIDATION,
+    ) -> None:
+        """
+        :param policy: a tianshou policy or algorithm, whose policy is copied to the actors.
+        :param env_fn: a function creating an environment; each actor creates
+            `num_envs_per_actor` environments with it.
+        :param num_actors: the number of actor processes.
+        :param num_envs_per_actor: the number of environments each actor steps (sequentially).
+        :param buffer: the buffer to which the learner adds the collected transitions, which must
+            have (at least) `num_actors * num_envs_per_actor` sub-buffers. If it is a
+            :class:`~tianshou.data.SharedMemoryVectorReplayBuffer`, the actors add the transitions
+            to it directly. If None, a
+            :class:`~tianshou.data.VectorReplayBuffer` of size :data:`DEFAULT_BUFFER_MAXSIZE` times
+            the number of environments is used.
+        :param exploration_noise: whether the actors shall add the policy's exploration noise to actions.
+        :param num_env_steps_per_chunk: the number of transitions an actor collects (over all its
+            environments) before passing them to the learner. Must be a multiple of
+            `num_envs_per_actor`.
+        :param weight_sync_interval: the number of calls of :meth:`collect` after which the learner's
+            weights are published to the actors (weights are published at the first call).
+        :param max_queued_chunks: the maximum number of chunks that may be waiting to be consumed by the
+            learner before actors block. If None, use `num_actors`.
+        :param seed: the seed with which to seed the actors' environments and random number generators.
+        :param context: the multiprocessing context (or its name) with which to create the actors.
+        :param raise_on_nan_in_buffer: whether to raise a `RuntimeError` if NaNs are found in the buffer
+            after a collection step.
+        """
+        if num_env_steps_per_chunk % num_envs_per_actor != 0:
+            raise ValueError(
+                f"{num_env_steps_per_chunk=} must be a multiple of {num_envs_per_actor=}.",
+            )
+        if weight_sync_interval < 1:
+            raise ValueError(f"{weight_sync_interval=} must be positive.")
+        if not isinstance(context, BaseContext):
+            context = multiprocessing.get_context(context)
+        self.policy = policy.policy if isinstance(policy, Algorithm) else policy
+        self.num_actors = num_actors
+        self.num_envs_per_actor = num_envs_per_actor
+        if buffer is None:
+            buffer = VectorReplayBuffer(DEFAULT_BUFFER_MAXSIZE * self.env_num, self.env_num)
+        if not isinstance(buffer, ReplayBufferManager) or buffer.buffer_num < self.env_num:
+            raise ValueError(
+                f"The buffer must be a {ReplayBufferManager.__name__} with at least "
+                f"{self.env_num} sub-buffers.",
+            )
+        self.buffer: ReplayBufferManager = buffer
+        self.raise_on_nan_in_buffer = raise_on_nan_in_buffer
+        self.exploration_noise = exploration_noise
+        self.collect_stats_class = CollectStats
+        self.collect_step, self.collect_episode, self.collect_time = 0, 0, 0.0
+        self.weight_sync_interval = weight_sync_interval
+        self._num_collect_calls = 0
+        self._is_closed = False
+
+        dummy_env = env_fn()
+        self._action_space = dummy_env.action_space
+        dummy_env.close()
+
+        self._weights = SharedModuleWeights(self.policy, context)
+        self._queue = context.Queue(maxsize=max_queued_chunks or num_actors)
+        self._stop_event = context.Event()
+        # its lock is held by the actors while they write to a shared memory buffer
+        self._shared_buffer_generation = context.Value("q", 0)
+        self._actors = []
+        assert hasattr(context, "Process")  # for mypy
+        for actor_id in range(num_actors):
+            args = (
+                actor_id,
+                CloudpickleWrapper(env_fn),
+                CloudpickleWrapper(self.policy),
+                num_envs_per_actor,
+                num_env_steps_per_chunk,
+                exploration_noise,
+                self._weights,
+                self._queue,
+                self._stop_event,
+                seed,
+                buffer.name if isinstance(buffer, SharedMemoryVectorReplayBuffer) else None,
+                self._shared_buffer_generation,
+            )
+            process = context.Process(target=_actor_worker, args=args, daemon=True)
+            process.start()
+            self._actors.append(process)
+
+    @property
+    def env_num(self) -> int:
+        return self.num_actors * self.num_envs_per_actor
+
+    def reset_env(
+        self,
+        gym_reset_kwargs: dict[str, Any] | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Does nothing, as the environments are managed (and reset) by the actors.
+
+        :return: empty arrays in place of the initial observations and infos.
+        """
+        return np.array([]), np.array([], dtype=object)
+
+    def reset(
+        self,
+        reset_buffer: bool = True,
+        reset_stats: bool = True,
+        gym_reset_kwargs: dict[str, Any] | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """See :meth:`BaseCollector.reset`; the collector cannot be reset once it has been closed, as
+        the actor processes have been stopped.
+        """
+        if self._is_closed:
+            raise RuntimeError("The collector has been closed and its actors have been stopped.")
+        return super().reset(
+            reset_buffer=reset_buffer,
+            reset_stats=reset_stats,
+            gym_reset_kwargs=gym_reset_kwargs,
+        )
+
+    def reset_buffer(self, keep_statistics: bool = False) -> None:
+        """Resets the buffer.
+
+        If the buffer is a :class:`~tianshou.data.SharedMemoryVectorReplayBuffer`, the actors are
+        paused while the buffer is reset, and chunks which the actors added before the reset are
+        not taken into account by subsequent calls of :meth:`collect`.
+        """
+        if not isinstance(self.buffer, SharedMemoryVectorReplayBuffer):
+            super().reset_buffer(keep_statistics=keep_statistics)
+            return
+        with self._shared_buffer_generation.get_lock():
+            self.buffer.reset(keep_statistics=keep_statistics)
+            self._shared_buffer_generation.value += 1
+
+    def close(self) -> None:
+        """Stops the actor processes."""
+        if self._is_closed:
+            return
+        self._stop_event.set()
+        for process in self._actors:
+            # consume pending chunks, such that actors blocked on a full queue can terminate
+            while process.is_alive():
+                try:
+                    self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    process.join(timeout=0.1)
+        self._is_closed = True
+
+    def _assert_actors_alive(self) -> None:
+        for actor_id, process in enumerate(self._actors):
+            if not process.is_alive():
+                raise RuntimeError(
+                    f"Actor {actor_id} terminated unexpectedly (exit code {process.exitcode}).",
+                )
+
+    def _collect(
+        self,
+        n_step: int | None = None,
+        n_episode: int | None = None,
+        random: bool = False,
+        render: float | None = None,
+        gym_reset_kwargs: dict[str, Any] | None = None,
+    ) -> CollectStats:
+        """Adds (at least) `n_step` transitions collected by the actors to the buffer, waiting for
+        the actors if necessary.
+        """
+        if self._is_closed:
+            raise RuntimeError("The collector has been closed.")
+        if n_step is None or n_episode is not None or random or render:
+            raise ValueError(
+                f"{self.__class__.__name__} supports only the collection of a number of steps "
+                "using the policy (n_step).",
+            )
+        if self._num_collect_calls % self.weight_sync_interval == 0:
+            self._weights.publish(self.policy)
+        self._num_collect_calls += 1
+
+        start_time = time.time()
+        step_count = 0
+        episode_returns: list[float] = []
+        episode_lens: list[int] = []
+        while step_count < n_step:
+            try:
+                actor_id, message = self._queue.get(timeout=_ACTOR_LIVENESS_CHECK_INTERVAL)
+            except queue.Empty:
+                self._assert_actors_alive()
+                continue
+            if isinstance(message, _AddedChunk):
+                if message.buffer_generation != self._shared_buffer_generation.value:
+                    # the chunk was removed from the buffer by a reset
+                    continue
+                num_steps, chunk_returns, chunk_lens, _ = message
+            else:
+                buffer_ids = actor_id * self.num_envs_per_actor + np.arange(self.num_envs_per_actor)
+                chunk_returns, chunk_lens = _add_chunk(self.buffer, message, buffer_ids)
+                num_steps = len(message)
+            episode_returns.extend(chunk_returns)
+            episode_lens.extend(chunk_lens)
+            step_count += num_steps
+
+        self.collect_step += step_count
+        self.collect_episode += len(episode_returns)
+        self.collect_time += time.time() - start_time
+        return CollectStats.with_autogenerated_stats(
+            returns=np.array(episode_returns, dtype=float),
+            lens=np.array(episode_lens, dtype=int),
+            n_collected_episodes=len(episode_returns),
+            n_collected_steps=step_count,
+        )
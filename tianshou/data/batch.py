@@ -45,7 +45,7 @@ the functionality.
 import pprint
 import warnings
 from collections.abc import Callable, Collection, Iterable, Iterator, KeysView, Sequence
-from copy import deepcopy
+from copy import copy, deepcopy
 from numbers import Number
 from types import EllipsisType
 from typing import (
@@ -61,12 +61,12 @@ from typing import (
 )
 
 import numpy as np
-import pandas as pd
 import torch
-from deepdiff import DeepDiff
 from sensai.util import logging
 from torch.distributions import Categorical, Distribution, Independent, Normal
 
+from tianshou.config import ENABLE_VALIDATION
+
 _SingleIndexType = slice | int | EllipsisType
 IndexType = np.ndarray | _SingleIndexType | Sequence[_SingleIndexType]
 TBatch = TypeVar("TBatch", bound="BatchProtocol")
@@ -182,6 +182,44 @@ def create_value(
     return np.array([None for _ in range(size)], object)
 
 
+def _is_valid_batch_value(value: Any) -> bool:
+    """Checks whether the value is of a type which results from parsing values when creating a batch."""
+    if value is None or isinstance(value, Batch | torch.Tensor | Distribution):
+        return True
+    if isinstance(value, np.ndarray):
+        if issubclass(value.dtype.type, np.bool_ | np.number):
+            return True
+        return value.dtype == object and value.shape != () and not _is_batch_set(value)
+    return False
+
+
+def _stack_number_dicts(dicts: Sequence[Any]) -> dict[str, np.ndarray] | None:
+    """Fast path for stacking dicts with the same keys whose values are numbers of the same type per key.
+
+    This is the most common case when stacking the info dicts returned by environments. The result is the
+    same as that of the general stacking logic, which creates a batch for each dict.
+
+    :return: the stacked values by key or None if the dicts do not satisfy the conditions above
+    """
+    if len(dicts) == 0 or not all(type(d) is dict for d in dicts):
+        return None
+    keys = dicts[0].keys()
+    if len(keys) == 0 or not all(d.keys() == keys for d in dicts):
+        return None
+    result = {}
+    for key in keys:
+        values = [d[key] for d in dicts]
+        value_type = type(values[0])
+        if (
+            not isinstance(key, str)
+            or not _is_number(values[0])
+            or not all(type(value) is value_type for value in values)
+        ):
+            return None
+        result[key] = np.array(values)
+    return result
+
+
 def _assert_type_keys(keys: Iterable[str]) -> None:
     assert all(isinstance(key, str) for key in keys), f"keys should all be string, but got {keys}"
 
@@ -502,6 +540,8 @@ class BatchProtocol(Protocol):
         size: int,
         shuffle: bool = True,
         merge_last: bool = False,
+        contiguous: bool = False,
+        out: "BatchProtocol | None" = None,
     ) -> Iterator[Self]:
         """Split whole data into multiple small batches.
 
@@ -512,6 +552,17 @@ class BatchProtocol(Protocol):
             True, otherwise remain in the same. Default to True.
         :param merge_last: merge the last batch into the previous one.
             Default to False.
+        :param contiguous: whether to yield the small batches as views (slices) of contiguous
+            storage instead of gathering each of them separately. If `shuffle` is True, the entire
+            data batch is permuted into contiguous storage (see `out`) once; otherwise, the small
+            batches are views of this batch. Since the small batches share their memory with the
+            storage, they are only valid until the storage is modified (e.g. by the next call
+            with the same `out`).
+        :param out: if `contiguous` and `shuffle` are True, the batch to permute the data into.
+            Its array storage is reused if it matches the data (in structure, shapes, types and
+            devices); otherwise (e.g. if it is empty) it is populated with newly allocated storage,
+            such that passing the same `out` to subsequent calls avoids repeated allocations.
+            If None, new storage is allocated.
         """
         raise ProtocolCalledException
 
@@ -622,7 +673,23 @@ class BatchProtocol(Protocol):
         raise ProtocolCalledException
 
 
-class Batch(BatchProtocol):
+class _BatchMeta(type(BatchProtocol)):  # type: ignore[misc]
+    """The metaclass of :class:`Batch`, which restores the regular (fast) instance and subclass checks.
+
+    As a subclass of a protocol, :class:`Batch` would otherwise inherit the checks of the protocol
+    metaclass, which make ``isinstance(value, Batch)`` an order of magnitude slower for values
+    which are not batches (e.g. arrays). Since such checks are performed for every value in
+    most batch operations and :class:`Batch` is not a protocol itself, this matters.
+    """
+
+    def __instancecheck__(cls, instance: Any) -> bool:
+        return type.__instancecheck__(cls, instance)
+
+    def __subclasscheck__(cls, subclass: type) -> bool:
+        return type.__subclasscheck__(cls, subclass)
+
+
+class Batch(BatchProtocol, metaclass=_BatchMeta):
     """See :class:`~tianshou.data.batch.BatchProtocol`."""
 
     __doc__ = BatchProtocol.__doc__
@@ -640,18 +707,56 @@ class Batch(BatchProtocol):
         if copy:
             batch_dict = deepcopy(batch_dict)
         if batch_dict is not None:
-            if isinstance(batch_dict, dict | BatchProtocol):
+            # NOTE: the batch set is checked first, because isinstance checks with the
+            # runtime-checkable protocol are slow for objects which are not dicts or batches
+            if not isinstance(batch_dict, dict | Batch) and _is_batch_set(batch_dict):
+                batch_dict = cast(Sequence[dict | BatchProtocol], batch_dict)
+                self.stack_(batch_dict)
+            elif isinstance(batch_dict, dict | BatchProtocol):
                 _assert_type_keys(batch_dict.keys())
                 for batch_key, obj in batch_dict.items():
                     self.__dict__[batch_key] = _parse_value(obj)
-            elif _is_batch_set(batch_dict):
-                batch_dict = cast(Sequence[dict | BatchProtocol], batch_dict)
-                self.stack_(batch_dict)
         if len(kwargs) > 0:
             # TODO: that's a rather weird pattern, is it really needed?
             # Feels like kwargs could be just merged into batch_dict in the beginning
             self.__init__(kwargs, copy=copy)  # type: ignore
 
+    @classmethod
+    def from_validated(cls, batch_dict: dict[str, Any] | None = None, /, **kwargs: Any) -> Self:
+        """Creates a batch from values which are already valid batch values, bypassing their parsing.
+
+        This is a fast path for library-internal call sites which create batches from values
+        as they are stored in batches, i.e. instances of :class:`Batch`, numpy arrays (of numbers,
+        booleans or objects which are not dicts), torch tensors, distributions and None.
+        Other values (in particular dicts, lists and scalars) are not converted, so they must be
+        passed to the regular constructor instead.
+        If validation is enabled (see :data:`tianshou.config.ENABLE_VALIDATION`), the values are checked.
+
+        :param batch_dict: a dict of keys and values to add to the batch.
+        :param kwargs: further keys and values to add to the batch.
+        """
+        batch = cls.__new__(cls)
+        if batch_dict is not None:
+            batch.__dict__.update(batch_dict)
+        batch.__dict__.update(kwargs)
+        if ENABLE_VALIDATION:
+            for key, value in batch.__dict__.items():
+                if not isinstance(key, str) or not _is_valid_batch_value(value):
+                    raise ValueError(
+                        f"Value of type {type(value)} for key {key!r} is not a valid batch value; "
+                        f"use the regular constructor instead.",
+                    )
+        return batch
+
+    def __copy__(self) -> Self:
+        # the values are already parsed, so the copy bypasses the parsing
+        return self.from_validated(
+            {
+                key: copy(value) if isinstance(value, Batch) else value
+                for key, value in self.__dict__.items()
+            },
+        )
+
     def to_dict(self, recursive: bool = True) -> dict[str, Any]:
         result = {}
         for k, v in self.__dict__.items():
@@ -715,29 +820,16 @@ class Batch(BatchProtocol):
         """Returns either the value of a key or a sliced Batch object."""
         if isinstance(index, str):
             return self.__dict__[index]
-        batch_items = self.items()
-        if len(batch_items) > 0:
-            new_batch = Batch()
-
-            sliced_obj: Any
-            for batch_key, obj in batch_items:
-                # None and empty Batches as values are added to any slice
-                if obj is None:
-                    sliced_obj = None
-                elif isinstance(obj, Batch) and len(obj.get_keys()) == 0:
-                    sliced_obj = Batch()
-                # We attempt slicing of a distribution. This is hacky, but presents an important special case
-                elif isinstance(obj, Distribution):
-                    sliced_obj = get_sliced_dist(obj, index)
-                # All other objects are either array-like or Batch-like, so hopefully sliceable
-                # A batch should have no scalars
-                else:
-                    sliced_obj = obj[index]
-                new_batch.__dict__[batch_key] = sliced_obj
-            return new_batch
+        if len(self.__dict__) > 0:
+            # the leaves of all nested batches are indexed in a single loop
+            layout, leaves = _flatten_batch(self)
+            return _unflatten_batch(layout, [_index_batch_value(leaf, index) for leaf in leaves])
         raise IndexError("Cannot access item from empty Batch object.")
 
     def __eq__(self, other: Any) -> bool:
+        # imported lazily to keep the import of tianshou fast
+        from deepdiff import DeepDiff
+
         if not isinstance(other, self.__class__):
             return False
 
@@ -1038,7 +1130,22 @@ class Batch(BatchProtocol):
         batch.cat_(batches)
         return batch  # type: ignore
 
+    def _stack_number_dicts_(self, batches: Sequence[dict | BatchProtocol], axis: int) -> bool:
+        """Applies the fast path of :meth:`stack_` for dicts with number values (see `_stack_number_dicts`).
+
+        :return: whether the fast path was applicable (and the batches were thus stacked)
+        """
+        if axis != 0 or len(self.__dict__) != 0:
+            return False
+        stacked_values = _stack_number_dicts(batches)
+        if stacked_values is None:
+            return False
+        self.__dict__.update(stacked_values)
+        return True
+
     def stack_(self, batches: Sequence[dict | BatchProtocol], axis: int = 0) -> None:
+        if self._stack_number_dicts_(batches, axis):
+            return
         # check input format
         batch_list = []
         for batch in batches:
@@ -1163,14 +1270,20 @@ class Batch(BatchProtocol):
         """Raises `TypeError` if any value in the batch has no len(), typically meaning it's a batch of scalars."""
         lens = []
         for key, obj in self.__dict__.items():
-            # TODO: causes inconsistent behavior to batch with empty batches
-            #  and batch with empty sequences of other type. Remove, but only after
-            #  Buffer and Collectors have been improved to no longer rely on this
-            if isinstance(obj, Batch) and len(obj) == 0:
+            if isinstance(obj, np.ndarray | torch.Tensor) and obj.ndim > 0:  # most often case
+                lens.append(len(obj))
                 continue
             if obj is None:
                 continue
-            if hasattr(obj, "__len__") and (isinstance(obj, Batch) or obj.ndim > 0):
+            if isinstance(obj, Batch):
+                obj_len = len(obj)
+                # TODO: causes inconsistent behavior to batch with empty batches
+                #  and batch with empty sequences of other type. Remove, but only after
+                #  Buffer and Collectors have been improved to no longer rely on this
+                if obj_len > 0:
+                    lens.append(obj_len)
+                continue
+            if hasattr(obj, "__len__") and obj.ndim > 0:
                 lens.append(len(obj))
                 continue
             if isinstance(obj, Distribution):
@@ -1201,6 +1314,8 @@ class Batch(BatchProtocol):
         size: int,
         shuffle: bool = True,
         merge_last: bool = False,
+        contiguous: bool = False,
+        out: "BatchProtocol | None" = None,
     ) -> Iterator[Self]:
         length = len(self)
         if size == -1:
@@ -1208,11 +1323,23 @@ class Batch(BatchProtocol):
         assert size >= 1  # size can be greater than length, return whole batch
         indices = np.random.permutation(length) if shuffle else np.arange(length)
         merge_last = merge_last and length % size > 0
+        # the batch is flattened only once, such that each split is a single loop over the leaves
+        layout, leaves = _flatten_batch(self)
+        if contiguous and shuffle:
+            out_batch = Batch() if out is None else cast(Batch, out)
+            leaves = _permute_leaves_into(layout, leaves, indices, out_batch)
+
+        def get_split(start: int, stop: int) -> Batch:
+            # in contiguous mode, the small batches are slices of the (permuted) leaves
+            split_indices = slice(start, stop) if contiguous else indices[start:stop]
+            split_leaves = [_index_batch_value(leaf, split_indices) for leaf in leaves]
+            return _unflatten_batch(layout, split_leaves)
+
         for idx in range(0, length, size):
             if merge_last and idx + size + size >= length:
-                yield self[indices[idx:]]
+                yield cast(Self, get_split(idx, length))
                 break
-            yield self[indices[idx : idx + size]]
+            yield cast(Self, get_split(idx, idx + size))
 
     @overload
     def apply_values_transform(
@@ -1292,6 +1419,9 @@ class Batch(BatchProtocol):
             self[key] = arr
 
     def isnull(self) -> Self:
+        # imported lazily to keep the import of tianshou fast
+        import pandas as pd
+
         return self.apply_values_transform(pd.isnull, inplace=False)
 
     def hasnull(self) -> bool:
@@ -1370,3 +1500,127 @@ def _apply_batch_values_func_recursively(
     if not inplace:
         return result
     return None
+
+
+def _flatten_batch(batch: Batch) -> tuple[list[tuple[int, str, int]], list[Any]]:
+    """Flattens a (nested) batch into its layout and a flat list of its leaf values.
+
+    The leaves are all values which are not non-empty batches. Operations which apply to each leaf
+    (like indexing) can thus be performed in a single loop, after which the resulting batch is
+    rebuilt via :func:`_unflatten_batch`.
+
+    :param batch: the batch to flatten.
+    :return: a pair (layout, leaves). For each value in the batch (in depth-first order), the layout
+        contains an entry (parent_node, key, leaf_index), where parent_node is the number of the batch
+        containing the value (0 for the root and 1, 2, ... for the nested non-empty batches in the
+        order of their entries) and leaf_index is the index of the value in leaves or -1 for nested
+        non-empty batches.
+    """
+    layout: list[tuple[int, str, int]] = []
+    leaves: list[Any] = []
+    num_nodes = 1
+
+    def add_entries(node: Batch, node_number: int) -> None:
+        nonlocal num_nodes
+        for key, value in node.__dict__.items():
+            if isinstance(value, Batch) and len(value.__dict__) > 0:
+                layout.append((node_number, key, -1))
+                num_nodes += 1
+                add_entries(value, num_nodes - 1)
+            else:
+                layout.append((node_number, key, len(leaves)))
+                leaves.append(value)
+
+    add_entries(batch, 0)
+    return layout, leaves
+
+
+def _unflatten_batch(layout: list[tuple[int, str, int]], leaves: list[Any]) -> Batch:
+    """Rebuilds a (nested) batch from a layout and leaves as returned by :func:`_flatten_batch`.
+
+    The leaves must be valid batch values, as they are not parsed.
+    """
+    nodes = [Batch.__new__(Batch)]
+    value: Any
+    for parent_node, key, leaf_index in layout:
+        if leaf_index < 0:
+            value = Batch.__new__(Batch)
+            nodes.append(value)
+        else:
+            value = leaves[leaf_index]
+        nodes[parent_node].__dict__[key] = value
+    return nodes[0]
+
+
+def _permute_leaves_into(
+    layout: list[tuple[int, str, int]],
+    leaves: list[Any],
+    indices: np.ndarray,
+    out: Batch,
+) -> list[Any]:
+    """Permutes the leaves of a flattened batch along their first axis into the storage of `out`.
+
+    The array leaves are gathered into the corresponding arrays of `out` if these match in shape,
+    type and device and into newly allocated arrays otherwise. Afterwards, `out` holds the
+    permuted batch.
+
+    :param layout: the layout of the flattened batch, see :func:`_flatten_batch`.
+    :param leaves: the leaves of the flattened batch.
+    :param indices: the permutation.
+    :param out: the batch whose storage is to be reused.
+    :return: the permuted leaves.
+    """
+    out_layout, out_leaves = _flatten_batch(out)
+    if out_layout != layout:
+        out_leaves = [None] * len(leaves)
+    index_tensors: dict[torch.device, torch.Tensor] = {}
+    permuted_leaves = []
+    for leaf, out_leaf in zip(leaves, out_leaves, strict=True):
+        shape = (len(indices), *leaf.shape[1:]) if hasattr(leaf, "shape") else None
+        if isinstance(leaf, np.ndarray):
+            if not (
+                isinstance(out_leaf, np.ndarray)
+                and out_leaf.shape == shape
+                and out_leaf.dtype == leaf.dtype
+            ):
+                out_leaf = None
+            # the indices are valid, so the (slower) bounds checking of mode="raise" is not needed
+            permuted_leaf = np.take(leaf, indices, axis=0, out=out_leaf, mode="clip")
+        elif isinstance(leaf, torch.Tensor):
+            if leaf.device not in index_tensors:
+                index_tensors[leaf.device] = torch.from_numpy(indices).to(leaf.device)
+            index_tensor = index_tensors[leaf.device]
+            # NOTE: out arguments are not supported for tensors requiring gradients
+            if (
+                not leaf.requires_grad
+                and isinstance(out_leaf, torch.Tensor)
+                and out_leaf.shape == shape
+                and out_leaf.dtype == leaf.dtype
+                and out_leaf.device == leaf.device
+            ):
+                permuted_leaf = torch.index_select(leaf, 0, index_tensor, out=out_leaf)
+            else:
+                permuted_leaf = torch.index_select(leaf, 0, index_tensor)
+        else:
+            permuted_leaf = _index_batch_value(leaf, indices)
+        permuted_leaves.append(permuted_leaf)
+    out.__dict__.clear()
+    out.__dict__.update(_unflatten_batch(layout, permuted_leaves).__dict__)
+    return permuted_leaves
+
+
+def _index_batch_value(value: Any, index: IndexType) -> Any:
+    """Indexes a leaf value of a batch as returned by :func:`_flatten_batch`."""
+    if isinstance(value, np.ndarray | torch.Tensor):  # most often case
+        return value[index]  # type: ignore[index]
+    # None and empty Batches as values are added to any slice
+    if value is None:
+        return None
+    if isinstance(value, Batch):
+        return Batch()
+    # We attempt slicing of a distribution. This is hacky, but presents an important special case
+    if isinstance(value, Distribution):
+        return get_sliced_dist(value, index)
+    # All other objects are hopefully sliceable
+    # A batch should have no scalars
+    return value[index]
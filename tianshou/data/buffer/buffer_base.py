@@ -1,19 +1,24 @@
 from collections.abc import Sequence
-from typing import Any, ClassVar, Self, TypeVar, cast
+from typing import TYPE_CHECKING, Any, ClassVar, Self, TypeVar, cast
 
-import h5py
 import numpy as np
+import torch
 from sensai.util.pickle import setstate
 
 from tianshou.data import Batch
 from tianshou.data.batch import (
     IndexType,
+    _flatten_batch,
+    _unflatten_batch,
     alloc_by_keys_diff,
     create_value,
     log,
 )
-from tianshou.data.types import RolloutBatchProtocol
-from tianshou.data.utils.converter import from_hdf5, to_hdf5
+from tianshou.data.types import RolloutBatchProtocol, SequenceBatchProtocol
+from tianshou.data.utils.converter import from_hdf5, hdf5_dataset_to_array, to_hdf5
+
+if TYPE_CHECKING:
+    import h5py
 
 TBuffer = TypeVar("TBuffer", bound="ReplayBuffer")
 
@@ -96,6 +101,13 @@ class ReplayBuffer:
         self._sample_avail = sample_avail
         self._meta = cast(RolloutBatchProtocol, Batch())
         self._random_state = np.random.RandomState(random_seed)
+        # episode index tables, maintained for each slot when data is added (see `_update_ep_index`)
+        self._ep_step_idx = np.zeros(self.maxsize, dtype=int)
+        """the index of the transition within its episode, i.e. the number of preceding transitions"""
+        self._ep_end_idx = np.arange(self.maxsize)
+        """the index of the last transition of the episode, or -1 if the episode is unfinished"""
+        self._unfinished_mask = np.zeros(self.maxsize, dtype=bool)
+        """whether the slot holds the last added transition of an unfinished episode"""
 
         # Keep in sync with reset!
         self.last_index = np.array([0])
@@ -103,12 +115,18 @@ class ReplayBuffer:
         self._ep_return, self._ep_len, self._ep_start_idx = 0.0, 0, 0
 
     def __setstate__(self, state: dict[str, Any]) -> None:
+        has_ep_index = "_unfinished_mask" in state
         setstate(
             ReplayBuffer,
             self,
             state,
             new_default_properties={"_random_state": np.random.RandomState(42)},
         )
+        if not has_ep_index:  # the buffer was saved before the episode index tables were introduced
+            self._ep_step_idx = np.zeros(self.maxsize, dtype=int)
+            self._ep_end_idx = np.arange(self.maxsize)
+            self._unfinished_mask = np.zeros(self.maxsize, dtype=bool)
+            self._rebuild_ep_index()
 
     @property
     def subbuffer_edges(self) -> np.ndarray:
@@ -251,54 +269,103 @@ class ReplayBuffer:
 
     def save_hdf5(self, path: str, compression: str | None = None) -> None:
         """Save replay buffer to HDF5 file."""
+        import h5py
+
         with h5py.File(path, "w") as f:
             to_hdf5(self.__dict__, f, compression=compression)
 
     @classmethod
-    def load_hdf5(cls, path: str, device: str | None = None) -> Self:
-        """Load replay buffer from HDF5 file."""
+    def load_hdf5(cls, path: str, device: str | None = None, mmap: bool = False) -> Self:
+        """Load replay buffer from HDF5 file.
+
+        :param path: the path of the file.
+        :param device: the device of restored tensors.
+        :param mmap: whether to memory-map the stored arrays instead of reading them into memory.
+            This is possible for arrays saved without compression (other arrays are read).
+            The mapping is copy-on-write, i.e. modifications of the buffer's data do not affect the file.
+        """
+        import h5py
+
         with h5py.File(path, "r") as f:
             buf = cls.__new__(cls)
-            buf.__setstate__(from_hdf5(f, device=device))  # type: ignore
+            buf.__setstate__(from_hdf5(f, device=device, mmap=mmap))  # type: ignore
         return buf
 
     @classmethod
     def from_data(
         cls,
-        obs: h5py.Dataset,
-        act: h5py.Dataset,
-        rew: h5py.Dataset,
-        terminated: h5py.Dataset,
-        truncated: h5py.Dataset,
-        done: h5py.Dataset,
-        obs_next: h5py.Dataset,
+        obs: "np.ndarray | h5py.Dataset",
+        act: "np.ndarray | h5py.Dataset",
+        rew: "np.ndarray | h5py.Dataset",
+        terminated: "np.ndarray | h5py.Dataset",
+        truncated: "np.ndarray | h5py.Dataset",
+        done: "np.ndarray | h5py.Dataset | None",
+        obs_next: "np.ndarray | h5py.Dataset",
+        mmap: bool = False,
     ) -> Self:
+        """Create a (full) buffer from the given data, where each entry corresponds to a transition.
+
+        The buffer is built in place from the given arrays: numpy arrays are used as they are (without
+        copying), and HDF5 datasets are read into memory at once (or memory-mapped, see `mmap`).
+        This makes the ingestion of large offline datasets cheap.
+
+        :param obs: the observations.
+        :param act: the actions.
+        :param rew: the rewards.
+        :param terminated: the terminated flags.
+        :param truncated: the truncated flags.
+        :param done: the done flags; if None, they are computed as `terminated | truncated`.
+        :param obs_next: the next observations.
+        :param mmap: whether to memory-map HDF5 datasets instead of reading them into memory.
+            This is possible for contiguous datasets without compression (other datasets are read).
+            The mapping is copy-on-write, i.e. modifications of the buffer's data do not affect the file.
+        """
+        if done is None:
+            done = np.logical_or(
+                cls._dataset_to_array(terminated, mmap),
+                cls._dataset_to_array(truncated, mmap),
+            )
+        data = {
+            "obs": obs,
+            "act": act,
+            "rew": rew,
+            "terminated": terminated,
+            "truncated": truncated,
+            "done": done,
+            "obs_next": obs_next,
+        }
         size = len(obs)
-        assert all(
-            len(dset) == size for dset in [obs, act, rew, terminated, truncated, done, obs_next]
-        ), "Lengths of all hdf5 datasets need to be equal."
+        assert all(len(dset) == size for dset in data.values()), (
+            "Lengths of all hdf5 datasets need to be equal."
+        )
         buf = cls(size)
         if size == 0:
             return buf
-        batch = Batch(
-            obs=obs,
-            act=act,
-            rew=rew,
-            terminated=terminated,
-            truncated=truncated,
-            done=done,
-            obs_next=obs_next,
-        )
-        batch = cast(RolloutBatchProtocol, batch)
-        buf.set_batch(batch)
+        batch = Batch({key: cls._dataset_to_array(dset, mmap) for key, dset in data.items()})
+        buf.set_batch(cast(RolloutBatchProtocol, batch))
         buf._size = size
+        # the buffer is full and the most recently added transition is the last one
+        buf.last_index = np.array([size - 1])
+        buf._rebuild_ep_index()
         return buf
 
+    @staticmethod
+    def _dataset_to_array(data: "np.ndarray | h5py.Dataset", mmap: bool) -> np.ndarray:
+        # only h5py datasets require h5py, whose import is comparatively expensive
+        if not type(data).__module__.startswith("h5py"):
+            return np.asanyarray(data)
+        import h5py
+
+        assert isinstance(data, h5py.Dataset)
+        return hdf5_dataset_to_array(data, mmap)
+
     def reset(self, keep_statistics: bool = False) -> None:
         """Clear all the data in replay buffer and episode statistics."""
         # Keep in sync with init!
         self.last_index = np.array([0])
         self._insertion_idx = self._size = self._ep_start_idx = 0
+        # in place, since the mask may be a view of the mask of a buffer manager
+        self._unfinished_mask[:] = False
         if not keep_statistics:
             self._ep_return, self._ep_len = 0.0, 0
 
@@ -310,28 +377,121 @@ class ReplayBuffer:
             self._reserved_keys,
         ), "Input batch doesn't meet ReplayBuffer's data form requirement."
         self._meta = batch
+        self._rebuild_ep_index()
+
+    def _update_ep_index(self, index: int, done: bool) -> None:
+        """Update the episode index tables for a transition that was added at the given index.
+
+        The transition continues the episode of the previously added transition unless that episode
+        is finished. When the episode is finished, its end index is set for all of its transitions,
+        such that the cost is constant per added transition (amortized over the episode).
+        """
+        prev_index = (index - 1) % self.maxsize
+        if self._size > 1 and self._ep_end_idx[prev_index] < 0:
+            self._ep_step_idx[index] = self._ep_step_idx[prev_index] + 1
+        else:
+            self._ep_step_idx[index] = 0
+        if done:
+            # the beginning of an episode longer than the buffer has been overwritten
+            ep_len = min(int(self._ep_step_idx[index]) + 1, self._size)
+            self._ep_end_idx[(index - np.arange(ep_len)) % self.maxsize] = index
+        else:
+            self._ep_end_idx[index] = -1
+        # the previously added transition is no longer the last one of an unfinished episode
+        self._unfinished_mask[prev_index] = False
+        self._unfinished_mask[index] = not done
+
+    def _rebuild_ep_index(self) -> None:
+        """Rebuild the episode index tables from the stored done flags, e.g. after setting the data."""
+        self._unfinished_mask[:] = False
+        if self._size == 0:
+            return
+        # the stored transitions in the order in which they were added
+        oldest_index = self._insertion_idx if self._size == self.maxsize else 0
+        indices = (oldest_index + np.arange(self._size)) % self.maxsize
+        done = self.done[indices].astype(bool)
+        is_ep_start = np.concatenate([[True], done[:-1]])
+        positions = np.arange(self._size)
+        ep_start_positions = np.maximum.accumulate(np.where(is_ep_start, positions, 0))
+        self._ep_step_idx[indices] = positions - ep_start_positions
+        ep_end_indices = np.append(indices[done], -1)
+        self._ep_end_idx[indices] = ep_end_indices[np.cumsum(is_ep_start) - 1]
+        self._unfinished_mask[indices[-1]] = not done[-1]
 
     def unfinished_index(self) -> np.ndarray:
         """Return the index of unfinished episode."""
-        last = (self._insertion_idx - 1) % self._size if self._size else 0
-        return np.array([last] if not self.done[last] and self._size else [], int)
+        return self.last_index[self._unfinished_mask[self.last_index]]
 
-    def prev(self, index: int | np.ndarray) -> np.ndarray:
+    def unfinished_mask(self) -> np.ndarray:
+        """Return a boolean mask over the buffer's slots, which is True at the last transitions of
+        unfinished episodes (see :meth:`unfinished_index`).
+
+        The mask is maintained when data is added, so this is an O(1) operation. The returned array
+        is the buffer's internal state and must not be modified.
+        """
+        return self._unfinished_mask
+
+    def prev(self, index: int | np.ndarray, num_steps: int | np.ndarray = 1) -> np.ndarray:
         """Return the index of previous transition.
 
         The index won't be modified if it is the beginning of an episode.
+
+        :param index: the index (or indices) of the transitions.
+        :param num_steps: the number of steps to go back, which may be an array that is
+            broadcast against `index`. Going back is stopped at the beginning of an episode,
+            i.e. the result is `prev` applied `num_steps` times, computed in a single lookup.
         """
-        index = (index - 1) % self._size
-        end_flag = self.done[index] | (index == self.last_index[0])
-        return (index + end_flag) % self._size
+        index = np.asarray(index) % max(self._size, 1)
+        return self._ep_index_back(index, num_steps, 0, self.maxsize, self.last_index[0])
 
-    def next(self, index: int | np.ndarray) -> np.ndarray:
+    def next(self, index: int | np.ndarray, num_steps: int | np.ndarray = 1) -> np.ndarray:
         """Return the index of next transition.
 
         The index won't be modified if it is the end of an episode.
+
+        :param index: the index (or indices) of the transitions.
+        :param num_steps: the number of steps to go forward, which may be an array that is
+            broadcast against `index`. Going forward is stopped at the end of an episode (or at the
+            last added transition), i.e. the result is `next` applied `num_steps` times, computed in
+            a single lookup.
+        """
+        index = np.asarray(index) % max(self._size, 1)
+        return self._ep_index_forward(index, num_steps, 0, self.maxsize, self.last_index[0])
+
+    def _ep_index_back(
+        self,
+        index: np.ndarray,
+        num_steps: int | np.ndarray,
+        offset: int | np.ndarray,
+        maxsize: int | np.ndarray,
+        last_index: int | np.ndarray,
+    ) -> np.ndarray:
+        """Go back within the episodes using the episode index tables.
+
+        :param index: the indices of the transitions.
+        :param num_steps: the number of steps to go back.
+        :param offset: the offset of the (sub-)buffers containing the transitions.
+        :param maxsize: the sizes of the (sub-)buffers containing the transitions.
+        :param last_index: the indices of the last added transitions of the (sub-)buffers.
         """
-        end_flag = self.done[index] | (index == self.last_index[0])
-        return (index + (1 - end_flag)) % self._size
+        # going back ends at the oldest transition (following the last added one), since its
+        # predecessors, possibly including the beginning of its episode, have been overwritten
+        num_preceding = np.minimum(self._ep_step_idx[index], (index - last_index - 1) % maxsize)
+        return offset + (index - offset - np.minimum(num_steps, num_preceding)) % maxsize
+
+    def _ep_index_forward(
+        self,
+        index: np.ndarray,
+        num_steps: int | np.ndarray,
+        offset: int | np.ndarray,
+        maxsize: int | np.ndarray,
+        last_index: int | np.ndarray,
+    ) -> np.ndarray:
+        """Go forward within the episodes using the episode index tables; see `_ep_index_back`."""
+        end_index = self._ep_end_idx[index]
+        end_index = np.where(end_index < 0, last_index, end_index + offset)
+        num_following = (end_index - index) % maxsize
+        return offset + (index - offset + np.minimum(num_steps, num_following)) % maxsize
 
     def update(self, buffer: "ReplayBuffer") -> np.ndarray:
         """Move the data from the given buffer to current buffer.
@@ -346,11 +506,12 @@ class ReplayBuffer:
         if len(from_indices) == 0:
             return np.array([], int)
         updated_indices = []
-        for _ in range(len(from_indices)):
+        for done in buffer.done[from_indices]:
             updated_indices.append(self._insertion_idx)
             self.last_index[0] = self._insertion_idx
             self._insertion_idx = (self._insertion_idx + 1) % self.maxsize
             self._size = min(self._size + 1, self.maxsize)
+            self._update_ep_index(self.last_index[0], done)
         updated_indices = np.array(updated_indices)
         if len(self._meta.get_keys()) == 0:
             self._meta = create_value(buffer._meta, self.maxsize, stack=False)  # type: ignore
@@ -378,6 +539,7 @@ class ReplayBuffer:
         self.last_index[0] = cur_insertion_idx = self._insertion_idx
         self._size = min(self._size + 1, self.maxsize)
         self._insertion_idx = (self._insertion_idx + 1) % self.maxsize
+        self._update_ep_index(cur_insertion_idx, done)
 
         self._ep_return += rew  # type: ignore
         self._ep_len += 1
@@ -537,8 +699,7 @@ class ReplayBuffer:
                 np.arange(self._insertion_idx),
             ],
         )
-        for _ in range(self.stack_num - 2):
-            prev_indices = self.prev(prev_indices)
+        prev_indices = self.prev(all_indices, self.stack_num - 2)
         all_indices = all_indices[prev_indices != self.prev(prev_indices)]
         if batch_size > 0:
             return self._random_state.choice(all_indices, batch_size)
@@ -554,6 +715,87 @@ class ReplayBuffer:
         indices = self.sample_indices(batch_size)
         return self[indices], indices
 
+    def get_sequence_indices(
+        self,
+        start_indices: np.ndarray,
+        seq_len: int,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Computes the indices of the sequences of consecutive transitions starting at the given indices.
+
+        A sequence that reaches the end of an episode (or the last transition of an unfinished
+        episode) before `seq_len` transitions is padded by repeating its last index.
+
+        :param start_indices: the indices of the first transitions of the sequences.
+        :param seq_len: the length of the sequences.
+        :return: a pair (indices, mask) of arrays of shape (len(start_indices), seq_len), where
+            mask is False for the padding.
+        """
+        indices = self.next(np.asarray(start_indices)[:, None], np.arange(seq_len))
+        mask = np.ones((len(start_indices), seq_len), dtype=bool)
+        # the next index is the index itself at the end of an episode
+        mask[:, 1:] = indices[:, 1:] != indices[:, :-1]
+        return indices, mask
+
+    def get_sequences(self, start_indices: np.ndarray, seq_len: int) -> SequenceBatchProtocol:
+        """Return the sequences of consecutive transitions starting at the given indices.
+
+        All values are gathered in a single pass (as in `self[indices]`) and have the shape
+        (len(start_indices), seq_len, ...). Sequences which reach the end of an episode are padded
+        (see :meth:`get_sequence_indices`) and the padding is marked in the mask.
+        If the hidden states of a recurrent policy are stored (as `policy.hidden_state` by the
+        collector), the states before the first transitions of the sequences are added as
+        `initial_state`, which is, for instance, what a recurrent Q-learning algorithm needs
+        in order to unroll the network over the sequences (after a burn-in period).
+
+        :param start_indices: the indices of the first transitions of the sequences.
+        :param seq_len: the length of the sequences.
+        """
+        indices, mask = self.get_sequence_indices(start_indices, seq_len)
+        layout, leaves = _flatten_batch(cast(Batch, self[indices.reshape(-1)]))
+        leaves = [
+            leaf.reshape(*indices.shape, *leaf.shape[1:])
+            if isinstance(leaf, np.ndarray | torch.Tensor)
+            else leaf
+            for leaf in leaves
+        ]
+        sequences = _unflatten_batch(layout, leaves)
+        sequences.mask = mask
+        sequences.initial_state = None
+        policy_data = self._meta.get("policy")
+        if isinstance(policy_data, Batch) and "hidden_state" in policy_data.get_keys():
+            # the stored hidden state of a transition is the one after the policy's step,
+            # i.e. the state before the next transition in the episode
+            prev_indices = self.prev(indices[:, 0])
+            is_episode_start = prev_indices == indices[:, 0]
+            initial_state = policy_data.hidden_state[prev_indices]
+            state_leaves = (
+                _flatten_batch(initial_state)[1]
+                if isinstance(initial_state, Batch)
+                else [initial_state]
+            )
+            for state_leaf in state_leaves:
+                if isinstance(state_leaf, np.ndarray | torch.Tensor):
+                    state_leaf[is_episode_start] = 0
+            sequences.initial_state = initial_state
+        return cast(SequenceBatchProtocol, sequences)
+
+    def sample_sequences(
+        self,
+        batch_size: int | None,
+        seq_len: int,
+    ) -> tuple[SequenceBatchProtocol, np.ndarray]:
+        """Get a random sample of sequences of consecutive transitions from the buffer.
+
+        This is the sequence counterpart of :meth:`sample`, e.g. for training recurrent policies;
+        see :meth:`get_sequences` for the structure of the returned batch.
+
+        :param batch_size: the number of sequences; see :meth:`sample_indices` for the semantics.
+        :param seq_len: the length of the sequences.
+        :return: the sequences and the indices of their first transitions.
+        """
+        start_indices = self.sample_indices(batch_size)
+        return self.get_sequences(start_indices, seq_len), start_indices
+
     def get(
         self,
         index: int | list[int] | np.ndarray,
@@ -585,68 +827,93 @@ class ReplayBuffer:
             if stack_num == 1:  # the most common case
                 return val[index]
 
-            stack = list[Any]()
-            indices = np.array(index) if isinstance(index, list) else index
-            # NOTE: stack_num > 1, so the range is not empty and indices is turned into
-            # np.ndarray by self.prev
-            for _ in range(stack_num):
-                stack = [val[indices], *stack]
-                indices = self.prev(indices)
-            indices = cast(np.ndarray, indices)
-            if isinstance(val, Batch):
-                return Batch.stack(stack, axis=indices.ndim)
-            return np.stack(stack, axis=indices.ndim)
+            # gather [val[prev^(stack_num - 1)(index)], ..., val[index]] along a new last axis of the index
+            stacked_indices = self.prev(
+                np.asarray(index)[..., None],
+                np.arange(stack_num - 1, -1, -1),
+            )
+            return val[stacked_indices]
 
         except IndexError as exception:
             if not (isinstance(val, Batch) and len(val.keys()) == 0):
                 raise exception  # val != Batch()
             return Batch()
 
-    def __getitem__(self, index: IndexType) -> RolloutBatchProtocol:
-        """Return a data batch: self[index].
-
-        If stack_num is larger than 1, return the stacked obs and obs_next with shape
-        (batch, len, ...).
-        """
+    def _index_to_indices(self, index: IndexType) -> np.ndarray:
         # TODO: this is a seriously problematic hack leading to
         #  buffer[slice] != buffer[np.arange(slice.start, slice.stop)]
         #  Fix asap, high priority!!!
         if isinstance(index, slice):  # change slice to np array
             # buffer[:] will get all available data
-            indices = (
+            return (
                 self.sample_indices(0)
                 if index == slice(None)
                 else self._indices[: len(self)][index]
             )
-        else:
-            indices = index  # type: ignore
+        return index  # type: ignore
+
+    @staticmethod
+    def _create_batch(indices: IndexType, batch_dict: dict[str, Any]) -> Batch:
+        # indexing the stored data with an index array yields valid batch values, so parsing them can
+        # be skipped; indexing with an integer yields numpy scalars, which need to be converted
+        if isinstance(indices, np.ndarray):
+            return Batch.from_validated(batch_dict)
+        return Batch(batch_dict)
+
+    def _get_value(self, indices: np.ndarray, key: str) -> Any:
+        """Return the value of the given key at the given indices, as in `self[indices]`."""
+        match key:
+            case "obs":
+                return self.get(indices, "obs")
+            case "obs_next":
+                if self._save_obs_next:
+                    return self.get(indices, "obs_next", Batch())
+                return self.get(self.next(indices), "obs", Batch())
+            case "info" | "policy":
+                return self.get(indices, key, Batch())
+            case _:
+                return self._meta[key][indices]
+
+    def get_keys(self, index: IndexType, keys: Sequence[str]) -> Batch:
+        """Return a data batch with only the given keys of `self[index]`.
+
+        This is much cheaper than `self[index]` if only some of the keys are needed,
+        e.g. only "obs_next" for computing targets, since the data of the other keys
+        is not gathered.
+
+        :param index: the index of the data.
+        :param keys: the keys to gather, e.g. ``("obs_next",)``. The key "obs_next" is
+            resolved via :meth:`next` if obs_next is not stored (``ignore_obs_next``).
+        """
+        indices = self._index_to_indices(index)
+        return self._create_batch(indices, {key: self._get_value(indices, key) for key in keys})
+
+    def __getitem__(self, index: IndexType) -> RolloutBatchProtocol:
+        """Return a data batch: self[index].
+
+        If stack_num is larger than 1, return the stacked obs and obs_next with shape
+        (batch, len, ...).
+        """
+        indices = self._index_to_indices(index)
         # raise KeyError first instead of AttributeError,
         # to support np.array([ReplayBuffer()])
-        obs = self.get(indices, "obs")
-        if self._save_obs_next:
-            obs_next = self.get(indices, "obs_next", Batch())
-        else:
-            obs_next_indices = self.next(indices)
-            obs_next = self.get(obs_next_indices, "obs", Batch())
-        # TODO: don't do this
-        batch_dict = {
-            "obs": obs,
-            "act": self.act[indices],
-            "rew": self.rew[indices],
-            "terminated": self.terminated[indices],
-            "truncated": self.truncated[indices],
-            "done": self.done[indices],
-            "obs_next": obs_next,
-            "info": self.get(indices, "info", Batch()),
-            # TODO: what's the use of this key?
-            "policy": self.get(indices, "policy", Batch()),
-        }
         # TODO: don't do this, reduce complexity. Why such a big difference between what is returned
         #   and sub-batches of self._meta?
         missing_keys = set(self._meta.get_keys()) - set(self._input_keys)
-        for key in missing_keys:
-            batch_dict[key] = self._meta[key][indices]
-        return cast(RolloutBatchProtocol, Batch(batch_dict))
+        # TODO: what's the use of the "policy" key?
+        keys = (
+            "obs",
+            "act",
+            "rew",
+            "terminated",
+            "truncated",
+            "done",
+            "obs_next",
+            "info",
+            "policy",
+        )
+        batch_dict = {key: self._get_value(indices, key) for key in (*keys, *missing_keys)}
+        return cast(RolloutBatchProtocol, self._create_batch(indices, batch_dict))
 
     def set_array_at_key(
         self,
@@ -668,3 +935,5 @@ class ReplayBuffer:
         self._meta = self._meta.dropnull()
         self._size = len(self._meta)
         self._insertion_idx = len(self._meta)
+        self.last_index[0] = max(self._size - 1, 0)
+        self._rebuild_ep_index()
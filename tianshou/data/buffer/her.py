@@ -1,10 +1,9 @@
 from collections.abc import Callable
-from typing import Any, Union, cast
+from typing import Any, cast
 
 import numpy as np
 
 from tianshou.data import Batch, ReplayBuffer
-from tianshou.data.batch import BatchProtocol
 from tianshou.data.types import RolloutBatchProtocol
 
 
@@ -15,6 +14,13 @@ class HERReplayBuffer(ReplayBuffer):
     observation is a dictionary with keys ``observation``, ``achieved_goal`` and
     ``desired_goal``. Currently support only HER's future strategy, online sampling.
 
+    The relabeling is applied out-of-place to the sampled batch only, the stored transitions
+    are never modified. The sampled batch carries the relabeling in ``batch.her`` (see
+    :meth:`rewrite_transitions`), which is used by
+    :meth:`~tianshou.algorithm.algorithm_base.Algorithm.compute_nstep_return` for the
+    transitions following the sampled ones. Reading the buffer in any other way (e.g. via
+    indexing or :meth:`get`) returns the stored data.
+
     :param size: the size of the replay buffer.
     :param compute_reward_fn: a function that takes 2 ``np.array`` arguments,
         ``acheived_goal`` and ``desired_goal``, and returns rewards as ``np.array``.
@@ -42,154 +48,148 @@ class HERReplayBuffer(ReplayBuffer):
         self.horizon = horizon
         self.future_p = 1 - 1 / future_k
         self.compute_reward_fn = compute_reward_fn
-        self._original_meta = Batch()
-        self._altered_indices = np.array([])
-
-    def _restore_cache(self) -> None:
-        """Write cached original meta back to `self._meta`.
-
-        It's called everytime before 'writing', 'sampling' or 'saving' the buffer.
-        """
-        if not hasattr(self, "_altered_indices"):
-            return
-
-        if self._altered_indices.size == 0:
-            return
-        self._meta[self._altered_indices] = self._original_meta
-        # Clean
-        self._original_meta = Batch()
-        self._altered_indices = np.array([])
-
-    def reset(self, keep_statistics: bool = False) -> None:
-        self._restore_cache()
-        return super().reset(keep_statistics)
 
-    def save_hdf5(self, path: str, compression: str | None = None) -> None:
-        self._restore_cache()
-        return super().save_hdf5(path, compression)
+    def sample(self, batch_size: int | None) -> tuple[RolloutBatchProtocol, np.ndarray]:
+        """Get a random sample from buffer with size = batch_size, relabeled according to HER.
 
-    def set_batch(self, batch: RolloutBatchProtocol) -> None:
-        self._restore_cache()
-        return super().set_batch(batch)
+        Return all the data in the buffer if batch_size is 0.
 
-    def update(self, buffer: Union["HERReplayBuffer", "ReplayBuffer"]) -> np.ndarray:
-        self._restore_cache()
-        return super().update(buffer)
-
-    def add(
-        self,
-        batch: RolloutBatchProtocol,
-        buffer_ids: np.ndarray | list[int] | None = None,
-    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
-        self._restore_cache()
-        return super().add(batch, buffer_ids)
-
-    def sample_indices(self, batch_size: int | None) -> np.ndarray:
-        """Get a random sample of index with size = batch_size.
-
-        Return all available indices in the buffer if batch_size is 0; return an \
-        empty numpy array if batch_size < 0 or no available index can be sampled. \
-        Additionally, some episodes of the sampled transitions will be re-written \
-        according to HER.
+        :return: Sample data and its corresponding index inside the buffer.
         """
-        self._restore_cache()
-        indices = super().sample_indices(batch_size=batch_size)
-        self.rewrite_transitions(indices.copy())
-        return indices
-
-    def rewrite_transitions(self, indices: np.ndarray) -> None:
-        """Re-write the goal of some sampled transitions' episodes according to HER.
-
-        Currently applies only HER's 'future' strategy. The new goals will be written \
-        directly to the internal batch data temporarily and will be restored right \
-        before the next sampling or when using some of the buffer's method (e.g. \
-        `add`, `save_hdf5`, etc.). This is to make sure that n-step returns \
-        calculation etc., performs correctly without additional alteration.
+        indices = self.sample_indices(batch_size)
+        return _relabel_batch(self[indices], self.rewrite_transitions(indices)), indices
+
+    def rewrite_transitions(self, indices: np.ndarray) -> Batch:
+        """Compute the relabeling of the transitions at the given indices according to HER.
+
+        Currently applies only HER's 'future' strategy: for a fraction of the episodes of the
+        given transitions, the desired goal is replaced by an achieved goal of a later
+        transition of the episode (the same one for all given transitions of the episode).
+        The stored data is not modified.
+
+        :param indices: the indices of the (sampled) transitions.
+        :return: a batch with an entry for each of the given indices containing
+            ``is_relabeled`` (whether the episode of the transition is relabeled),
+            ``desired_goal`` (the relabeled desired goal, or the stored one of the transition)
+            and ``rew`` of shape (len(indices), horizon), the rewards of the transition and of
+            the `horizon - 1` transitions following it in the episode (padded with the last
+            transition of the episode) with respect to ``desired_goal``.
         """
+        # Construct episode trajectories (padded with the last index of the episode)
+        # and the future timestep to use
+        trajectories = self.next(indices, np.arange(self.horizon)[:, None])
+        obs = self._meta.obs
+        assert isinstance(obs, Batch)
+        her = Batch(
+            is_relabeled=np.zeros(len(indices), dtype=bool),
+            desired_goal=obs.desired_goal[indices],
+            rew=self.rew[trajectories].T.astype(np.float32),
+        )
         if indices.size == 0:
-            return
-
-        # Sort indices keeping chronological order
-        indices[indices < self._insertion_idx] += self.maxsize
-        indices = np.sort(indices)
-        indices[indices >= self.maxsize] -= self.maxsize
-
-        # Construct episode trajectories
-        indices = [indices]
-        for _ in range(self.horizon - 1):
-            indices.append(self.next(indices[-1]))
-        indices = np.stack(indices)
-
-        # Calculate future timestep to use
-        current = indices[0]
-        terminal = indices[-1]
-        episodes_len = (terminal - current + self.maxsize) % self.maxsize
-        future_offset = np.random.uniform(size=len(indices[0])) * episodes_len
-        future_offset = np.round(future_offset).astype(int)
-        future_t = (current + future_offset) % self.maxsize
-
-        # Compute indices
-        #   open indices are used to find longest, unique trajectories among
-        #   presented episodes
-        unique_ep_open_indices = np.sort(np.unique(terminal, return_index=True)[1])
-        unique_ep_indices = indices[:, unique_ep_open_indices]
-        #   close indices are used to find max future_t among presented episodes
-        unique_ep_close_indices = np.hstack([(unique_ep_open_indices - 1)[1:], len(terminal) - 1])
-        #   episode indices that will be altered
-        her_ep_indices = np.random.choice(
-            len(unique_ep_open_indices),
-            size=int(len(unique_ep_open_indices) * self.future_p),
-            replace=False,
+            return her
+        terminal = trajectories[-1]
+        episode_len = (terminal - indices) % self._size
+        uniform = np.random.uniform(size=len(indices))
+        future_t = (indices + np.rint(uniform * episode_len).astype(int)) % self._size
+
+        # Episodes are identified by their last index; the goal of an episode is taken from the
+        # future timestep of its latest given transition, such that the goal lies in the future
+        # of all given transitions of the episode
+        unique_terminal, episode_ids = np.unique(terminal, return_inverse=True)
+        latest = np.lexsort((episode_len, episode_ids))
+        latest = latest[np.r_[True, episode_ids[latest][1:] != episode_ids[latest][:-1]]]
+        #   episodes that will be altered
+        her_ep_mask = np.zeros(len(unique_terminal), dtype=bool)
+        her_ep_mask[
+            np.random.choice(
+                len(unique_terminal),
+                size=int(len(unique_terminal) * self.future_p),
+                replace=False,
+            )
+        ] = True
+        is_relabeled = her_ep_mask[episode_ids]
+        if not is_relabeled.any():
+            return her
+
+        # Gather only the goals needed for relabeling instead of whole transitions
+        future_ag = self._get_achieved_goal_next(future_t[latest])
+        goal = future_ag[episode_ids[is_relabeled]]
+        ag_next = self._get_achieved_goal_next(trajectories[:, is_relabeled])
+        rew = self.compute_reward_fn(
+            ag_next.reshape(-1, *ag_next.shape[2:]),
+            np.broadcast_to(goal[None], ag_next.shape).reshape(-1, *goal.shape[1:]),
         )
+        her.is_relabeled = is_relabeled
+        her.desired_goal[is_relabeled] = goal
+        her.rew[is_relabeled] = rew.reshape(self.horizon, -1).T
+        return her
 
-        # Cache original meta
-        self._altered_indices = unique_ep_indices.copy()
-        self._original_meta = self._meta[self._altered_indices].copy()
-
-        # Copy original obs, ep_rew (and obs_next), and obs of future time step
-        ep_obs = self[unique_ep_indices].obs
-        # to satisfy mypy
-        # TODO: add protocol covering these batches
-        assert isinstance(ep_obs, Batch)
-        ep_rew = self[unique_ep_indices].rew
-        if self._save_obs_next:
-            ep_obs_next = self[unique_ep_indices].obs_next
-            # to satisfy mypy
-            assert isinstance(ep_obs_next, Batch)
-            future_obs = self[future_t[unique_ep_close_indices]].obs_next
-        else:
-            future_obs = self[self.next(future_t[unique_ep_close_indices])].obs
-        future_obs = cast(BatchProtocol, future_obs)
-
-        # Re-assign goals and rewards via broadcast assignment
-        ep_obs.desired_goal[:, her_ep_indices] = future_obs.achieved_goal[None, her_ep_indices]
+    def _get_achieved_goal_next(self, indices: np.ndarray) -> np.ndarray:
+        """Return the achieved goals of obs_next at the given indices of the stored data."""
         if self._save_obs_next:
-            ep_obs_next = cast(BatchProtocol, ep_obs_next)
-            ep_obs_next.desired_goal[:, her_ep_indices] = future_obs.achieved_goal[
-                None,
-                her_ep_indices,
-            ]
-            ep_rew[:, her_ep_indices] = self._compute_reward(ep_obs_next)[:, her_ep_indices]
-        else:
-            tmp_ep_obs_next = self[self.next(unique_ep_indices)].obs
-            assert isinstance(tmp_ep_obs_next, Batch)
-            ep_rew[:, her_ep_indices] = self._compute_reward(tmp_ep_obs_next)[:, her_ep_indices]
-
-        # Sanity check
-        assert ep_obs.desired_goal.shape[:2] == unique_ep_indices.shape
-        assert ep_obs.achieved_goal.shape[:2] == unique_ep_indices.shape
-        assert ep_rew.shape == unique_ep_indices.shape
-
-        # Re-write meta
-        assert isinstance(self._meta.obs, Batch)
-        self._meta.obs[unique_ep_indices] = ep_obs
-        if self._save_obs_next:
-            self._meta.obs_next[unique_ep_indices] = ep_obs_next  # type: ignore
-        self._meta.rew[unique_ep_indices] = ep_rew.astype(np.float32)
-
-    def _compute_reward(self, obs: BatchProtocol, lead_dims: int = 2) -> np.ndarray:
-        lead_shape = obs.observation.shape[:lead_dims]
-        g = obs.desired_goal.reshape(-1, *obs.desired_goal.shape[lead_dims:])
-        ag = obs.achieved_goal.reshape(-1, *obs.achieved_goal.shape[lead_dims:])
-        rewards = self.compute_reward_fn(ag, g)
-        return rewards.reshape(*lead_shape, *rewards.shape[1:])
+            obs_next = self._meta.obs_next
+            assert isinstance(obs_next, Batch)
+            return obs_next.achieved_goal[indices]
+        obs = self._meta.obs
+        assert isinstance(obs, Batch)
+        return obs.achieved_goal[self.next(indices)]
+
+
+def _relabel_goals(obs: Batch, her: Batch) -> None:
+    """Replace the desired goals of the observations (one for each entry of `her`, not a view of
+    the stored data) in-place by the relabeled ones.
+    """
+    goal = her.desired_goal[her.is_relabeled]
+    # the goal is the same for all stacked frames of the episode
+    num_stacked_dims = obs.desired_goal.ndim - goal.ndim
+    obs.desired_goal[her.is_relabeled] = goal.reshape(
+        len(goal),
+        *(1,) * num_stacked_dims,
+        *goal.shape[1:],
+    )
+
+
+def _relabel_batch(batch: RolloutBatchProtocol, her: Batch) -> RolloutBatchProtocol:
+    """Apply the relabeling `her` (see :meth:`HERReplayBuffer.rewrite_transitions`) to the
+    sampled batch in-place and store it in ``batch.her``.
+    """
+    for obs in (batch.obs, batch.obs_next):
+        assert isinstance(obs, Batch)
+        _relabel_goals(obs, her)
+    batch.rew[her.is_relabeled] = her.rew[her.is_relabeled, 0]
+    batch.her = her
+    return batch
+
+
+def relabel_nstep_rewards(her: Batch, rew_NI: np.ndarray) -> np.ndarray:
+    """Return the rewards of the n-step trajectories of a sampled batch with its HER relabeling.
+
+    :param her: the relabeling of the sampled batch (see :meth:`HERReplayBuffer.rewrite_transitions`).
+    :param rew_NI: the stored rewards of the transitions at
+        `buffer.next(indices, np.arange(N)[:, None])`, where `indices` are the sampled indices.
+    """
+    horizon = min(len(rew_NI), her.rew.shape[1])
+    rew_NI = rew_NI.copy()
+    rew_NI[:horizon, her.is_relabeled] = her.rew[her.is_relabeled, :horizon].T
+    return rew_NI
+
+
+def relabeled_target_buffer(
+    her: Batch,
+    buffer: ReplayBuffer,
+    indices: np.ndarray,
+) -> tuple[ReplayBuffer, np.ndarray]:
+    """Return a buffer containing the observations s_{t+n} of a sampled batch with its HER
+    relabeling, for the computation of the target values.
+
+    :param her: the relabeling of the sampled batch (see :meth:`HERReplayBuffer.rewrite_transitions`).
+    :param buffer: the buffer the batch was sampled from.
+    :param indices: the indices of the transitions whose obs_next is s_{t+n}, one for each
+        sampled transition.
+    :return: the buffer and the indices of the observations s_{t+n} in it.
+    """
+    obs_next = buffer.get_keys(indices, ("obs_next",)).obs_next
+    _relabel_goals(obs_next, her)
+    target_buffer = ReplayBuffer(len(indices))
+    target_buffer.set_batch(cast(RolloutBatchProtocol, Batch(obs_next=obs_next)))
+    return target_buffer, np.arange(len(indices))
@@ -1,12 +1,12 @@
 from collections.abc import Sequence
-from typing import Union, cast
+from typing import Any, cast
 
 import numpy as np
-from numba import njit
 from overrides import override
 
 from tianshou.data import Batch, HERReplayBuffer, PrioritizedReplayBuffer, ReplayBuffer
 from tianshou.data.batch import alloc_by_keys_diff, create_value
+from tianshou.data.buffer.her import _relabel_batch
 from tianshou.data.types import RolloutBatchProtocol
 
 
@@ -48,21 +48,41 @@ class ReplayBufferManager(ReplayBuffer):
         self._offset = np.array(offset)
         self._extend_offset = np.array([*offset, size])
         self._lengths = np.zeros_like(offset)
+        self._subbuffer_sizes = np.diff(self._extend_offset)
+        self._subbuffer_ids = np.repeat(np.arange(self.buffer_num), self._subbuffer_sizes)
         self.last_index = np.array(last_index)
-        self._compile()
+        self._link_ep_index()
         self._meta: RolloutBatchProtocol
 
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        super().__setstate__(state)
+        # the views of the sub-buffers are not preserved by pickling
+        self._link_ep_index()
+
     @property
     @override
     def subbuffer_edges(self) -> np.ndarray:
         return self._extend_offset
 
-    def _compile(self) -> None:
-        lens = last = index = np.array([0])
-        offset = np.array([0, 1])
-        done = np.array([False, False])
-        _prev_index(index, offset, done, last, lens)
-        _next_index(index, offset, done, last, lens)
+    def _link_ep_index(self) -> None:
+        """Join the episode index tables of the sub-buffers, making the sub-buffers' tables views of the joint ones.
+
+        The tables are maintained by the sub-buffers (in terms of their own indices) when data is added.
+        """
+        self._ep_step_idx = np.concatenate([buf._ep_step_idx for buf in self.buffers])
+        self._ep_end_idx = np.concatenate([buf._ep_end_idx for buf in self.buffers])
+        self._unfinished_mask = np.concatenate([buf._unfinished_mask for buf in self.buffers])
+        self._set_ep_index_for_children()
+
+    def _set_ep_index_for_children(self) -> None:
+        for offset, buf in zip(self._offset, self.buffers, strict=True):
+            buf._ep_step_idx = self._ep_step_idx[offset : offset + buf.maxsize]
+            buf._ep_end_idx = self._ep_end_idx[offset : offset + buf.maxsize]
+            buf._unfinished_mask = self._unfinished_mask[offset : offset + buf.maxsize]
+
+    def _rebuild_ep_index(self) -> None:
+        # the sub-buffers rebuild their tables when their batches are set (see _set_batch_for_children)
+        pass
 
     def __len__(self) -> int:
         return int(self._lengths.sum())
@@ -82,47 +102,27 @@ class ReplayBufferManager(ReplayBuffer):
         super().set_batch(batch)
         self._set_batch_for_children()
 
-    def unfinished_index(self) -> np.ndarray:
-        return np.concatenate(
-            [
-                buf.unfinished_index() + offset
-                for offset, buf in zip(self._offset, self.buffers, strict=True)
-            ],
+    def prev(self, index: int | np.ndarray, num_steps: int | np.ndarray = 1) -> np.ndarray:
+        index = np.asarray(index) % self.maxsize
+        buffer_ids = self._subbuffer_ids[index]
+        return self._ep_index_back(
+            index,
+            num_steps,
+            self._offset[buffer_ids],
+            self._subbuffer_sizes[buffer_ids],
+            self.last_index[buffer_ids],
         )
 
-    def prev(self, index: int | np.ndarray) -> np.ndarray:
-        if isinstance(index, list | np.ndarray):
-            return _prev_index(
-                np.asarray(index),
-                self._extend_offset,
-                self.done,
-                self.last_index,
-                self._lengths,
-            )
-        return _prev_index(
-            np.array([index]),
-            self._extend_offset,
-            self.done,
-            self.last_index,
-            self._lengths,
-        )[0]
-
-    def next(self, index: int | np.ndarray) -> np.ndarray:
-        if isinstance(index, list | np.ndarray):
-            return _next_index(
-                np.asarray(index),
-                self._extend_offset,
-                self.done,
-                self.last_index,
-                self._lengths,
-            )
-        return _next_index(
-            np.array([index]),
-            self._extend_offset,
-            self.done,
-            self.last_index,
-            self._lengths,
-        )[0]
+    def next(self, index: int | np.ndarray, num_steps: int | np.ndarray = 1) -> np.ndarray:
+        index = np.asarray(index) % self.maxsize
+        buffer_ids = self._subbuffer_ids[index]
+        return self._ep_index_forward(
+            index,
+            num_steps,
+            self._offset[buffer_ids],
+            self._subbuffer_sizes[buffer_ids],
+            self.last_index[buffer_ids],
+        )
 
     def update(self, buffer: ReplayBuffer) -> np.ndarray:
         """The ReplayBufferManager cannot be updated by any buffer."""
@@ -155,27 +155,16 @@ class ReplayBufferManager(ReplayBuffer):
             batch.pop("obs_next", None)
         elif self._save_only_last_obs:
             batch.obs_next = batch.obs_next[:, -1]
-        # get index
         if buffer_ids is None:
             buffer_ids = np.arange(self.buffer_num)
-        insertion_indxS, ep_lens, ep_returns, ep_idxs = [], [], [], []
-        for batch_idx, buffer_id in enumerate(buffer_ids):
-            # TODO: don't access private method!
-            insertion_index, ep_return, ep_len, ep_start_idx = self.buffers[
-                buffer_id
-            ]._update_state_pre_add(
-                batch.rew[batch_idx],
-                batch.done[batch_idx],
-            )
-            offset_insertion_idx = insertion_index + self._offset[buffer_id]
-            offset_ep_start_idx = ep_start_idx + self._offset[buffer_id]
-            insertion_indxS.append(offset_insertion_idx)
-            ep_lens.append(ep_len)
-            ep_returns.append(ep_return)
-            ep_idxs.append(offset_ep_start_idx)
-            self.last_index[buffer_id] = insertion_index + self._offset[buffer_id]
-            self._lengths[buffer_id] = len(self.buffers[buffer_id])
-        insertion_indxS = np.array(insertion_indxS)
+        # write the data before advancing the sub-buffers' state (insertion indices, sizes, episode
+        # index tables and last_index), such that readers never see indices of unwritten data
+        insertion_indxS = np.array(
+            [
+                self.buffers[buffer_id]._insertion_idx + self._offset[buffer_id]
+                for buffer_id in buffer_ids
+            ],
+        )
         try:
             self._meta[insertion_indxS] = batch
         # TODO: don't do this!
@@ -188,8 +177,22 @@ class ReplayBufferManager(ReplayBuffer):
                 self._meta = create_value(batch, self.maxsize, stack=False)  # type: ignore
             else:  # dynamic key pops up in batch
                 alloc_by_keys_diff(self._meta, batch, self.maxsize, False)
-            self._set_batch_for_children()
             self._meta[insertion_indxS] = batch
+            self._set_batch_for_children()
+        ep_lens, ep_returns, ep_idxs = [], [], []
+        for batch_idx, buffer_id in enumerate(buffer_ids):
+            # TODO: don't access private method!
+            insertion_index, ep_return, ep_len, ep_start_idx = self.buffers[
+                buffer_id
+            ]._update_state_pre_add(
+                batch.rew[batch_idx],
+                batch.done[batch_idx],
+            )
+            ep_lens.append(ep_len)
+            ep_returns.append(ep_return)
+            ep_idxs.append(ep_start_idx + self._offset[buffer_id])
+            self.last_index[buffer_id] = insertion_index + self._offset[buffer_id]
+            self._lengths[buffer_id] = len(self.buffers[buffer_id])
         return (
             insertion_indxS,
             np.array(ep_returns),
@@ -265,6 +268,7 @@ class PrioritizedReplayBufferManager(PrioritizedReplayBuffer, ReplayBufferManage
         #  but it currently leads to infinite recursion. This kind of multiple inheritance with overlapping
         #  interfaces is evil and we should get rid of it
         self.last_index = last_index_from_buffer_manager
+        self._link_ep_index()
 
 
 class HERReplayBufferManager(ReplayBufferManager):
@@ -283,81 +287,29 @@ class HERReplayBufferManager(ReplayBufferManager):
     def __init__(self, buffer_list: list[HERReplayBuffer]) -> None:
         super().__init__(buffer_list)
 
-    def _restore_cache(self) -> None:
-        for buf in self.buffers:
-            buf._restore_cache()
+    def sample(self, batch_size: int | None) -> tuple[RolloutBatchProtocol, np.ndarray]:
+        """Get a random sample from buffer with size = batch_size, relabeled according to HER.
 
-    def save_hdf5(self, path: str, compression: str | None = None) -> None:
-        self._restore_cache()
-        return super().save_hdf5(path, compression)
+        Return all the data in the buffer if batch_size is 0.
 
-    def set_batch(self, batch: RolloutBatchProtocol) -> None:
-        self._restore_cache()
-        return super().set_batch(batch)
+        :return: Sample data and its corresponding index inside the buffer.
+        """
+        indices = self.sample_indices(batch_size)
+        return _relabel_batch(self[indices], self.rewrite_transitions(indices)), indices
 
-    def update(self, buffer: Union["HERReplayBuffer", "ReplayBuffer"]) -> np.ndarray:
-        self._restore_cache()
-        return super().update(buffer)
+    def rewrite_transitions(self, indices: np.ndarray) -> Batch:
+        """Compute the relabeling of the transitions at the given indices according to HER.
 
-    def add(
-        self,
-        batch: RolloutBatchProtocol,
-        buffer_ids: np.ndarray | list[int] | None = None,
-    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
-        self._restore_cache()
-        return super().add(batch, buffer_ids)
-
-
-@njit
-def _prev_index(
-    index: np.ndarray,
-    offset: np.ndarray,
-    done: np.ndarray,
-    last_index: np.ndarray,
-    lengths: np.ndarray,
-) -> np.ndarray:
-    index = index % offset[-1]
-    prev_index = np.zeros_like(index)
-    # disable B905 until strict=True in zip is implemented in numba
-    # https://github.com/numba/numba/issues/8943
-    for start, end, cur_len, last in zip(  # noqa: B905
-        offset[:-1],
-        offset[1:],
-        lengths,
-        last_index,
-    ):
-        mask = (start <= index) & (index < end)
-        correct_cur_len = max(1, cur_len)
-        if np.sum(mask) > 0:
-            subind = index[mask]
-            subind = (subind - start - 1) % correct_cur_len
-            end_flag = done[subind + start] | (subind + start == last)
-            prev_index[mask] = (subind + end_flag) % correct_cur_len + start
-    return prev_index
-
-
-@njit
-def _next_index(
-    index: np.ndarray,
-    offset: np.ndarray,
-    done: np.ndarray,
-    last_index: np.ndarray,
-    lengths: np.ndarray,
-) -> np.ndarray:
-    index = index % offset[-1]
-    next_index = np.zeros_like(index)
-    # disable B905 until strict=True in zip is implemented in numba
-    # https://github.com/numba/numba/issues/8943
-    for start, end, cur_len, last in zip(  # noqa: B905
-        offset[:-1],
-        offset[1:],
-        lengths,
-        last_index,
-    ):
-        mask = (start <= index) & (index < end)
-        correct_cur_len = max(1, cur_len)
-        if np.sum(mask) > 0:
-            subind = index[mask]
-            end_flag = done[subind] | (subind == last)
-            next_index[mask] = (subind - start + 1 - end_flag) % correct_cur_len + start
-    return next_index
+        See :meth:`HERReplayBuffer.rewrite_transitions`.
+        """
+        # the sub-buffers relabel their own episodes
+        buffer_ids = self._subbuffer_ids[indices]
+        positions, hers = [], []
+        for buffer_id, (offset, buf) in enumerate(zip(self._offset, self.buffers, strict=True)):
+            buffer_positions = np.flatnonzero(buffer_ids == buffer_id)
+            if buffer_positions.size > 0:
+                positions.append(buffer_positions)
+                hers.append(buf.rewrite_transitions(indices[buffer_positions] - offset))
+        if not hers:
+            return cast(HERReplayBuffer, self.buffers[0]).rewrite_transitions(indices)
+        return Batch.cat(hers)[np.argsort(np.concatenate(positions))]
@@ -0,0 +1,396 @@
+import logging
+import pickle
+from collections.abc import Sequence
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Self, cast
+
+import gymnasium as gym
+import numpy as np
+
+from tianshou.data import Batch, ReplayBuffer, ReplayBufferManager
+from tianshou.data.types import RolloutBatchProtocol
+
+log = logging.getLogger(__name__)
+
+_ALIGNMENT = 64
+_HEADER_LEN_BYTES = 8
+
+# the columns of the integer-valued state of a sub-buffer
+_INSERTION_IDX, _SIZE, _EP_START_IDX, _EP_LEN = range(4)
+
+
+def _space_layout(space: gym.Space) -> tuple[tuple[int, ...], np.dtype]:
+    """Returns the shape and dtype in which a single element of the space is stored."""
+    if isinstance(space, gym.spaces.Box):
+        return space.shape, space.dtype
+    if isinstance(space, gym.spaces.Discrete):
+        return (), np.dtype(np.int64)
+    if isinstance(space, gym.spaces.MultiDiscrete | gym.spaces.MultiBinary):
+        return tuple(space.shape), np.dtype(np.int64)
+    raise ValueError(
+        f"Spaces of type {type(space).__name__} are not supported by the shared memory buffer.",
+    )
+
+
+def _align(nbytes: int) -> int:
+    return -(-nbytes // _ALIGNMENT) * _ALIGNMENT
+
+
+def _array_layout(spec: dict[str, Any]) -> list[tuple[str, tuple[int, ...], np.dtype]]:
+    """Returns the (name, shape, dtype) of all arrays in the shared memory block in the order in
+    which they are laid out.
+    """
+    total_size, buffer_num = spec["total_size"], spec["buffer_num"]
+    arrays = [(key, (total_size, *shape), np.dtype(dtype)) for key, shape, dtype in spec["fields"]]
+    arrays += [
+        ("_int_state", (buffer_num, 4), np.dtype(np.int64)),
+        ("_ep_return", (buffer_num,), np.dtype(np.float64)),
+        ("_last_index", (buffer_num,), np.dtype(np.int64)),
+        ("_lengths", (buffer_num,), np.dtype(np.int64)),
+        ("_seq", (buffer_num,), np.dtype(np.int64)),
+        ("_ep_step_idx", (total_size,), np.dtype(np.int64)),
+        ("_ep_end_idx", (total_size,), np.dtype(np.int64)),
+        ("_unfinished_mask", (total_size,), np.dtype(bool)),
+    ]
+    return arrays
+
+
+class _SharedStateReplayBuffer(ReplayBuffer):
+    """A sub-buffer of :class:`SharedMemoryVectorReplayBuffer`, whose insertion index, size and
+    episode statistics live in shared memory instead of Python attributes.
+    """
+
+    def __init__(self, size: int, int_state: np.ndarray, ep_return: np.ndarray, **kwargs: Any):
+        # placeholders, such that the base class can initialize the state without modifying the
+        # shared state (which other processes may already be using)
+        self._int_state = np.zeros(4, dtype=np.int64)
+        self._ep_return_state = np.zeros(1, dtype=np.float64)
+        super().__init__(size, **kwargs)
+        self._int_state = int_state
+        self._ep_return_state = ep_return
+
+    @property
+    def _insertion_idx(self) -> int:
+        return int(self._int_state[_INSERTION_IDX])
+
+    @_insertion_idx.setter
+    def _insertion_idx(self, value: int) -> None:
+        self._int_state[_INSERTION_IDX] = value
+
+    @property
+    def _size(self) -> int:
+        return int(self._int_state[_SIZE])
+
+    @_size.setter
+    def _size(self, value: int) -> None:
+        self._int_state[_SIZE] = value
+
+    @property
+    def _ep_start_idx(self) -> int:
+        return int(self._int_state[_EP_START_IDX])
+
+    @_ep_start_idx.setter
+    def _ep_start_idx(self, value: int) -> None:
+        self._int_state[_EP_START_IDX] = value
+
+    @property
+    def _ep_len(self) -> int:
+        return int(self._int_state[_EP_LEN])
+
+    @_ep_len.setter
+    def _ep_len(self, value: int) -> None:
+        self._int_state[_EP_LEN] = value
+
+    @property
+    def _ep_return(self) -> float:
+        return float(self._ep_return_state[0])
+
+    @_ep_return.setter
+    def _ep_return(self, value: float) -> None:
+        self._ep_return_state[0] = value
+
+
+class SharedMemoryVectorReplayBuffer(ReplayBufferManager):
+    """A VectorReplayBuffer whose data and state live in a single shared memory block, such that
+    it can be written to and sampled from by several processes.
+
+    Besides the stored transitions, the block contains the state of all sub-buffers (insertion
+    indices, sizes, episode statistics, episode index tables, ``last_index`` and the sub-buffer
+    lengths), so all processes that have attached to the buffer see the same buffer. Other
+    processes attach via :meth:`attach` (using the buffer's :attr:`name`), or implicitly by
+    unpickling the buffer.
+
+    Synchronization is lock-free and relies on the following contract: every sub-buffer has a
+    single writer, i.e. processes writing concurrently must write to disjoint sub-buffers (which can
+    be enforced by passing ``buffer_ids`` to :meth:`attach`). Each sub-buffer has a sequence
+    counter, which its writer increments before and after every write (an odd value thus indicates
+    a write in progress). :meth:`sample` uses the counters to detect samples that may have been
+    (partially) overwritten while being read, and samples again in that case. Other ways of reading
+    the data (e.g. indexing or :meth:`prev`/:meth:`next`) are unsynchronized. Since a write stores
+    the data before it advances the sub-buffer's insertion index, ``last_index`` and episode index
+    tables, following these from a sampled index (e.g. for n-step returns) never reaches unwritten
+    transitions; only the oldest transitions, which are being overwritten, may be read while they
+    change.
+
+    Since shared memory cannot grow, the data layout is determined at construction from the
+    observation and action spaces: the keys obs, obs_next, act, rew, terminated, truncated and
+    done are stored, whereas info and policy are not (reading them yields empty batches).
+
+    :param total_size: the total size of the buffer.
+    :param buffer_num: the number of sub-buffers, which are under the same configuration.
+    :param observation_space: the observation space, which determines the shape and dtype of obs
+        and obs_next.
+    :param action_space: the action space, which determines the shape and dtype of act.
+
+    Other input arguments (stack_num/ignore_obs_next/save_only_last_obs/sample_avail)
+    are the same as :class:`~tianshou.data.ReplayBuffer`.
+
+    .. seealso::
+
+        Please refer to :class:`~tianshou.data.ReplayBuffer` for other APIs' usage.
+    """
+
+    def __init__(
+        self,
+        total_size: int,
+        buffer_num: int,
+        observation_space: gym.Space,
+        action_space: gym.Space,
+        **kwargs: Any,
+    ) -> None:
+        assert buffer_num > 0
+        size = int(np.ceil(total_size / buffer_num))
+        obs_shape, obs_dtype = _space_layout(observation_space)
+        if kwargs.get("save_only_last_obs", False):
+            obs_shape = obs_shape[1:]
+        act_shape, act_dtype = _space_layout(action_space)
+        fields = [
+            ("obs", obs_shape, obs_dtype.str),
+            ("act", act_shape, act_dtype.str),
+            ("rew", (), np.dtype(np.float64).str),
+            ("terminated", (), np.dtype(bool).str),
+            ("truncated", (), np.dtype(bool).str),
+            ("done", (), np.dtype(bool).str),
+        ]
+        if not kwargs.get("ignore_obs_next", False):
+            fields.append(("obs_next", obs_shape, obs_dtype.str))
+        spec = {
+            "total_size": size * buffer_num,
+            "buffer_num": buffer_num,
+            "fields": fields,
+            "kwargs": kwargs,
+        }
+        header = pickle.dumps(spec)
+        data_start = _align(_HEADER_LEN_BYTES + len(header))
+        nbytes = data_start + sum(
+            _align(int(np.prod(shape)) * dtype.itemsize) for _, shape, dtype in _array_layout(spec)
+        )
+        shm = SharedMemory(create=True, size=nbytes)
+        assert shm.buf is not None  # for mypy
+        shm.buf[:_HEADER_LEN_BYTES] = len(header).to_bytes(_HEADER_LEN_BYTES, "little")
+        shm.buf[_HEADER_LEN_BYTES : _HEADER_LEN_BYTES + len(header)] = header
+        self._init_from_shared_memory(shm, spec, data_start, is_owner=True, buffer_ids=None)
+
+    @classmethod
+    def attach(cls, name: str, buffer_ids: Sequence[int] | np.ndarray | None = None) -> Self:
+        """Attaches to a buffer that was created in another process.
+
+        :param name: the name of the buffer (see :attr:`name`).
+        :param buffer_ids: the ids of the sub-buffers this process may write to; these should be
+            disjoint from the sub-buffers that other processes write to. If None, writes are not
+            restricted.
+        """
+        shm = SharedMemory(name)
+        assert shm.buf is not None  # for mypy
+        header_len = int.from_bytes(shm.buf[:_HEADER_LEN_BYTES], "little")
+        spec = pickle.loads(shm.buf[_HEADER_LEN_BYTES : _HEADER_LEN_BYTES + header_len])
+        data_start = _align(_HEADER_LEN_BYTES + header_len)
+        buffer = cls.__new__(cls)
+        buffer._init_from_shared_memory(
+            shm,
+            spec,
+            data_start,
+            is_owner=False,
+            buffer_ids=buffer_ids,
+        )
+        return buffer
+
+    def _init_from_shared_memory(
+        self,
+        shm: SharedMemory,
+        spec: dict[str, Any],
+        data_start: int,
+        is_owner: bool,
+        buffer_ids: Sequence[int] | np.ndarray | None,
+    ) -> None:
+        arrays: dict[str, np.ndarray] = {}
+        offset = data_start
+        for key, shape, dtype in _array_layout(spec):
+            arrays[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+            offset += _align(int(np.prod(shape)) * dtype.itemsize)
+        buffer_num = spec["buffer_num"]
+        size = spec["total_size"] // buffer_num
+        buffer_list: list[ReplayBuffer] = [
+            _SharedStateReplayBuffer(
+                size,
+                arrays["_int_state"][i],
+                arrays["_ep_return"][i : i + 1],
+                **spec["kwargs"],
+            )
+            for i in range(buffer_num)
+        ]
+        super().__init__(buffer_list)
+        self._shm = shm
+        self._is_owner = is_owner
+        self._writable_buffer_ids = None if buffer_ids is None else np.asarray(buffer_ids)
+        self._seq = arrays["_seq"]
+        if is_owner:
+            arrays["_last_index"][:] = self.last_index
+            arrays["_lengths"][:] = self._lengths
+        self.last_index = arrays["_last_index"]
+        self._lengths = arrays["_lengths"]
+        keys = [key for key, _, _ in spec["fields"]]
+        self.set_batch(cast(RolloutBatchProtocol, Batch({key: arrays[key] for key in keys})))
+        # after setting the batch, which rebuilds the (not yet shared) episode index tables
+        if is_owner:
+            arrays["_ep_step_idx"][:] = self._ep_step_idx
+            arrays["_ep_end_idx"][:] = self._ep_end_idx
+            arrays["_unfinished_mask"][:] = self._unfinished_mask
+        self._ep_step_idx = arrays["_ep_step_idx"]
+        self._ep_end_idx = arrays["_ep_end_idx"]
+        self._unfinished_mask = arrays["_unfinished_mask"]
+        self._set_ep_index_for_children()
+
+    @property
+    def name(self) -> str:
+        """The name of the shared memory block, with which other processes can attach."""
+        return self._shm.name
+
+    def __getstate__(self) -> dict[str, Any]:
+        buffer_ids = self._writable_buffer_ids
+        return {
+            "name": self.name,
+            "buffer_ids": None if buffer_ids is None else buffer_ids.tolist(),
+        }
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        attached = self.attach(state["name"], state["buffer_ids"])
+        self.__dict__.update(attached.__dict__)
+
+    def close(self) -> None:
+        """Detaches this process from the shared memory; the buffer cannot be used afterwards."""
+        self.__dict__["_meta"] = Batch()
+        for key in (
+            "buffers",
+            "last_index",
+            "_lengths",
+            "_seq",
+            "_ep_step_idx",
+            "_ep_end_idx",
+            "_unfinished_mask",
+        ):
+            self.__dict__.pop(key, None)
+        try:
+            self._shm.close()
+        except BufferError:
+            log.warning(
+                "Could not detach from the shared memory, as views of the buffer's data are still "
+                "referenced; it is detached once they are garbage collected.",
+            )
+
+    def unlink(self) -> None:
+        """Releases the shared memory once all processes have detached from it.
+
+        Must only be called by the process which created the buffer.
+        """
+        if not self._is_owner:
+            raise RuntimeError("Only the process that created the buffer may unlink it.")
+        self._shm.unlink()
+
+    def reset(self, keep_statistics: bool = False) -> None:
+        # update the shared arrays in place; must not be called while other processes write
+        # (the ActorLearnerCollector pauses its actors for this)
+        self.last_index[:] = self._offset
+        self._lengths[:] = 0
+        for buf in self.buffers:
+            buf.reset(keep_statistics=keep_statistics)
+
+    def add(
+        self,
+        batch: RolloutBatchProtocol,
+        buffer_ids: np.ndarray | list[int] | None = None,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Add a batch of data into the buffer.
+
+        Each of the data's length (first dimension) must equal to the length of
+        buffer_ids. By default buffer_ids is the ids of the sub-buffers this process may write
+        to (all sub-buffers, unless restricted when attaching).
+        """
+        if buffer_ids is None:
+            if self._writable_buffer_ids is None:
+                buffer_ids = np.arange(self.buffer_num)
+            else:
+                buffer_ids = self._writable_buffer_ids
+        buffer_ids = np.asarray(buffer_ids)
+        if (
+            self._writable_buffer_ids is not None
+            and not np.isin(
+                buffer_ids,
+                self._writable_buffer_ids,
+            ).all()
+        ):
+            raise ValueError(
+                f"This process may only write to the sub-buffers {self._writable_buffer_ids}, "
+                f"but got {buffer_ids=}.",
+            )
+        # keys which are not stored would make the base class reallocate the (shared) data
+        batch = cast(
+            RolloutBatchProtocol,
+            Batch({key: batch[key] for key in self._meta.get_keys() if key in batch.get_keys()}),
+        )
+        self._seq[buffer_ids] += 1
+        try:
+            return super().add(batch, buffer_ids=buffer_ids)
+        finally:
+            self._seq[buffer_ids] += 1
+
+    def _stale_mask(
+        self,
+        indices: np.ndarray,
+        seq_before: np.ndarray,
+        insertion_idx_before: np.ndarray,
+    ) -> np.ndarray:
+        """Determines which of the sampled indices may have been written to since the snapshot of
+        the sequence counters and insertion indices was taken.
+        """
+        buffer_ids = np.searchsorted(self._extend_offset, indices, side="right") - 1
+        # the number of writes that started since the snapshot, including a write that was in
+        # progress when the snapshot was taken
+        num_writes = (self._seq - seq_before + 1) // 2 + seq_before % 2
+        # reading data at an index may involve neighbouring indices (frame stacking, obs_next)
+        margin = self.stack_num if self.stack_num > 1 or not self._save_obs_next else 1
+        maxsize = self._extend_offset[1:] - self._offset
+        local_indices = indices - self._offset[buffer_ids]
+        distance = (local_indices - insertion_idx_before[buffer_ids]) % maxsize[buffer_ids]
+        written = num_writes[buffer_ids] > 0
+        near_insertion = (distance < num_writes[buffer_ids] + margin) | (
+            distance >= maxsize[buffer_ids] - margin
+        )
+        return written & near_insertion
+
+    def sample(self, batch_size: int | None) -> tuple[RolloutBatchProtocol, np.ndarray]:
+        """Get a random sample from buffer with size = batch_size.
+
+        Return all the data in the buffer if batch_size is 0. Concurrent writes by other
+        processes are taken into account, i.e. no returned transition is read while it is being
+        written.
+
+        :return: Sample data and its corresponding index inside the buffer.
+        """
+        while True:
+            seq_before = self._seq.copy()
+            insertion_idx_before = np.array([buf._insertion_idx for buf in self.buffers])
+            indices = self.sample_indices(batch_size)
+            batch = self[indices]
+            if not self._stale_mask(indices, seq_before, insertion_idx_before).any():
+                return batch, indices
@@ -4,7 +4,7 @@ import warnings
 from abc import ABC, abstractmethod
 from copy import copy
 from dataclasses import dataclass, field
-from typing import Any, Generic, Optional, Protocol, Self, TypedDict, TypeVar, cast
+from typing import Any, Generic, Literal, Optional, Protocol, Self, TypedDict, TypeVar, cast
 
 import gymnasium as gym
 import numpy as np
@@ -13,7 +13,11 @@ from overrides import override
 from torch.distributions import Categorical, Distribution
 
 from tianshou.algorithm import Algorithm
-from tianshou.algorithm.algorithm_base import Policy, episode_mc_return_to_go
+from tianshou.algorithm.algorithm_base import (
+    InferencePolicy,
+    Policy,
+    episode_mc_return_to_go,
+)
 from tianshou.config import ENABLE_VALIDATION
 from tianshou.data import (
     Batch,
@@ -35,6 +39,7 @@ from tianshou.data.types import (
 from tianshou.env import BaseVectorEnv, DummyVectorEnv
 from tianshou.utils.determinism import TraceLogger
 from tianshou.utils.print import DataclassPPrintMixin
+from tianshou.utils.profiling import Profiler
 from tianshou.utils.torch_utils import torch_train_mode
 
 log = logging.getLogger(__name__)
@@ -586,6 +591,7 @@ class Collector(BaseCollector[TCollectStats], Generic[TCollectStats]):
         on_step_hook: Optional["StepHookProtocol"] = None,
         raise_on_nan_in_buffer: bool = ENABLE_VALIDATION,
         collect_stats_class: type[TCollectStats] = CollectStats,  # type: ignore[assignment]
+        policy_export: Literal["eager", "compile"] | None = None,
     ) -> None:
         """
         :param policy: a tianshou policy or algorithm
@@ -626,6 +632,14 @@ class Collector(BaseCollector[TCollectStats], Generic[TCollectStats]):
         :param collect_stats_class: the class to use for collecting statistics. Allows customizing
             the stats collection logic by passing a subclass of :class:`CollectStats`. Changing
             this is rarely necessary and is mainly done by "power users".
+        :param policy_export: if not None, actions are computed by an :class:`InferencePolicy`
+            exporting the policy's acting path (using the given mode), which avoids most of the
+            overhead of calling the policy's `forward` method. This is particularly useful for
+            CPU-bound collection with small networks. It is supported only for feed-forward
+            policies with array observations (i.e. not for dict observations, e.g. ones carrying
+            action masks) that implement
+            :meth:`~tianshou.algorithm.algorithm_base.Policy.create_inference_module`.
+            Note that no action distributions are available to step hooks in this case.
         """
         super().__init__(
             policy,
@@ -635,6 +649,9 @@ class Collector(BaseCollector[TCollectStats], Generic[TCollectStats]):
             collect_stats_class=collect_stats_class,
             raise_on_nan_in_buffer=raise_on_nan_in_buffer,
         )
+        self._inference_policy = (
+            InferencePolicy(self.policy, mode=policy_export) if policy_export is not None else None
+        )
 
         self._pre_collect_obs_RO: np.ndarray | None = None
         self._pre_collect_info_R: np.ndarray | None = None
@@ -726,6 +743,15 @@ class Collector(BaseCollector[TCollectStats], Generic[TCollectStats]):
             # TODO: instead use a (uniform) Distribution instance that corresponds to sampling from action_space
             action_dist_R = None
 
+        elif self._inference_policy is not None:
+            act_RA, act_normalized_RA = self._inference_policy(
+                last_obs_RO,
+                exploration_noise=self.exploration_noise,
+            )
+            policy_R = Batch()
+            hidden_state_RH = None
+            action_dist_R = None
+
         else:
             info_batch = _HACKY_create_info_batch(last_info_R)
             obs_batch_R = cast(ObsBatchProtocol, Batch(obs=last_obs_RO, info=info_batch))
@@ -864,40 +890,43 @@ class Collector(BaseCollector[TCollectStats], Generic[TCollectStats]):
 
             # Step 2
             # get the next action and related stats from the previous observation
-            collect_action_computation_batch_R = self._compute_action_policy_hidden(
-                random=random,
-                ready_env_ids_R=ready_env_ids_R,
-                last_obs_RO=last_obs_RO,
-                last_info_R=last_info_R,
-                last_hidden_state_RH=last_hidden_state_RH,
-            )
+            with Profiler.timer("collect/policy_forward"):
+                collect_action_computation_batch_R = self._compute_action_policy_hidden(
+                    random=random,
+                    ready_env_ids_R=ready_env_ids_R,
+                    last_obs_RO=last_obs_RO,
+                    last_info_R=last_info_R,
+                    last_hidden_state_RH=last_hidden_state_RH,
+                )
             TraceLogger.log(log, lambda: f"Action: {collect_action_computation_batch_R.act}")
 
             # Step 3
-            obs_next_RO, rew_R, terminated_R, truncated_R, info_R = self.env.step(
-                collect_action_computation_batch_R.act_normalized,
-                ready_env_ids_R,
-            )
+            with Profiler.timer("collect/env_step"):
+                obs_next_RO, rew_R, terminated_R, truncated_R, info_R = self.env.step(
+                    collect_action_computation_batch_R.act_normalized,
+                    ready_env_ids_R,
+                )
             if isinstance(info_R, dict):  # type: ignore[unreachable]
                 # This can happen if the env is an envpool env. Then the info returned by step is a dict
                 info_R = _dict_of_arr_to_arr_of_dicts(info_R)  # type: ignore[unreachable]
             done_R = np.logical_or(terminated_R, truncated_R)
 
-            current_step_batch_R = cast(
-                CollectStepBatchProtocol,
-                Batch(
-                    obs=last_obs_RO,
-                    dist=collect_action_computation_batch_R.dist,
-                    act=collect_action_computation_batch_R.act,
-                    policy=collect_action_computation_batch_R.policy_entry,
-                    obs_next=obs_next_RO,
-                    rew=rew_R,
-                    terminated=terminated_R,
-                    truncated=truncated_R,
-                    done=done_R,
-                    info=info_R,
-                ),
-            )
+            with Profiler.timer("collect/batch_construction"):
+                current_step_batch_R = cast(
+                    CollectStepBatchProtocol,
+                    Batch(
+                        obs=last_obs_RO,
+                        dist=collect_action_computation_batch_R.dist,
+                        act=collect_action_computation_batch_R.act,
+                        policy=collect_action_computation_batch_R.policy_entry,
+                        obs_next=obs_next_RO,
+                        rew=rew_R,
+                        terminated=terminated_R,
+                        truncated=truncated_R,
+                        done=done_R,
+                        info=info_R,
+                    ),
+                )
 
             # TODO: only makes sense if render_mode is human.
             #  Also, doubtful whether it makes sense at all for true vectorized envs
@@ -907,13 +936,15 @@ class Collector(BaseCollector[TCollectStats], Generic[TCollectStats]):
                     time.sleep(render)
 
             # Step 4
-            self.run_on_step_hook(
-                collect_action_computation_batch_R,
-                current_step_batch_R,
-            )
+            with Profiler.timer("collect/step_hook"):
+                self.run_on_step_hook(
+                    collect_action_computation_batch_R,
+                    current_step_batch_R,
+                )
 
             # Step 5, collect statistics
-            collect_stats.update_at_step_batch(current_step_batch_R)
+            with Profiler.timer("collect/step_stats"):
+                collect_stats.update_at_step_batch(current_step_batch_R)
             num_episodes_done_this_iter = np.sum(done_R)
             num_collected_episodes += num_episodes_done_this_iter
             step_count += len(ready_env_ids_R)
@@ -926,10 +957,11 @@ class Collector(BaseCollector[TCollectStats], Generic[TCollectStats]):
             batch_to_add_R = copy(current_step_batch_R)
             batch_to_add_R.pop("dist")
             batch_to_add_R = cast(RolloutBatchProtocol, batch_to_add_R)
-            insertion_idx_R, ep_return_R, ep_len_R, ep_start_idx_R = self.buffer.add(
-                batch_to_add_R,
-                buffer_ids=ready_env_ids_R,
-            )
+            with Profiler.timer("collect/buffer_add"):
+                insertion_idx_R, ep_return_R, ep_len_R, ep_start_idx_R = self.buffer.add(
+                    batch_to_add_R,
+                    buffer_ids=ready_env_ids_R,
+                )
 
             # preparing for the next iteration
             # obs_next, info and hidden_state will be modified inplace in the code below,
@@ -970,10 +1002,11 @@ class Collector(BaseCollector[TCollectStats], Generic[TCollectStats]):
                 used to communicate with the vector env, where env ids are selected from this "global" index.
                 Is not suited for selecting from the ready envs (`..._R` arrays), use the local counterpart instead.
                 """
-                obs_reset_DO, info_reset_D = self.env.reset(
-                    env_id=env_done_global_idx_D,
-                    **gym_reset_kwargs,
-                )
+                with Profiler.timer("collect/env_reset"):
+                    obs_reset_DO, info_reset_D = self.env.reset(
+                        env_id=env_done_global_idx_D,
+                        **gym_reset_kwargs,
+                    )
 
                 # Set the hidden state to zero or None for the envs that reached done
                 # TODO: does it have to be so complicated? We should have a single clear type for hidden_state instead of
@@ -997,7 +1030,8 @@ class Collector(BaseCollector[TCollectStats], Generic[TCollectStats]):
                     ep_batch = cast(EpisodeBatchProtocol, self.buffer[ep_index_array])
 
                     # Step 10
-                    episode_hook_additions = self.run_on_episode_done(ep_batch)
+                    with Profiler.timer("collect/episode_hook"):
+                        episode_hook_additions = self.run_on_episode_done(ep_batch)
                     if episode_hook_additions is not None:
                         if n_episode is None:
                             raise ValueError(
@@ -1128,6 +1162,7 @@ class AsyncCollector(Collector[CollectStats]):
         buffer: ReplayBuffer | None = None,
         exploration_noise: bool = False,
         raise_on_nan_in_buffer: bool = True,
+        policy_export: Literal["eager", "compile"] | None = None,
     ) -> None:
         if not env.is_async:
             # TODO: raise an exception?
@@ -1144,6 +1179,7 @@ class AsyncCollector(Collector[CollectStats]):
             exploration_noise,
             collect_stats_class=CollectStats,
             raise_on_nan_in_buffer=raise_on_nan_in_buffer,
+            policy_export=policy_export,
         )
         # E denotes the number of parallel environments: self.env_num
         # At init, E=R but during collection R <= E
@@ -1256,13 +1292,14 @@ class AsyncCollector(Collector[CollectStats]):
                 )
 
             # get the next action
-            collect_batch_R = self._compute_action_policy_hidden(
-                random=random,
-                ready_env_ids_R=ready_env_ids_R,
-                last_obs_RO=last_obs_RO,
-                last_info_R=last_info_R,
-                last_hidden_state_RH=last_hidden_state_RH,
-            )
+            with Profiler.timer("collect/policy_forward"):
+                collect_batch_R = self._compute_action_policy_hidden(
+                    random=random,
+                    ready_env_ids_R=ready_env_ids_R,
+                    last_obs_RO=last_obs_RO,
+                    last_info_R=last_info_R,
+                    last_hidden_state_RH=last_hidden_state_RH,
+                )
 
             # save act_RA/policy_R/ hidden_state_RH before env.step
             self._current_action_in_all_envs_EA[ready_env_ids_R] = collect_batch_R.act
@@ -1286,10 +1323,11 @@ class AsyncCollector(Collector[CollectStats]):
                     self._current_hidden_state_in_all_envs_EH = collect_batch_R.hidden_state
 
             # step in env
-            obs_next_RO, rew_R, terminated_R, truncated_R, info_R = self.env.step(
-                collect_batch_R.act_normalized,
-                ready_env_ids_R,
-            )
+            with Profiler.timer("collect/env_step"):
+                obs_next_RO, rew_R, terminated_R, truncated_R, info_R = self.env.step(
+                    collect_batch_R.act_normalized,
+                    ready_env_ids_R,
+                )
             done_R = np.logical_or(terminated_R, truncated_R)
             # Not all environments of the AsyncCollector might have performed a step in this iteration.
             # Change batch_of_envs_with_step_in_this_iteration here to reflect that ready_env_ids_R has changed.
@@ -1300,20 +1338,21 @@ class AsyncCollector(Collector[CollectStats]):
             except Exception:
                 ready_env_ids_R = np.array([i["env_id"] for i in info_R])
 
-            current_iteration_batch = cast(
-                RolloutBatchProtocol,
-                Batch(
-                    obs=self._current_obs_in_all_envs_EO[ready_env_ids_R],
-                    act=self._current_action_in_all_envs_EA[ready_env_ids_R],
-                    policy=self._current_policy_in_all_envs_E[ready_env_ids_R],
-                    obs_next=obs_next_RO,
-                    rew=rew_R,
-                    terminated=terminated_R,
-                    truncated=truncated_R,
-                    done=done_R,
-                    info=info_R,
-                ),
-            )
+            with Profiler.timer("collect/batch_construction"):
+                current_iteration_batch = cast(
+                    RolloutBatchProtocol,
+                    Batch(
+                        obs=self._current_obs_in_all_envs_EO[ready_env_ids_R],
+                        act=self._current_action_in_all_envs_EA[ready_env_ids_R],
+                        policy=self._current_policy_in_all_envs_E[ready_env_ids_R],
+                        obs_next=obs_next_RO,
+                        rew=rew_R,
+                        terminated=terminated_R,
+                        truncated=truncated_R,
+                        done=done_R,
+                        info=info_R,
+                    ),
+                )
 
             if render:
                 self.env.render()
@@ -1321,10 +1360,11 @@ class AsyncCollector(Collector[CollectStats]):
                     time.sleep(render)
 
             # add data into the buffer
-            ptr_R, ep_rew_R, ep_len_R, ep_idx_R = self.buffer.add(
-                current_iteration_batch,
-                buffer_ids=ready_env_ids_R,
-            )
+            with Profiler.timer("collect/buffer_add"):
+                ptr_R, ep_rew_R, ep_len_R, ep_idx_R = self.buffer.add(
+                    current_iteration_batch,
+                    buffer_ids=ready_env_ids_R,
+                )
 
             # collect statistics
             num_episodes_done_this_iter = np.sum(done_R)
@@ -1333,10 +1373,14 @@ class AsyncCollector(Collector[CollectStats]):
 
             # preparing for the next iteration
             # todo seem we can get rid of this last_sth stuff altogether
-            last_obs_RO = copy(obs_next_RO)
-            last_info_R = copy(info_R)
-            last_hidden_state_RH = copy(
-                self._current_hidden_state_in_all_envs_EH[ready_env_ids_R],  # type: ignore[index]
+            # the arrays returned by env.step are fresh and have already been copied into the
+            # buffer, so they can be reused (and modified) without copying; the same holds for
+            # the result of indexing with an array of ids
+            last_obs_RO = obs_next_RO
+            last_info_R = info_R
+            last_hidden_state_RH = _nullable_slice(
+                self._current_hidden_state_in_all_envs_EH,
+                ready_env_ids_R,
             )
             if num_episodes_done_this_iter:
                 env_ind_local_D = np.where(done_R)[0]
@@ -1348,10 +1392,11 @@ class AsyncCollector(Collector[CollectStats]):
                 # now we copy obs_next_RO to obs, but since there might be
                 # finished episodes, we have to reset finished envs first.
                 gym_reset_kwargs = gym_reset_kwargs or {}
-                obs_reset_DO, info_reset_D = self.env.reset(
-                    env_id=env_ind_global_D,
-                    **gym_reset_kwargs,
-                )
+                with Profiler.timer("collect/env_reset"):
+                    obs_reset_DO, info_reset_D = self.env.reset(
+                        env_id=env_ind_global_D,
+                        **gym_reset_kwargs,
+                    )
                 last_obs_RO[env_ind_local_D] = obs_reset_DO
                 last_info_R[env_ind_local_D] = info_reset_D
 
@@ -1359,9 +1404,7 @@ class AsyncCollector(Collector[CollectStats]):
 
             # update based on the current transition in all envs
             self._current_obs_in_all_envs_EO[ready_env_ids_R] = last_obs_RO
-            # this is a list, so loop over
-            for idx, ready_env_id in enumerate(ready_env_ids_R):
-                self._current_info_in_all_envs_E[ready_env_id] = last_info_R[idx]
+            self._current_info_in_all_envs_E[ready_env_ids_R] = last_info_R
             if self._current_hidden_state_in_all_envs_EH is not None:
                 # Need to cast since if it's a Tensor, the assignment might in fact fail if hidden_state_RH is not
                 # a tensor as well. This is hard to express with proper typing, even using @overload, so we cheat
@@ -49,6 +49,20 @@ class PrioBatchProtocol(RolloutBatchProtocol, Protocol):
     """can be used for prioritized replay."""
 
 
+class SequenceBatchProtocol(RolloutBatchProtocol, Protocol):
+    """Sequences of consecutive transitions, where all values have the shape (batch, time, ...).
+
+    Typically, the outcome of sampling sequences from a replay buffer
+    (see :meth:`~tianshou.data.ReplayBuffer.sample_sequences`).
+    """
+
+    mask: np.ndarray
+    """boolean array of shape (batch, time), which is False for the padding after the end of an episode"""
+    initial_state: TArr | BatchProtocol | None
+    """the hidden state of a recurrent policy before the first transition of each sequence (zeros for
+    sequences starting at the beginning of an episode), or None if no hidden states are stored"""
+
+
 class RecurrentStateBatch(BatchProtocol, Protocol):
     """Used by RNNs in policies, contains `hidden` and `cell` fields."""
 
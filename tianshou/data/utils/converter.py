@@ -1,14 +1,16 @@
 import pickle
 from copy import deepcopy
 from numbers import Number
-from typing import Any, Union, no_type_check
+from typing import TYPE_CHECKING, Any, Union, no_type_check
 
-import h5py
 import numpy as np
 import torch
 
 from tianshou.data.batch import Batch, _parse_value
 
+if TYPE_CHECKING:
+    import h5py
+
 
 # TODO: confusing name, could actually return a batch...
 #  Overrides and generic types should be added
@@ -90,12 +92,12 @@ Hdf5ConvertibleValues = Union[
 Hdf5ConvertibleType = dict[str, Hdf5ConvertibleValues]
 
 
-def to_hdf5(x: Hdf5ConvertibleType, y: h5py.Group, compression: str | None = None) -> None:
+def to_hdf5(x: Hdf5ConvertibleType, y: "h5py.Group", compression: str | None = None) -> None:
     """Copy object into HDF5 group."""
 
     def to_hdf5_via_pickle(
         x: object,
-        y: h5py.Group,
+        y: "h5py.Group",
         key: str,
         compression: str | None = None,
     ) -> None:
@@ -148,12 +150,38 @@ def to_hdf5(x: Hdf5ConvertibleType, y: h5py.Group, compression: str | None = Non
             y[k].attrs["__data_type__"] = v.__class__.__name__
 
 
-def from_hdf5(x: h5py.Group, device: str | None = None) -> Hdf5ConvertibleValues:
-    """Restore object from HDF5 group."""
+def hdf5_dataset_to_array(x: "h5py.Dataset", mmap: bool = False) -> np.ndarray:
+    """Read an HDF5 dataset into a numpy array.
+
+    :param x: the dataset.
+    :param mmap: whether to memory-map the dataset instead of reading it into memory.
+        This is possible for contiguous datasets without compression (other datasets are read).
+        The mapping is copy-on-write, i.e. modifications of the array do not affect the file.
+    """
+    # the offset is only defined for contiguous datasets (without chunking and compression)
+    offset = x.id.get_offset()
+    if mmap and offset is not None and x.size > 0:
+        return np.memmap(x.file.filename, dtype=x.dtype, mode="c", offset=offset, shape=x.shape)
+    return x[()]
+
+
+def from_hdf5(
+    x: "h5py.Group",
+    device: str | None = None,
+    mmap: bool = False,
+) -> Hdf5ConvertibleValues:
+    """Restore object from HDF5 group.
+
+    :param x: the group.
+    :param device: the device of restored tensors.
+    :param mmap: whether to memory-map arrays where possible (see :func:`hdf5_dataset_to_array`).
+    """
+    import h5py
+
     if isinstance(x, h5py.Dataset):
         # handle datasets
         if x.attrs["__data_type__"] == "ndarray":
-            return np.array(x)
+            return hdf5_dataset_to_array(x, mmap)
         if x.attrs["__data_type__"] == "Tensor":
             return torch.tensor(x, device=device)
         return pickle.loads(x[()])
@@ -161,5 +189,5 @@ def from_hdf5(x: h5py.Group, device: str | None = None) -> Hdf5ConvertibleValues
     y = dict(x.attrs.items())
     data_type = y.pop("__data_type__", None)
     for k, v in x.items():
-        y[k] = from_hdf5(v, device)
+        y[k] = from_hdf5(v, device, mmap)
     return Batch(y) if data_type == "Batch" else y
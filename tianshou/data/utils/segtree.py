@@ -23,7 +23,6 @@ class SegmentTree:
         self._size = size
         self._bound = bound
         self._value = np.zeros([bound * 2])
-        self._compile()
 
     def __len__(self) -> int:
         return self._size
@@ -81,18 +80,8 @@ class SegmentTree:
         index = _get_prefix_sum_idx(value, self._bound, self._value)
         return index.item() if single else index
 
-    def _compile(self) -> None:
-        f64 = np.array([0, 1], dtype=np.float64)
-        f32 = np.array([0, 1], dtype=np.float32)
-        i64 = np.array([0, 1], dtype=np.int64)
-        _setitem(f64, i64, f64)
-        _setitem(f64, i64, f32)
-        _reduce(f64, 0, 1)
-        _get_prefix_sum_idx(f64, 1, f64)
-        _get_prefix_sum_idx(f32, 1, f64)
 
-
-@njit
+@njit(cache=True)
 def _setitem(tree: np.ndarray, index: np.ndarray, value: np.ndarray) -> None:
     """Numba version, 4x faster: 0.1 -> 0.024."""
     tree[index] = value
@@ -101,7 +90,7 @@ def _setitem(tree: np.ndarray, index: np.ndarray, value: np.ndarray) -> None:
         tree[index] = tree[index * 2] + tree[index * 2 + 1]
 
 
-@njit
+@njit(cache=True)
 def _reduce(tree: np.ndarray, start: int, end: int) -> float:
     """Numba version, 2x faster: 0.009 -> 0.005."""
     # nodes in (start, end) should be aggregated
@@ -116,7 +105,7 @@ def _reduce(tree: np.ndarray, start: int, end: int) -> float:
     return result
 
 
-@njit
+@njit(cache=True)
 def _get_prefix_sum_idx(value: np.ndarray, bound: int, sums: np.ndarray) -> np.ndarray:
     """Numba version (v0.51), 5x speed up with size=100000 and bsz=64.
 
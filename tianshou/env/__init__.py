@@ -6,7 +6,11 @@ from tianshou.env.gym_wrappers import (
     TruncatedAsTerminated,
 )
 from tianshou.env.pettingzoo_env import PettingZooEnv
-from tianshou.env.venv_wrappers import VectorEnvNormObs, VectorEnvWrapper
+from tianshou.env.venv_wrappers import (
+    VectorEnvNormObs,
+    VectorEnvWorkerNormObs,
+    VectorEnvWrapper,
+)
 from tianshou.env.venvs import (
     BaseVectorEnv,
     DummyVectorEnv,
@@ -26,5 +30,6 @@ __all__ = [
     "SubprocVectorEnv",
     "TruncatedAsTerminated",
     "VectorEnvNormObs",
+    "VectorEnvWorkerNormObs",
     "VectorEnvWrapper",
 ]
@@ -1,10 +1,15 @@
+from collections.abc import Callable, Sequence
+from functools import partial
+from multiprocessing.shared_memory import SharedMemory
 from typing import Any
 
+import gymnasium as gym
 import numpy as np
+import numpy.typing as npt
 import torch
 
-from tianshou.env.utils import gym_new_venv_step_type
-from tianshou.env.venvs import GYM_RESERVED_KEYS, BaseVectorEnv
+from tianshou.env.utils import ENV_TYPE, gym_new_venv_step_type
+from tianshou.env.venvs import GYM_RESERVED_KEYS, BaseVectorEnv, SubprocVectorEnv
 from tianshou.utils import RunningMeanStd
 
 
@@ -70,13 +75,25 @@ class VectorEnvNormObs(VectorEnvWrapper):
     """An observation normalization wrapper for vectorized environments.
 
     :param update_obs_rms: whether to update obs_rms. Default to True.
+    :param norm_dtype: the dtype in which observations are normalized, e.g. ``np.float32``;
+        see :class:`~tianshou.utils.RunningMeanStd`.
+
+    .. seealso::
+
+        :class:`VectorEnvWorkerNormObs`, which normalizes observations within the env
+        workers instead of the main process.
     """
 
-    def __init__(self, venv: BaseVectorEnv, update_obs_rms: bool = True) -> None:
+    def __init__(
+        self,
+        venv: BaseVectorEnv,
+        update_obs_rms: bool = True,
+        norm_dtype: npt.DTypeLike | None = None,
+    ) -> None:
         super().__init__(venv)
         # initialize observation running mean/std
         self.update_obs_rms = update_obs_rms
-        self.obs_rms = RunningMeanStd()
+        self.obs_rms = RunningMeanStd(dtype=norm_dtype)
 
     def reset(
         self,
@@ -118,3 +135,261 @@ class VectorEnvNormObs(VectorEnvWrapper):
     def get_obs_rms(self) -> RunningMeanStd:
         """Return observation running mean/std."""
         return self.obs_rms
+
+
+class _SharedObsRms:
+    """Observation statistics in shared memory: the global statistics, which are broadcast to the
+    workers, and the statistics of all observations each worker has seen.
+
+    Each set of statistics is stored as a row ``[count, *mean, *var]`` with a single writer (the main
+    process for the global statistics, the worker for its own statistics). Readers never observe
+    partially written rows, as every row has a sequence counter which its writer increments before
+    and after writing (an odd value indicating a write in progress).
+
+    Instances can be pickled (e.g. to be sent to subprocesses), which attaches to the same memory.
+    """
+
+    def __init__(self, obs_shape: tuple[int, ...], num_workers: int) -> None:
+        self.obs_shape = obs_shape
+        self.num_workers = num_workers
+        row_nbytes = (1 + 2 * int(np.prod(obs_shape))) * 8
+        self._shm = SharedMemory(create=True, size=(num_workers + 1) * (row_nbytes + 8))
+        self._create_views()
+        self._rows[:] = 0
+        self._seqs[:] = 0
+
+    def _create_views(self) -> None:
+        num_rows = self.num_workers + 1
+        row_size = 1 + 2 * int(np.prod(self.obs_shape))
+        self._rows = np.ndarray((num_rows, row_size), dtype=np.float64, buffer=self._shm.buf)
+        self._seqs = np.ndarray(
+            (num_rows,),
+            dtype=np.int64,
+            buffer=self._shm.buf,
+            offset=self._rows.nbytes,
+        )
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {"obs_shape": self.obs_shape, "num_workers": self.num_workers, "_shm": self._shm}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._create_views()
+
+    def version(self) -> int:
+        """The version of the global statistics, which changes whenever they are written."""
+        return int(self._seqs[0])
+
+    def read(self, row: int, dtype: npt.DTypeLike | None = None) -> tuple[RunningMeanStd, int]:
+        """Reads the statistics of the given row (0 for the global statistics, ``1 + i`` for the
+        statistics of the i-th worker).
+
+        :return: the statistics and the version they were read at.
+        """
+        half = self._rows.shape[1] // 2
+        while True:
+            seq = int(self._seqs[row])
+            if seq % 2 == 1:
+                continue
+            data = self._rows[row].copy()
+            if int(self._seqs[row]) == seq:
+                break
+        rms = RunningMeanStd(
+            mean=data[1 : 1 + half].reshape(self.obs_shape),
+            std=data[1 + half :].reshape(self.obs_shape),
+            dtype=dtype,
+        )
+        rms.count = int(data[0])
+        return rms, seq
+
+    def write(self, row: int, rms: RunningMeanStd) -> None:
+        """Writes the statistics of the given row, which must only be written by the calling process."""
+        half = self._rows.shape[1] // 2
+        self._seqs[row] += 1
+        self._rows[row, 0] = rms.count
+        self._rows[row, 1 : 1 + half] = np.ravel(rms.mean)
+        self._rows[row, 1 + half :] = np.ravel(rms.var)
+        self._seqs[row] += 1
+
+    def close(self) -> None:
+        del self._rows, self._seqs
+        self._shm.close()
+
+    def unlink(self) -> None:
+        self._shm.unlink()
+
+
+class _WorkerNormObs(gym.Wrapper):
+    """Normalizes observations with running statistics inside the env worker, see
+    :class:`VectorEnvWorkerNormObs`.
+
+    Observations are normalized with the latest global statistics, updated with the observations
+    the worker has seen since it loaded them.
+    """
+
+    def __init__(
+        self,
+        env: gym.Env,
+        shared_rms: _SharedObsRms,
+        worker_id: int,
+        update_obs_rms: bool,
+        norm_dtype: npt.DTypeLike | None,
+    ) -> None:
+        super().__init__(env)
+        self._shared_rms = shared_rms
+        self._row = 1 + worker_id
+        self._update_obs_rms = update_obs_rms
+        self._norm_dtype = norm_dtype
+        self._loaded_version = -1
+        self.obs_rms = RunningMeanStd(dtype=norm_dtype)
+        # the statistics of all observations of this worker
+        self._worker_rms = RunningMeanStd()
+
+    def _norm_obs(self, obs: np.ndarray) -> np.ndarray:
+        if self._shared_rms.version() != self._loaded_version:
+            self.obs_rms, self._loaded_version = self._shared_rms.read(0, self._norm_dtype)
+        if self._update_obs_rms:
+            obs_batch = np.asarray(obs)[None]
+            self.obs_rms.update(obs_batch)
+            self._worker_rms.update(obs_batch)
+            self._shared_rms.write(self._row, self._worker_rms)
+        return self.obs_rms.norm(obs)  # type: ignore
+
+    def reset(self, **kwargs: Any) -> tuple[np.ndarray, dict[str, Any]]:
+        obs, info = self.env.reset(**kwargs)
+        return self._norm_obs(obs), info
+
+    def step(self, action: Any) -> tuple[np.ndarray, Any, bool, bool, dict[str, Any]]:
+        obs, rew, terminated, truncated, info = self.env.step(action)
+        return self._norm_obs(obs), rew, terminated, truncated, info
+
+
+def _create_worker_norm_env(
+    env_fn: Callable[[], ENV_TYPE],
+    shared_rms: _SharedObsRms,
+    worker_id: int,
+    update_obs_rms: bool,
+    norm_dtype: npt.DTypeLike | None,
+) -> gym.Env:
+    return _WorkerNormObs(env_fn(), shared_rms, worker_id, update_obs_rms, norm_dtype)
+
+
+class VectorEnvWorkerNormObs(VectorEnvWrapper):
+    """An observation normalization wrapper for vectorized environments, which normalizes the
+    observations within the env workers.
+
+    Each worker keeps the statistics of the observations it has seen and normalizes its observations
+    itself. Periodically, the statistics of all workers are reduced into global statistics (in the
+    main process), which are then broadcast to the workers via shared memory. In contrast to
+    :class:`VectorEnvNormObs`, the main process thus neither updates the statistics with every
+    observation nor normalizes them, which matters for high-dimensional observations and many
+    (subprocess) workers.
+
+    :param env_fns: a list of callable envs, ``env_fns[i]()`` generates the i-th env.
+    :param venv_factory: creates the vector env from (wrapped) env functions, e.g.
+        :class:`~tianshou.env.SubprocVectorEnv` or ``partial(SubprocVectorEnv, context="spawn")``.
+    :param update_obs_rms: whether to update the statistics. Default to True.
+    :param sync_interval: the number of calls of :meth:`step` (or :meth:`reset`) after which the
+        statistics are reduced and broadcast.
+    :param norm_dtype: the dtype in which observations are normalized; see
+        :class:`~tianshou.utils.RunningMeanStd`.
+    """
+
+    def __init__(
+        self,
+        env_fns: Sequence[Callable[[], ENV_TYPE]],
+        venv_factory: Callable[[list[Callable[[], gym.Env]]], BaseVectorEnv] = SubprocVectorEnv,
+        update_obs_rms: bool = True,
+        sync_interval: int = 1,
+        norm_dtype: npt.DTypeLike | None = np.float32,
+    ) -> None:
+        if sync_interval < 1:
+            raise ValueError(f"{sync_interval=} must be positive.")
+        dummy_env = env_fns[0]()
+        obs_space = dummy_env.observation_space
+        dummy_env.close()
+        if not isinstance(obs_space, gym.spaces.Box):
+            raise ValueError("Only Box observation spaces can be normalized.")
+        self._shared_rms = _SharedObsRms(obs_space.shape, len(env_fns))
+        # the statistics which the statistics of the workers are combined with
+        self._base_obs_rms = RunningMeanStd(
+            mean=np.zeros(obs_space.shape),
+            std=np.ones(obs_space.shape),
+        )
+        self.obs_rms = self._base_obs_rms
+        # the workers normalize with the base statistics until the first reduction
+        self._shared_rms.write(0, self._base_obs_rms)
+        super().__init__(
+            venv_factory(
+                [
+                    partial(
+                        _create_worker_norm_env,
+                        env_fn,
+                        self._shared_rms,
+                        worker_id,
+                        update_obs_rms,
+                        norm_dtype,
+                    )
+                    for worker_id, env_fn in enumerate(env_fns)
+                ],
+            ),
+        )
+        self.update_obs_rms = update_obs_rms
+        self.sync_interval = sync_interval
+        self._num_calls_since_sync = 0
+
+    def sync_obs_rms(self) -> None:
+        """Reduces the statistics of the workers into the global statistics and broadcasts them to
+        the workers.
+        """
+        obs_rms = RunningMeanStd(mean=self._base_obs_rms.mean, std=self._base_obs_rms.var)
+        obs_rms.count = self._base_obs_rms.count
+        for worker_id in range(self._shared_rms.num_workers):
+            worker_rms, _ = self._shared_rms.read(1 + worker_id)
+            obs_rms.merge(worker_rms)
+        self.obs_rms = obs_rms
+        self._shared_rms.write(0, obs_rms)
+
+    def _after_env_call(self) -> None:
+        if not self.update_obs_rms:
+            return
+        self._num_calls_since_sync += 1
+        if self._num_calls_since_sync >= self.sync_interval:
+            self.sync_obs_rms()
+            self._num_calls_since_sync = 0
+
+    def reset(
+        self,
+        env_id: int | list[int] | np.ndarray | None = None,
+        **kwargs: Any,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        result = self.venv.reset(env_id, **kwargs)
+        self._after_env_call()
+        return result
+
+    def step(
+        self,
+        action: np.ndarray | torch.Tensor | None,
+        id: int | list[int] | np.ndarray | None = None,
+    ) -> gym_new_venv_step_type:
+        result = self.venv.step(action, id)
+        self._after_env_call()
+        return result
+
+    def close(self) -> None:
+        super().close()
+        self._shared_rms.close()
+        self._shared_rms.unlink()
+
+    def set_obs_rms(self, obs_rms: RunningMeanStd) -> None:
+        """Set with given observation running mean/std and broadcast it to the workers.
+
+        The statistics of the observations the workers see from now on (and have seen before) are
+        combined with the given statistics.
+        """
+        self._base_obs_rms = obs_rms
+        self.sync_obs_rms()
+
+    def get_obs_rms(self) -> RunningMeanStd:
+        """Return the global observation running mean/std (as of the last reduction)."""
+        return self.obs_rms
@@ -1,5 +1,7 @@
+import multiprocessing
+import time
 from collections.abc import Callable, Sequence
-from typing import Any, Literal
+from typing import Any, Literal, cast
 
 import gymnasium as gym
 import numpy as np
@@ -12,6 +14,7 @@ from tianshou.env.worker import (
     RayEnvWorker,
     SubprocEnvWorker,
 )
+from tianshou.env.worker.subproc import CompletionQueue
 
 GYM_RESERVED_KEYS = [
     "metadata",
@@ -22,6 +25,14 @@ GYM_RESERVED_KEYS = [
 ]
 
 
+_LIVENESS_CHECK_INTERVAL = 1.0
+"""the interval (in seconds) in which the liveness of stepping subprocess workers is checked while waiting"""
+
+
+def _is_async(env_num: int, wait_num: int | None, timeout: float | None) -> bool:
+    return (wait_num or env_num) != env_num or timeout is not None
+
+
 class BaseVectorEnv:
     """Base class for vectorized environments.
 
@@ -71,6 +82,10 @@ class BaseVectorEnv:
     :param timeout: use in asynchronous simulation same as above, in each
         vectorized step it only deal with those environments spending time
         within ``timeout`` seconds.
+    :param completion_queue: the queue to which the workers post their ids when they
+        finish a step (see :class:`~tianshou.env.worker.subproc.CompletionQueue`). If
+        given, it is used to determine the ready environments in asynchronous
+        simulation instead of ``worker_class.wait``.
     """
 
     def __init__(
@@ -79,6 +94,7 @@ class BaseVectorEnv:
         worker_fn: Callable[[Callable[[], ENV_TYPE]], EnvWorker],
         wait_num: int | None = None,
         timeout: float | None = None,
+        completion_queue: CompletionQueue | None = None,
     ) -> None:
         self._env_fns = env_fns
         # A VectorEnv contains a pool of EnvWorkers, which corresponds to
@@ -97,17 +113,26 @@ class BaseVectorEnv:
         assert self.timeout is None or self.timeout > 0, (
             f"timeout is {timeout}, it should be positive if provided!"
         )
-        self.is_async = self.wait_num != len(env_fns) or timeout is not None
-        self.waiting_conn: list[EnvWorker] = []
-        # environments in self.ready_id is actually ready
-        # but environments in self.waiting_id are just waiting when checked,
+        self.is_async = _is_async(len(env_fns), wait_num, timeout)
+        self._completion_queue = completion_queue
+        # environments which are not waiting are actually ready,
+        # but environments which are waiting are just waiting when checked,
         # and they may be ready now, but this is not known until we check it
-        # in the step() function
-        self.waiting_id: list[int] = []
-        # all environments are ready in the beginning
-        self.ready_id = list(range(self.env_num))
+        # in the step() function; all environments are ready in the beginning
+        self._is_waiting_E = np.zeros(self.env_num, dtype=bool)
+        self._worker_to_env_id = {worker: env_id for env_id, worker in enumerate(self.workers)}
         self.is_closed = False
 
+    @property
+    def waiting_id(self) -> list[int]:
+        """The ids of the environments which are stepping (in asynchronous simulation)."""
+        return np.flatnonzero(self._is_waiting_E).tolist()
+
+    @property
+    def ready_id(self) -> list[int]:
+        """The ids of the environments which can be interacted with."""
+        return np.flatnonzero(~self._is_waiting_E).tolist()
+
     def _assert_is_not_closed(self) -> None:
         assert not self.is_closed, (
             f"Methods of {self.__class__.__name__} cannot be called after close."
@@ -184,11 +209,52 @@ class BaseVectorEnv:
         return [id] if np.isscalar(id) else id  # type: ignore
 
     def _assert_id(self, id: list[int] | np.ndarray) -> None:
-        for i in id:
-            assert i not in self.waiting_id, (
-                f"Cannot interact with environment {i} which is stepping now."
-            )
-            assert i in self.ready_id, f"Can only interact with ready environments {self.ready_id}."
+        is_waiting = self._is_waiting_E[np.asarray(id, dtype=int)]
+        assert not is_waiting.any(), (
+            f"Cannot interact with environments {np.asarray(id)[is_waiting]} which are stepping now."
+        )
+
+    def _wait_for_ready_ids(self) -> list[int]:
+        """Waits until (some of) the stepping environments are ready, according to `wait_num`
+        and `timeout`.
+
+        :return: the ids of the ready environments.
+        """
+        if self._completion_queue is not None:
+            return self._wait_for_completed_ids(self._completion_queue)
+        waiting_workers = [self.workers[env_id] for env_id in np.flatnonzero(self._is_waiting_E)]
+        ready_workers: list[EnvWorker] = []
+        while not ready_workers:
+            ready_workers = self.worker_class.wait(waiting_workers, self.wait_num, self.timeout)
+        return [self._worker_to_env_id[worker] for worker in ready_workers]
+
+    def _wait_for_completed_ids(self, completion_queue: CompletionQueue) -> list[int]:
+        min_num = min(self.wait_num, int(self._is_waiting_E.sum()))
+        deadline = None if self.timeout is None else time.time() + self.timeout
+        ready_ids: list[int] = []
+        while True:
+            if deadline is None or time.time() < deadline:
+                num = min_num - len(ready_ids)
+                remain_time = _LIVENESS_CHECK_INTERVAL
+                if deadline is not None:
+                    remain_time = min(remain_time, deadline - time.time())
+            else:  # timed out, wait for the first ready environment only
+                num, remain_time = 1, _LIVENESS_CHECK_INTERVAL
+            ready_ids.extend(completion_queue.get(num, remain_time).tolist())
+            if len(ready_ids) >= min_num or (
+                ready_ids and deadline is not None and time.time() >= deadline
+            ):
+                return ready_ids
+            # a worker which died while stepping never posts its id; receiving from it raises
+            # an EOFError (as when waiting on the connections without the completion queue)
+            dead_ids = [
+                env_id
+                for env_id in np.flatnonzero(self._is_waiting_E).tolist()
+                if env_id not in ready_ids
+                and not cast(SubprocEnvWorker, self.workers[env_id]).is_alive()
+            ]
+            if dead_ids:
+                return ready_ids + dead_ids
 
     # TODO: for now, has to be kept in sync with reset in EnvPoolMixin
     #  In particular, can't rename env_id to env_ids
@@ -291,23 +357,16 @@ class BaseVectorEnv:
                 assert len(action) == len(id)
                 for act, env_id in zip(action, id, strict=True):
                     self.workers[env_id].send(act)
-                    self.waiting_conn.append(self.workers[env_id])
-                    self.waiting_id.append(env_id)
-                self.ready_id = [x for x in self.ready_id if x not in id]
-            ready_conns: list[EnvWorker] = []
-            while not ready_conns:
-                ready_conns = self.worker_class.wait(self.waiting_conn, self.wait_num, self.timeout)
+                self._is_waiting_E[np.asarray(id, dtype=int)] = True
+            ready_ids = self._wait_for_ready_ids()
             result = []
-            for conn in ready_conns:
-                waiting_index = self.waiting_conn.index(conn)
-                self.waiting_conn.pop(waiting_index)
-                env_id = self.waiting_id.pop(waiting_index)
+            for env_id in ready_ids:
                 # env_return can be (obs, reward, done, info) or
                 # (obs, reward, terminated, truncated, info)
-                env_return = conn.recv()
+                env_return = self.workers[env_id].recv()
                 env_return[-1]["env_id"] = env_id  # Add `env_id` to info
                 result.append(env_return)
-                self.ready_id.append(env_id)
+            self._is_waiting_E[ready_ids] = False
         obs_list, rew_list, term_list, trunc_list, info_list = tuple(zip(*result, strict=True))
         try:
             obs_stack = np.stack(obs_list)
@@ -344,7 +403,7 @@ class BaseVectorEnv:
     def render(self, **kwargs: Any) -> list[Any]:
         """Render all of the environments."""
         self._assert_is_not_closed()
-        if self.is_async and len(self.waiting_id) > 0:
+        if self.is_async and self._is_waiting_E.any():
             raise RuntimeError(
                 f"Environments {self.waiting_id} are still stepping, cannot render them now.",
             )
@@ -386,6 +445,18 @@ class DummyVectorEnv(BaseVectorEnv):
         super().__init__(env_fns, DummyEnvWorker, wait_num, timeout)
 
 
+def _create_completion_queue(
+    env_fns: Sequence[Callable[[], ENV_TYPE]],
+    wait_num: int | None,
+    timeout: float | None,
+    context: Literal["fork", "spawn"] | None,
+) -> CompletionQueue | None:
+    """Creates the completion queue for the subprocess workers of an asynchronous vector env."""
+    if not _is_async(len(env_fns), wait_num, timeout):
+        return None
+    return CompletionQueue(len(env_fns), multiprocessing.get_context(context))
+
+
 class SubprocVectorEnv(BaseVectorEnv):
     """Vectorized environment wrapper based on subprocess.
 
@@ -413,14 +484,24 @@ class SubprocVectorEnv(BaseVectorEnv):
         share_memory: bool = False,
         context: Literal["fork", "spawn"] | None = None,
     ) -> None:
+        completion_queue = _create_completion_queue(env_fns, wait_num, timeout, context)
+        worker_ids = iter(range(len(env_fns)))
+
         def worker_fn(fn: Callable[[], gym.Env]) -> SubprocEnvWorker:
-            return SubprocEnvWorker(fn, share_memory=share_memory, context=context)
+            return SubprocEnvWorker(
+                fn,
+                share_memory=share_memory,
+                context=context,
+                completion_queue=completion_queue,
+                worker_id=next(worker_ids),
+            )
 
         super().__init__(
             env_fns,
             worker_fn,
             wait_num,
             timeout,
+            completion_queue,
         )
 
 
@@ -440,10 +521,18 @@ class ShmemVectorEnv(BaseVectorEnv):
         wait_num: int | None = None,
         timeout: float | None = None,
     ) -> None:
+        completion_queue = _create_completion_queue(env_fns, wait_num, timeout, None)
+        worker_ids = iter(range(len(env_fns)))
+
         def worker_fn(fn: Callable[[], gym.Env]) -> SubprocEnvWorker:
-            return SubprocEnvWorker(fn, share_memory=True)
+            return SubprocEnvWorker(
+                fn,
+                share_memory=True,
+                completion_queue=completion_queue,
+                worker_id=next(worker_ids),
+            )
 
-        super().__init__(env_fns, worker_fn, wait_num, timeout)
+        super().__init__(env_fns, worker_fn, wait_num, timeout, completion_queue)
 
 
 class RayVectorEnv(BaseVectorEnv):
@@ -65,6 +65,58 @@ class ShArray:
         return np.frombuffer(obj, dtype=self.dtype).reshape(self.shape)  # type: ignore
 
 
+class CompletionQueue:
+    """A queue of the ids of the workers which have finished a step, shared by the workers of a vector env.
+
+    Every worker posts its id to a shared ring after sending the result of a step, such that the vector
+    env can retrieve all ready workers in bulk instead of polling the connections of all waiting workers.
+    Since a worker is only sent a new action after its previous result was received, the ring holds at
+    most one entry per worker.
+
+    :param capacity: the number of workers.
+    :param ctx: the multiprocessing context with which the workers are created.
+    """
+
+    def __init__(self, capacity: int, ctx: BaseContext | None) -> None:
+        if ctx is None:
+            ctx = multiprocessing.get_context()
+        self.capacity = capacity
+        self._ring = ctx.RawArray(ctypes.c_int64, capacity)  # type: ignore
+        self._tail = ctx.Value(ctypes.c_int64, 0)  # type: ignore
+        self._num_available = ctx.Semaphore(0)  # type: ignore
+        # only used by the consumer
+        self._head = 0
+
+    def put(self, worker_id: int) -> None:
+        """Posts the id of a worker which has finished a step (called by the workers)."""
+        with self._tail.get_lock():
+            self._ring[self._tail.value % self.capacity] = worker_id
+            self._tail.value += 1
+        self._num_available.release()
+
+    def get(self, min_num: int, timeout: float | None = None) -> np.ndarray:
+        """Retrieves the ids of all workers which have finished a step, waiting until there are at least
+        `min_num` of them or until `timeout` seconds have passed.
+
+        :return: the ids in the order in which the workers finished their steps.
+        """
+        num = 0
+        deadline = None if timeout is None else time.time() + timeout
+        while num < min_num:
+            remain_time = None if deadline is None else deadline - time.time()
+            if remain_time is not None and remain_time <= 0:
+                break
+            if not self._num_available.acquire(timeout=remain_time):
+                break
+            num += 1
+        while self._num_available.acquire(block=False):
+            num += 1
+        ring = np.frombuffer(self._ring, dtype=np.int64)  # type: ignore
+        ids = ring[(self._head + np.arange(num)) % self.capacity]
+        self._head += num
+        return ids
+
+
 def _setup_buf(space: gym.Space, ctx: BaseContext) -> dict | tuple | ShArray:
     if isinstance(space, gym.spaces.Dict):
         return {k: _setup_buf(v, ctx) for k, v in space.spaces.items()}
@@ -74,27 +126,30 @@ def _setup_buf(space: gym.Space, ctx: BaseContext) -> dict | tuple | ShArray:
     return ShArray(space.dtype, space.shape, ctx)  # type: ignore
 
 
+def _encode_obs(
+    obs: dict | tuple | np.ndarray,
+    buffer: dict | tuple | ShArray,
+) -> None:
+    if isinstance(buffer, ShArray):
+        # if buffer is an ShArray, obs must be array-like
+        obs = np.asarray(obs, dtype=buffer.dtype)
+        buffer.save(obs)
+    elif isinstance(obs, tuple) and isinstance(buffer, tuple):
+        for o, b in zip(obs, buffer, strict=True):
+            _encode_obs(o, b)
+    elif isinstance(obs, dict) and isinstance(buffer, dict):
+        for k in obs:
+            _encode_obs(obs[k], buffer[k])
+
+
 def _worker(
     parent: connection.Connection,
     p: connection.Connection,
     env_fn_wrapper: CloudpickleWrapper,
     obs_bufs: dict | tuple | ShArray | None = None,
+    completion_queue: CompletionQueue | None = None,
+    worker_id: int = 0,
 ) -> None:
-    def _encode_obs(
-        obs: dict | tuple | np.ndarray,
-        buffer: dict | tuple | ShArray,
-    ) -> None:
-        if isinstance(buffer, ShArray):
-            # if buffer is an ShArray, obs must be array-like
-            obs = np.asarray(obs, dtype=buffer.dtype)
-            buffer.save(obs)
-        elif isinstance(obs, tuple) and isinstance(buffer, tuple):
-            for o, b in zip(obs, buffer, strict=True):
-                _encode_obs(o, b)
-        elif isinstance(obs, dict) and isinstance(buffer, dict):
-            for k in obs:
-                _encode_obs(obs[k], buffer[k])
-
     parent.close()
     env = env_fn_wrapper.data()
     try:
@@ -110,6 +165,8 @@ def _worker(
                     _encode_obs(env_return[0], obs_bufs)
                     env_return = (None, *env_return[1:])
                 p.send(env_return)
+                if completion_queue is not None:
+                    completion_queue.put(worker_id)
             elif cmd == "reset":
                 obs, info = env.reset(**data)
                 if obs_bufs is not None:
@@ -141,13 +198,23 @@ def _worker(
 
 
 class SubprocEnvWorker(EnvWorker):
-    """Subprocess worker used in SubprocVectorEnv and ShmemVectorEnv."""
+    """Subprocess worker used in SubprocVectorEnv and ShmemVectorEnv.
+
+    :param env_fn: a function creating the environment.
+    :param share_memory: whether to exchange observations through shared memory.
+    :param context: the multiprocessing context (or its name) with which to create the subprocess.
+    :param completion_queue: the queue to which the worker posts `worker_id` whenever it has finished
+        a step, see :class:`CompletionQueue`.
+    :param worker_id: the id of the worker within the vector env.
+    """
 
     def __init__(
         self,
         env_fn: Callable[[], gym.Env],
         share_memory: bool = False,
         context: BaseContext | Literal["fork", "spawn"] | None = None,
+        completion_queue: CompletionQueue | None = None,
+        worker_id: int = 0,
     ) -> None:
         if not isinstance(context, BaseContext):
             context = multiprocessing.get_context(context)
@@ -166,12 +233,18 @@ class SubprocEnvWorker(EnvWorker):
             self.child_remote,
             CloudpickleWrapper(env_fn),
             self.buffer,
+            completion_queue,
+            worker_id,
         )
         self.process = context.Process(target=_worker, args=args, daemon=True)
         self.process.start()
         self.child_remote.close()
         super().__init__(env_fn)
 
+    def is_alive(self) -> bool:
+        """:return: whether the subprocess running the environment is alive"""
+        return self.process.is_alive()
+
     def get_env_attr(self, key: str) -> Any:
         self.parent_remote.send(["getattr", key])
         return self.parent_remote.recv()
@@ -1,13 +1,20 @@
 """Provides a basic interface for launching experiments. The API is experimental and subject to change!."""
 
 import logging
+import multiprocessing
+import os
+import queue
+import time
 from abc import ABC, abstractmethod
-from collections.abc import Callable, Sequence
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
 from copy import copy
 from dataclasses import asdict, dataclass
 from enum import Enum
-from typing import TYPE_CHECKING, Literal
+from typing import TYPE_CHECKING, Any, Literal
 
+import numpy as np
+import torch
 from joblib import Parallel, delayed
 
 from tianshou.data import InfoStats
@@ -147,9 +154,273 @@ class JoblibExpLauncher(ExpLauncher):
         return self._return_from_successful_and_failed_exps(successful_exps, failed_exps)
 
 
+THREAD_LIMIT_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+"""Environment variables through which the thread pools of OpenMP and the BLAS implementations are limited."""
+
+
+@dataclass
+class ProcessPoolConfig:
+    n_jobs: int = -1
+    """The maximum number of concurrently running experiments. The number is further limited by the number of
+    available CPUs and the CPU demand of the experiments (see `cpus_per_experiment`), which alone determine it
+    if -1."""
+    cpus: Sequence[int] | None = None
+    """The ids of the CPUs to distribute among the experiments. If None, all CPUs the current process
+    is allowed to run on are used."""
+    cpus_per_experiment: int | None = None
+    """The number of CPUs an experiment requires. If None, it is derived from the experiments' number of
+    environment worker processes (one CPU per worker, at least one CPU in total), because the main process
+    (policy inference and updates) and the environment workers take turns rather than running concurrently."""
+    pin_cpus: bool = True
+    """Whether to pin each experiment's process to its disjoint set of CPUs. The environment worker processes
+    created by an experiment inherit the pinning, such that experiments cannot interfere with each other."""
+    start_method: Literal["spawn", "forkserver", "fork"] = "spawn"
+    """The multiprocessing start method. With "spawn" and "forkserver", the thread limits also apply to
+    native libraries initialized during the import of torch and numpy in the experiment process."""
+
+
+@dataclass(kw_only=True)
+class ExperimentExecutionReport:
+    """Resource usage and performance of a single experiment executed by a launcher."""
+
+    experiment_name: str
+    seed: int
+    cpus: list[int]
+    """The CPUs the experiment was pinned to (empty if pinning was disabled or unsupported)."""
+    num_threads: int
+    """The number of intra-op threads torch, OpenMP and BLAS were limited to."""
+    wall_time: float
+    """The wall-clock time (in seconds) taken by the experiment."""
+    env_steps: int | None
+    """The number of environment steps collected for training (None if unknown)."""
+    steps_per_second: float | None
+    """The number of training environment steps per second of wall-clock time (None if unknown)."""
+    failed: bool
+
+
+def _get_num_env_worker_processes(exp: "Experiment") -> int:
+    """Returns the number of environment worker processes an experiment creates during training."""
+    from tianshou.highlevel.env import VectorEnvType
+
+    venv_type = getattr(exp.env_factory, "venv_type", None)
+    if venv_type is None or venv_type in (VectorEnvType.DUMMY, VectorEnvType.RAY):
+        return 0
+    # training and test environments are stepped alternately, never at the same time
+    return max(exp.training_config.num_training_envs, exp.training_config.num_test_envs)
+
+
+@contextmanager
+def _environ_overrides(overrides: dict[str, str]) -> Iterator[None]:
+    """Temporarily sets environment variables (e.g. such that they are inherited by a child process)."""
+    original = {key: os.environ.get(key) for key in overrides}
+    os.environ.update(overrides)
+    try:
+        yield
+    finally:
+        for key, value in original.items():
+            if value is None:
+                del os.environ[key]
+            else:
+                os.environ[key] = value
+
+
+def _run_pinned_experiment(
+    experiment_runner: Callable[["Experiment"], InfoStats | None],
+    exp: "Experiment",
+    exp_index: int,
+    cpus: list[int],
+    num_threads: int,
+    result_queue: Any,
+) -> None:
+    """Target function of the experiment processes created by :class:`ProcessPoolExpLauncher`."""
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    torch.set_num_threads(num_threads)
+    # the environment workers share the experiment's CPUs, so they are limited to a single thread
+    # (the variables were already read by the native libraries of this process)
+    os.environ.update(dict.fromkeys(THREAD_LIMIT_ENV_VARS, "1"))
+    start_time = time.perf_counter()
+    result: InfoStats | None | Literal["failed"]
+    try:
+        result = experiment_runner(exp)
+    except BaseException as e:
+        log.error(f"Failed to run experiment {exp}.", exc_info=e)
+        result = "failed"
+    result_queue.put((exp_index, result, time.perf_counter() - start_time))
+
+
+class ProcessPoolExpLauncher(ExpLauncher):
+    """Runs each experiment in a dedicated process with a disjoint set of CPUs and limited intra-op threads.
+
+    Without thread limits, every experiment process (and every environment worker process) initializes
+    torch, OpenMP and BLAS with as many threads as there are cores, such that running many experiments
+    concurrently oversubscribes the machine. This launcher partitions the available CPUs among the concurrently
+    running experiments, pins each experiment process (and thereby its environment workers) to its partition,
+    and limits the thread pools of the experiment process to the size of the partition and those of its
+    environment worker processes to a single thread.
+
+    After :meth:`launch`, the per-experiment wall times and throughputs are available in :attr:`reports`.
+    """
+
+    def __init__(
+        self,
+        process_pool_cfg: ProcessPoolConfig | None = None,
+        experiment_runner: Callable[
+            ["Experiment"], InfoStats | None
+        ] = default_experiment_execution,
+    ) -> None:
+        super().__init__(experiment_runner=experiment_runner)
+        self.process_pool_cfg = (
+            copy(process_pool_cfg) if process_pool_cfg is not None else ProcessPoolConfig()
+        )
+        self.reports: list[ExperimentExecutionReport] = []
+
+    def _get_available_cpus(self) -> list[int]:
+        if self.process_pool_cfg.cpus is not None:
+            return list(self.process_pool_cfg.cpus)
+        if hasattr(os, "sched_getaffinity"):
+            return sorted(os.sched_getaffinity(0))
+        return list(range(os.cpu_count() or 1))
+
+    def _partition_cpus(self, experiments: Sequence["Experiment"]) -> list[list[int]]:
+        """Partitions the available CPUs into one disjoint CPU set per concurrently running experiment."""
+        cpus = self._get_available_cpus()
+        cfg = self.process_pool_cfg
+        cpus_per_experiment = cfg.cpus_per_experiment
+        if cpus_per_experiment is None:
+            cpus_per_experiment = max(
+                1, *(_get_num_env_worker_processes(exp) for exp in experiments)
+            )
+        num_slots = max(1, len(cpus) // cpus_per_experiment)
+        if cfg.n_jobs > 0:
+            if cfg.n_jobs > num_slots:
+                log.warning(
+                    f"Cannot run {cfg.n_jobs} experiments requiring {cpus_per_experiment} CPUs each "
+                    f"concurrently on disjoint sets of {len(cpus)} CPUs; running only {num_slots} "
+                    "experiments at a time",
+                )
+            num_slots = min(num_slots, cfg.n_jobs)
+        num_slots = min(num_slots, len(experiments))
+        return [[int(cpu) for cpu in part] for part in np.array_split(np.array(cpus), num_slots)]
+
+    def _launch(self, experiments: Sequence["Experiment"]) -> list[InfoStats | None]:
+        cfg = self.process_pool_cfg
+        slot_cpus = self._partition_cpus(experiments)
+        pin_cpus = cfg.pin_cpus and hasattr(os, "sched_setaffinity")
+        if cfg.pin_cpus and not pin_cpus:
+            log.warning("CPU pinning is not supported on this platform; only limiting threads")
+        log.info(
+            f"Running {len(experiments)} experiments with at most {len(slot_cpus)} at a time, "
+            f"using CPU sets {slot_cpus}",
+        )
+
+        ctx = multiprocessing.get_context(cfg.start_method)
+        result_queue = ctx.Queue()
+        pending = list(range(len(experiments)))
+        free_slots = list(range(len(slot_cpus)))
+        running: dict[int, tuple[Any, int]] = {}  # experiment index -> (process, slot)
+        results: dict[int, tuple[InfoStats | None | Literal["failed"], float, int]] = {}
+
+        def start_next_experiment() -> None:
+            exp_index = pending.pop(0)
+            slot = free_slots.pop(0)
+            cpus = slot_cpus[slot]
+            num_threads = len(cpus)
+            process = ctx.Process(  # type: ignore[attr-defined]
+                target=_run_pinned_experiment,
+                args=(
+                    self.experiment_runner,
+                    experiments[exp_index],
+                    exp_index,
+                    cpus if pin_cpus else [],
+                    num_threads,
+                    result_queue,
+                ),
+                daemon=False,
+            )
+            # the variables are inherited by the new process (and the environment workers it creates)
+            with _environ_overrides(dict.fromkeys(THREAD_LIMIT_ENV_VARS, str(num_threads))):
+                process.start()
+            running[exp_index] = (process, slot)
+
+        def finish_experiment(
+            exp_index: int,
+            result: InfoStats | None | Literal["failed"],
+            wall_time: float,
+        ) -> None:
+            process, slot = running.pop(exp_index)
+            process.join()
+            free_slots.append(slot)
+            results[exp_index] = (result, wall_time, slot)
+
+        while pending or running:
+            while pending and free_slots:
+                start_next_experiment()
+            try:
+                finish_experiment(*result_queue.get(timeout=1.0))
+            except queue.Empty:
+                # detect processes that terminated without reporting a result (e.g. killed by the OS)
+                for exp_index, (process, _) in list(running.items()):
+                    if not process.is_alive() and result_queue.empty():
+                        log.error(
+                            f"Process of experiment {experiments[exp_index]} terminated with exit code "
+                            f"{process.exitcode} without reporting a result.",
+                        )
+                        finish_experiment(exp_index, "failed", float("nan"))
+
+        self.reports = []
+        successful_exps = []
+        failed_exps = []
+        for exp_index, exp in enumerate(experiments):
+            result, wall_time, slot = results[exp_index]
+            self.reports.append(
+                self._create_report(exp, result, wall_time, slot_cpus[slot], pin_cpus),
+            )
+            if result == "failed":
+                failed_exps.append(exp)
+            else:
+                successful_exps.append(result)
+        for report in self.reports:
+            log.info(f"Experiment execution report: {report}")
+        return self._return_from_successful_and_failed_exps(successful_exps, failed_exps)
+
+    @staticmethod
+    def _create_report(
+        exp: "Experiment",
+        result: InfoStats | None | Literal["failed"],
+        wall_time: float,
+        cpus: list[int],
+        pin_cpus: bool,
+    ) -> ExperimentExecutionReport:
+        env_steps: int | None = None
+        steps_per_second: float | None = None
+        if isinstance(result, InfoStats):
+            env_steps = result.train_step
+            if wall_time > 0:
+                steps_per_second = env_steps / wall_time
+        return ExperimentExecutionReport(
+            experiment_name=exp.name,
+            seed=exp.config.seed,
+            cpus=cpus if pin_cpus else [],
+            num_threads=len(cpus),
+            wall_time=wall_time,
+            env_steps=env_steps,
+            steps_per_second=steps_per_second,
+            failed=result == "failed",
+        )
+
+
 class RegisteredExpLauncher(Enum):
     JOBLIB = "JOBLIB"
     SEQUENTIAL = "SEQUENTIAL"
+    PROCESS_POOL = "PROCESS_POOL"
 
     def create_launcher(self) -> ExpLauncher:
         match self:
@@ -157,6 +428,8 @@ class RegisteredExpLauncher(Enum):
                 return JoblibExpLauncher()
             case RegisteredExpLauncher.SEQUENTIAL:
                 return SequentialExpLauncher()
+            case RegisteredExpLauncher.PROCESS_POOL:
+                return ProcessPoolExpLauncher()
             case _:
                 raise NotImplementedError(
                     f"Launcher {self} is not yet implemented.",
@@ -569,6 +569,11 @@ class ParamsMixinActorAndDualCritics(GetParamTransformersProtocol):
     """factory for the creation of a learning rate scheduler to use for the first critic network (if any)"""
     critic2_lr_scheduler: LRSchedulerFactoryFactory | None = None
     """factory for the creation of a learning rate scheduler to use for the second critic network (if any)"""
+    fuse_twin_critics: bool = False
+    """
+    whether to evaluate the two critics jointly in a single vectorized call; see
+    :class:`~tianshou.algorithm.modelfree.td3.ActorDualCriticsOffPolicyAlgorithm`.
+    """
 
     def _get_param_transformers(self) -> list[ParamTransformer]:
         return [
@@ -670,6 +675,11 @@ class QLearningOffPolicyParams(
     A value of 0.0 means no exploration (fully greedy) and a value of 1.0 means full
     exploration (fully random).
     """
+    fuse_online_forward: bool = False
+    """
+    whether to fuse the forward passes of the online network in the update; see
+    :class:`~tianshou.algorithm.modelfree.dqn.QLearningOffPolicyAlgorithm`.
+    """
 
     def _get_param_transformers(self) -> list[ParamTransformer]:
         transformers = super()._get_param_transformers()
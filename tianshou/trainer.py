@@ -72,6 +72,7 @@ from tianshou.utils import (
 )
 from tianshou.utils.determinism import TraceLogger, torch_param_hash
 from tianshou.utils.logging import set_numerical_fields_to_precision
+from tianshou.utils.profiling import Profiler
 from tianshou.utils.torch_utils import policy_within_training_step
 
 log = logging.getLogger(__name__)
@@ -572,12 +573,27 @@ class Trainer(Generic[TAlgorithm, TTrainerParams], ABC):
         )
 
     def execute_epoch(self) -> EpochStats:
+        with Profiler.timer("trainer/epoch"):
+            epoch_stats = self._execute_epoch()
+        if Profiler.is_enabled:
+            self._log_profile_data()
+        return epoch_stats
+
+    def _log_profile_data(self) -> None:
+        """Logs the latency percentiles of all phases timed by the profiler since the previous call."""
+        profile_data = {
+            name: asdict(phase_stats) for name, phase_stats in Profiler.get_summary().items()
+        }
+        self._logger.log_profile_data(profile_data, self._epoch)
+
+    def _execute_epoch(self) -> EpochStats:
         self._epoch += 1
         TraceLogger.log(log, lambda: f"Epoch #{self._epoch} start")
 
         # perform the required number of steps for the epoch (`epoch_num_steps`)
         steps_done_in_this_epoch = 0
         train_collect_stats, training_stats = None, None
+        last_pbar_postfix_time = -np.inf
         with self._pbar(
             total=self.params.epoch_num_steps, desc=f"Epoch #{self._epoch}", position=1
         ) as t:
@@ -585,7 +601,8 @@ class Trainer(Generic[TAlgorithm, TTrainerParams], ABC):
                 # perform a training step and update progress
                 TraceLogger.log(log, lambda: "Training step")
                 self._current_update_step += 1
-                training_step_result = self._training_step()
+                with Profiler.timer("trainer/training_step"):
+                    training_step_result = self._training_step()
                 steps_done_in_this_epoch += training_step_result.get_steps_in_epoch_advancement()
                 t.update(training_step_result.get_steps_in_epoch_advancement())
                 self._stop_fn_flag = training_step_result.is_training_done()
@@ -597,14 +614,27 @@ class Trainer(Generic[TAlgorithm, TTrainerParams], ABC):
                 )
                 self._log_params(self.algorithm)
 
-                collect_stats = training_step_result.get_collect_stats()
-                if collect_stats is not None:
-                    self._logger.log_training_data(asdict(collect_stats), self._env_step)
-
-                pbar_data_dict = self._create_epoch_pbar_data_dict(training_step_result)
-                pbar_data_dict = set_numerical_fields_to_precision(pbar_data_dict)
-                pbar_data_dict["update_step"] = str(self._current_update_step)
-                t.set_postfix(**pbar_data_dict)
+                with Profiler.timer("trainer/logging"):
+                    collect_stats = training_step_result.get_collect_stats()
+                    if collect_stats is not None:
+                        self._logger.log_training_data(
+                            partial(asdict, collect_stats), self._env_step
+                        )
+
+                    # the progress bar postfix is only updated as often as the progress bar is
+                    # refreshed anyway (and at the end of the epoch), as creating it is comparatively expensive
+                    is_epoch_done = (
+                        steps_done_in_this_epoch >= self.params.epoch_num_steps
+                        or self._stop_fn_flag
+                    )
+                    if not t.disable and (
+                        is_epoch_done or time.monotonic() - last_pbar_postfix_time >= t.mininterval
+                    ):
+                        last_pbar_postfix_time = time.monotonic()
+                        pbar_data_dict = self._create_epoch_pbar_data_dict(training_step_result)
+                        pbar_data_dict = set_numerical_fields_to_precision(pbar_data_dict)
+                        pbar_data_dict["update_step"] = str(self._current_update_step)
+                        t.set_postfix(**pbar_data_dict)
 
         test_collect_stats = None
         if not self._stop_fn_flag:
@@ -617,7 +647,8 @@ class Trainer(Generic[TAlgorithm, TTrainerParams], ABC):
 
             # test step
             if self.params.test_collector is not None:
-                test_collect_stats, self._stop_fn_flag = self._test_step()
+                with Profiler.timer("trainer/test_step"):
+                    test_collect_stats, self._stop_fn_flag = self._test_step()
 
         info_stats = self._create_info_stats()
 
@@ -734,7 +765,8 @@ class Trainer(Generic[TAlgorithm, TTrainerParams], ABC):
         update_stat.smoothed_loss = self._update_moving_avg_stats_and_get_averaged_data(
             cur_losses_dict,
         )
-        self._logger.log_update_data(asdict(update_stat), self._current_update_step)
+        # the conversion of the stats to a dict is deferred until the logger actually logs the data
+        self._logger.log_update_data(partial(asdict, update_stat), self._current_update_step)
 
     # TODO: seems convoluted, there should be a better way of dealing with the moving average stats
     def _update_moving_avg_stats_and_get_averaged_data(
@@ -912,7 +944,8 @@ class OnlineTrainer(
         """
         with policy_within_training_step(self.algorithm.policy):
             # collect data
-            collect_stats = self._collect_training_data()
+            with Profiler.timer("trainer/collect"):
+                collect_stats = self._collect_training_data()
 
             # determine whether we should stop training based on the data collected
             should_stop_training = False
@@ -922,7 +955,8 @@ class OnlineTrainer(
             # perform gradient update step (if not already done)
             training_stats: TrainingStats | None = None
             if not should_stop_training:
-                training_stats = self._update_step(collect_stats)
+                with Profiler.timer("trainer/update"):
+                    training_stats = self._update_step(collect_stats)
 
             return self._TrainingStepResult(
                 collect_stats=collect_stats,
@@ -1091,7 +1125,8 @@ class OffPolicyTrainer(OnlineTrainer[OffPolicyAlgorithm, OffPolicyTrainerParams]
         # exactly one gradient step. This is why we don't need to calculate the
         # number of gradient steps, like in the on-policy case.
         update_stat = self.algorithm.update(sample_size=self.params.batch_size, buffer=buffer)
-        self._update_moving_avg_stats_and_log_update_data(update_stat)
+        with Profiler.timer("trainer/update_bookkeeping"):
+            self._update_moving_avg_stats_and_log_update_data(update_stat)
         return update_stat
 
 
@@ -1,5 +1,6 @@
 """Utils package."""
 
+from tianshou.utils.logger.background import BackgroundLogger
 from tianshou.utils.logger.logger_base import BaseLogger, LazyLogger
 from tianshou.utils.logger.tensorboard import TensorboardLogger
 from tianshou.utils.logger.wandb import WandbLogger
@@ -8,6 +9,7 @@ from tianshou.utils.statistics import MovAvg, RunningMeanStd
 from tianshou.utils.warning import deprecation
 
 __all__ = [
+    "BackgroundLogger",
     "BaseLogger",
     "DummyTqdm",
     "LazyLogger",
@@ -0,0 +1,171 @@
+import logging
+import queue
+import threading
+from collections.abc import Callable
+from enum import StrEnum
+from typing import Any
+
+from tianshou.utils.logger.logger_base import VALID_LOG_VALS_TYPE, BaseLogger, TRestoredData
+from tianshou.utils.logger.tensorboard import TensorboardLogger
+
+log = logging.getLogger(__name__)
+
+
+class QueueFullPolicy(StrEnum):
+    BLOCK = "block"
+    """block the training thread until the writer thread has made room in the queue"""
+    DROP = "drop"
+    """drop the data to be logged (and count it in :attr:`BackgroundLogger.num_dropped`)"""
+
+
+_STOP = object()
+"""sentinel which signals the writer thread to terminate"""
+
+
+class BackgroundLogger(BaseLogger):
+    """A wrapper around another logger which performs the actual writing in a background thread.
+
+    The wrapper applies the logging intervals of the wrapped logger on the calling thread and enqueues
+    the data to be logged into a bounded queue. A writer thread takes the data from the queue in
+    batches, prepares it for logging (flattening, filtering) and writes it via the wrapped logger,
+    flushing once per batch. Thus, slow writers (e.g. on network file systems or when syncing with
+    W&B) do not block the training loop.
+
+    The queue is flushed (i.e. all enqueued data is written) before checkpoints are saved, before
+    data is restored and on :meth:`finalize`, such that the logged data is consistent with the
+    checkpoints. Exceptions raised by the wrapped logger in the writer thread are re-raised on the
+    calling thread with the next logging call.
+
+    NOTE: Since the wrapper flushes the wrapped logger after each batch, the wrapped
+    :class:`~tianshou.utils.logger.tensorboard.TensorboardLogger` should be created with
+    ``write_flush=False``.
+
+    :param logger: the logger to wrap, whose logging intervals are applied.
+    :param max_queue_size: the maximum number of log entries in the queue.
+    :param queue_full_policy: what to do if the queue is full when new data is to be logged.
+    :param max_batch_size: the maximum number of log entries to write before flushing the wrapped logger.
+    """
+
+    def __init__(
+        self,
+        logger: BaseLogger,
+        max_queue_size: int = 1000,
+        queue_full_policy: QueueFullPolicy = QueueFullPolicy.BLOCK,
+        max_batch_size: int = 100,
+    ) -> None:
+        super().__init__(
+            training_interval=logger.training_interval,
+            test_interval=logger.test_interval,
+            update_interval=logger.update_interval,
+            info_interval=logger.info_interval,
+            save_interval=logger.save_interval,
+            exclude_arrays=logger.exclude_arrays,
+        )
+        self.logger = logger
+        self.queue_full_policy = queue_full_policy
+        self.max_batch_size = max_batch_size
+        self.num_dropped = 0
+        """the number of log entries that were dropped because the queue was full"""
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=max_queue_size)
+        self._exception: BaseException | None = None
+        self._thread = threading.Thread(
+            target=self._write_loop,
+            name=f"{self.__class__.__name__}Writer",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            entries = [self._queue.get()]
+            while len(entries) < self.max_batch_size:
+                try:
+                    entries.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                if self._exception is None:
+                    for entry in entries:
+                        if entry is not _STOP:
+                            step_type, step, data = entry
+                            data = self.logger.prepare_dict_for_logging(data)
+                            self.logger.write(step_type, step, data)
+                    self.logger.flush()
+            except BaseException as e:
+                log.error(f"Error in background logger thread: {e}")
+                self._exception = e
+            finally:
+                for _ in entries:
+                    self._queue.task_done()
+            if any(entry is _STOP for entry in entries):
+                return
+
+    def _raise_pending_exception(self) -> None:
+        if self._exception is not None:
+            exception, self._exception = self._exception, None
+            raise RuntimeError("Writing log data in the background thread failed") from exception
+
+    def prepare_dict_for_logging(self, log_data: dict) -> dict[str, VALID_LOG_VALS_TYPE]:
+        # preparation is performed by the writer thread (see write)
+        return log_data
+
+    def write(self, step_type: str, step: int, data: dict[str, VALID_LOG_VALS_TYPE]) -> None:
+        self._raise_pending_exception()
+        if not self._thread.is_alive():
+            raise RuntimeError("Cannot log data after the logger has been finalized")
+        entry = (step_type, step, data)
+        if self.queue_full_policy == QueueFullPolicy.BLOCK:
+            self._queue.put(entry)
+        else:
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                if self.num_dropped == 0:
+                    log.warning(
+                        "Log queue is full, dropping log data; consider increasing the queue size "
+                        "or the logging intervals"
+                    )
+                self.num_dropped += 1
+
+    def flush(self) -> None:
+        """Blocks until all enqueued data has been written by the wrapped logger."""
+        self._queue.join()
+        self._raise_pending_exception()
+
+    def finalize(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._raise_pending_exception()
+        self.logger.finalize()
+
+    def save_data(
+        self,
+        epoch: int,
+        env_step: int,
+        update_step: int,
+        save_checkpoint_fn: Callable[[int, int, int], str] | None = None,
+    ) -> None:
+        self.flush()
+        self.logger.save_data(epoch, env_step, update_step, save_checkpoint_fn)
+
+    def restore_data(self) -> tuple[int, int, int]:
+        self.flush()
+        result = self.logger.restore_data()
+        self.last_log_training_step = self.logger.last_log_training_step
+        self.last_log_test_step = self.logger.last_log_test_step
+        self.last_log_update_step = self.logger.last_log_update_step
+        self.last_log_info_step = self.logger.last_log_info_step
+        return result
+
+    @staticmethod
+    def restore_logged_data(
+        log_path: str,
+        logger_class: type[BaseLogger] = TensorboardLogger,
+    ) -> TRestoredData:
+        """Restores the logged data by delegating to the class of the wrapped logger, which wrote it.
+
+        :param log_path: the path from which to restore the logged data.
+        :param logger_class: the class of the wrapped logger.
+        """
+        return logger_class.restore_logged_data(log_path)
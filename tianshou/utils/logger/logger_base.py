@@ -18,6 +18,7 @@ class DataScope(StrEnum):
     TEST = "test"
     UPDATE = "update"
     INFO = "info"
+    PROFILE = "profile"
 
 
 class BaseLogger(ABC):
@@ -75,14 +76,21 @@ class BaseLogger(ABC):
     def finalize(self) -> None:
         """Finalize the logger, e.g., close writers and connections."""
 
-    def log_training_data(self, log_data: dict, step: int) -> None:
+    def flush(self) -> None:
+        """Flush all data written so far, e.g., to disk."""
+
+    def log_training_data(self, log_data: dict | Callable[[], dict], step: int) -> None:
         """Use writer to log statistics generated during training.
 
-        :param log_data: a dict containing the information returned by the collector during the train step.
+        :param log_data: a dict containing the information returned by the collector during the train step,
+            or a function creating this dict (which may be expensive); the function will only be called if
+            the data is actually logged at this step.
         :param step: stands for the timestep the collector result is logged.
         """
         # TODO: move interval check to calling method
         if step - self.last_log_training_step >= self.training_interval:
+            if callable(log_data):
+                log_data = log_data()
             log_data = self.prepare_dict_for_logging(log_data)
             self.write(f"{DataScope.TRAINING}/env_step", step, log_data)
             self.last_log_training_step = step
@@ -99,14 +107,18 @@ class BaseLogger(ABC):
             self.write(f"{DataScope.TEST}/env_step", step, log_data)
             self.last_log_test_step = step
 
-    def log_update_data(self, log_data: dict, step: int) -> None:
+    def log_update_data(self, log_data: dict | Callable[[], dict], step: int) -> None:
         """Use writer to log statistics generated during updating.
 
-        :param log_data:a dict containing the information returned during the policy update step.
+        :param log_data: a dict containing the information returned during the policy update step,
+            or a function creating this dict (which may be expensive); the function will only be called if
+            the data is actually logged at this step.
         :param step: stands for the timestep the policy training data is logged.
         """
         # TODO: move interval check to calling method
         if step - self.last_log_update_step >= self.update_interval:
+            if callable(log_data):
+                log_data = log_data()
             log_data = self.prepare_dict_for_logging(log_data)
             self.write(f"{DataScope.UPDATE}/update_step", step, log_data)
             self.last_log_update_step = step
@@ -124,6 +136,17 @@ class BaseLogger(ABC):
             self.write(f"{DataScope.INFO}/epoch", step, log_data)
             self.last_log_info_step = step
 
+    def log_profile_data(self, log_data: dict, step: int) -> None:
+        """Use writer to log the phase timing statistics collected by the profiler.
+
+        This is only called if the profiler is enabled (see :class:`~tianshou.utils.profiling.ProfilerContext`).
+
+        :param log_data: a dict mapping phase names to their timing statistics, collected since the last call.
+        :param step: stands for the epoch in which the timings were recorded.
+        """
+        log_data = self.prepare_dict_for_logging(log_data)
+        self.write(f"{DataScope.PROFILE}/epoch", step, log_data)
+
     @abstractmethod
     def save_data(
         self,
@@ -1,10 +1,8 @@
+import sys
 from collections.abc import Callable
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 import numpy as np
-from matplotlib.figure import Figure
-from tensorboard.backend.event_processing import event_accumulator
-from torch.utils.tensorboard import SummaryWriter
 
 from tianshou.utils.logger.logger_base import (
     VALID_LOG_VALS,
@@ -13,6 +11,15 @@ from tianshou.utils.logger.logger_base import (
     TRestoredData,
 )
 
+if TYPE_CHECKING:
+    from torch.utils.tensorboard import SummaryWriter
+
+
+def _is_figure(value: Any) -> bool:
+    # matplotlib is expensive to import and a figure can only exist if it has already been imported
+    figure_module = sys.modules.get("matplotlib.figure")
+    return figure_module is not None and isinstance(value, figure_module.Figure)
+
 
 class TensorboardLogger(BaseLogger):
     """A logger that relies on tensorboard SummaryWriter by default to visualize and log statistics.
@@ -29,7 +36,7 @@ class TensorboardLogger(BaseLogger):
 
     def __init__(
         self,
-        writer: SummaryWriter,
+        writer: "SummaryWriter",
         training_interval: int = 1000,
         test_interval: int = 1,
         update_interval: int = 1000,
@@ -92,13 +99,16 @@ class TensorboardLogger(BaseLogger):
             scope_key = f"{scope}/{k}"
             if isinstance(v, np.ndarray):
                 self.writer.add_histogram(scope_key, v, global_step=step, bins="auto")
-            elif isinstance(v, Figure):
+            elif _is_figure(v):
                 self.writer.add_figure(scope_key, v, global_step=step)
             else:
                 self.writer.add_scalar(scope_key, v, global_step=step)
         if self.write_flush:  # issue 580
             self.writer.flush()  # issue #482
 
+    def flush(self) -> None:
+        self.writer.flush()
+
     def finalize(self) -> None:
         self.writer.close()
 
@@ -125,6 +135,8 @@ class TensorboardLogger(BaseLogger):
             )
 
     def restore_data(self) -> tuple[int, int, int]:
+        from tensorboard.backend.event_processing import event_accumulator
+
         ea = event_accumulator.EventAccumulator(self.writer.log_dir)
         ea.Reload()
 
@@ -154,6 +166,8 @@ class TensorboardLogger(BaseLogger):
         form a nested structure, where the hierarchy is represented by the slashes
         in the tensorboard key-strings.
         """
+        from tensorboard.backend.event_processing import event_accumulator
+
         ea = event_accumulator.EventAccumulator(log_path)
         ea.Reload()
 
@@ -2,12 +2,14 @@ import argparse
 import logging
 import os
 from collections.abc import Callable
-
-from torch.utils.tensorboard import SummaryWriter
+from typing import TYPE_CHECKING
 
 from tianshou.utils import BaseLogger, TensorboardLogger
 from tianshou.utils.logger.logger_base import VALID_LOG_VALS_TYPE, TRestoredData
 
+if TYPE_CHECKING:
+    from torch.utils.tensorboard import SummaryWriter
+
 log = logging.getLogger(__name__)
 
 
@@ -100,7 +102,7 @@ class WandbLogger(BaseLogger):
             )
         return self.tensorboard_logger.prepare_dict_for_logging(log_data)
 
-    def load(self, writer: SummaryWriter) -> None:
+    def load(self, writer: "SummaryWriter") -> None:
         self.writer = writer
         self.tensorboard_logger = TensorboardLogger(
             writer,
@@ -120,6 +122,10 @@ class WandbLogger(BaseLogger):
             )
         self.tensorboard_logger.write(step_type, step, data)
 
+    def flush(self) -> None:
+        if self.tensorboard_logger is not None:
+            self.tensorboard_logger.flush()
+
     def finalize(self) -> None:
         if self.wandb_run is not None:
             self.wandb_run.finish()
@@ -242,6 +242,30 @@ class Actor(Generic[T], ActionReprNetWithVectorOutput[T], ABC):
         (see :class:`RandomActor` for an example).
         """
 
+    def forward_from_latent(
+        self,
+        latent: torch.Tensor,
+        state: T | None = None,
+    ) -> tuple[Any, T | None]:
+        """Computes the actor's output from the latent representation produced by the pre-processing network
+        (see :meth:`get_preprocess_net`), i.e. it performs the part of :meth:`forward` that follows the
+        pre-processing stage.
+
+        This allows the result of the pre-processing network to be shared with other networks (e.g. a critic
+        using the same pre-processing network), such that it needs to be computed only once.
+        Actors that do not support this raise `NotImplementedError`
+        (see :meth:`supports_forward_from_latent`).
+
+        :param latent: the output of the pre-processing network
+        :param state: the hidden state, which is returned as is
+        :return: a tuple (action_repr, state) as in :meth:`forward`
+        """
+        raise NotImplementedError
+
+    def supports_forward_from_latent(self) -> bool:
+        """:return: whether the actor implements :meth:`forward_from_latent`"""
+        return type(self).forward_from_latent is not Actor.forward_from_latent
+
 
 class Net(ActionReprNetWithVectorOutput[Any]):
     """A multi-layer perceptron which outputs an action-related representation.
@@ -550,6 +574,65 @@ class EnsembleLinear(nn.Module):
         return x
 
 
+def is_stackable(modules: Sequence[nn.Module]) -> bool:
+    """Checks whether the given modules can be evaluated jointly via :func:`stacked_forward`.
+
+    This is the case if the modules are of the same type, have parameters of the same names, shapes,
+    dtypes and devices, and have no buffers (which could be updated in the forward pass, e.g. the
+    running statistics of batch normalization).
+
+    :param modules: the modules to check
+    """
+    if len(modules) == 0 or len({type(m) for m in modules}) != 1:
+        return False
+    if any(next(m.buffers(), None) is not None for m in modules):
+        return False
+    signatures = [
+        [(name, p.shape, p.dtype, p.device) for name, p in m.named_parameters()] for m in modules
+    ]
+    return all(signature == signatures[0] for signature in signatures[1:])
+
+
+def stacked_forward(modules: Sequence[nn.Module], *args: Any, **kwargs: Any) -> Any:
+    """Applies several structurally identical modules to the same inputs in a single vectorized call.
+
+    The current parameters of the modules are stacked (differentiably) in every call and the forward
+    pass of the first module is vectorized over them via `torch.vmap` and `torch.func.functional_call`,
+    such that gradients flow back to the individual modules and the modules can be optimized separately.
+    A typical use case are the twin critics of TD3/SAC-style algorithms, which are evaluated
+    on the same observations and actions.
+
+    :param modules: the modules to apply, which must be stackable (see :func:`is_stackable`)
+    :param args: the positional arguments of the forward pass, which are passed to every module
+    :param kwargs: keyword arguments that are passed to every module
+    :return: the outputs of the modules, stacked along the first dimension. If the modules return tuples,
+        entries that are not tensors are returned as they are (taken from the first module).
+    """
+    named_params = [dict(m.named_parameters()) for m in modules]
+    params = {name: torch.stack([p[name] for p in named_params]) for name in named_params[0]}
+    non_tensor_outputs: dict[int, Any] = {}
+
+    def call_single(params: dict[str, torch.Tensor], *single_args: Any) -> Any:
+        output = torch.func.functional_call(modules[0], params, single_args, kwargs)
+        if not isinstance(output, tuple):
+            return output
+        # vmap only supports tensor outputs, so other outputs are handed over separately
+        non_tensor_outputs.update(
+            {i: o for i, o in enumerate(output) if not isinstance(o, torch.Tensor)},
+        )
+        return tuple(o for o in output if isinstance(o, torch.Tensor))
+
+    in_dims = (0, *([None] * len(args)))
+    output = torch.vmap(call_single, in_dims=in_dims, randomness="different")(params, *args)
+    if not non_tensor_outputs:
+        return output
+    tensor_outputs = iter(output)
+    return tuple(
+        non_tensor_outputs[i] if i in non_tensor_outputs else next(tensor_outputs)
+        for i in range(len(output) + len(non_tensor_outputs))
+    )
+
+
 class BranchingNet(ActionReprNet):
     """Branching dual Q network.
 
@@ -80,9 +80,16 @@ class ContinuousActorDeterministic(AbstractContinuousActorDeterministic):
         The hidden state is only not None if a recurrent net is used as part of the
         learning algorithm (support for RNNs is currently experimental).
         """
-        action_BA, hidden_BH = self.preprocess(obs, state)
-        action_BA = self.max_action * torch.tanh(self.last(action_BA))
-        return action_BA, hidden_BH
+        latent_BL, hidden_BH = self.preprocess(obs, state)
+        return self.forward_from_latent(latent_BL, hidden_BH)
+
+    def forward_from_latent(
+        self,
+        latent: torch.Tensor,
+        state: T | None = None,
+    ) -> tuple[torch.Tensor, T | None]:
+        action_BA = self.max_action * torch.tanh(self.last(latent))
+        return action_BA, state
 
 
 class AbstractContinuousCritic(ModuleWithVectorOutput, ABC):
@@ -168,6 +175,14 @@ class ContinuousCritic(AbstractContinuousCritic):
             obs, _ = self.preprocess(obs)
         return self.last(obs)
 
+    def forward_from_latent(self, latent: torch.Tensor) -> torch.Tensor:
+        """Computes V(s) from the latent representation of the observations produced by the pre-processing
+        network, allowing the pre-processing to be shared with an actor (see :meth:`Actor.forward_from_latent`).
+        Requires `apply_preprocess_net_to_obs_only` (and a critic that does not use actions).
+        """
+        assert self.apply_preprocess_net_to_obs_only
+        return self.last(latent.flatten(1))
+
 
 class ContinuousActorProbabilistic(AbstractContinuousActorProbabilistic):
     """Simple actor network that outputs `mu` and `sigma` to be used as input for a `dist_fn` (typically, a Gaussian).
@@ -226,11 +241,18 @@ class ContinuousActorProbabilistic(AbstractContinuousActorProbabilistic):
         if info is None:
             info = {}
         logits, hidden = self.preprocess(obs, state)
-        mu = self.mu(logits)
+        return self.forward_from_latent(logits, state)
+
+    def forward_from_latent(
+        self,
+        latent: torch.Tensor,
+        state: T | None = None,
+    ) -> tuple[tuple[torch.Tensor, torch.Tensor], T | None]:
+        mu = self.mu(latent)
         if not self._unbounded:
             mu = self.max_action * torch.tanh(mu)
         if self._c_sigma:
-            sigma = torch.clamp(self.sigma(logits), min=SIGMA_MIN, max=SIGMA_MAX).exp()
+            sigma = torch.clamp(self.sigma(latent), min=SIGMA_MIN, max=SIGMA_MAX).exp()
         else:
             shape = [1] * len(mu.shape)
             shape[1] = -1
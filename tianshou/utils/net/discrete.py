@@ -83,12 +83,19 @@ class DiscreteActor(AbstractDiscreteActor):
         not None if a recurrent net is used as part of the learning algorithm.
         """
         x, hidden_BH = self.preprocess(obs, state)
-        x = self.last(x)
+        return self.forward_from_latent(x, hidden_BH)
+
+    def forward_from_latent(
+        self,
+        latent: torch.Tensor,
+        state: T | None = None,
+    ) -> tuple[torch.Tensor, T | None]:
+        x = self.last(latent)
         if self.softmax_output:
             x = F.softmax(x, dim=-1)
         # If we computed softmax, output is probabilities, otherwise it's the non-normalized action values
         output_BA = x
-        return output_BA, hidden_BH
+        return output_BA, state
 
 
 class DiscreteCritic(ModuleWithVectorOutput):
@@ -120,7 +127,13 @@ class DiscreteCritic(ModuleWithVectorOutput):
         """Mapping: s_B -> V(s)_B."""
         # TODO: don't use this mechanism for passing state
         logits, _ = self.preprocess(obs, state=state)
-        return self.last(logits)
+        return self.forward_from_latent(logits)
+
+    def forward_from_latent(self, latent: torch.Tensor) -> torch.Tensor:
+        """Computes the output from the latent representation produced by the pre-processing network,
+        allowing the pre-processing to be shared with an actor (see :meth:`Actor.forward_from_latent`).
+        """
+        return self.last(latent)
 
 
 class CosineEmbeddingNetwork(nn.Module):
@@ -0,0 +1,188 @@
+"""Opt-in, low-overhead timing instrumentation for collection, updates and training epochs.
+
+Instrumented code wraps phases in ``with Profiler.timer("<scope>/<phase>"):`` blocks. While the
+profiler is disabled (the default), the call returns a shared no-op context manager, such that the
+instrumentation costs little more than an attribute lookup per phase. When enabled (preferably via
+:class:`ProfilerContext`), each timed phase is recorded as an event, from which percentile latency
+summaries can be computed and a trace in the Chrome trace event format can be written (which can be
+inspected with ``chrome://tracing`` or https://ui.perfetto.dev).
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import dataclass
+from typing import Any, ClassVar, NamedTuple, Self
+
+import numpy as np
+
+_NULL_TIMER: AbstractContextManager[None] = nullcontext()
+
+
+class _TimerEvent(NamedTuple):
+    name: str
+    start_ns: int
+    duration_ns: int
+    thread_id: int
+
+
+@dataclass(kw_only=True)
+class PhaseTimingStats:
+    """Latency statistics of a single named phase; all times are given in milliseconds."""
+
+    count: int
+    total_ms: float
+    mean_ms: float
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    max_ms: float
+
+    @classmethod
+    def from_durations_ns(cls, durations_ns: list[int]) -> Self:
+        durations_ms = np.asarray(durations_ns, dtype=np.float64) / 1e6
+        p50, p90, p99 = np.percentile(durations_ms, [50, 90, 99])
+        return cls(
+            count=len(durations_ms),
+            total_ms=float(durations_ms.sum()),
+            mean_ms=float(durations_ms.mean()),
+            p50_ms=float(p50),
+            p90_ms=float(p90),
+            p99_ms=float(p99),
+            max_ms=float(durations_ms.max()),
+        )
+
+
+class _Timer:
+    __slots__ = ("_name", "_start_ns")
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+        self._start_ns = 0
+
+    def __enter__(self) -> None:
+        self._start_ns = time.perf_counter_ns()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):  # type: ignore
+        end_ns = time.perf_counter_ns()
+        Profiler._record(self._name, self._start_ns, end_ns - self._start_ns)
+
+
+class Profiler:
+    """Collects named phase timings, which can be summarized as percentile latencies and exported as a trace."""
+
+    is_enabled = False
+    """
+    whether the profiler is enabled.
+
+    NOTE: The preferred way to enable this is via the context manager :class:`ProfilerContext`.
+    """
+    max_events = 1_000_000
+    """
+    the maximum number of events to retain for the trace; when exceeded, further events are only taken
+    into account for the percentile summaries
+    """
+    _events: ClassVar[list[_TimerEvent]] = []
+    _window_durations_ns: ClassVar[defaultdict[str, list[int]]] = defaultdict(list)
+    _origin_ns = 0
+
+    @classmethod
+    def timer(cls, name: str) -> AbstractContextManager[None]:
+        """
+        :param name: the name of the phase to be timed; by convention, names are hierarchical with "/" as the
+            separator, e.g. "collect/env_step"
+        :return: a context manager which times the enclosed block if the profiler is enabled and does nothing
+            otherwise
+        """
+        if not cls.is_enabled:
+            return _NULL_TIMER
+        return _Timer(name)
+
+    @classmethod
+    def _record(cls, name: str, start_ns: int, duration_ns: int) -> None:
+        cls._window_durations_ns[name].append(duration_ns)
+        if len(cls._events) < cls.max_events:
+            cls._events.append(_TimerEvent(name, start_ns, duration_ns, threading.get_ident()))
+
+    @classmethod
+    def reset(cls) -> None:
+        """Discards all recorded events and timings."""
+        cls._events = []
+        cls._window_durations_ns = defaultdict(list)
+        cls._origin_ns = time.perf_counter_ns()
+
+    @classmethod
+    def get_summary(cls, reset_window: bool = True) -> dict[str, PhaseTimingStats]:
+        """Computes latency statistics for all phases that were timed since the last window reset.
+
+        :param reset_window: whether to start a new window, i.e. subsequent summaries will only consider
+            timings recorded after this call. The events retained for the trace are not affected.
+        :return: a mapping from phase name to the phase's timing statistics
+        """
+        window = cls._window_durations_ns
+        if reset_window:
+            cls._window_durations_ns = defaultdict(list)
+        return {
+            name: PhaseTimingStats.from_durations_ns(durations)
+            for name, durations in sorted(window.items())
+            if durations
+        }
+
+    @classmethod
+    def get_chrome_trace(cls) -> dict[str, Any]:
+        """:return: the retained events in the Chrome trace event format (complete events, times in microseconds)"""
+        pid = os.getpid()
+        trace_events = [
+            {
+                "name": event.name,
+                "cat": event.name.split("/", 1)[0],
+                "ph": "X",
+                "ts": (event.start_ns - cls._origin_ns) / 1e3,
+                "dur": event.duration_ns / 1e3,
+                "pid": pid,
+                "tid": event.thread_id,
+            }
+            for event in cls._events
+        ]
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    @classmethod
+    def save_chrome_trace(cls, path: str) -> None:
+        """Writes the retained events to the given path as a Chrome trace JSON file.
+
+        :param path: the path of the JSON file to write
+        """
+        with open(path, "w") as f:
+            json.dump(cls.get_chrome_trace(), f)
+
+
+class ProfilerContext:
+    """A context manager which enables the profiler and discards all previously recorded timings."""
+
+    def __init__(self, trace_path: str | None = None, max_events: int = 1_000_000) -> None:
+        """
+        :param trace_path: if not None, the Chrome trace of all events recorded within the context
+            is saved to this path when the context is exited
+        :param max_events: the maximum number of events to retain for the trace
+        """
+        self._trace_path = trace_path
+        self._max_events = max_events
+
+    def __enter__(self) -> Self:
+        Profiler.reset()
+        Profiler.max_events = self._max_events
+        Profiler.is_enabled = True
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):  # type: ignore
+        Profiler.is_enabled = False
+        if self._trace_path is not None:
+            Profiler.save_chrome_trace(self._trace_path)
+
+    @staticmethod
+    def get_summary(reset_window: bool = False) -> dict[str, PhaseTimingStats]:
+        """See :meth:`Profiler.get_summary`."""
+        return Profiler.get_summary(reset_window=reset_window)
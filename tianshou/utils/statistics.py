@@ -1,7 +1,11 @@
+import math
 from numbers import Number
+from typing import Any
 
 import numpy as np
+import numpy.typing as npt
 import torch
+from sensai.util.pickle import setstate
 
 
 class MovAvg:
@@ -21,13 +25,49 @@ class MovAvg:
         6.5
         >>> print(f'{stat.mean():.2f}±{stat.std():.2f}')
         6.50±1.12
+
+    The values are kept in a ring buffer together with their running sum, such that adding a value
+    and retrieving the average take constant time.
+
+    :param size: the number of most recent values to average over; if non-positive, all values are kept.
     """
 
+    _INITIAL_UNBOUNDED_CAPACITY = 128
+
     def __init__(self, size: int = 100) -> None:
         super().__init__()
         self.size = size
-        self.cache: list[np.number] = []
-        self.banned = [np.inf, np.nan, -np.inf]
+        capacity = size if size > 0 else self._INITIAL_UNBOUNDED_CAPACITY
+        self._values = np.zeros(capacity, dtype=np.float64)
+        self._num_values = 0
+        self._next_idx = 0
+        self._sum = 0.0
+        self._num_adds_since_resum = 0
+
+    @property
+    def cache(self) -> np.ndarray:
+        """The values currently being averaged, in the order in which they were added."""
+        if self._num_values < len(self._values):
+            return self._values[: self._num_values].copy()
+        return np.roll(self._values, -self._next_idx)
+
+    def _add_value(self, value: float) -> None:
+        if self._num_values == len(self._values) and self.size > 0:
+            self._sum -= self._values[self._next_idx]
+        else:
+            if self._num_values == len(self._values):
+                # unbounded: values are never overwritten, so the buffer is grown instead
+                self._values = np.concatenate([self._values, np.zeros_like(self._values)])
+                self._next_idx = self._num_values
+            self._num_values += 1
+        self._values[self._next_idx] = value
+        self._sum += value
+        self._next_idx = (self._next_idx + 1) % len(self._values)
+        # periodically recompute the sum to prevent the accumulation of floating point errors
+        self._num_adds_since_resum += 1
+        if self._num_adds_since_resum >= len(self._values):
+            self._sum = float(self._values[: self._num_values].sum())
+            self._num_adds_since_resum = 0
 
     def add(
         self,
@@ -38,22 +78,22 @@ class MovAvg:
         You can add ``torch.Tensor`` with only one element, a python scalar, or
         a list of python scalar.
         """
+        if isinstance(data_array, float | int):
+            if math.isfinite(data_array):
+                self._add_value(data_array)
+            return self.get()
         if isinstance(data_array, torch.Tensor):
             data_array = data_array.flatten().cpu().numpy()
-        if np.isscalar(data_array):
-            data_array = [data_array]
-        for number in data_array:  # type: ignore
-            if number not in self.banned:
-                self.cache.append(number)
-        if self.size > 0 and len(self.cache) > self.size:
-            self.cache = self.cache[-self.size :]
+        for number in np.asarray(data_array, dtype=np.float64).reshape(-1):
+            if np.isfinite(number):
+                self._add_value(float(number))
         return self.get()
 
     def get(self) -> float:
         """Get the average."""
-        if len(self.cache) == 0:
+        if self._num_values == 0:
             return 0.0
-        return float(np.mean(self.cache))  # type: ignore
+        return self._sum / self._num_values
 
     def mean(self) -> float:
         """Get the average. Same as :meth:`get`."""
@@ -61,9 +101,9 @@ class MovAvg:
 
     def std(self) -> float:
         """Get the standard deviation."""
-        if len(self.cache) == 0:
+        if self._num_values == 0:
             return 0.0
-        return float(np.std(self.cache))  # type: ignore
+        return float(np.std(self._values[: self._num_values]))
 
 
 class RunningMeanStd:
@@ -71,11 +111,18 @@ class RunningMeanStd:
 
     https://en.wikipedia.org/wiki/Algorithms_for_calculating_variance#Parallel_algorithm
 
+    Since the statistics are updated with the parallel algorithm, statistics computed
+    separately (e.g. in different processes) can be combined via :meth:`merge`.
+
     :param mean: the initial mean estimation for data array. Default to 0.
     :param std: the initial standard error estimation for data array.
     :param clip_max: the maximum absolute value for data array. Default to
         10.0.
     :param epsilon: To avoid division by zero.
+    :param dtype: the dtype in which :meth:`norm` computes the normalized data, e.g.
+        ``np.float32`` to avoid float64 arithmetic on large float32 arrays. If None,
+        numpy's type promotion applies. The statistics are always accumulated in
+        the precision of the initial mean and variance.
     """
 
     def __init__(
@@ -84,13 +131,26 @@ class RunningMeanStd:
         std: float | np.ndarray = 1.0,
         clip_max: float | None = 10.0,
         epsilon: float = np.finfo(np.float32).eps.item(),
+        dtype: npt.DTypeLike | None = None,
     ) -> None:
         self.mean, self.var = mean, std
         self.clip_max = clip_max
         self.count = 0
         self.eps = epsilon
+        self.dtype = None if dtype is None else np.dtype(dtype)
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        setstate(RunningMeanStd, self, state, new_default_properties={"dtype": None})
 
     def norm(self, data_array: float | np.ndarray) -> float | np.ndarray:
+        if self.dtype is not None:
+            data_array = np.asarray(data_array, dtype=self.dtype)
+            mean = np.asarray(self.mean, dtype=self.dtype)
+            scale = np.asarray(1.0 / np.sqrt(self.var + self.eps), dtype=self.dtype)
+            data_array = (data_array - mean) * scale
+            if self.clip_max:
+                np.clip(data_array, -self.clip_max, self.clip_max, out=data_array)
+            return data_array
         data_array = (data_array - self.mean) / np.sqrt(self.var + self.eps)
         if self.clip_max:
             data_array = np.clip(data_array, -self.clip_max, self.clip_max)
@@ -99,8 +159,17 @@ class RunningMeanStd:
     def update(self, data_array: np.ndarray) -> None:
         """Add a batch of item into RMS with the same shape, modify mean/var/count."""
         batch_mean, batch_var = np.mean(data_array, axis=0), np.var(data_array, axis=0)
-        batch_count = len(data_array)
+        self.update_from_moments(batch_mean, batch_var, len(data_array))
 
+    def update_from_moments(
+        self,
+        batch_mean: float | np.ndarray,
+        batch_var: float | np.ndarray,
+        batch_count: int,
+    ) -> None:
+        """Add the mean and variance of a batch of items to the statistics, modify mean/var/count."""
+        if batch_count == 0:
+            return
         delta = batch_mean - self.mean
         total_count = self.count + batch_count
 
@@ -112,3 +181,7 @@ class RunningMeanStd:
 
         self.mean, self.var = new_mean, new_var
         self.count = total_count
+
+    def merge(self, other: "RunningMeanStd") -> None:
+        """Combine the statistics of another instance (computed over disjoint data) into these statistics."""
+        self.update_from_moments(other.mean, other.var, other.count)